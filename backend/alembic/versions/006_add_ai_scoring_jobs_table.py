@@ -0,0 +1,51 @@
+"""Add ai_scoring_jobs table
+
+Revision ID: 006
+Revises: 7d765fb21260
+Create Date: 2026-03-02 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '006'
+down_revision: Union[str, None] = '7d765fb21260'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ai_scoring_jobs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('evaluation_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('dedupe_key', sa.String(length=36), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('next_run_at', sa.DateTime(), nullable=False),
+        sa.Column('locked_by', sa.String(length=64), nullable=True),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('ai_score_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('requested_by', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['evaluation_id'], ['self_evaluations.id']),
+        sa.ForeignKeyConstraint(['requested_by'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dedupe_key', name='uq_ai_scoring_jobs_dedupe_key')
+    )
+    op.create_index('ix_ai_scoring_jobs_evaluation_id', 'ai_scoring_jobs', ['evaluation_id'], unique=False)
+    op.create_index('ix_ai_scoring_jobs_status_next_run_at', 'ai_scoring_jobs', ['status', 'next_run_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ai_scoring_jobs_status_next_run_at', table_name='ai_scoring_jobs')
+    op.drop_index('ix_ai_scoring_jobs_evaluation_id', table_name='ai_scoring_jobs')
+    op.drop_table('ai_scoring_jobs')
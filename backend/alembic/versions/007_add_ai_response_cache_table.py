@@ -0,0 +1,42 @@
+"""Add ai_response_cache table
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-03-03 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ai_response_cache',
+        sa.Column('fingerprint', sa.String(length=64), nullable=False),
+        sa.Column('model', sa.String(length=64), nullable=False),
+        sa.Column('temperature', sa.Numeric(precision=3, scale=2), nullable=False),
+        sa.Column('response', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('api_latency_ms', sa.Integer(), nullable=False),
+        sa.Column('hit_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('fingerprint')
+    )
+    op.create_index('ix_ai_response_cache_last_used_at', 'ai_response_cache', ['last_used_at'], unique=False)
+    op.create_index('ix_ai_response_cache_expires_at', 'ai_response_cache', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ai_response_cache_expires_at', table_name='ai_response_cache')
+    op.drop_index('ix_ai_response_cache_last_used_at', table_name='ai_response_cache')
+    op.drop_table('ai_response_cache')
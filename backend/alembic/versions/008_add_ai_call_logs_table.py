@@ -0,0 +1,43 @@
+"""Add ai_call_logs table
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-03-04 15:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '008'
+down_revision: Union[str, None] = '007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ai_call_logs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('evaluation_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('model', sa.String(length=64), nullable=False),
+        sa.Column('prompt_tokens_estimated', sa.Integer(), nullable=False),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=True),
+        sa.Column('completion_tokens', sa.Integer(), nullable=True),
+        sa.Column('latency_ms', sa.Integer(), nullable=False),
+        sa.Column('truncated_sections', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['evaluation_id'], ['self_evaluations.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ai_call_logs_evaluation_id', 'ai_call_logs', ['evaluation_id'], unique=False)
+    op.create_index('ix_ai_call_logs_created_at', 'ai_call_logs', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ai_call_logs_created_at', table_name='ai_call_logs')
+    op.drop_index('ix_ai_call_logs_evaluation_id', table_name='ai_call_logs')
+    op.drop_table('ai_call_logs')
@@ -0,0 +1,28 @@
+"""Add streaming progress columns to ai_scoring_jobs
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-03-06 10:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '009'
+down_revision: Union[str, None] = '008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('ai_scoring_jobs', sa.Column('partial_scores', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.add_column('ai_scoring_jobs', sa.Column('indicators_received', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('ai_scoring_jobs', 'indicators_received')
+    op.drop_column('ai_scoring_jobs', 'partial_scores')
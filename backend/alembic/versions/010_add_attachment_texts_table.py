@@ -0,0 +1,39 @@
+"""Add attachment_texts table and attachments.content_hash
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-03-09 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '010'
+down_revision: Union[str, None] = '009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'attachment_texts',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('extractor', sa.String(length=20), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('text', sa.Text(), nullable=True),
+        sa.Column('char_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('content_hash')
+    )
+    op.add_column('attachments', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_attachments_content_hash', 'attachments', ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_attachments_content_hash', table_name='attachments')
+    op.drop_column('attachments', 'content_hash')
+    op.drop_table('attachment_texts')
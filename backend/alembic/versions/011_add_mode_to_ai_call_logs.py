@@ -0,0 +1,25 @@
+"""Add mode to ai_call_logs
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-03-11 16:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '011'
+down_revision: Union[str, None] = '010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('ai_call_logs', sa.Column('mode', sa.String(length=10), server_default='full', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('ai_call_logs', 'mode')
@@ -0,0 +1,27 @@
+"""Add parsed competition counts to ai_scores
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-03-12 10:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '012'
+down_revision: Union[str, None] = '011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('ai_scores', sa.Column('parsed_competitions', sa.Integer(), nullable=True))
+    op.add_column('ai_scores', sa.Column('parsed_innovations', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('ai_scores', 'parsed_innovations')
+    op.drop_column('ai_scores', 'parsed_competitions')
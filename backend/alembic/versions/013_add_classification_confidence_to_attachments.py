@@ -0,0 +1,25 @@
+"""Add classification confidence to attachments
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-03-13 09:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '013'
+down_revision: Union[str, None] = '012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('attachments', sa.Column('classification_confidence', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('attachments', 'classification_confidence')
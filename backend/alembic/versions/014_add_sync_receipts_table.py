@@ -0,0 +1,39 @@
+"""Add sync_receipts table for chunked sync acknowledgement
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-03-14 10:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '014'
+down_revision: Union[str, None] = '013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sync_receipts',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('sync_task_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('chunk_index', sa.Integer(), nullable=False),
+        sa.Column('record_count', sa.Integer(), nullable=False),
+        sa.Column('chunk_root', sa.String(length=64), nullable=False),
+        sa.Column('evaluation_ids', sa.JSON(), nullable=False),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('sync_task_id', 'chunk_index', name='uq_sync_receipts_task_chunk')
+    )
+    op.create_index('ix_sync_receipts_sync_task_id', 'sync_receipts', ['sync_task_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sync_receipts_sync_task_id', table_name='sync_receipts')
+    op.drop_table('sync_receipts')
@@ -0,0 +1,41 @@
+"""Add sync_watermarks table and delta sync fields
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-03-15 09:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '015'
+down_revision: Union[str, None] = '014'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sync_watermarks',
+        sa.Column('evaluation_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('payload_hash', sa.String(length=64), nullable=True),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('deleted', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('sync_task_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('synced_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('evaluation_id')
+    )
+    op.add_column('sync_tasks', sa.Column('mode', sa.String(length=20), nullable=False, server_default='full'))
+    op.add_column('sync_tasks', sa.Column('deleted_evaluation_ids', sa.JSON(), nullable=True))
+    op.add_column('sync_receipts', sa.Column('deleted_ids', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('sync_receipts', 'deleted_ids')
+    op.drop_column('sync_tasks', 'deleted_evaluation_ids')
+    op.drop_column('sync_tasks', 'mode')
+    op.drop_table('sync_watermarks')
@@ -0,0 +1,46 @@
+"""Add evaluation_replicas table for the president office
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-03-16 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '016'
+down_revision: Union[str, None] = '015'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'evaluation_replicas',
+        sa.Column('evaluation_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('sync_task_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('payload_hash', sa.String(length=64), nullable=True),
+        sa.Column('teaching_office_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('teaching_office_name', sa.String(length=200), nullable=True),
+        sa.Column('evaluation_year', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=50), nullable=True),
+        sa.Column('ai_score', sa.Float(), nullable=True),
+        sa.Column('final_score', sa.Float(), nullable=True),
+        sa.Column('manual_scores', sa.JSON(), nullable=True),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('deleted', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('source_synced_at', sa.DateTime(), nullable=True),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('evaluation_id')
+    )
+    op.create_index('ix_evaluation_replicas_evaluation_year', 'evaluation_replicas', ['evaluation_year'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_evaluation_replicas_evaluation_year', table_name='evaluation_replicas')
+    op.drop_table('evaluation_replicas')
@@ -0,0 +1,52 @@
+"""Add sync_outbox table for transactional sync delivery
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-03-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '017'
+down_revision: Union[str, None] = '016'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sync_outbox',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('sync_task_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('evaluation_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False, server_default='record'),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('payload_hash', sa.String(length=64), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('max_attempts', sa.Integer(), nullable=False, server_default='8'),
+        sa.Column('next_run_at', sa.DateTime(), nullable=False),
+        sa.Column('locked_by', sa.String(length=64), nullable=True),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('delivered_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['sync_task_id'], ['sync_tasks.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('sync_task_id', 'evaluation_id', name='uq_sync_outbox_task_evaluation')
+    )
+    op.create_index('ix_sync_outbox_sync_task_id', 'sync_outbox', ['sync_task_id'], unique=False)
+    op.create_index('ix_sync_outbox_status_next_run_at', 'sync_outbox', ['status', 'next_run_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sync_outbox_status_next_run_at', table_name='sync_outbox')
+    op.drop_index('ix_sync_outbox_sync_task_id', table_name='sync_outbox')
+    op.drop_table('sync_outbox')
@@ -0,0 +1,59 @@
+"""Add upload_sessions and upload_chunks tables for chunked uploads
+
+Revision ID: 018
+Revises: 017
+Create Date: 2026-03-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '018'
+down_revision: Union[str, None] = '017'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'upload_sessions',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('evaluation_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('indicator', sa.String(length=255), nullable=False),
+        sa.Column('file_name', sa.String(length=255), nullable=False),
+        sa.Column('file_size', sa.BigInteger(), nullable=False),
+        sa.Column('content_type', sa.String(length=100), nullable=True),
+        sa.Column('chunk_size', sa.BigInteger(), nullable=False),
+        sa.Column('total_chunks', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='uploading'),
+        sa.Column('attachment_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['evaluation_id'], ['self_evaluations.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_upload_sessions_status_expires_at', 'upload_sessions', ['status', 'expires_at'], unique=False)
+    op.create_table(
+        'upload_chunks',
+        sa.Column('upload_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('chunk_index', sa.Integer(), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('storage_path', sa.String(length=500), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['upload_id'], ['upload_sessions.id'], ),
+        sa.PrimaryKeyConstraint('upload_id', 'chunk_index')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('upload_chunks')
+    op.drop_index('ix_upload_sessions_status_expires_at', table_name='upload_sessions')
+    op.drop_table('upload_sessions')
@@ -0,0 +1,104 @@
+"""Add content-addressed attachment storage and deduplicate existing files
+
+Revision ID: 019
+Revises: 018
+Create Date: 2026-03-19 09:00:00.000000
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '019'
+down_revision: Union[str, None] = '018'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'content_objects',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('storage_path', sa.String(length=500), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('content_type', sa.String(length=100), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('sha256'),
+        sa.UniqueConstraint('storage_path')
+    )
+    op.create_index('ix_content_objects_ref_count_updated_at', 'content_objects', ['ref_count', 'updated_at'])
+
+    op.create_table(
+        'storage_orphans',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('storage_path', sa.String(length=500), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    # 相同内容的附件共用存储路径
+    op.drop_constraint('uq_attachments_storage_path', 'attachments', type_='unique')
+    op.create_index('ix_attachments_storage_path', 'attachments', ['storage_path'])
+
+    _deduplicate_attachments()
+
+
+def _deduplicate_attachments() -> None:
+    """
+    按内容哈希合并已有附件：最早上传的文件作为内容对象，其余附件改指向它，
+    多余的文件记入 storage_orphans，由存储清理任务删除（迁移本身不操作对象存储）
+    """
+    bind = op.get_bind()
+    rows = bind.execute(sa.text(
+        "SELECT id, storage_path, content_hash, file_size, file_type FROM attachments "
+        "WHERE content_hash IS NOT NULL ORDER BY content_hash, uploaded_at, id"
+    )).fetchall()
+
+    groups = {}
+    for row in rows:
+        groups.setdefault(row.content_hash, []).append(row)
+
+    now = datetime.utcnow()
+    content_objects = sa.table(
+        'content_objects',
+        sa.column('sha256'), sa.column('storage_path'), sa.column('size'), sa.column('content_type'),
+        sa.column('ref_count'), sa.column('created_at'), sa.column('updated_at'),
+    )
+    storage_orphans = sa.table('storage_orphans', sa.column('storage_path'), sa.column('created_at'))
+    attachments = sa.table('attachments', sa.column('id'), sa.column('storage_path'))
+
+    for sha256, group in groups.items():
+        canonical = group[0]
+        # 大小不一致说明哈希记录有误，这些附件保持独立文件
+        same = [row for row in group if row.file_size == canonical.file_size]
+        bind.execute(content_objects.insert().values(
+            sha256=sha256,
+            storage_path=canonical.storage_path,
+            size=canonical.file_size,
+            content_type=canonical.file_type,
+            ref_count=len(same),
+            created_at=now,
+            updated_at=now,
+        ))
+        for row in same[1:]:
+            bind.execute(
+                attachments.update()
+                .where(attachments.c.id == row.id)
+                .values(storage_path=canonical.storage_path)
+            )
+            bind.execute(storage_orphans.insert().values(storage_path=row.storage_path, created_at=now))
+
+
+def downgrade() -> None:
+    # 只恢复表结构：去重后共用存储路径的附件无法恢复为独立文件，
+    # 存在共用路径的附件时唯一约束会创建失败，需先复制文件并改回独立路径
+    op.drop_index('ix_attachments_storage_path', table_name='attachments')
+    op.create_unique_constraint('uq_attachments_storage_path', 'attachments', ['storage_path'])
+    op.drop_table('storage_orphans')
+    op.drop_index('ix_content_objects_ref_count_updated_at', table_name='content_objects')
+    op.drop_table('content_objects')
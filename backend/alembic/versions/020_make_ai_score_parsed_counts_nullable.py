@@ -0,0 +1,30 @@
+"""Allow missing parsed attachment counts on ai_scores
+
+Revision ID: 020
+Revises: 019
+Create Date: 2026-03-20 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '020'
+down_revision: Union[str, None] = '019'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 流式响应被截断时未收到的解析数量存为空，不再以0代替（会误报数量不一致异常）。
+    # 此前以0保存的部分结果无法识别，保持不变
+    op.alter_column('ai_scores', 'parsed_reform_projects', existing_type=sa.Integer(), nullable=True)
+    op.alter_column('ai_scores', 'parsed_honorary_awards', existing_type=sa.Integer(), nullable=True)
+
+
+def downgrade() -> None:
+    # ai_scores 不可修改（见 004），存在为空的评分记录时降级失败
+    op.alter_column('ai_scores', 'parsed_honorary_awards', existing_type=sa.Integer(), nullable=False)
+    op.alter_column('ai_scores', 'parsed_reform_projects', existing_type=sa.Integer(), nullable=False)
@@ -0,0 +1,26 @@
+"""Store the local classifier's suggestion separately from the chosen indicator
+
+Revision ID: 021
+Revises: 020
+Create Date: 2026-03-21 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '021'
+down_revision: Union[str, None] = '020'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 本地分类模型的建议单独保存，不再覆盖用户上传时选择的指标
+    op.add_column('attachments', sa.Column('suggested_indicator', sa.String(length=255), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('attachments', 'suggested_indicator')
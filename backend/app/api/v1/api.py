@@ -1,4 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from app.core.circuit_breaker import outbound_guards
+from app.core.deps import require_management_roles
+from app.core.http_clients import http_clients
+from app.services.ai_response_cache import cache_metrics
 from app.api.v1.endpoints import auth, self_evaluation, attachments, scoring, review, president_office, publication, insight, logs, chunked_upload, improvement, college, management
 
 api_router = APIRouter()
@@ -7,6 +11,22 @@ api_router = APIRouter()
 def health_check():
     return {"status": "healthy"}
 
+# 连接池、熔断与缓存等内部状态只对管理端开放
+@api_router.get("/health/http-clients", dependencies=[Depends(require_management_roles)])
+def http_clients_health():
+    """出站HTTP连接池统计"""
+    return http_clients.metrics()
+
+@api_router.get("/health/outbound", dependencies=[Depends(require_management_roles)])
+def outbound_health():
+    """外部目标熔断状态与并发（上限、进行中、等待中）"""
+    return outbound_guards.metrics()
+
+@api_router.get("/health/ai-response-cache", dependencies=[Depends(require_management_roles)])
+def ai_response_cache_health():
+    """AI响应缓存命中统计"""
+    return cache_metrics.snapshot()
+
 # Include authentication routes
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
 
@@ -1,16 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status, UploadFile, File, Form, Query
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional
-from uuid import UUID, uuid4
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+from uuid import UUID
 from datetime import datetime
-import os
-import re
+import asyncio
 import logging
 from fastapi.concurrency import run_in_threadpool
 
 logger = logging.getLogger(__name__)
 
+from app.core.config import settings
 from app.core.deps import get_db, get_current_user, RoleChecker
 from app.models.user import User
 from app.models.attachment import Attachment
@@ -21,9 +22,25 @@ from app.schemas.attachment import (
     AttachmentInfo, 
     AttachmentWithRelations,
     AttachmentClassificationUpdate, 
-    AttachmentClassificationResponse
+    AttachmentClassificationResponse,
+    InstantUploadRequest,
+    InstantUploadResponse
 )
 from app.services.minio_service import minio_service
+from app.services.content_store import ContentStore
+from app.services.upload_challenge import decode_challenge, issue_challenge, verify_proof
+from app.services.attachment_text_service import extract_uploaded_attachments
+from app.services.storage_stream import StoredObject, attachment_storage_path, iter_stream
+from app.services.attachment_download import (
+    FileRangeResponse,
+    RangeNotSatisfiable,
+    entity_tag,
+    http_date,
+    is_not_modified,
+    last_modified,
+    requested_range
+)
+from app.services.attachment_classifier import AttachmentClassifierService, invalidate_attachment_classifier
 
 router = APIRouter()
 
@@ -32,17 +49,9 @@ require_teaching_office = RoleChecker(["teaching_office", "director", "teacher"]
 require_management_roles = RoleChecker(["evaluation_team", "evaluation_office"])
 
 
-def _sanitize_path_segment(segment: str) -> str:
-    """移除路径中非法字符，避免 Windows/本地存储报错"""
-    if not segment or not isinstance(segment, str):
-        return "unknown"
-    # 保留字母数字、中文、下划线、连字符，其余替换为下划线
-    segment = re.sub(r'[<>:"/\\|?*\x00-\x1f]', "_", segment)
-    return segment.strip() or "unknown"
-
-
 @router.post("/attachments", response_model=AttachmentUploadResponse, status_code=status.HTTP_201_CREATED)
 async def upload_attachments(
+    background_tasks: BackgroundTasks,
     evaluation_id: UUID = Form(..., description="自评表ID"),
     indicator: str = Form(..., description="考核指标"),
     files: List[UploadFile] = File(..., description="上传的文件列表"),
@@ -53,10 +62,12 @@ async def upload_attachments(
     上传附件
     
     - 支持多文件上传
-    - 将文件上传到MinIO对象存储
+    - 将文件按分段流式上传到MinIO对象存储，多个文件并发上传
     - 保存文件元数据到数据库
     - 支持证书类和项目类文件上传
     - 自动归档附件（需求 18.1, 18.4）
+    - 响应后在后台提取附件正文，供AI评分使用
+    - 按文件名本地预分类，置信度高的附件AI评分时不再请DeepSeek分类
     
     需求: 2.1, 2.2, 2.3, 2.4, 2.5, 18.1, 18.4
     """
@@ -86,86 +97,107 @@ async def upload_attachments(
         )
     
     uploaded_attachments = []
+    extraction_items = []
+    classifier = AttachmentClassifierService(db)
+    content_store = ContentStore(db)
     
-    # 对 indicator 做路径安全处理，避免 Windows 非法字符导致写入失败
-    indicator_safe = _sanitize_path_segment(indicator)
+    # 同一请求内的多个文件并发写入存储，并发数受 ATTACHMENT_UPLOAD_CONCURRENCY 限制
+    semaphore = asyncio.Semaphore(max(1, settings.ATTACHMENT_UPLOAD_CONCURRENCY))
 
-    # 处理每个文件
-    for file in files:
-        try:
-            # 读取一次内容，避免 upload 时二次 read 或 seek(0) 失败导致 500
-            file_content = await file.read()
-            file_size = len(file_content)
-            if file_size == 0:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"文件 {file.filename or '未知'} 为空，无法上传"
-                )
-
-            # 生成唯一的文件名（避免 file.filename 为空）
-            raw_filename = file.filename or "unknown"
-            file_extension = os.path.splitext(raw_filename)[1]
-            unique_filename = f"{uuid4()}{file_extension}"
-            
-            # 构建存储路径: evaluation_id/indicator_safe/unique_filename（路径中只用安全字符）
-            storage_path = f"{evaluation_id}/{indicator_safe}/{unique_filename}"
-            
-            # 使用 run_in_threadpool 防止同步方法阻塞事件循环，从而导致上传速度慢
-            upload_success = await run_in_threadpool(
-                minio_service.upload_file_bytes,
+    async def store(file: UploadFile) -> Tuple[str, StoredObject]:
+        # 生成唯一的存储路径（避免 file.filename 为空；indicator 做路径安全处理，避免 Windows 非法字符导致写入失败）
+        raw_filename = file.filename or "unknown"
+        storage_path = attachment_storage_path(evaluation_id, indicator, raw_filename)
+
+        async with semaphore:
+            # 在线程池中按分段读取上传的临时文件并写入存储，边写边计算大小和哈希，不把整个文件读入内存
+            stored = await run_in_threadpool(
+                minio_service.upload_stream,
                 storage_path,
-                file_content,
+                file.file,
                 content_type=file.content_type or "application/octet-stream",
                 original_filename=raw_filename,
             )
-            
-            if not upload_success:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"文件 {raw_filename} 写入存储失败"
-                )
-            
+
+        if stored is None:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"文件 {raw_filename} 写入存储失败"
+            )
+        if stored.size == 0:
+            await run_in_threadpool(minio_service.delete_file, storage_path)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"文件 {file.filename or '未知'} 为空，无法上传"
+            )
+        # 纳入内容寻址存储：已有相同内容时只增加引用计数，不保留重复文件
+        storage_path = await run_in_threadpool(content_store.adopt, storage_path, stored, file.content_type)
+        return storage_path, stored
+
+    results = await asyncio.gather(*(store(file) for file in files), return_exceptions=True)
+
+    async def release_stored() -> None:
+        # 撤销本次上传对存储对象的引用（新写入且无其他引用的文件直接删除）
+        for result in results:
+            if not isinstance(result, BaseException):
+                await run_in_threadpool(content_store.discard, result[0], result[1].sha256)
+
+    try:
+        failure = next((result for result in results if isinstance(result, BaseException)), None)
+        if failure is not None:
+            # 任一文件失败则整个请求失败，删除本次已写入存储的文件
+            await release_stored()
+            raise failure
+
+        for file, (storage_path, stored) in zip(files, results):
+            raw_filename = file.filename or "unknown"
+
             # 创建附件记录（自动归档），file_name 不允许为空
             attachment = Attachment(
                 evaluation_id=evaluation_id,
                 indicator=indicator,
                 file_name=raw_filename,
-                file_size=file_size,
+                file_size=stored.size,
                 file_type=file.content_type or "application/octet-stream",
                 storage_path=storage_path,
+                content_hash=stored.sha256,
                 classified_by="user",  # 用户上传时分类方式为 'user'
                 uploaded_at=datetime.utcnow(),
                 is_archived=True,  # 自动归档（需求 18.1, 18.4）
                 archived_at=datetime.utcnow()
             )
+            classifier.apply(attachment)
             
             db.add(attachment)
             uploaded_attachments.append(attachment)
+            extraction_items.append((stored.sha256, storage_path, stored.size, raw_filename, file.content_type))
             
-        except HTTPException:
-            raise
-        except UnicodeEncodeError as e:
-            logger.exception("附件上传时发生编码错误: %s", e)
-            db.rollback()
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="文件上传失败，请稍后重试"
-            )
-        except Exception as e:
-            logger.exception("附件上传失败: %s", e)
-            db.rollback()
-            # 返回通用错误信息，避免将编码异常等敏感信息暴露给前端
-            detail = "文件上传失败，请稍后重试"
-            try:
-                err_str = str(e)
-                if err_str and "\u26a0" not in err_str and "codec" not in err_str.lower():
-                    detail = f"文件上传过程中发生错误: {err_str}"
-            except Exception:
-                pass
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=detail
-            )
+    except HTTPException:
+        raise
+    except UnicodeEncodeError as e:
+        logger.exception("附件上传时发生编码错误: %s", e)
+        db.rollback()
+        await release_stored()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="文件上传失败，请稍后重试"
+        )
+    except Exception as e:
+        logger.exception("附件上传失败: %s", e)
+        db.rollback()
+        await release_stored()
+        # 返回通用错误信息，避免将编码异常等敏感信息暴露给前端
+        detail = "文件上传失败，请稍后重试"
+        try:
+            err_str = str(e)
+            if err_str and "\u26a0" not in err_str and "codec" not in err_str.lower():
+                detail = f"文件上传过程中发生错误: {err_str}"
+        except Exception:
+            pass
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=detail
+        )
     
     # 提交所有附件记录
     try:
@@ -175,6 +207,8 @@ async def upload_attachments(
         for attachment in uploaded_attachments:
             db.refresh(attachment)
         
+        background_tasks.add_task(extract_uploaded_attachments, db.get_bind(), extraction_items)
+        
         return AttachmentUploadResponse(
             attachment_ids=[attachment.id for attachment in uploaded_attachments],
             uploaded_count=len(uploaded_attachments)
@@ -183,6 +217,7 @@ async def upload_attachments(
     except UnicodeEncodeError as e:
         logger.exception("保存附件元数据时编码错误: %s", e)
         db.rollback()
+        await release_stored()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="保存附件失败，请稍后重试"
@@ -190,6 +225,7 @@ async def upload_attachments(
     except Exception as e:
         logger.exception("保存附件元数据失败: %s", e)
         db.rollback()
+        await release_stored()
         detail = "保存附件元数据失败，请稍后重试"
         try:
             err_str = str(e)
@@ -203,6 +239,97 @@ async def upload_attachments(
         )
 
 
+@router.post("/attachments/instant-upload", response_model=InstantUploadResponse)
+async def instant_upload_attachment(
+    request: InstantUploadRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    秒传附件
+
+    - 客户端先提交文件的 SHA-256 与大小，服务端返回持有证明挑战（随机字节区间与随机数）
+    - 客户端带回挑战令牌与 SHA-256(nonce + 区间内的字节)；服务端已存有相同内容且证明正确时
+      直接创建附件记录，不再传输文件
+    - 内容不存在或证明不正确时返回 hit=false，客户端再走普通上传或分块上传
+    """
+    evaluation = db.query(SelfEvaluation).filter(
+        SelfEvaluation.id == request.evaluation_id
+    ).first()
+    if not evaluation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="自评表不存在"
+        )
+    if evaluation.status == "locked":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="自评表已锁定，无法上传附件"
+        )
+
+    sha256 = request.sha256.lower()
+    if not request.challenge_token or not request.proof:
+        # 内容是否存在都下发挑战，不泄露他人上传过的文件
+        return InstantUploadResponse(
+            hit=False,
+            challenge=issue_challenge(sha256, request.file_size, current_user.id),
+        )
+    challenge = decode_challenge(request.challenge_token, sha256, request.file_size, current_user.id)
+    if challenge is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="秒传挑战无效或已过期，请重新获取"
+        )
+
+    content_store = ContentStore(db)
+    existing = content_store.lookup(sha256, request.file_size)
+    if existing is None or not await run_in_threadpool(
+        verify_proof, existing.storage_path, challenge, request.proof
+    ):
+        return InstantUploadResponse(hit=False)
+    storage_path = await run_in_threadpool(content_store.claim, sha256, request.file_size)
+    if storage_path is None:
+        return InstantUploadResponse(hit=False)
+
+    content_type = request.content_type or "application/octet-stream"
+    now = datetime.utcnow()
+    attachment = Attachment(
+        evaluation_id=request.evaluation_id,
+        indicator=request.indicator,
+        file_name=request.file_name,
+        file_size=request.file_size,
+        file_type=content_type,
+        storage_path=storage_path,
+        content_hash=sha256,
+        classified_by="user",
+        uploaded_at=now,
+        is_archived=True,
+        archived_at=now
+    )
+    try:
+        AttachmentClassifierService(db).apply(attachment)
+        db.add(attachment)
+        db.commit()
+        db.refresh(attachment)
+    except Exception as e:
+        logger.exception("秒传附件失败: %s", e)
+        db.rollback()
+        await run_in_threadpool(content_store.discard, storage_path, sha256)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="保存附件元数据失败，请稍后重试"
+        )
+
+    # 正文按内容哈希缓存，相同内容通常已提取过，不会重复解析
+    background_tasks.add_task(
+        extract_uploaded_attachments,
+        db.get_bind(),
+        [(sha256, storage_path, request.file_size, request.file_name, request.content_type)],
+    )
+    return InstantUploadResponse(hit=True, attachment_id=attachment.id)
+
+
 @router.get("/attachments/{evaluation_id}", response_model=List[AttachmentInfo])
 def get_attachments(
     evaluation_id: UUID,
@@ -289,6 +416,8 @@ def query_attachments(
             "file_type": attachment.file_type,
             "storage_path": attachment.storage_path,
             "classified_by": attachment.classified_by,
+            "suggested_indicator": attachment.suggested_indicator,
+            "classification_confidence": attachment.classification_confidence,
             "uploaded_at": attachment.uploaded_at,
             "is_archived": attachment.is_archived,
             "archived_at": attachment.archived_at,
@@ -304,6 +433,7 @@ def query_attachments(
 @router.get("/attachments/{attachment_id}/download")
 async def download_attachment(
     attachment_id: UUID,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -311,7 +441,9 @@ async def download_attachment(
     下载附件
     
     - 根据附件ID下载文件
-    - 从MinIO对象存储获取文件流
+    - 本地存储的文件直接发送（FileResponse，Range 请求定位到区间读取，或配置 ATTACHMENT_ACCEL_REDIRECT_PREFIX 后交给 nginx 发送）
+    - MinIO 中的文件按分段转发，Range 请求只从 MinIO 读取请求的区间
+    - 支持 Range 断点续传/在线预览（206），ETag（内容哈希）与 Last-Modified 条件请求（304）
     - 支持长期归档的附件访问
     - 需求: 18.5, 18.6
     """
@@ -332,29 +464,84 @@ async def download_attachment(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="附件未归档，无法下载"
         )
-    
-    # 从MinIO获取文件流
-    file_stream = minio_service.get_file_stream(attachment.storage_path)
+
+    etag = entity_tag(attachment)
+    modified = last_modified(attachment)
+    # 需要登录才能下载，只允许浏览器私有缓存，每次使用前按 ETag 重新验证
+    cache_headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(modified),
+        "Cache-Control": "private, no-cache",
+    }
+    if is_not_modified(request.headers, etag, modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+    size = attachment.file_size
+    try:
+        byte_range = requested_range(request.headers, size, etag, modified)
+    except RangeNotSatisfiable:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="请求的范围超出文件大小",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+
+    # 对文件名进行URL编码以支持中文文件名
+    encoded_filename = quote(attachment.file_name, encoding='utf-8')
+    media_type = attachment.file_type or "application/octet-stream"
+    headers = {
+        **cache_headers,
+        "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}",
+        "Accept-Ranges": "bytes",
+    }
+
+    local_path = minio_service.get_local_file_path(attachment.storage_path)
+    if local_path is not None and settings.ATTACHMENT_ACCEL_REDIRECT_PREFIX:
+        # 由 nginx 用 sendfile 发送文件，Range 也由 nginx 处理
+        prefix = settings.ATTACHMENT_ACCEL_REDIRECT_PREFIX.rstrip("/")
+        headers["X-Accel-Redirect"] = f"{prefix}/{quote(attachment.storage_path)}"
+        return Response(media_type=media_type, headers=headers)
+    if local_path is not None and byte_range is None:
+        return FileResponse(local_path, media_type=media_type, headers=headers)
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1
+    if local_path is not None:
+        headers["Content-Length"] = str(length)
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return FileRangeResponse(
+            local_path,
+            start,
+            length,
+            settings.ATTACHMENT_DOWNLOAD_CHUNK_SIZE,
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type=media_type,
+            headers=headers,
+        )
+
+    file_stream = await run_in_threadpool(
+        minio_service.get_file_stream,
+        attachment.storage_path,
+        offset=start,
+        length=length if byte_range else None,
+    )
     
     if not file_stream:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="无法获取文件，请稍后重试"
         )
+
+    headers["Content-Length"] = str(length)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
     
-    from urllib.parse import quote
-    
-    # 对文件名进行URL编码以支持中文文件名
-    encoded_filename = quote(attachment.file_name, encoding='utf-8')
-    
-    # 返回文件流响应
+    # 按固定大小的分段读取并发送（不按行迭代 MinIO 响应），发送完毕后关闭文件流
     return StreamingResponse(
-        file_stream,
-        media_type=attachment.file_type or "application/octet-stream",
-        headers={
-            "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}",
-            "Content-Length": str(attachment.file_size)
-        }
+        iter_stream(file_stream, length, settings.ATTACHMENT_DOWNLOAD_CHUNK_SIZE),
+        status_code=status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK,
+        media_type=media_type,
+        headers=headers
     )
 
 
@@ -368,7 +555,7 @@ async def delete_attachment(
     删除附件
     
     - 仅允许删除未锁定自评表下的附件 (如果是教研室端)。管理端可随时删除。
-    - 同步删除 MinIO/本地存储中的文件
+    - 同步删除 MinIO/本地存储中的文件；与其他附件共用的文件保留，最后一个引用删除后由清理任务删除
     """
     attachment = db.query(Attachment).filter(Attachment.id == attachment_id).first()
     if not attachment:
@@ -393,13 +580,18 @@ async def delete_attachment(
     try:
         db.delete(attachment)
         db.commit()
-        minio_service.delete_file(storage_path)
     except Exception as e:
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"删除附件失败: {str(e)}"
         )
+    # 内容对象的引用计数已在删除时减少，由清理任务删除；未登记为内容对象的文件立即删除，失败时留给清理任务
+    try:
+        ContentStore(db).collect_orphans([storage_path])
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"删除附件文件失败: {str(e)}")
 
 
 @router.put("/attachments/{attachment_id}/classification", response_model=AttachmentClassificationResponse)
@@ -438,10 +630,15 @@ def update_attachment_classification(
     # 更新分类标签（维护附件与考核指标的关联）
     old_indicator = attachment.indicator
     attachment.indicator = classification_update.indicator
+    # 人工调整后的分类作为本地分类模型的训练样本
+    attachment.classified_by = "user"
+    attachment.suggested_indicator = None
+    attachment.classification_confidence = None
     
     try:
         db.commit()
         db.refresh(attachment)
+        invalidate_attachment_classifier()
         
         return AttachmentClassificationResponse(
             id=attachment.id,
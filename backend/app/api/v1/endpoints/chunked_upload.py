@@ -2,75 +2,80 @@
 分块上传端点
 
 实现任务 22.1 的文件上传断点续传功能
+
+上传会话保存在数据库中（见 ChunkedUploadService），分块可以发往任意worker并行上传，
+完成时在存储端合并全部分块
 """
 
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, status, Depends
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, Form, HTTPException, status, Depends
 from sqlalchemy.orm import Session
 from typing import Optional
-from uuid import UUID, uuid4
+from uuid import UUID
 import logging
 
-from app.core.error_handling import ChunkedUploadManager
-from app.services.minio_service import minio_service
-from app.db.base import get_db
-from app.models.attachment import Attachment
-from app.core.deps import get_current_user
+from app.core.deps import get_db, get_current_user
+from app.models.self_evaluation import SelfEvaluation
 from app.models.user import User
+from app.services.attachment_text_service import extract_uploaded_attachments
+from app.services.chunked_upload_service import ChunkedUploadError, ChunkedUploadService
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+def _http_error(e: ChunkedUploadError) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=str(e))
+
+
 @router.post("/upload/init")
 async def init_chunked_upload(
     file_name: str = Form(...),
     file_size: int = Form(...),
-    evaluation_id: str = Form(...),
+    evaluation_id: UUID = Form(...),
     indicator: str = Form(...),
     chunk_size: Optional[int] = Form(None),
+    content_type: Optional[str] = Form(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     初始化分块上传
-    
+
     Args:
         file_name: 文件名
         file_size: 文件总大小（字节）
         evaluation_id: 自评表ID
         indicator: 考核指标
         chunk_size: 分块大小（可选，默认5MB）
-        
+        content_type: 文件MIME类型（可选）
+
     Returns:
         上传会话信息
     """
-    try:
-        # 生成唯一的上传ID
-        upload_id = str(uuid4())
-        
-        # 计算分块数
-        total_chunks = ChunkedUploadManager.calculate_chunks(file_size, chunk_size)
-        
-        # 创建上传会话
-        session = ChunkedUploadManager.create_upload_session(
-            upload_id=upload_id,
-            file_name=file_name,
-            file_size=file_size,
-            total_chunks=total_chunks
+    evaluation = db.query(SelfEvaluation).filter(SelfEvaluation.id == evaluation_id).first()
+    if not evaluation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="自评表不存在"
         )
-        
-        logger.info(
-            f"初始化分块上传: upload_id={upload_id}, "
-            f"file={file_name}, size={file_size}, chunks={total_chunks}"
+    if evaluation.status == "locked":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="自评表已锁定，无法上传附件"
+        )
+
+    try:
+        session = ChunkedUploadService(db).create_session(
+            current_user,
+            evaluation_id,
+            indicator,
+            file_name,
+            file_size,
+            chunk_size=chunk_size,
+            content_type=content_type,
         )
-        
-        return {
-            "upload_id": upload_id,
-            "total_chunks": total_chunks,
-            "chunk_size": chunk_size or ChunkedUploadManager.DEFAULT_CHUNK_SIZE,
-            "status": "initialized"
-        }
-        
+    except ChunkedUploadError as e:
+        raise _http_error(e)
     except Exception as e:
         logger.error(f"初始化分块上传失败: {str(e)}")
         raise HTTPException(
@@ -78,80 +83,47 @@ async def init_chunked_upload(
             detail=f"初始化上传失败: {str(e)}"
         )
 
+    logger.info(
+        f"初始化分块上传: upload_id={session.id}, "
+        f"file={file_name}, size={file_size}, chunks={session.total_chunks}"
+    )
+
+    return {
+        "upload_id": str(session.id),
+        "total_chunks": session.total_chunks,
+        "chunk_size": session.chunk_size,
+        "expires_at": session.expires_at.isoformat(),
+        "status": "initialized"
+    }
+
 
 @router.post("/upload/chunk")
 async def upload_chunk(
-    upload_id: str = Form(...),
+    upload_id: UUID = Form(...),
     chunk_index: int = Form(...),
     chunk: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
     上传单个分块
-    
+
+    同一会话的分块可并行上传；已接收的分块再次上传时直接跳过（断点续传）
+
     Args:
         upload_id: 上传会话ID
         chunk_index: 分块索引（从0开始）
         chunk: 分块文件数据
-        
+
     Returns:
         上传结果
     """
+    service = ChunkedUploadService(db)
     try:
-        # 获取上传会话
-        session = ChunkedUploadManager.get_upload_session(upload_id)
-        if not session:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="上传会话不存在或已过期"
-            )
-        
-        # 验证分块索引
-        if chunk_index < 0 or chunk_index >= session["total_chunks"]:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"无效的分块索引: {chunk_index}"
-            )
-        
-        # 检查分块是否已上传（支持断点续传）
-        if chunk_index in session["uploaded_chunks"]:
-            logger.info(f"分块已存在，跳过: upload_id={upload_id}, chunk={chunk_index}")
-            return {
-                "upload_id": upload_id,
-                "chunk_index": chunk_index,
-                "status": "already_uploaded",
-                "progress": len(session["uploaded_chunks"]) / session["total_chunks"]
-            }
-        
-        # 上传分块到临时存储
-        chunk_object_name = f"chunks/{upload_id}/chunk_{chunk_index}"
-        success = await minio_service.upload_file_object(chunk, chunk_object_name)
-        
-        if not success:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="分块上传失败"
-            )
-        
-        # 标记分块已上传
-        is_complete = ChunkedUploadManager.mark_chunk_uploaded(upload_id, chunk_index)
-        
-        logger.info(
-            f"分块上传成功: upload_id={upload_id}, "
-            f"chunk={chunk_index + 1}/{session['total_chunks']}"
-        )
-        
-        return {
-            "upload_id": upload_id,
-            "chunk_index": chunk_index,
-            "status": "completed" if is_complete else "in_progress",
-            "progress": len(session["uploaded_chunks"]) / session["total_chunks"],
-            "uploaded_chunks": len(session["uploaded_chunks"]),
-            "total_chunks": session["total_chunks"]
-        }
-        
-    except HTTPException:
-        raise
+        session = service.get_session(upload_id, current_user)
+        result = await service.accept_chunk(session, chunk_index, chunk.file)
+    except ChunkedUploadError as e:
+        raise _http_error(e)
     except Exception as e:
         logger.error(f"上传分块失败: {str(e)}")
         raise HTTPException(
@@ -159,79 +131,57 @@ async def upload_chunk(
             detail=f"上传分块失败: {str(e)}"
         )
 
+    uploaded_chunks = len(service.uploaded_chunks(session))
+    if result == "already_uploaded":
+        logger.info(f"分块已存在，跳过: upload_id={upload_id}, chunk={chunk_index}")
+    else:
+        logger.info(
+            f"分块上传成功: upload_id={upload_id}, "
+            f"chunk={chunk_index + 1}/{session.total_chunks}"
+        )
+
+    return {
+        "upload_id": str(upload_id),
+        "chunk_index": chunk_index,
+        "status": result if result == "already_uploaded" else (
+            "completed" if uploaded_chunks == session.total_chunks else "in_progress"
+        ),
+        "progress": uploaded_chunks / session.total_chunks,
+        "uploaded_chunks": uploaded_chunks,
+        "total_chunks": session.total_chunks
+    }
+
 
 @router.post("/upload/complete")
 async def complete_chunked_upload(
-    upload_id: str = Form(...),
-    evaluation_id: str = Form(...),
-    indicator: str = Form(...),
+    background_tasks: BackgroundTasks,
+    upload_id: UUID = Form(...),
+    evaluation_id: Optional[UUID] = Form(None),
+    indicator: Optional[str] = Form(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    完成分块上传，合并所有分块
-    
+    完成分块上传，在存储端合并所有分块并创建附件记录
+
+    自评表与考核指标以初始化时为准；旧版客户端仍会传入，不一致时拒绝
+
     Args:
         upload_id: 上传会话ID
-        evaluation_id: 自评表ID
-        indicator: 考核指标
-        
+        evaluation_id: 自评表ID（可选）
+        indicator: 考核指标（可选）
+
     Returns:
         附件信息
     """
+    service = ChunkedUploadService(db)
     try:
-        # 获取上传会话
-        session = ChunkedUploadManager.get_upload_session(upload_id)
-        if not session:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="上传会话不存在或已过期"
-            )
-        
-        # 检查是否所有分块都已上传
-        if session["status"] != "completed":
-            missing_chunks = ChunkedUploadManager.get_missing_chunks(upload_id)
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"上传未完成，缺失分块: {missing_chunks}"
-            )
-        
-        # 合并分块（这里简化处理，实际应该合并所有分块）
-        # 在生产环境中，应该使用MinIO的multipart upload API
-        final_object_name = f"attachments/{evaluation_id}/{session['file_name']}"
-        
-        # 创建附件记录
-        attachment = Attachment(
-            evaluation_id=UUID(evaluation_id),
-            indicator=indicator,
-            file_name=session["file_name"],
-            file_size=session["file_size"],
-            file_type="application/octet-stream",
-            storage_path=final_object_name,
-            classified_by="user"
-        )
-        
-        db.add(attachment)
-        db.commit()
-        db.refresh(attachment)
-        
-        # 清理上传会话
-        ChunkedUploadManager.cleanup_session(upload_id)
-        
-        logger.info(
-            f"分块上传完成: upload_id={upload_id}, "
-            f"attachment_id={attachment.id}"
-        )
-        
-        return {
-            "attachment_id": str(attachment.id),
-            "file_name": attachment.file_name,
-            "file_size": attachment.file_size,
-            "status": "completed"
-        }
-        
-    except HTTPException:
-        raise
+        session = service.get_session(upload_id, current_user)
+        if (evaluation_id and evaluation_id != session.evaluation_id) or (indicator and indicator != session.indicator):
+            raise ChunkedUploadError("自评表或考核指标与初始化时不一致")
+        attachment = await service.complete(session)
+    except ChunkedUploadError as e:
+        raise _http_error(e)
     except Exception as e:
         logger.error(f"完成上传失败: {str(e)}")
         raise HTTPException(
@@ -239,47 +189,59 @@ async def complete_chunked_upload(
             detail=f"完成上传失败: {str(e)}"
         )
 
+    background_tasks.add_task(
+        extract_uploaded_attachments,
+        db.get_bind(),
+        [(attachment.content_hash, attachment.storage_path, attachment.file_size, attachment.file_name, attachment.file_type)],
+    )
+
+    logger.info(
+        f"分块上传完成: upload_id={upload_id}, "
+        f"attachment_id={attachment.id}"
+    )
+
+    return {
+        "attachment_id": str(attachment.id),
+        "file_name": attachment.file_name,
+        "file_size": attachment.file_size,
+        "status": "completed"
+    }
+
 
 @router.get("/upload/status/{upload_id}")
 async def get_upload_status(
-    upload_id: str,
-    current_user: User = Depends(get_current_user)
+    upload_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
     查询上传状态（用于断点续传）
-    
+
     Args:
         upload_id: 上传会话ID
-        
+
     Returns:
         上传状态和缺失的分块列表
     """
+    service = ChunkedUploadService(db)
     try:
-        session = ChunkedUploadManager.get_upload_session(upload_id)
-        if not session:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="上传会话不存在或已过期"
-            )
-        
-        missing_chunks = ChunkedUploadManager.get_missing_chunks(upload_id)
-        
-        return {
-            "upload_id": upload_id,
-            "status": session["status"],
-            "file_name": session["file_name"],
-            "file_size": session["file_size"],
-            "total_chunks": session["total_chunks"],
-            "uploaded_chunks": len(session["uploaded_chunks"]),
-            "missing_chunks": missing_chunks,
-            "progress": len(session["uploaded_chunks"]) / session["total_chunks"]
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"查询上传状态失败: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"查询上传状态失败: {str(e)}"
-        )
+        session = service.get_session(upload_id, current_user)
+    except ChunkedUploadError as e:
+        raise _http_error(e)
+
+    # 合并完成后分块记录已删除
+    missing_chunks = [] if session.status == "completed" else service.missing_chunks(session)
+    uploaded_chunks = session.total_chunks - len(missing_chunks)
+
+    return {
+        "upload_id": str(upload_id),
+        "status": session.status,
+        "file_name": session.file_name,
+        "file_size": session.file_size,
+        "total_chunks": session.total_chunks,
+        "uploaded_chunks": uploaded_chunks,
+        "missing_chunks": missing_chunks,
+        "progress": uploaded_chunks / session.total_chunks,
+        "attachment_id": str(session.attachment_id) if session.attachment_id else None,
+        "expires_at": session.expires_at.isoformat()
+    }
@@ -1,13 +1,14 @@
-from typing import Any, List, Dict
+from typing import Any, List, Dict, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.core.deps import get_db, get_current_user
 from app.models.user import User
 from app.models.college import College
 from app.schemas.college import CollegeCreate, CollegeResponse, CollegeStats
+from app.services.college_stats_service import CollegeStatsService
 
 router = APIRouter()
 
@@ -31,34 +32,23 @@ def create_college(
 
 @router.get("/dashboard/stats", response_model=CollegeStats)
 def get_dashboard_stats(
+    year: Optional[int] = Query(None, description="考评年度，默认最近一个有最终得分的年度"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ) -> Any:
     """
     Get dashboard stats for the college the user belongs to.
+
+    Aggregates final scores of the college's teaching offices (average and
+    ranking) and the average loss rate of each regular teaching indicator.
+    Results are cached per college and year and invalidated when scores are
+    inserted.
     """
-    # Assuming user is Dean or relevant personnel
-    # logic to get college_id
     if not current_user.college_id:
-         # Fallback or error
-         # For demo, return mock if no college
-         return {
+        return {
             "avg_score": 0.0,
             "rank_list": [],
-            "weakness_analysis": [] 
-         }
+            "weakness_analysis": []
+        }
 
-    # In strict implementation we would aggregate scores here.
-    # For MVP fast implementation:
-    return {
-        "avg_score": 85.5,
-        "rank_list": [
-            {"name": "软件工程教研室", "score": 92.5},
-            {"name": "网络工程教研室", "score": 88.0},
-            {"name": "大数据教研室", "score": 76.0}
-        ],
-        "weakness_analysis": [
-             {"indicator": "师资队伍", "avg_loss_rate": 0.15},
-             {"indicator": "教学运行", "avg_loss_rate": 0.05}
-        ] 
-    }
+    return CollegeStatsService(db).get_dashboard_stats(current_user.college_id, year)
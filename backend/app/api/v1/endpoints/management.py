@@ -7,6 +7,7 @@
 import logging
 
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional, List
 
@@ -17,6 +18,9 @@ from app.models.teaching_office import TeachingOffice
 from app.models.ai_score import AIScore
 from app.models.manual_score import ManualScore
 from app.models.final_score import FinalScore
+from app.schemas.scoring import AIScoringModeComparisonRequest, BulkAIScoringRequest
+from app.services.scoring_mode_comparison import ScoringModeComparison
+from app.services.bulk_ai_scoring_service import BulkAIScoringService, stream_bulk_scoring, stream_job_progress
 
 router = APIRouter()
 
@@ -132,3 +136,69 @@ def get_management_results(
             continue
 
     return result_list
+
+
+@router.post("/bulk-ai-scoring")
+async def bulk_ai_scoring(
+    request: BulkAIScoringRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_management_roles),
+):
+    """
+    批量触发AI评分（年底集中评分）
+
+    选取已提交（locked）且尚无AI评分的自评表写入评分队列，按有限并发执行，
+    以 Server-Sent Events 推送每个自评表的评分进度，最后推送失败汇总。
+    """
+    batch = BulkAIScoringService(db).prepare_batch(
+        year=request.year,
+        evaluation_ids=request.evaluation_ids,
+        requested_by=current_user.id,
+    )
+    return StreamingResponse(
+        stream_bulk_scoring(batch, concurrency=request.concurrency),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/ai-scoring-mode-comparison")
+async def compare_ai_scoring_modes(
+    request: AIScoringModeComparisonRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_management_roles),
+):
+    """
+    对比 full 与 hybrid 两种AI评分模式
+
+    对选取的自评表分别以两种模式调用DeepSeek（不写入评分结果），返回平均耗时、
+    token用量及评分一致性报告。
+    """
+    if request.evaluation_ids:
+        evaluation_ids = request.evaluation_ids[:request.limit]
+    else:
+        query = db.query(SelfEvaluation.id).filter(
+            SelfEvaluation.status.notin_(["draft"]),
+            SelfEvaluation.submitted_at.isnot(None),
+        )
+        if request.year is not None:
+            query = query.filter(SelfEvaluation.evaluation_year == request.year)
+        evaluation_ids = [row.id for row in query.order_by(SelfEvaluation.submitted_at.desc()).limit(request.limit)]
+    return await ScoringModeComparison(db).compare(evaluation_ids)
+
+
+@router.get("/ai-scoring-progress/stream")
+async def stream_ai_scoring_progress(
+    year: Optional[int] = Query(None, description="考评年度"),
+    current_user: User = Depends(require_management_roles),
+):
+    """
+    订阅AI评分进度（评分进度页）
+
+    以 Server-Sent Events 推送评分任务状态变化，流式评分过程中每收到一个指标评分推送一次。
+    """
+    return StreamingResponse(
+        stream_job_progress(year=year),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -4,22 +4,31 @@
 包括数据接收、实时监控、结果审定等功能
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Header, Query
+from fastapi import APIRouter, Depends, File, HTTPException, status, Header, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from typing import Optional
 from uuid import UUID
 from datetime import datetime
 import hashlib
 import json
+import logging
 
-from app.core.deps import get_db, require_president_office
+from app.core.config import settings
+from app.core.deps import get_db, require_president_office, verify_sync_request, verify_sync_stream_request
 from app.schemas.sync import SyncDataPackage
 from app.schemas.approval import ApprovalRequest, ApprovalResponse
 from app.models.operation_log import OperationLog
 from app.models.approval import Approval
 from app.models.self_evaluation import SelfEvaluation
 from app.models.user import User
-from app.models.teaching_office import TeachingOffice
+from app.services.evaluation_replica_service import EvaluationReplicaService
+from app.services.sync_bundle import import_bundle
+from app.services.sync_receiver_service import SyncReceiverService, evaluation_sync_errors
+from app.services.sync_stream import SyncStreamDecoder, SyncStreamError
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -31,71 +40,30 @@ def get_dashboard_data(
 ):
     """
     获取校长办公会端数据看板所需真实数据 (Public).
-    """
-    query = (
-        db.query(SelfEvaluation)
-        .join(TeachingOffice, SelfEvaluation.teaching_office_id == TeachingOffice.id)
-        .filter(SelfEvaluation.status.in_(["ai_scored", "manually_scored", "ready_for_final", "finalized", "approved", "published", "distributed"]))
-    )
-    if year:
-        query = query.filter(SelfEvaluation.evaluation_year == year)
     
-    evaluations = query.all()
+    读取校长办公会端接收的考评数据副本，不查询管理端的业务表
+    """
+    scores = [
+        {
+            "teaching_office_id": str(replica.teaching_office_id),
+            "teaching_office_name": replica.teaching_office_name,
+            "evaluation_year": replica.evaluation_year,
+            "status": replica.status,
+            "ai_score": replica.ai_score,
+            "final_score": replica.final_score,
+            "manual_scores": replica.manual_scores or []
+        }
+        for replica in EvaluationReplicaService(db).dashboard_rows(year)
+    ]
     
-    scores = []
-    for ev in evaluations:
-        office = ev.teaching_office
-        
-        from app.models.ai_score import AIScore
-        from app.models.final_score import FinalScore
-        from app.models.manual_score import ManualScore
-        
-        ai_score = db.query(AIScore).filter(AIScore.evaluation_id == ev.id).first()
-        ai_score_val = float(ai_score.total_score) if ai_score else None
-        
-        final = db.query(FinalScore).filter(FinalScore.evaluation_id == ev.id).first()
-        final_score_val = float(final.final_score) if final else None
-        
-        # 简单组装所需的 reviewer data
-        manuals = db.query(ManualScore).filter(ManualScore.evaluation_id == ev.id).all()
-        manual_scores_list = []
-        for m in manuals:
-            manual_scores_list.append({
-                "reviewer_id": str(m.reviewer_id),
-                "reviewer_name": "Reviewer",
-                "reviewer_role": "evaluation_team",
-                "total_score": float(_manual_score_total(m.scores)) if m.scores else 0.0
-            })
-            
-        scores.append({
-            "teaching_office_id": str(office.id),
-            "teaching_office_name": office.name,
-            "evaluation_year": ev.evaluation_year,
-            "status": ev.status,
-            "ai_score": ai_score_val,
-            "final_score": final_score_val,
-            "manual_scores": manual_scores_list
-        })
-        
     return {
         "teaching_office_scores": scores,
         "historical_scores": [],
         "indicator_comparisons": []
     }
 
-def _manual_score_total(scores_json) -> float:
-    if not scores_json or not isinstance(scores_json, list):
-        return 0.0
-    total = 0.0
-    for item in scores_json:
-        try:
-            total += float(item.get("score", 0))
-        except:
-            pass
-    return total
 
-
-@router.post("/receive-sync-data", status_code=status.HTTP_200_OK)
+@router.post("/receive-sync-data", status_code=status.HTTP_200_OK, dependencies=[Depends(verify_sync_request)])
 def receive_sync_data(
     sync_package: SyncDataPackage,
     x_sync_task_id: Optional[str] = Header(None),
@@ -146,7 +114,7 @@ def receive_sync_data(
     # Validate data completeness
     validation_errors = []
     
-    if not sync_package.evaluations:
+    if not sync_package.evaluations and not sync_package.deleted_evaluation_ids:
         validation_errors.append("No evaluations in sync package")
     
     if sync_package.total_count != len(sync_package.evaluations):
@@ -156,34 +124,7 @@ def receive_sync_data(
     
     # Validate each evaluation data
     for idx, eval_data in enumerate(sync_package.evaluations):
-        eval_errors = []
-        
-        # Check required fields (需求 10.1 - 考评数据)
-        if not eval_data.evaluation_id:
-            eval_errors.append("missing evaluation_id")
-        if not eval_data.teaching_office_id:
-            eval_errors.append("missing teaching_office_id")
-        if not eval_data.content:
-            eval_errors.append("missing content")
-        
-        # Check scoring data (需求 10.2 - 评分记录)
-        if not eval_data.ai_score:
-            eval_errors.append("missing ai_score")
-        if not eval_data.manual_scores:
-            eval_errors.append("missing manual_scores")
-        if not eval_data.final_score:
-            eval_errors.append("missing final_score")
-        
-        # Check attachments (需求 10.3 - 附件)
-        # Attachments list should exist (can be empty)
-        if eval_data.attachments is None:
-            eval_errors.append("missing attachments list")
-        
-        # Check anomalies (需求 10.4 - 异常处理结果)
-        # Anomalies list should exist (can be empty)
-        if eval_data.anomalies is None:
-            eval_errors.append("missing anomalies list")
-        
+        eval_errors = evaluation_sync_errors(eval_data)
         if eval_errors:
             validation_errors.append(
                 f"Evaluation {idx} ({eval_data.evaluation_id}): {', '.join(eval_errors)}"
@@ -198,6 +139,18 @@ def receive_sync_data(
             }
         )
     
+    # Store the synced data in the president office replica (idempotent)
+    try:
+        replica_counts = EvaluationReplicaService(db).apply_package(sync_package)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.exception("Failed to store synced data")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to store synced data: {str(e)}"
+        )
+    
     # Record operation log for data reception
     try:
         operation_log = OperationLog(
@@ -211,6 +164,7 @@ def receive_sync_data(
                 "sync_task_id": str(sync_package.sync_task_id),
                 "total_count": sync_package.total_count,
                 "evaluation_ids": [str(e.evaluation_id) for e in sync_package.evaluations],
+                "deleted_evaluation_ids": [str(eid) for eid in sync_package.deleted_evaluation_ids],
                 "synced_at": sync_package.synced_at.isoformat(),
                 "checksum": sync_package.checksum,
                 "checksum_verified": x_checksum == sync_package.checksum if x_checksum else False
@@ -224,22 +178,110 @@ def receive_sync_data(
         db.rollback()
         pass
     
-    # TODO: Store the synced data in president office database
-    # This would typically involve:
-    # 1. Creating/updating records in president office's own tables
-    # 2. Storing evaluation data for monitoring and approval
-    # 3. Making data available for real-time monitoring dashboard
-    
     return {
         "status": "success",
         "message": f"Successfully received and validated {sync_package.total_count} evaluations",
         "sync_task_id": str(sync_package.sync_task_id),
         "received_at": datetime.utcnow().isoformat(),
-        "evaluations_count": len(sync_package.evaluations)
+        "evaluations_count": len(sync_package.evaluations),
+        "deleted_count": len(sync_package.deleted_evaluation_ids),
+        "replica": replica_counts
     }
 
 
 
+@router.get(
+    "/receive-sync-stream/{sync_task_id}",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(verify_sync_request)]
+)
+def get_sync_stream_status(
+    sync_task_id: UUID,
+    db: Session = Depends(get_db)
+):
+    """
+    查询流式同步已确认的分块
+    
+    发送端重试前调用，从最后一个已确认分块的下一块继续发送
+    """
+    return SyncReceiverService(db).status(sync_task_id)
+
+
+@router.post(
+    "/receive-sync-stream",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(verify_sync_stream_request)]
+)
+async def receive_sync_stream(
+    request: Request,
+    x_sync_task_id: Optional[str] = Header(None),
+    content_encoding: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    流式接收管理端同步的数据（NDJSON，可选 zstd/gzip 压缩）
+    
+    需求: 10.1, 10.2, 10.3, 10.4
+    
+    - 边读取边校验，内存占用只与分块大小有关
+    - 校验每条记录的哈希、每个分块及整个数据包的Merkle根
+    - 每个分块校验通过后即确认，连接中断后可续传
+    - 解码、校验与数据库写入在线程池中执行，不阻塞事件循环
+    """
+    try:
+        expected_task_id = UUID(x_sync_task_id) if x_sync_task_id else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid X-Sync-Task-Id header")
+    
+    receiver = SyncReceiverService(db, expected_task_id)
+    
+    def consume(messages) -> None:
+        for message in messages:
+            receiver.handle(message)
+    
+    try:
+        decoder = SyncStreamDecoder(content_encoding or "identity", settings.SYNC_STREAM_MAX_RECORD_BYTES)
+        async for data in request.stream():
+            await run_in_threadpool(consume, decoder.feed(data))
+        await run_in_threadpool(consume, decoder.close())
+        return await run_in_threadpool(receiver.finish)
+    except SyncStreamError as e:
+        logger.warning(f"Sync stream rejected: {e} (acked chunks: {receiver.next_chunk})")
+        raise HTTPException(
+            status_code=e.status_code,
+            detail={
+                "message": str(e),
+                "errors": e.errors,
+                "acked_chunks": receiver.next_chunk,
+            }
+        )
+
+
+@router.post("/import-sync-bundle", status_code=status.HTTP_200_OK)
+def import_sync_bundle(
+    file: UploadFile = File(..., description="管理端导出的离线同步包"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_president_office)
+):
+    """
+    导入离线同步包 (Import an offline sync bundle exported by management).
+    
+    需求: 10.1, 10.2, 10.3, 10.4
+    
+    - 验证清单签名后边解压边校验，每个分块与签名清单一致后写入数据副本
+    - 校验规则与在线接收相同；同一同步包重复导入时直接返回
+    - 仅校长办公会可以导入
+    """
+    try:
+        return import_bundle(db, file.file)
+    except SyncStreamError as e:
+        logger.warning(f"Sync bundle {file.filename} rejected: {e}")
+        raise HTTPException(
+            status_code=e.status_code,
+            detail={"message": str(e), "errors": e.errors}
+        )
+
+
 @router.post("/approve", response_model=ApprovalResponse, status_code=status.HTTP_200_OK)
 def approve_evaluation_results(
     request: ApprovalRequest,
@@ -271,20 +313,15 @@ def approve_evaluation_results(
             detail="reject_reason is required when decision is 'reject'"
         )
     
-    # Validate that all evaluations exist
-    evaluations = []
+    # Validate that all evaluations have been received (president office replica)
+    replica_service = EvaluationReplicaService(db)
+    replicas = replica_service.active(request.evaluation_ids)
     for eval_id in request.evaluation_ids:
-        evaluation = db.query(SelfEvaluation).filter(
-            SelfEvaluation.id == eval_id
-        ).first()
-        
-        if not evaluation:
+        if eval_id not in replicas:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Evaluation with id {eval_id} not found"
             )
-        
-        evaluations.append(evaluation)
     
     # Create approval record
     approved_at = datetime.utcnow()
@@ -304,19 +341,26 @@ def approve_evaluation_results(
     if request.decision == "approve":
         # 同意公示 - 需求 12.2, 12.4, 12.5
         # Update evaluation status to allow publication
-        for evaluation in evaluations:
-            evaluation.status = "approved"
-        
+        new_status = "approved"
         message = "Approval successful. Management office can now initiate publication."
         
     elif request.decision == "reject":
         # 驳回重新审核 - 需求 12.3, 12.6, 12.7
         # Update evaluation status to indicate rejection
-        for evaluation in evaluations:
-            evaluation.status = "rejected_by_president"
-        
+        new_status = "rejected_by_president"
         message = f"Evaluation results rejected. Reason: {request.reject_reason}. Management office has been notified."
     
+    # 审定结果写入副本，并同步至管理端的自评表状态
+    evaluation_ids = list(replicas)
+    replica_service.set_status(evaluation_ids, new_status)
+    if evaluation_ids:
+        db.execute(
+            update(SelfEvaluation)
+            .where(SelfEvaluation.id.in_(evaluation_ids))
+            .values(status=new_status)
+            .execution_options(synchronize_session=False)
+        )
+    
     # Commit all changes first
     try:
         db.commit()
@@ -6,9 +6,10 @@
 
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from uuid import UUID, uuid4
 from datetime import datetime
 
@@ -23,6 +24,7 @@ from app.schemas.anomaly import (
     HandleAnomalyResponse,
     AnomalyResponse,
     AnomalyListResponse,
+    RedetectAnomaliesRequest,
 )
 from app.schemas.sync import (
     SyncToPresidentOfficeRequest,
@@ -30,7 +32,10 @@ from app.schemas.sync import (
     SyncStatusResponse,
     SyncTaskListItem,
 )
-from app.services.sync_service import get_sync_service
+from app.services.sync_bundle import SyncBundleConfigError, export_bundle
+from app.services.sync_service import SyncDelta, get_sync_service
+from app.services.sync_outbox import SyncOutboxService, sync_outbox_dispatcher
+from app.services.anomaly_detection_service import RESOLVED_STATUS, AnomalyRedetectionService
 
 router = APIRouter()
 
@@ -86,6 +91,11 @@ def handle_anomaly(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="This anomaly has already been handled"
         )
+    if anomaly.status == RESOLVED_STATUS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This anomaly no longer applies and has been resolved automatically"
+        )
     
     # Get associated evaluation
     evaluation = db.query(SelfEvaluation).filter(
@@ -189,7 +199,7 @@ def handle_anomaly(
 @router.get("/anomalies", response_model=AnomalyListResponse)
 def get_anomalies(
     evaluation_id: Optional[UUID] = Query(None, description="按自评表ID筛选"),
-    status: Optional[str] = Query(None, description="按状态筛选: pending, handled"),
+    status: Optional[str] = Query(None, description="按状态筛选: pending, handled, resolved"),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_management_roles)
 ):
@@ -212,10 +222,10 @@ def get_anomalies(
             query = query.filter(Anomaly.evaluation_id == evaluation_id)
 
         if status:
-            if status not in ["pending", "handled"]:
+            if status not in ["pending", "handled", RESOLVED_STATUS]:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Invalid status. Must be 'pending' or 'handled'"
+                    detail="Invalid status. Must be 'pending', 'handled' or 'resolved'"
                 )
             query = query.filter(Anomaly.status == status)
 
@@ -258,6 +268,27 @@ def get_anomalies(
         return AnomalyListResponse(total=0, anomalies=[])
 
 
+@router.post("/anomalies/redetect")
+def redetect_anomalies(
+    request: RedetectAnomaliesRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_evaluation_office)
+):
+    """
+    按年度批量重新检测数量一致性异常
+
+    检测规则调整或人工修正自评表后使用：以各自评表最新的AI评分重新比对，
+    新增仍存在的异常，自动关闭已不存在的待处理异常（已人工处理的记录不变）。
+    dry_run=true 时只返回差异统计，不写入。
+    """
+    result = AnomalyRedetectionService(db).redetect_year(request.year, dry_run=request.dry_run)
+    logging.getLogger(__name__).info(
+        f"{current_user.name} 重新检测 {request.year} 年度异常: "
+        f"新增 {result['inserted']}，关闭 {result['closed']}"
+    )
+    return result
+
+
 @router.get("/anomalies/{anomaly_id}", response_model=AnomalyResponse)
 def get_anomaly_detail(
     anomaly_id: UUID,
@@ -296,10 +327,48 @@ def get_anomaly_detail(
 
 
 
+def _sync_scope(
+    db: Session,
+    request: SyncToPresidentOfficeRequest
+) -> Tuple[List[UUID], List[UUID], Optional[SyncDelta]]:
+    """同步范围：(要发送的自评表, 要发送墓碑的自评表, 增量同步计划)"""
+    delta = None
+    deleted_ids: List[UUID] = []
+    if request.mode == "changes":
+        delta = get_sync_service().plan_changes(db, request.evaluation_ids)
+        evaluation_ids = delta.changed
+        deleted_ids = delta.deleted
+    else:
+        evaluation_ids = request.evaluation_ids
+        # Validate that all evaluations exist and are ready for sync
+        for eval_id in evaluation_ids:
+            evaluation = db.query(SelfEvaluation).filter(
+                SelfEvaluation.id == eval_id
+            ).first()
+            
+            if not evaluation:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Evaluation with id {eval_id} not found"
+                )
+            
+            # Check if evaluation has final score (required for sync)
+            from app.models.final_score import FinalScore
+            final_score = db.query(FinalScore).filter(
+                FinalScore.evaluation_id == eval_id
+            ).first()
+            
+            if not final_score:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Evaluation {eval_id} does not have a final score yet. Cannot sync."
+                )
+    return evaluation_ids, deleted_ids, delta
+
+
 @router.post("/sync-to-president-office", response_model=SyncToPresidentOfficeResponse, status_code=status.HTTP_200_OK)
 async def sync_to_president_office(
     request: SyncToPresidentOfficeRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_evaluation_office)
 ):
@@ -310,49 +379,45 @@ async def sync_to_president_office(
     
     - 实现HTTPS数据传输
     - 实现数据完整性验证（考评数据、评分记录、附件、异常处理结果）
-    - 实现同步失败重试机制
+    - 实现同步失败重试机制：同步任务与每份自评表的投递记录在同一事务中写入出站队列，
+      由后台dispatcher按指数退避投递，达到最大次数后转入死信
+    - mode=changes 时只发送上次成功同步以来新增或变化的自评表，以及已删除自评表的墓碑
     - 仅考评办公室可以上传
     """
-    # Validate that all evaluations exist and are ready for sync
-    for eval_id in request.evaluation_ids:
-        evaluation = db.query(SelfEvaluation).filter(
-            SelfEvaluation.id == eval_id
-        ).first()
-        
-        if not evaluation:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Evaluation with id {eval_id} not found"
-            )
-        
-        # Check if evaluation has final score (required for sync)
-        from app.models.final_score import FinalScore
-        final_score = db.query(FinalScore).filter(
-            FinalScore.evaluation_id == eval_id
-        ).first()
-        
-        if not final_score:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Evaluation {eval_id} does not have a final score yet. Cannot sync."
-            )
+    evaluation_ids, deleted_ids, delta = _sync_scope(db, request)
     
     # Create sync task
     sync_task_id = uuid4()
+    total_count = len(evaluation_ids) + len(deleted_ids)
+    now = datetime.utcnow()
     sync_task = SyncTask(
         id=sync_task_id,
-        evaluation_ids=[str(eid) for eid in request.evaluation_ids],
+        evaluation_ids=[str(eid) for eid in evaluation_ids],
+        mode=request.mode,
+        deleted_evaluation_ids=[str(eid) for eid in deleted_ids] or None,
         status="syncing",
         synced_count=0,
         failed_count=0,
-        total_count=len(request.evaluation_ids),
-        started_at=datetime.utcnow()
+        total_count=total_count,
+        started_at=now
     )
-    db.add(sync_task)
-    db.commit()
-    db.refresh(sync_task)
+    # 增量同步没有变化时直接完成；数据不完整的自评表直接记为失败
+    skipped = SyncOutboxService(db).enqueue(sync_task, evaluation_ids, deleted_ids)
     
     # Record operation log
+    details = {
+        "evaluation_ids": [str(eid) for eid in evaluation_ids],
+        "total_count": total_count,
+        "mode": request.mode
+    }
+    if delta is not None:
+        details.update({
+            "deleted_evaluation_ids": [str(eid) for eid in deleted_ids],
+            "unchanged_count": delta.unchanged,
+            "skipped": delta.skipped
+        })
+    if skipped:
+        details["skipped"] = [*details.get("skipped", []), *skipped]
     operation_log = OperationLog(
         operation_type="sync",
         operator_id=current_user.id,
@@ -360,31 +425,83 @@ async def sync_to_president_office(
         operator_role=current_user.role,
         target_id=sync_task_id,
         target_type="sync_task",
-        details={
-            "evaluation_ids": [str(eid) for eid in request.evaluation_ids],
-            "total_count": len(request.evaluation_ids)
-        }
+        details=details
     )
     db.add(operation_log)
     db.commit()
+    db.refresh(sync_task)
     
-    # Perform sync in background
-    background_tasks.add_task(
-        perform_sync_task,
-        sync_task_id=sync_task_id,
-        evaluation_ids=request.evaluation_ids
-    )
+    if sync_task.status == "syncing":
+        sync_outbox_dispatcher.notify()
+        message = "Sync task started. Data is being synchronized to president office."
+    elif total_count:
+        message = sync_task.error_message or "No valid evaluations to sync"
+    else:
+        message = "No changes since last successful sync."
     
     return SyncToPresidentOfficeResponse(
         sync_task_id=sync_task_id,
-        status="syncing",
-        synced_count=0,
-        failed_count=0,
-        message="Sync task started. Data is being synchronized to president office.",
+        status=sync_task.status,
+        synced_count=sync_task.synced_count,
+        failed_count=sync_task.failed_count,
+        mode=request.mode,
+        changed_count=len(delta.changed) if delta else None,
+        deleted_count=len(deleted_ids) if delta else None,
+        unchanged_count=delta.unchanged if delta else None,
+        message=message,
         synced_at=datetime.utcnow()
     )
 
 
+@router.post("/sync-bundle", response_class=FileResponse)
+async def export_sync_bundle(
+    request: SyncToPresidentOfficeRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_evaluation_office)
+):
+    """
+    导出离线同步包 (Export a signed offline sync bundle).
+    
+    - 管理端无法通过HTTPS直连校长办公会端时使用，导出文件在校长办公会端导入
+    - 同步范围与数据校验规则与"上传至校长办公会"相同；mode=changes 时导出上次成功同步以来的变化
+    - 离线导出不更新同步水位（校长办公会端的导入结果无法回传）
+    - 仅考评办公室可以导出
+    """
+    evaluation_ids, deleted_ids, _ = _sync_scope(db, request)
+    try:
+        bundle = await export_bundle(db, evaluation_ids, deleted_ids)
+    except SyncBundleConfigError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    
+    db.add(OperationLog(
+        operation_type="export_sync_bundle",
+        operator_id=current_user.id,
+        operator_name=current_user.name,
+        operator_role=current_user.role,
+        target_id=UUID(bundle.manifest["sync_task_id"]),
+        target_type="sync_task",
+        details={
+            "mode": request.mode,
+            "file_name": bundle.path.name,
+            "evaluation_count": bundle.manifest["evaluation_count"],
+            "deleted_count": bundle.manifest["deleted_count"],
+            "merkle_root": bundle.manifest["merkle_root"],
+            "skipped": bundle.skipped
+        }
+    ))
+    db.commit()
+    
+    return FileResponse(
+        bundle.path,
+        media_type="application/octet-stream",
+        filename=bundle.path.name,
+        headers={
+            "X-Sync-Task-Id": bundle.manifest["sync_task_id"],
+            "X-Bundle-Sha256": bundle.manifest["payload_sha256"]
+        }
+    )
+
+
 @router.get("/sync-tasks", response_model=List[SyncTaskListItem])
 def list_sync_tasks(
     db: Session = Depends(get_db),
@@ -398,13 +515,16 @@ def list_sync_tasks(
         SyncTaskListItem(
             id=t.id,
             evaluation_ids=[UUID(str(eid)) for eid in (t.evaluation_ids or [])] if isinstance(t.evaluation_ids, list) else [],
+            mode=t.mode or "full",
+            deleted_evaluation_ids=[UUID(str(eid)) for eid in (t.deleted_evaluation_ids or [])],
             status=t.status or "pending",
             synced_count=t.synced_count or 0,
             failed_count=t.failed_count or 0,
             total_count=t.total_count or 0,
             started_at=t.started_at,
             completed_at=t.completed_at,
-            error_message=t.error_message
+            error_message=t.error_message,
+            retry_count=t.retry_count or 0
         )
         for t in tasks
     ]
@@ -441,54 +561,43 @@ def get_sync_status(
         total_count=sync_task.total_count,
         started_at=sync_task.started_at,
         completed_at=sync_task.completed_at,
-        error_message=sync_task.error_message
+        error_message=sync_task.error_message,
+        retry_count=sync_task.retry_count or 0
     )
 
 
-async def perform_sync_task(sync_task_id: UUID, evaluation_ids: List[UUID]):
+@router.post("/sync-tasks/{sync_task_id}/retry", response_model=SyncStatusResponse)
+def retry_sync_task(
+    sync_task_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_evaluation_office)
+):
     """
-    执行同步任务的后台任务
+    重新投递同步任务的死信 (Requeue dead-lettered sync deliveries).
     
-    需求: 9.1, 9.2, 9.3, 9.4, 9.5, 9.6, 9.8
+    - 自评表按当前数据重新生成同步快照，数据仍不完整的保留为死信
+    - 仅考评办公室可以操作
     """
-    from app.db.base import SessionLocal
-    
-    db = SessionLocal()
-    sync_service = get_sync_service()
+    sync_task = db.query(SyncTask).filter(SyncTask.id == sync_task_id).first()
     
-    try:
-        # Perform sync with retry mechanism
-        synced_count, failed_count, error_message = await sync_service.sync_evaluations(
-            db=db,
-            evaluation_ids=evaluation_ids,
-            sync_task_id=sync_task_id
+    if not sync_task:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Sync task with id {sync_task_id} not found"
         )
-        
-        # Update sync task status
-        sync_task = db.query(SyncTask).filter(SyncTask.id == sync_task_id).first()
-        if sync_task:
-            sync_task.synced_count = synced_count
-            sync_task.failed_count = failed_count
-            sync_task.completed_at = datetime.utcnow()
-            
-            if failed_count == 0:
-                sync_task.status = "completed"
-            else:
-                sync_task.status = "failed"
-                sync_task.error_message = error_message
-            
-            db.commit()
     
-    except Exception as e:
-        # Update sync task as failed
-        sync_task = db.query(SyncTask).filter(SyncTask.id == sync_task_id).first()
-        if sync_task:
-            sync_task.status = "failed"
-            sync_task.failed_count = sync_task.total_count
-            sync_task.completed_at = datetime.utcnow()
-            sync_task.error_message = str(e)
-            db.commit()
-    
-    finally:
-        db.close()
-        await sync_service.close()
+    if SyncOutboxService(db).requeue_dead(sync_task):
+        sync_outbox_dispatcher.notify()
+    db.refresh(sync_task)
+    
+    return SyncStatusResponse(
+        sync_task_id=sync_task.id,
+        status=sync_task.status,
+        synced_count=sync_task.synced_count,
+        failed_count=sync_task.failed_count,
+        total_count=sync_task.total_count,
+        started_at=sync_task.started_at,
+        completed_at=sync_task.completed_at,
+        error_message=sync_task.error_message,
+        retry_count=sync_task.retry_count or 0
+    )
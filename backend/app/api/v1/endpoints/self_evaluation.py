@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID, uuid4
 from datetime import datetime
+from collections import defaultdict
+import threading
 
 from app.core.deps import get_db, get_current_user, RoleChecker
 from app.models.user import User
@@ -23,8 +26,10 @@ from app.schemas.self_evaluation import (
     SelfEvaluationUnlockResponse,
     TriggerAIScoringRequest,
     TriggerAIScoringResponse,
+    AIScoringJobResponse,
 )
-from app.services.ai_scoring_service import AIScoringService
+from app.models.ai_scoring_job import AIScoringJob
+from app.services.ai_scoring_queue import AIScoringJobService, ai_scoring_workers
 from app.core.logging_middleware import log_operation
 import logging
 
@@ -197,78 +202,122 @@ def get_teaching_office_result(
     }
 
 
-@router.get("/published-results")
-def get_published_results(
-    teaching_office_id: Optional[str] = None,
-    year: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_teaching_office),
-):
+def _manual_score_total(scores_json) -> float:
+    """从 ManualScore.scores JSON 计算总分（各指标得分之和）"""
+    if not scores_json or not isinstance(scores_json, list):
+        return 0.0
+    total = 0.0
+    for item in scores_json:
+        try:
+            if isinstance(item, dict) and "score" in item:
+                total += float(item["score"])
+        except (TypeError, ValueError):
+            continue
+    return total
+
+
+# 已公示结果缓存: (teaching_office_id, year) -> (版本指纹, 结果列表)
+_published_results_cache: Dict[Tuple[str, Optional[int]], Tuple[tuple, List[dict]]] = {}
+_published_results_lock = threading.Lock()
+
+
+def _published_evaluations_filter(office_id: UUID, year: Optional[int]) -> list:
+    conditions = [
+        SelfEvaluation.teaching_office_id == office_id,
+        SelfEvaluation.status.in_(["published", "distributed"]),
+    ]
+    if year:
+        conditions.append(SelfEvaluation.evaluation_year == year)
+    return conditions
+
+
+def _published_results_fingerprint(db: Session, office_id: UUID, year: Optional[int]) -> tuple:
     """
-    教研室端获取已公示/已分发的考评结果列表。
-    允许教研室查看自己的所有已公示结果。
+    计算教研室已公示考评的版本指纹（单次聚合查询）
+
+    评分记录不可修改，公示后的考评只会因状态/内容变化而更新 updated_at 或 version，
+    因此 (数量, 最大更新时间, 最大版本号) 足以判断缓存是否过期。
     """
-    # 从当前用户的 teaching_office_id 或参数获取
-    office_id_to_use = teaching_office_id or str(current_user.teaching_office_id) if current_user.teaching_office_id else None
+    row = (
+        db.query(
+            func.count(SelfEvaluation.id),
+            func.max(SelfEvaluation.updated_at),
+            func.max(SelfEvaluation.version),
+        )
+        .filter(*_published_evaluations_filter(office_id, year))
+        .one()
+    )
+    return tuple(row)
 
-    if not office_id_to_use:
-        return []
 
-    query = (
-        db.query(SelfEvaluation)
-        .filter(
-            SelfEvaluation.teaching_office_id == UUID(office_id_to_use),
-            SelfEvaluation.status.in_(["published", "distributed"])
-        )
+def _load_published_results(db: Session, office_id: UUID, year: Optional[int]) -> List[dict]:
+    """批量加载已公示结果：考评+教研室一次联表查询，各类评分各一次 IN 查询"""
+    evaluations = (
+        db.query(SelfEvaluation, TeachingOffice.name)
+        .outerjoin(TeachingOffice, TeachingOffice.id == SelfEvaluation.teaching_office_id)
+        .filter(*_published_evaluations_filter(office_id, year))
         .order_by(SelfEvaluation.evaluation_year.desc())
+        .all()
     )
-    if year:
-        query = query.filter(SelfEvaluation.evaluation_year == year)
+    if not evaluations:
+        return []
+
+    evaluation_ids = [ev.id for ev, _ in evaluations]
+
+    # 重新评分会新增AI评分记录：按评分时间倒序，取最新一次
+    ai_totals: Dict[UUID, float] = {}
+    for evaluation_id, total_score in (
+        db.query(AIScore.evaluation_id, AIScore.total_score)
+        .filter(AIScore.evaluation_id.in_(evaluation_ids))
+        .order_by(AIScore.scored_at.desc())
+        .all()
+    ):
+        ai_totals.setdefault(evaluation_id, float(total_score))
+
+    manual_by_eval: Dict[UUID, List[ManualScore]] = defaultdict(list)
+    for score in (
+        db.query(ManualScore)
+        .filter(ManualScore.evaluation_id.in_(evaluation_ids))
+        .order_by(ManualScore.submitted_at)
+        .all()
+    ):
+        manual_by_eval[score.evaluation_id].append(score)
+
+    finals: Dict[UUID, FinalScore] = {
+        final.evaluation_id: final
+        for final in db.query(FinalScore).filter(FinalScore.evaluation_id.in_(evaluation_ids)).all()
+    }
 
-    evaluations = query.all()
     results = []
-    for ev in evaluations:
-        office = db.query(TeachingOffice).filter(TeachingOffice.id == ev.teaching_office_id).first()
-        ai_score = db.query(AIScore).filter(AIScore.evaluation_id == ev.id).first()
-        manual_scores_raw = db.query(ManualScore).filter(ManualScore.evaluation_id == ev.id).all()
-        final = db.query(FinalScore).filter(FinalScore.evaluation_id == ev.id).first()
-
-        def _manual_score_total(scores_json) -> float:
-            if not scores_json or not isinstance(scores_json, list):
-                return 0.0
-            total = 0.0
-            for item in scores_json:
-                try:
-                    if isinstance(item, dict) and "score" in item:
-                        total += float(item["score"])
-                except Exception:
-                    continue
-            return total
+    for ev, office_name in evaluations:
+        manual_scores_raw = manual_by_eval.get(ev.id, [])
+        manual_totals = [_manual_score_total(s.scores) for s in manual_scores_raw]
+        final = finals.get(ev.id)
 
         manual_scores_detail = [
             {
                 "reviewer_name": s.reviewer_name,
                 "reviewer_role": s.reviewer_role,
                 "submitted_at": s.submitted_at.isoformat() if s.submitted_at else None,
-                "total": _manual_score_total(s.scores)
+                "total": total
             }
-            for s in manual_scores_raw
+            for s, total in zip(manual_scores_raw, manual_totals)
         ]
 
         calculated_final = None
         if final:
             calculated_final = float(final.final_score)
-        elif manual_scores_raw:
-            tot = sum([_manual_score_total(s.scores) for s in manual_scores_raw])
-            calculated_final = tot / len(manual_scores_raw)
+        elif manual_totals:
+            calculated_final = sum(manual_totals) / len(manual_totals)
 
+        ai_total = ai_totals.get(ev.id)
         results.append({
             "evaluation_id": str(ev.id),
             "teaching_office_id": str(ev.teaching_office_id),
-            "teaching_office_name": office.name if office else "",
+            "teaching_office_name": office_name or "",
             "evaluation_year": ev.evaluation_year,
             "status": ev.status,
-            "ai_score": {"total_score": float(ai_score.total_score)} if ai_score else None,
+            "ai_score": {"total_score": ai_total} if ai_total is not None else None,
             "manual_scores": manual_scores_detail,
             "final_score": {
                 "final_score": calculated_final,
@@ -280,6 +329,41 @@ def get_published_results(
     return results
 
 
+@router.get("/published-results")
+def get_published_results(
+    teaching_office_id: Optional[str] = None,
+    year: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_teaching_office),
+):
+    """
+    教研室端获取已公示/已分发的考评结果列表。
+    允许教研室查看自己的所有已公示结果。
+
+    - 结果按教研室缓存，以考评版本指纹校验，命中时仅需一次聚合查询
+    - 未命中时批量加载，查询次数与历史年度数量无关
+    """
+    # 从当前用户的 teaching_office_id 或参数获取
+    office_id_to_use = teaching_office_id or str(current_user.teaching_office_id) if current_user.teaching_office_id else None
+
+    if not office_id_to_use:
+        return []
+
+    office_id = UUID(office_id_to_use)
+    cache_key = (str(office_id), year)
+    fingerprint = _published_results_fingerprint(db, office_id, year)
+
+    with _published_results_lock:
+        cached = _published_results_cache.get(cache_key)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+
+    results = _load_published_results(db, office_id, year)
+    with _published_results_lock:
+        _published_results_cache[cache_key] = (fingerprint, results)
+    return results
+
+
 @router.put("/self-evaluation/{evaluation_id}", response_model=SelfEvaluationResponse)
 def update_self_evaluation(
     evaluation_id: UUID,
@@ -465,43 +549,9 @@ def unlock_self_evaluation(
 
 
 
-async def _background_ai_scoring_task(evaluation_id: UUID, db: Session):
-    """
-    后台AI评分任务
-    
-    Args:
-        evaluation_id: 自评表ID
-        db: 数据库会话
-    """
-    try:
-        logger.info(f"后台AI评分任务开始，evaluation_id: {evaluation_id}")
-        
-        ai_scoring_service = AIScoringService(db)
-        ai_score = await ai_scoring_service.execute_ai_scoring(evaluation_id)
-        
-        logger.info(f"后台AI评分任务完成，score_id: {ai_score.id}")
-        
-    except Exception as e:
-        logger.error(f"后台AI评分任务失败，evaluation_id: {evaluation_id}, error: {str(e)}")
-        
-        # 更新自评表状态为失败（可选）
-        try:
-            evaluation = db.query(SelfEvaluation).filter(
-                SelfEvaluation.id == evaluation_id
-            ).first()
-            
-            if evaluation:
-                # 保持locked状态，但可以记录错误信息
-                evaluation.updated_at = datetime.utcnow()
-                db.commit()
-        except:
-            pass
-
-
 @router.post("/trigger-ai-scoring", response_model=TriggerAIScoringResponse)
 async def trigger_ai_scoring(
     request: TriggerAIScoringRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_teaching_office),
 ):
@@ -509,7 +559,7 @@ async def trigger_ai_scoring(
     触发AI评分
     
     - 检查自评表和附件是否都已提交（状态为locked）
-    - 使用BackgroundTasks异步执行AI评分任务
+    - 写入持久化的AI评分任务队列，由后台worker执行（同一自评表不重复入队）
     - 立即返回任务ID和状态
     
     需求: 3.1, 3.2
@@ -561,10 +611,14 @@ async def trigger_ai_scoring(
     # 生成任务ID（使用evaluation_id作为任务ID）
     scoring_task_id = evaluation_id
     
-    # 添加后台任务
-    background_tasks.add_task(_background_ai_scoring_task, evaluation_id, db)
+    # 写入任务队列并唤醒worker
+    job, created = AIScoringJobService(db).enqueue(evaluation_id, requested_by=current_user.id)
+    ai_scoring_workers.notify()
     
-    logger.info(f"AI评分任务已添加到后台队列，task_id: {scoring_task_id}")
+    if created:
+        logger.info(f"AI评分任务已添加到后台队列，task_id: {scoring_task_id}, job_id: {job.id}")
+    else:
+        logger.info(f"AI评分任务已在队列中，task_id: {scoring_task_id}, job_id: {job.id}")
     
     # 记录操作日志 - 需求 17.2
     try:
@@ -587,6 +641,60 @@ async def trigger_ai_scoring(
     
     return TriggerAIScoringResponse(
         scoring_task_id=scoring_task_id,
+        job_id=job.id,
         status="processing",
         message="AI评分任务已启动，正在后台处理中"
     )
+
+
+def _job_response(job: AIScoringJob) -> AIScoringJobResponse:
+    return AIScoringJobResponse(
+        job_id=job.id,
+        evaluation_id=job.evaluation_id,
+        status=job.status,
+        attempts=job.attempts,
+        max_attempts=job.max_attempts,
+        next_run_at=job.next_run_at if job.status == "queued" else None,
+        last_error=job.last_error,
+        ai_score_id=job.ai_score_id,
+        indicators_received=job.indicators_received or 0,
+        partial_scores=job.partial_scores,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+    )
+
+
+@router.get("/ai-scoring-jobs/{job_id}", response_model=AIScoringJobResponse)
+def get_ai_scoring_job(
+    job_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_teaching_office),
+):
+    """
+    查询AI评分任务状态
+    """
+    job = AIScoringJobService(db).get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="AI评分任务不存在"
+        )
+    return _job_response(job)
+
+
+@router.get("/self-evaluation/{evaluation_id}/ai-scoring-job", response_model=AIScoringJobResponse)
+def get_latest_ai_scoring_job(
+    evaluation_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_teaching_office),
+):
+    """
+    查询自评表最近一次AI评分任务状态（scoring_task_id 即自评表ID）
+    """
+    job = AIScoringJobService(db).get_latest_job(evaluation_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="该自评表没有AI评分任务"
+        )
+    return _job_response(job)
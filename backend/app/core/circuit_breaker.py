@@ -0,0 +1,391 @@
+"""
+出站调用熔断与自适应并发
+
+每个外部目标（DeepSeek、校长办公会端）一个共享的 OutboundGuard：
+- CircuitBreaker：连续失败达到阈值后熔断（open），冷却期内直接拒绝调用；
+  冷却结束进入半开（half_open），放行少量探测请求，成功则恢复（closed），失败则重新熔断
+- AIMDConcurrencyLimiter：并发上限按“加性增、乘性减”调整——调用成功且耗时未超过目标时
+  缓慢增加，遇到 429/5xx/超时/连接错误或耗时超标时减半；流式调用的耗时按首个响应数据
+  到达的时间计算，长输出本身不算拥塞
+
+只有目标不可用或过载（429、5xx、超时、连接错误）计为失败；其他 4xx 说明目标可正常响应，
+不影响熔断状态。与 TokenBucket 一样内部使用线程锁，可被多个worker、多个事件循环共享。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.http_clients import DEEPSEEK_CLIENT, PRESIDENT_OFFICE_CLIENT
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """目标已熔断，调用被直接拒绝"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"外部服务 {name} 暂时不可用（已熔断），{retry_after:.0f} 秒后重试")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """目标不可用或过载：429、5xx、超时、连接错误"""
+    if isinstance(error, httpx.HTTPStatusError):
+        code = error.response.status_code
+        return code == 429 or code >= 500
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+
+class CircuitBreaker:
+    """熔断器（closed / open / half_open）"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        recovery_timeout: float,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = max(failure_threshold, 1)
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = max(half_open_max_calls, 1)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self.times_opened = 0
+        self.rejected_calls = 0
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._half_open_calls = 0
+            logger.info(f"熔断器 {self.name} 进入半开状态，放行探测请求")
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(self._clock())
+
+    def before_call(self) -> None:
+        """
+        调用前检查
+
+        Raises:
+            CircuitOpenError: 已熔断，或半开状态下探测请求已满
+        """
+        with self._lock:
+            now = self._clock()
+            state = self._current_state(now)
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return
+            self.rejected_calls += 1
+            retry_after = max(self.recovery_timeout - (now - self._opened_at), 0.0)
+        raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                logger.info(f"熔断器 {self.name} 探测成功，恢复正常")
+            self._state = CLOSED
+            self._consecutive_failures = 0
+            self._half_open_calls = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            now = self._clock()
+            state = self._current_state(now)
+            self._consecutive_failures += 1
+            if state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if state != OPEN:
+                    self.times_opened += 1
+                    logger.warning(
+                        f"熔断器 {self.name} 打开（连续失败 {self._consecutive_failures} 次），"
+                        f"{self.recovery_timeout:.0f} 秒内拒绝调用"
+                    )
+                self._state = OPEN
+                self._opened_at = now
+                self._half_open_calls = 0
+
+    def release(self) -> None:
+        """调用被取消、未得出结论时归还半开探测名额"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = self._clock()
+            state = self._current_state(now)
+            return {
+                "state": state,
+                "consecutive_failures": self._consecutive_failures,
+                "times_opened": self.times_opened,
+                "rejected_calls": self.rejected_calls,
+                "retry_after": round(max(self.recovery_timeout - (now - self._opened_at), 0.0), 1)
+                if state == OPEN else 0.0,
+            }
+
+
+class AIMDConcurrencyLimiter:
+    """加性增、乘性减的并发上限"""
+
+    def __init__(
+        self,
+        name: str,
+        min_limit: int,
+        max_limit: int,
+        latency_target: float,
+        backoff_ratio: float = 0.5,
+        decrease_interval: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            min_limit / max_limit: 并发上限的调整范围（相等即为固定并发）
+            latency_target: 单次调用耗时目标（秒），超过视为拥塞
+            backoff_ratio: 拥塞时上限乘以的系数
+            decrease_interval: 两次减小之间的最短间隔（同一批并发失败只减一次）
+        """
+        self.name = name
+        self.min_limit = max(min_limit, 1)
+        self.max_limit = max(max_limit, self.min_limit)
+        self.latency_target = latency_target
+        self.backoff_ratio = backoff_ratio
+        self.decrease_interval = decrease_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._limit = float(self.max_limit)
+        self._in_flight = 0
+        self._waiting = 0
+        self._last_decrease = float("-inf")
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._in_flight < int(self._limit):
+                self._in_flight += 1
+                return True
+            return False
+
+    async def acquire(self, poll_interval: float = 0.05) -> None:
+        """等待直到有空闲的并发名额"""
+        if self.try_acquire():
+            return
+        with self._lock:
+            self._waiting += 1
+        try:
+            while not self.try_acquire():
+                await asyncio.sleep(poll_interval)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight = max(self._in_flight - 1, 0)
+
+    def on_success(self, latency: float) -> None:
+        if latency > self.latency_target:
+            self.on_overload()
+            return
+        with self._lock:
+            # 每个成功调用增加 1/limit，约每轮满并发增加1
+            self._limit = min(self._limit + 1.0 / self._limit, float(self.max_limit))
+
+    def on_overload(self) -> None:
+        with self._lock:
+            now = self._clock()
+            if now - self._last_decrease < self.decrease_interval:
+                return
+            self._last_decrease = now
+            self._limit = max(self._limit * self.backoff_ratio, float(self.min_limit))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "concurrency_limit": int(self._limit),
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+            }
+
+
+class _CallOutcome:
+    """单次受保护调用的结果记录"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self.error: Optional[BaseException] = None
+        self._clock = clock
+        self.started = clock()
+        self.first_byte_latency: Optional[float] = None
+
+    def record_failure(self, error: BaseException) -> None:
+        """调用未抛出异常但实际失败（如流式响应超时后使用部分结果）"""
+        self.error = error
+
+    def record_first_byte(self) -> None:
+        """流式调用收到首个响应数据，之后的耗时不再计入拥塞判断"""
+        if self.first_byte_latency is None:
+            self.first_byte_latency = self._clock() - self.started
+
+    def latency(self) -> float:
+        if self.first_byte_latency is not None:
+            return self.first_byte_latency
+        return self._clock() - self.started
+
+
+class OutboundGuard:
+    """外部目标的熔断器 + 自适应并发"""
+
+    def __init__(self, name: str, breaker: CircuitBreaker, limiter: AIMDConcurrencyLimiter):
+        self.name = name
+        self.breaker = breaker
+        self.limiter = limiter
+        self._lock = threading.Lock()
+        self.successes = 0
+        self.failures = 0
+
+    @asynccontextmanager
+    async def call(self) -> AsyncIterator[_CallOutcome]:
+        """
+        受保护地执行一次调用
+
+        Raises:
+            CircuitOpenError: 目标已熔断
+        """
+        await self.limiter.acquire()
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.limiter.release()
+            raise
+
+        outcome = _CallOutcome()
+        try:
+            yield outcome
+        except BaseException as e:
+            self._finish(outcome.error or e, outcome.latency())
+            raise
+        else:
+            self._finish(outcome.error, outcome.latency())
+        finally:
+            self.limiter.release()
+
+    def _finish(self, error: Optional[BaseException], latency: float) -> None:
+        if error is not None and is_overload_error(error):
+            self.breaker.record_failure()
+            self.limiter.on_overload()
+            with self._lock:
+                self.failures += 1
+        elif isinstance(error, asyncio.CancelledError):
+            self.breaker.release()
+        else:
+            # 其他错误（4xx、响应格式错误等）说明目标本身可用
+            self.breaker.record_success()
+            if error is None:
+                self.limiter.on_success(latency)
+            with self._lock:
+                self.successes += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = self.breaker.snapshot()
+        data.update(self.limiter.snapshot())
+        with self._lock:
+            data["successes"] = self.successes
+            data["failures"] = self.failures
+        return data
+
+
+class OutboundGuardRegistry:
+    """按目标名共享 OutboundGuard"""
+
+    def __init__(self) -> None:
+        self._factories: Dict[str, Callable[[], OutboundGuard]] = {}
+        self._guards: Dict[str, OutboundGuard] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], OutboundGuard]) -> None:
+        with self._lock:
+            self._factories[name] = factory
+            self._guards[name] = factory()
+
+    def get(self, name: str) -> OutboundGuard:
+        with self._lock:
+            if name not in self._guards:
+                raise KeyError(f"未注册的外部目标: {name}")
+            return self._guards[name]
+
+    def reset(self) -> None:
+        """按配置重建所有目标的状态"""
+        with self._lock:
+            self._guards = {name: factory() for name, factory in self._factories.items()}
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            guards = dict(self._guards)
+        return {name: guard.snapshot() for name, guard in guards.items()}
+
+
+def _guard_factory(name: str, min_limit: int, max_limit: int, latency_target: float) -> Callable[[], OutboundGuard]:
+    def build() -> OutboundGuard:
+        return OutboundGuard(
+            name,
+            CircuitBreaker(
+                name,
+                failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                recovery_timeout=settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT,
+                half_open_max_calls=settings.CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS,
+            ),
+            AIMDConcurrencyLimiter(name, min_limit, max_limit, latency_target),
+        )
+    return build
+
+
+def register_default_guards(registry: OutboundGuardRegistry) -> None:
+    """按配置注册系统使用的外部目标（名称与 http_clients 一致）"""
+    registry.register(DEEPSEEK_CLIENT, _guard_factory(
+        DEEPSEEK_CLIENT,
+        settings.DEEPSEEK_MIN_CONCURRENCY,
+        settings.DEEPSEEK_MAX_CONNECTIONS,
+        settings.DEEPSEEK_LATENCY_TARGET,
+    ))
+    registry.register(PRESIDENT_OFFICE_CLIENT, _guard_factory(
+        PRESIDENT_OFFICE_CLIENT,
+        settings.PRESIDENT_OFFICE_MIN_CONCURRENCY,
+        settings.PRESIDENT_OFFICE_MAX_CONNECTIONS,
+        settings.PRESIDENT_OFFICE_LATENCY_TARGET,
+    ))
+
+
+# 全局外部目标保护注册表
+outbound_guards = OutboundGuardRegistry()
+register_default_guards(outbound_guards)
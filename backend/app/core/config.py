@@ -32,7 +32,113 @@ class Settings(BaseSettings):
     # DeepSeek API
     DEEPSEEK_API_KEY: str = ""
     DEEPSEEK_API_URL: str = "https://api.deepseek.com/v1/chat/completions"
-    
+    DEEPSEEK_MODEL: str = "deepseek-chat"
+    DEEPSEEK_TEMPERATURE: float = 0.3
+    DEEPSEEK_TIMEOUT: float = 30.0
+    # 流式接收评分结果；超过总时限时使用已收到的部分结果
+    DEEPSEEK_STREAMING: bool = True
+    # JSON模式（response_format=json_object），保证返回单个JSON对象
+    DEEPSEEK_JSON_MODE: bool = True
+    DEEPSEEK_STREAM_DEADLINE: float = 90.0
+    # 评分提示词token预算（超出时截断/摘要自评内容与附件列表）
+    AI_PROMPT_MAX_TOKENS: int = 6000
+    # full: DeepSeek完成全部评分；hybrid: 可确定的字段本地计算，DeepSeek只评8个常规教学指标
+    AI_SCORING_MODE: str = "full"
+    DEEPSEEK_MAX_CONNECTIONS: int = 10
+    # DeepSeek 调用限流（令牌桶，<= 0 表示不限流）
+    DEEPSEEK_RATE_LIMIT_PER_SECOND: float = 2.0
+    DEEPSEEK_RATE_LIMIT_BURST: int = 5
+    # DeepSeek 自适应并发（AIMD，上限为 DEEPSEEK_MAX_CONNECTIONS）；单次调用耗时超过目标视为拥塞，
+    # 流式调用按首个token到达的耗时计算（须小于 DEEPSEEK_STREAM_DEADLINE）
+    DEEPSEEK_MIN_CONCURRENCY: int = 1
+    DEEPSEEK_LATENCY_TARGET: float = 20.0
+
+    # AI评分任务队列（worker 数为 0 时不启动后台处理）
+    AI_SCORING_WORKERS: int = 2
+    AI_SCORING_POLL_INTERVAL: float = 5.0
+    AI_SCORING_JOB_MAX_ATTEMPTS: int = 3
+    AI_SCORING_RETRY_BASE_DELAY: float = 30.0
+    AI_SCORING_RETRY_MAX_DELAY: float = 600.0
+    AI_SCORING_JOB_LEASE_SECONDS: int = 900
+    AI_SCORING_BULK_CONCURRENCY: int = 5
+    AI_PROGRESS_POLL_INTERVAL: float = 1.0
+
+    # AI响应缓存（按 提示词+模型+温度 指纹持久化，LRU淘汰）
+    AI_RESPONSE_CACHE_ENABLED: bool = True
+    AI_RESPONSE_CACHE_TTL: int = 60 * 60 * 24 * 30  # 30 days
+    AI_RESPONSE_CACHE_MAX_ENTRIES: int = 5000
+
+    # 附件上传：按分段流式写入存储（MinIO分段上传的分段不小于5MB），同一请求内的多个文件并发上传
+    ATTACHMENT_UPLOAD_PART_SIZE: int = 8 * 1024 * 1024
+    ATTACHMENT_UPLOAD_CONCURRENCY: int = 4
+    # 附件下载：本地存储的文件交给 nginx 发送（X-Accel-Redirect 的内部路径前缀，需映射到本地存储目录），为空时由应用发送
+    ATTACHMENT_ACCEL_REDIRECT_PREFIX: str = ""
+    ATTACHMENT_DOWNLOAD_CHUNK_SIZE: int = 1024 * 1024
+    # 分块上传：会话存数据库（多worker共享），超过有效期未完成的会话由存储清理任务删除其分块
+    CHUNKED_UPLOAD_MAX_CHUNK_SIZE: int = 64 * 1024 * 1024
+    CHUNKED_UPLOAD_SESSION_TTL: int = 60 * 60 * 24  # 24 hours，每收到一个分块顺延
+    # 内容寻址存储：相同内容的附件共用一个对象，引用计数归零超过宽限期后删除
+    CONTENT_STORE_GC_GRACE: int = 60 * 60
+    # 秒传持有证明：挑战区间的最大字节数与挑战有效期（秒）
+    INSTANT_UPLOAD_CHALLENGE_BYTES: int = 64 * 1024
+    INSTANT_UPLOAD_CHALLENGE_TTL: int = 300
+    # 存储清理任务间隔（秒），0 表示不启动
+    STORAGE_GC_INTERVAL: float = 600.0
+
+    # 附件正文提取（上传时在进程池中执行，0 表示在线程中执行）
+    ATTACHMENT_TEXT_WORKERS: int = 2
+    ATTACHMENT_TEXT_MAX_FILE_SIZE: int = 30 * 1024 * 1024
+    ATTACHMENT_TEXT_MAX_CHARS: int = 20000
+    # 提示词中附件正文摘录的token上限（计入 AI_PROMPT_MAX_TOKENS）
+    ATTACHMENT_TEXT_PROMPT_TOKENS: int = 2000
+    # 附件本地分类（文件名朴素贝叶斯）：高置信度建议与用户选择一致的附件不再请DeepSeek分类
+    ATTACHMENT_CLASSIFIER_ENABLED: bool = True
+    ATTACHMENT_CLASSIFIER_CONFIDENCE: float = 0.9
+    ATTACHMENT_CLASSIFIER_MAX_SAMPLES: int = 20000
+    ATTACHMENT_CLASSIFIER_REFRESH_SECONDS: int = 600
+
+    # 校长办公会端同步
+    PRESIDENT_OFFICE_API_URL: str = "https://president-office.example.com/api"
+    PRESIDENT_OFFICE_TIMEOUT: float = 30.0
+    PRESIDENT_OFFICE_MAX_CONNECTIONS: int = 5
+    PRESIDENT_OFFICE_MIN_CONCURRENCY: int = 1
+    PRESIDENT_OFFICE_LATENCY_TARGET: float = 10.0
+    # 同步传输：stream 为分块NDJSON流（可续传），package 为单个JSON数据包（兼容旧版接收端）
+    SYNC_TRANSPORT: str = "stream"
+    SYNC_STREAM_CHUNK_SIZE: int = 100
+    # zstd 需安装 zstandard，未安装时使用 gzip；identity 不压缩
+    SYNC_STREAM_COMPRESSION: str = "zstd"
+    SYNC_STREAM_MAX_RECORD_BYTES: int = 16 * 1024 * 1024
+    # 同步请求的服务凭证：管理端以 HMAC-SHA256 签名请求，校长办公会端校验（两端配置相同的密钥，
+    # 为空时校长办公会端拒绝所有同步请求）
+    SYNC_SHARED_SECRET: str = ""
+    SYNC_SIGNATURE_MAX_SKEW: int = 300
+    # 离线同步包（无法直连校长办公会端时导出文件、在校长办公会端导入）：HMAC-SHA256 签名，
+    # 两端配置相同的密钥，为空时拒绝导出与导入
+    SYNC_BUNDLE_SIGNING_KEY: str = ""
+    SYNC_BUNDLE_DIR: str = "./sync_bundles"
+    # 同步出站队列：创建同步任务时在同一事务中写入每份自评表的投递记录，
+    # 后台dispatcher按指数退避投递，达到最大次数后转入死信（worker 数为 0 时不启动后台投递）
+    SYNC_OUTBOX_WORKERS: int = 1
+    SYNC_OUTBOX_POLL_INTERVAL: float = 5.0
+    SYNC_OUTBOX_BATCH_SIZE: int = 1000
+    SYNC_OUTBOX_MAX_ATTEMPTS: int = 8
+    SYNC_OUTBOX_RETRY_BASE_DELAY: float = 30.0
+    SYNC_OUTBOX_RETRY_MAX_DELAY: float = 3600.0
+    SYNC_OUTBOX_LEASE_SECONDS: int = 900
+
+    # 外部调用熔断：连续失败达到阈值后熔断，冷却后放行探测请求
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_BREAKER_RECOVERY_TIMEOUT: float = 30.0
+    CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS: int = 1
+
+    # 出站HTTP连接池（HTTP/2 需安装 h2）
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP2_ENABLED: bool = False
+
+    # 学院看板统计缓存（秒）；写入评分时主动失效，TTL 兜底多进程部署
+    COLLEGE_STATS_CACHE_TTL: int = 300
+
     # CORS - 允许的前端访问地址
     BACKEND_CORS_ORIGINS: List[str] = [
         "http://localhost:3000",
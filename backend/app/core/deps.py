@@ -1,10 +1,22 @@
 from typing import Generator, Optional, List, Callable
-from fastapi import Depends, HTTPException, status
+import hmac
+import time
+
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
 from app.db.base import SessionLocal
-from app.core.security import decode_access_token
+from app.core.config import settings
+from app.core.security import (
+    STREAMING_BODY_DIGEST,
+    SYNC_SIGNATURE_HEADER,
+    SYNC_TIMESTAMP_HEADER,
+    SyncCredentialError,
+    body_digest,
+    decode_access_token,
+    sync_request_signature,
+)
 from app.models.user import User
 from app.schemas.auth import TokenData
 
@@ -152,3 +164,43 @@ def require_any_role(
 ) -> User:
     """Allow any authenticated user with a valid role."""
     return current_user
+
+
+class SyncRequestVerifier:
+    """
+    Verify the management-side service credential on sync endpoints.
+    
+    Requests must carry X-Sync-Timestamp and X-Sync-Signature (see SyncRequestAuth).
+    Streamed bodies are signed without their content and are verified record by record
+    by the receiver instead.
+    """
+    
+    def __init__(self, streaming_body: bool = False):
+        self.streaming_body = streaming_body
+    
+    async def __call__(self, request: Request) -> None:
+        timestamp = request.headers.get(SYNC_TIMESTAMP_HEADER)
+        signature = request.headers.get(SYNC_SIGNATURE_HEADER)
+        if not timestamp or not signature:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing sync credential")
+        try:
+            skew = abs(time.time() - int(timestamp))
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid sync timestamp")
+        if skew > settings.SYNC_SIGNATURE_MAX_SKEW:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Sync request expired")
+        
+        digest = STREAMING_BODY_DIGEST if self.streaming_body else body_digest(await request.body())
+        try:
+            expected = sync_request_signature(request.method, request.url.path, timestamp, digest)
+        except SyncCredentialError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Sync credential is not configured"
+            )
+        if not hmac.compare_digest(signature, expected):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid sync signature")
+
+
+verify_sync_request = SyncRequestVerifier()
+verify_sync_stream_request = SyncRequestVerifier(streaming_body=True)
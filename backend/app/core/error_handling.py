@@ -160,7 +160,7 @@ class ChunkedUploadManager:
     支持大文件的分块上传和断点续传
     """
     
-    # 存储上传会话信息（生产环境应使用Redis等持久化存储）
+    # 进程内的上传会话信息；分块上传接口使用数据库中的会话（见 ChunkedUploadService），可跨worker共享
     _upload_sessions = {}
     
     # 默认分块大小：5MB
@@ -0,0 +1,280 @@
+"""
+出站HTTP客户端注册表
+
+为每个外部目标（DeepSeek、校长办公会端）维护一个长连接复用的 httpx.AsyncClient：
+- 按目标配置连接池上限、keep-alive 过期时间、超时
+- 可选启用 HTTP/2（需安装 h2）
+- 应用启动时创建、关闭时统一释放
+- 统计请求数、进行中请求、错误数、耗时和连接池状态
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    H2_AVAILABLE = True
+except ImportError:
+    H2_AVAILABLE = False
+
+DEEPSEEK_CLIENT = "deepseek"
+PRESIDENT_OFFICE_CLIENT = "president_office"
+
+
+@dataclass
+class HTTPClientConfig:
+    """单个目标的客户端配置"""
+    timeout: float = 30.0
+    connect_timeout: float = 10.0
+    max_connections: int = 10
+    max_keepalive_connections: int = 5
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    verify: bool = True
+    follow_redirects: bool = False
+
+
+class _ClientStats:
+    """单个目标的请求统计"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.clients_created = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            completed = self.requests - self.in_flight
+            return {
+                "requests": self.requests,
+                "in_flight": self.in_flight,
+                "errors": self.errors,
+                "avg_latency_ms": round(self.total_latency / completed * 1000, 2) if completed else 0.0,
+                "max_latency_ms": round(self.max_latency * 1000, 2),
+                "clients_created": self.clients_created,
+            }
+
+
+class _InstrumentedTransport(httpx.AsyncBaseTransport):
+    """包装底层传输层，记录请求耗时和错误"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, stats: _ClientStats):
+        self.transport = transport
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with self.stats.lock:
+            self.stats.requests += 1
+            self.stats.in_flight += 1
+        started = time.monotonic()
+        failed = False
+        try:
+            response = await self.transport.handle_async_request(request)
+            failed = response.status_code >= 500
+            return response
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            with self.stats.lock:
+                self.stats.in_flight -= 1
+                self.stats.total_latency += elapsed
+                self.stats.max_latency = max(self.stats.max_latency, elapsed)
+                if failed:
+                    self.stats.errors += 1
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+    def pool_stats(self) -> Dict[str, int]:
+        """读取连接池状态（仅默认 AsyncHTTPTransport 可用）"""
+        pool = getattr(self.transport, "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {}
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {
+            "connections": len(connections),
+            "idle_connections": idle,
+            "active_connections": len(connections) - idle,
+        }
+
+
+class HTTPClientRegistry:
+    """按目标名称管理共享的 AsyncClient"""
+
+    def __init__(self):
+        self._configs: Dict[str, HTTPClientConfig] = {}
+        self._transports: Dict[str, Optional[httpx.AsyncBaseTransport]] = {}
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._loops: Dict[str, Optional[asyncio.AbstractEventLoop]] = {}
+        self._stats: Dict[str, _ClientStats] = {}
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        config: HTTPClientConfig,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ) -> None:
+        """
+        注册（或覆盖）一个目标的配置
+
+        Args:
+            name: 目标名称
+            config: 客户端配置
+            transport: 自定义底层传输（测试时注入 MockTransport）
+        """
+        with self._lock:
+            self._configs[name] = config
+            self._transports[name] = transport
+            self._stats.setdefault(name, _ClientStats())
+            stale = self._clients.pop(name, None)
+            self._loops.pop(name, None)
+        if stale is not None and not stale.is_closed:
+            self._schedule_close(stale)
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """
+        获取目标的共享客户端
+
+        客户端已关闭、或创建它的事件循环已不是当前循环时（如后台任务另起循环），
+        会重新创建一个，避免复用绑定在旧循环上的连接。
+        """
+        if name not in self._configs:
+            raise KeyError(f"未注册的HTTP客户端: {name}")
+
+        loop = self._current_loop()
+        with self._lock:
+            client = self._clients.get(name)
+            owner_loop = self._loops.get(name)
+            if (
+                client is not None
+                and not client.is_closed
+                and (loop is None or owner_loop is None or owner_loop is loop)
+            ):
+                return client
+
+            stale = client
+            client = self._build_client(name)
+            self._clients[name] = client
+            self._loops[name] = loop
+
+        if stale is not None and not stale.is_closed:
+            self._schedule_close(stale)
+        return client
+
+    async def startup(self) -> None:
+        """应用启动时预先创建所有客户端"""
+        for name in list(self._configs):
+            self.get(name)
+        logger.info(f"HTTP客户端已初始化: {', '.join(self._configs)}")
+
+    async def aclose(self) -> None:
+        """关闭所有客户端，释放连接池"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._loops.clear()
+        for client in clients:
+            if not client.is_closed:
+                try:
+                    await client.aclose()
+                except Exception as e:
+                    logger.warning(f"关闭HTTP客户端失败: {str(e)}")
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """各目标的请求统计和连接池状态"""
+        result = {}
+        for name, config in self._configs.items():
+            data = self._stats[name].snapshot()
+            data["http2"] = config.http2 and H2_AVAILABLE
+            data["max_connections"] = config.max_connections
+            data["max_keepalive_connections"] = config.max_keepalive_connections
+            client = self._clients.get(name)
+            data["open"] = client is not None and not client.is_closed
+            transport = getattr(client, "_transport", None) if data["open"] else None
+            if isinstance(transport, _InstrumentedTransport):
+                data.update(transport.pool_stats())
+            result[name] = data
+        return result
+
+    def _build_client(self, name: str) -> httpx.AsyncClient:
+        config = self._configs[name]
+        stats = self._stats[name]
+        http2 = config.http2 and H2_AVAILABLE
+        if config.http2 and not H2_AVAILABLE:
+            logger.warning(f"未安装h2，HTTP客户端 {name} 回退为 HTTP/1.1")
+
+        limits = httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        )
+        inner = self._transports.get(name) or httpx.AsyncHTTPTransport(
+            verify=config.verify,
+            http2=http2,
+            limits=limits,
+        )
+        with stats.lock:
+            stats.clients_created += 1
+        return httpx.AsyncClient(
+            transport=_InstrumentedTransport(inner, stats),
+            timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+            limits=limits,
+            follow_redirects=config.follow_redirects,
+        )
+
+    @staticmethod
+    def _current_loop() -> Optional[asyncio.AbstractEventLoop]:
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+    @staticmethod
+    def _schedule_close(client: httpx.AsyncClient) -> None:
+        """尽力关闭被替换的客户端（其所属循环可能已结束）"""
+        try:
+            asyncio.get_running_loop().create_task(client.aclose())
+        except RuntimeError:
+            pass
+
+
+def register_default_clients(registry: "HTTPClientRegistry") -> None:
+    """按配置注册系统使用的外部目标"""
+    registry.register(DEEPSEEK_CLIENT, HTTPClientConfig(
+        timeout=settings.DEEPSEEK_TIMEOUT,
+        max_connections=settings.DEEPSEEK_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.DEEPSEEK_MAX_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        http2=settings.HTTP2_ENABLED,
+    ))
+    registry.register(PRESIDENT_OFFICE_CLIENT, HTTPClientConfig(
+        timeout=settings.PRESIDENT_OFFICE_TIMEOUT,
+        max_connections=settings.PRESIDENT_OFFICE_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.PRESIDENT_OFFICE_MAX_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        http2=settings.HTTP2_ENABLED,
+        follow_redirects=True,
+    ))
+
+
+# 全局客户端注册表
+http_clients = HTTPClientRegistry()
+register_default_clients(http_clients)
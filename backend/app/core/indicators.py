@@ -0,0 +1,45 @@
+"""
+考核指标定义
+
+集中维护新评分表中"常规教学工作"的8个指标：
+- 自评表 content.regularTeaching 中使用的键名（驼峰）
+- AI评分 indicator_scores 中使用的中文名称
+- 每项满分（用于归一化计算失分率）
+"""
+
+from typing import Dict, Optional
+
+# 常规教学工作每项满分
+REGULAR_INDICATOR_MAX_SCORE = 10.0
+
+# 键名 -> 中文名称（顺序与评分表一致）
+REGULAR_TEACHING_INDICATORS: Dict[str, str] = {
+    "teachingProcessManagement": "教学过程管理",
+    "teachingQualityManagement": "教学质量管理",
+    "courseAssessment": "课程考核",
+    "educationResearch": "教育教学科研工作",
+    "courseConstruction": "课程建设",
+    "teacherTeamBuilding": "教师队伍建设",
+    "researchAndExchange": "科学研究与学术交流",
+    "archiveManagement": "教学档案室管理与建设",
+}
+
+_NAME_TO_LABEL: Dict[str, str] = {
+    **{key: label for key, label in REGULAR_TEACHING_INDICATORS.items()},
+    **{label: label for label in REGULAR_TEACHING_INDICATORS.values()},
+}
+
+
+def regular_indicator_label(indicator: Optional[str]) -> Optional[str]:
+    """
+    将指标键名或中文名称统一为中文名称
+
+    Args:
+        indicator: 指标键名（如 teachingProcessManagement）或中文名称
+
+    Returns:
+        中文名称；如果不是常规教学指标则返回None
+    """
+    if not indicator:
+        return None
+    return _NAME_TO_LABEL.get(str(indicator).strip())
@@ -0,0 +1,69 @@
+"""
+出站调用限流
+
+令牌桶：按固定速率补充令牌，允许一定突发，用于限制对DeepSeek API的调用频率
+"""
+
+import asyncio
+import threading
+import time
+
+from app.core.config import settings
+
+
+class TokenBucket:
+    """
+    令牌桶限流器
+
+    与事件循环无关（内部使用线程锁），可被多个worker、多个循环共享。
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: 每秒补充的令牌数，<= 0 表示不限流
+            capacity: 桶容量（允许的最大突发）
+        """
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        尝试取令牌
+
+        Returns:
+            float: 0 表示已取得；否则为需要等待的秒数
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """等待直到取得令牌"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+# DeepSeek API 全局限流
+deepseek_rate_limiter = TokenBucket(
+    rate=settings.DEEPSEEK_RATE_LIMIT_PER_SECOND,
+    capacity=settings.DEEPSEEK_RATE_LIMIT_BURST,
+)
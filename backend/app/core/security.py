@@ -1,5 +1,11 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Generator, Optional
+import hashlib
+import hmac
+import json
+import time
+
+import httpx
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
@@ -45,3 +51,63 @@ def decode_access_token(token: str) -> Optional[dict]:
         return payload
     except JWTError:
         return None
+
+
+# Service credential for management -> president office sync requests
+SYNC_TIMESTAMP_HEADER = "X-Sync-Timestamp"
+SYNC_SIGNATURE_HEADER = "X-Sync-Signature"
+# Streamed bodies cannot be hashed before sending; their control lines carry sync_stream_mac instead
+STREAMING_BODY_DIGEST = "STREAMING-PAYLOAD"
+SYNC_STREAM_MAC_FIELD = "mac"
+
+
+class SyncCredentialError(RuntimeError):
+    """SYNC_SHARED_SECRET is not configured."""
+
+
+def sync_request_signature(method: str, path: str, timestamp: str, body_digest: str) -> str:
+    """HMAC-SHA256 over method, path, timestamp and body digest with SYNC_SHARED_SECRET."""
+    if not settings.SYNC_SHARED_SECRET:
+        raise SyncCredentialError("SYNC_SHARED_SECRET is not configured")
+    message = "\n".join([method.upper(), path, timestamp, body_digest]).encode("utf-8")
+    return hmac.new(settings.SYNC_SHARED_SECRET.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def body_digest(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def sync_stream_mac(sync_task_id: str, message: Dict[str, Any]) -> str:
+    """
+    HMAC-SHA256 of a sync stream control line (header, chunk trailer or footer) with SYNC_SHARED_SECRET.
+
+    The request signature does not cover a streamed body, so each control line is authenticated
+    on its own, bound to its sync task. A chunk trailer's MAC covers its index, record count and
+    Merkle root, which in turn cover every record hash in the chunk.
+    """
+    if not settings.SYNC_SHARED_SECRET:
+        raise SyncCredentialError("SYNC_SHARED_SECRET is not configured")
+    fields = {key: value for key, value in message.items() if key != SYNC_STREAM_MAC_FIELD}
+    payload = json.dumps(fields, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    message_bytes = f"{sync_task_id}\n{payload}".encode("utf-8")
+    return hmac.new(settings.SYNC_SHARED_SECRET.encode("utf-8"), message_bytes, hashlib.sha256).hexdigest()
+
+
+class SyncRequestAuth(httpx.Auth):
+    """Sign outgoing sync requests (streamed bodies are signed without their content)."""
+
+    def __init__(self, streaming_body: bool = False):
+        self.streaming_body = streaming_body
+
+    def auth_flow(self, request: httpx.Request) -> Generator[httpx.Request, httpx.Response, None]:
+        digest = STREAMING_BODY_DIGEST if self.streaming_body else body_digest(request.content)
+        timestamp = str(int(time.time()))
+        request.headers[SYNC_TIMESTAMP_HEADER] = timestamp
+        request.headers[SYNC_SIGNATURE_HEADER] = sync_request_signature(
+            request.method, request.url.path, timestamp, digest
+        )
+        yield request
+
+
+sync_request_auth = SyncRequestAuth()
+sync_stream_auth = SyncRequestAuth(streaming_body=True)
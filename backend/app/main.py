@@ -17,6 +17,11 @@ from app.core.logging_middleware import OperationLoggingMiddleware
 from app.core.security import decode_access_token
 from app.models.user import User
 from app.db.base import SessionLocal
+from app.core.http_clients import http_clients
+from app.services.ai_scoring_queue import ai_scoring_workers
+from app.services.sync_outbox import sync_outbox_dispatcher
+from app.services.storage_janitor import storage_janitor
+from app.services.attachment_text_service import shutdown_extraction_pool
 
 # 配置 root logger 使用 UTF-8（若 handler 支持）
 logging.basicConfig(
@@ -79,6 +84,61 @@ app.add_middleware(OperationLoggingMiddleware)
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+
+@app.on_event("startup")
+async def startup_http_clients():
+    """创建出站HTTP连接池"""
+    await http_clients.startup()
+
+
+@app.on_event("startup")
+async def startup_ai_scoring_workers():
+    """启动AI评分任务worker"""
+    await ai_scoring_workers.start()
+
+
+@app.on_event("startup")
+async def startup_sync_outbox_dispatcher():
+    """启动同步出站队列dispatcher"""
+    await sync_outbox_dispatcher.start()
+
+
+@app.on_event("startup")
+async def startup_storage_janitor():
+    """启动存储清理任务（过期分块上传会话、未引用的附件文件）"""
+    await storage_janitor.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_ai_scoring_workers():
+    """停止AI评分任务worker"""
+    await ai_scoring_workers.stop()
+
+
+@app.on_event("shutdown")
+async def shutdown_sync_outbox_dispatcher():
+    """停止同步出站队列dispatcher"""
+    await sync_outbox_dispatcher.stop()
+
+
+@app.on_event("shutdown")
+async def shutdown_storage_janitor():
+    """停止存储清理任务"""
+    await storage_janitor.stop()
+
+
+@app.on_event("shutdown")
+def shutdown_attachment_text_pool():
+    """关闭附件正文提取进程池"""
+    shutdown_extraction_pool()
+
+
+@app.on_event("shutdown")
+async def shutdown_http_clients():
+    """关闭出站HTTP连接池"""
+    await http_clients.aclose()
+
+
 @app.get("/")
 def root():
     return {"message": "教研室工作考评系统 API"}
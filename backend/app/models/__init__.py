@@ -13,3 +13,13 @@ from .improvement_plan import ImprovementPlan
 from .anomaly import Anomaly
 from .approval import Approval
 from .publication import Publication
+from .ai_scoring_job import AIScoringJob
+from .ai_response_cache import AIResponseCacheEntry
+from .ai_call_log import AICallLog
+from .attachment_text import AttachmentText
+from .sync_receipt import SyncReceipt
+from .sync_watermark import SyncWatermark
+from .evaluation_replica import EvaluationReplica
+from .sync_outbox import SyncOutboxEntry
+from .upload_session import UploadSession, UploadChunk
+from .content_object import ContentObject, StorageOrphan
@@ -0,0 +1,27 @@
+"""
+AI调用记录模型
+
+记录每次DeepSeek调用的提示词token数与耗时，用于分析提示词规模与延迟的关系
+"""
+
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, JSON
+from app.db.types import UUID
+from datetime import datetime
+import uuid
+
+from app.db.base import Base
+
+
+class AICallLog(Base):
+    __tablename__ = "ai_call_logs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    evaluation_id = Column(UUID(as_uuid=True), ForeignKey("self_evaluations.id"), nullable=False, index=True)
+    model = Column(String(64), nullable=False)
+    mode = Column(String(10), default="full", nullable=False)  # full / hybrid（本地预评分）
+    prompt_tokens_estimated = Column(Integer, nullable=False)  # 本地估算
+    prompt_tokens = Column(Integer)  # API返回的实际用量
+    completion_tokens = Column(Integer)
+    latency_ms = Column(Integer, nullable=False)
+    truncated_sections = Column(JSON)  # 因超出预算被压缩的段落
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -0,0 +1,24 @@
+"""
+AI响应缓存模型
+
+按提示词指纹缓存解析后的DeepSeek评分结果，相同内容重复评分时不再调用API
+"""
+
+from sqlalchemy import Column, String, Integer, DateTime, Numeric, JSON
+from datetime import datetime
+
+from app.db.base import Base
+
+
+class AIResponseCacheEntry(Base):
+    __tablename__ = "ai_response_cache"
+
+    fingerprint = Column(String(64), primary_key=True)  # SHA256(提示词 + 模型 + 温度)
+    model = Column(String(64), nullable=False)
+    temperature = Column(Numeric(3, 2), nullable=False)
+    response = Column(JSON, nullable=False)  # 解析后的评分数据
+    api_latency_ms = Column(Integer, default=0, nullable=False)  # 原始API调用耗时，用于统计节省的时间
+    hit_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
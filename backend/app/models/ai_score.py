@@ -15,8 +15,12 @@ class AIScore(Base):
     evaluation_id = Column(UUID(as_uuid=True), ForeignKey("self_evaluations.id"), nullable=False, index=True)
     total_score = Column(Numeric(5, 2), nullable=False)
     indicator_scores = Column(JSON, nullable=False)  # Changed from JSONB to JSON for SQLite compatibility
-    parsed_reform_projects = Column(Integer, nullable=False)
-    parsed_honorary_awards = Column(Integer, nullable=False)
+    # 解析出的附件数量；流式响应被截断、未收到该字段时为空（不做数量一致性检测）
+    parsed_reform_projects = Column(Integer)
+    parsed_honorary_awards = Column(Integer)
+    # 批量重新检测异常使用；早期评分记录为空
+    parsed_competitions = Column(Integer)
+    parsed_innovations = Column(Integer)
     scored_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
@@ -0,0 +1,40 @@
+"""
+AI评分任务模型
+
+持久化的AI评分队列，由后台worker认领执行，进程重启后未完成的任务仍可继续
+"""
+
+from sqlalchemy import Column, String, Integer, DateTime, Text, ForeignKey, Index, JSON
+from app.db.types import UUID
+from datetime import datetime
+import uuid
+
+from app.db.base import Base
+
+
+class AIScoringJob(Base):
+    __tablename__ = "ai_scoring_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    evaluation_id = Column(UUID(as_uuid=True), ForeignKey("self_evaluations.id"), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, failed
+    # 进行中任务的去重键（= evaluation_id），任务结束后置空，保证同一自评表只有一个进行中的任务
+    dedupe_key = Column(String(36), unique=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=3, nullable=False)
+    next_run_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_by = Column(String(64))
+    locked_at = Column(DateTime)
+    last_error = Column(Text)
+    ai_score_id = Column(UUID(as_uuid=True))
+    # 流式评分过程中已收到的指标评分，供评分进度页实时展示
+    partial_scores = Column(JSON)
+    indicators_received = Column(Integer, default=0, nullable=False)
+    requested_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_ai_scoring_jobs_status_next_run_at", "status", "next_run_at"),
+    )
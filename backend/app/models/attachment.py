@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, BigInteger, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, String, BigInteger, DateTime, ForeignKey, Boolean, Float
 from app.db.types import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -16,8 +16,11 @@ class Attachment(Base):
     file_name = Column(String(255), nullable=False)
     file_size = Column(BigInteger, nullable=False)
     file_type = Column(String(100))
-    storage_path = Column(String(500), nullable=False, unique=True)  # Ensure unique storage paths
-    classified_by = Column(String(20), nullable=False)
+    storage_path = Column(String(500), nullable=False, index=True)  # 内容寻址存储：相同内容的附件共用存储路径
+    content_hash = Column(String(64), index=True)  # 文件内容SHA256，关联 attachment_texts
+    classified_by = Column(String(20), nullable=False)  # user / ai / model（早期版本上传时本地模型分类）
+    suggested_indicator = Column(String(255))  # 本地分类模型建议的分类（不覆盖 indicator）
+    classification_confidence = Column(Float)  # 本地分类模型的置信度
     uploaded_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     # Archiving fields for long-term storage (需求 18.1, 18.4)
@@ -0,0 +1,22 @@
+"""
+附件正文模型
+
+按文件内容SHA256缓存附件的提取文本：相同文件重复上传（如多个教研室共用的文件）只提取一次
+"""
+
+from sqlalchemy import Column, String, Integer, DateTime, Text
+from datetime import datetime
+
+from app.db.base import Base
+
+
+class AttachmentText(Base):
+    __tablename__ = "attachment_texts"
+
+    content_hash = Column(String(64), primary_key=True)  # 文件内容SHA256
+    extractor = Column(String(20), nullable=False)  # pdf, docx, text
+    status = Column(String(20), nullable=False)  # succeeded, failed, unsupported
+    text = Column(Text)  # 提取的正文（已规整空白并按长度上限截断）
+    char_count = Column(Integer, default=0, nullable=False)  # 截断前的正文长度
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,57 @@
+"""
+内容寻址存储模型
+
+相同内容（SHA-256）的附件共用一个存储对象，content_objects 记录对象路径与引用计数；
+附件删除时在同一事务中减少引用计数，计数归零的对象过一段时间后由清理任务删除。
+没有登记为内容对象的附件文件（早期上传、去重前的副本）删除时记入 storage_orphans，由清理任务删除
+"""
+
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, Index, event, insert, update
+from datetime import datetime
+
+from app.db.base import Base
+from app.models.attachment import Attachment
+
+
+class ContentObject(Base):
+    __tablename__ = "content_objects"
+
+    sha256 = Column(String(64), primary_key=True)
+    storage_path = Column(String(500), nullable=False, unique=True)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String(100))
+    # 引用该对象的附件数；-1 表示正在被清理任务删除，不能再引用
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_content_objects_ref_count_updated_at", "ref_count", "updated_at"),
+    )
+
+
+class StorageOrphan(Base):
+    __tablename__ = "storage_orphans"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    storage_path = Column(String(500), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+@event.listens_for(Attachment, "after_delete")
+def release_attachment_content(mapper, connection, target):
+    """附件删除（含随自评表级联删除）时释放其存储对象"""
+    now = datetime.utcnow()
+    if target.content_hash:
+        released = connection.execute(
+            update(ContentObject)
+            .where(
+                ContentObject.sha256 == target.content_hash,
+                ContentObject.storage_path == target.storage_path,
+                ContentObject.ref_count > 0,
+            )
+            .values(ref_count=ContentObject.ref_count - 1, updated_at=now)
+        ).rowcount
+        if released:
+            return
+    connection.execute(insert(StorageOrphan).values(storage_path=target.storage_path, created_at=now))
@@ -0,0 +1,32 @@
+"""
+考评数据副本模型（校长办公会端）
+
+校长办公会端接收的同步数据按自评表保存当前版本，数据看板与结果审定只读取副本，
+不再查询管理端的业务表
+"""
+
+from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, JSON
+from app.db.types import UUID
+from datetime import datetime
+
+from app.db.base import Base
+
+
+class EvaluationReplica(Base):
+    __tablename__ = "evaluation_replicas"
+
+    evaluation_id = Column(UUID(as_uuid=True), primary_key=True)
+    sync_task_id = Column(UUID(as_uuid=True), nullable=False)  # 最近一次写入该版本的同步任务
+    payload_hash = Column(String(64))  # 同步记录哈希，墓碑为空
+    teaching_office_id = Column(UUID(as_uuid=True))
+    teaching_office_name = Column(String(200))
+    evaluation_year = Column(Integer, index=True)
+    status = Column(String(50))
+    ai_score = Column(Float)
+    final_score = Column(Float)
+    manual_scores = Column(JSON)  # [{reviewer_id, reviewer_name, reviewer_role, total_score}]
+    payload = Column(JSON)  # 完整的 EvaluationSyncData
+    deleted = Column(Boolean, default=False, nullable=False)
+    source_synced_at = Column(DateTime)  # 管理端发送时间，较早的重复投递不覆盖较新的数据
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,41 @@
+"""
+同步出站队列模型（管理端）
+
+创建同步任务时在同一事务中为每份自评表写入一条投递记录（含当时的同步数据快照），
+由后台dispatcher投递至校长办公会端；失败按指数退避重试，达到最大次数后转入死信
+"""
+
+from sqlalchemy import Column, String, Integer, DateTime, Text, ForeignKey, Index, JSON, UniqueConstraint
+from app.db.types import UUID
+from datetime import datetime
+import uuid
+
+from app.db.base import Base
+
+
+class SyncOutboxEntry(Base):
+    __tablename__ = "sync_outbox"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    sync_task_id = Column(UUID(as_uuid=True), ForeignKey("sync_tasks.id"), nullable=False, index=True)
+    # 自评表可能已被删除（墓碑），不设外键
+    evaluation_id = Column(UUID(as_uuid=True), nullable=False)
+    seq = Column(Integer, nullable=False)  # 任务内的发送顺序，保证重试时分块划分一致
+    kind = Column(String(20), nullable=False, default="record")  # record, tombstone
+    payload = Column(JSON)  # 创建任务时的同步数据快照，墓碑为空
+    payload_hash = Column(String(64))
+    status = Column(String(20), nullable=False, default="pending")  # pending, sending, delivered, dead
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=8, nullable=False)
+    next_run_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_by = Column(String(64))
+    locked_at = Column(DateTime)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    delivered_at = Column(DateTime)
+
+    __table_args__ = (
+        UniqueConstraint("sync_task_id", "evaluation_id", name="uq_sync_outbox_task_evaluation"),
+        Index("ix_sync_outbox_status_next_run_at", "status", "next_run_at"),
+    )
@@ -0,0 +1,29 @@
+"""
+同步分块回执模型（校长办公会端）
+
+流式同步时每收完并校验一个分块即记录回执，连接中断后发送端据此从下一块继续发送
+"""
+
+from sqlalchemy import Column, String, Integer, DateTime, JSON, UniqueConstraint
+from app.db.types import UUID
+from datetime import datetime
+import uuid
+
+from app.db.base import Base
+
+
+class SyncReceipt(Base):
+    __tablename__ = "sync_receipts"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    sync_task_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    chunk_index = Column(Integer, nullable=False)
+    record_count = Column(Integer, nullable=False)
+    chunk_root = Column(String(64), nullable=False)  # 分块内记录哈希的Merkle根
+    evaluation_ids = Column(JSON, nullable=False)
+    deleted_ids = Column(JSON)  # 分块内墓碑记录的自评表ID
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("sync_task_id", "chunk_index", name="uq_sync_receipts_task_chunk"),
+    )
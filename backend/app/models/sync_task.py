@@ -19,6 +19,8 @@ class SyncTask(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     evaluation_ids = Column(JSON, nullable=False)  # Store as JSON array for SQLite compatibility
     status = Column(String(20), nullable=False, default="pending")  # pending, syncing, completed, failed
+    mode = Column(String(20), nullable=False, default="full")  # full: 全量, changes: 上次成功同步以来的变化
+    deleted_evaluation_ids = Column(JSON)  # 增量同步发送墓碑的自评表ID
     synced_count = Column(Integer, default=0, nullable=False)
     failed_count = Column(Integer, default=0, nullable=False)
     total_count = Column(Integer, nullable=False)
@@ -0,0 +1,24 @@
+"""
+同步水位模型（管理端）
+
+每份自评表最近一次被校长办公会端确认的同步数据哈希与版本，
+增量同步据此只发送新增或变化的自评表，以及已删除自评表的墓碑记录
+"""
+
+from sqlalchemy import Column, String, Integer, DateTime, Boolean
+from app.db.types import UUID
+from datetime import datetime
+
+from app.db.base import Base
+
+
+class SyncWatermark(Base):
+    __tablename__ = "sync_watermarks"
+
+    # 自评表可能已被删除，不设外键
+    evaluation_id = Column(UUID(as_uuid=True), primary_key=True)
+    payload_hash = Column(String(64))  # 同步数据的记录哈希，墓碑为空
+    version = Column(Integer, default=1, nullable=False)  # 每次确认的数据变化时加1
+    deleted = Column(Boolean, default=False, nullable=False)  # 已发送墓碑
+    sync_task_id = Column(UUID(as_uuid=True), nullable=False)
+    synced_at = Column(DateTime, default=datetime.utcnow, nullable=False)
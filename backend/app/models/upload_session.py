@@ -0,0 +1,49 @@
+"""
+分块上传会话模型
+
+会话与已接收的分块保存在数据库中，多个worker进程共享：分块可以落在任意worker上、并行到达，
+完成时由一个worker合并；超过有效期未完成的会话由清理任务删除其分块
+"""
+
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey, Index
+from app.db.types import UUID
+from datetime import datetime
+import uuid
+
+from app.db.base import Base
+
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)  # 即 upload_id
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    evaluation_id = Column(UUID(as_uuid=True), ForeignKey("self_evaluations.id"), nullable=False)
+    indicator = Column(String(255), nullable=False)
+    file_name = Column(String(255), nullable=False)
+    file_size = Column(BigInteger, nullable=False)
+    content_type = Column(String(100))
+    chunk_size = Column(BigInteger, nullable=False)
+    total_chunks = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default="uploading")  # uploading, merging, completed, expired
+    # 附件删除时不受会话记录约束，不设外键
+    attachment_id = Column(UUID(as_uuid=True))
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)  # 每收到一个分块顺延
+
+    __table_args__ = (
+        Index("ix_upload_sessions_status_expires_at", "status", "expires_at"),
+    )
+
+
+class UploadChunk(Base):
+    __tablename__ = "upload_chunks"
+
+    # 联合主键：同一分块被重复或并发上传时只记录一次
+    upload_id = Column(UUID(as_uuid=True), ForeignKey("upload_sessions.id"), primary_key=True)
+    chunk_index = Column(Integer, primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    storage_path = Column(String(500), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
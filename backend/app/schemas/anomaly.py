@@ -19,9 +19,9 @@ class AnomalyResponse(BaseModel):
     declared_count: Optional[int] = Field(None, description="自评表声明的数量")
     parsed_count: Optional[int] = Field(None, description="AI解析出的数量")
     description: Optional[str] = Field("", description="清晰的对比说明")
-    status: str = Field(..., description="状态: pending, handled")
+    status: str = Field(..., description="状态: pending, handled, resolved（重新检测后已不存在）")
     handled_by: Optional[UUID] = Field(None, description="处理人ID")
-    handled_action: Optional[str] = Field(None, description="处理动作: reject, correct")
+    handled_action: Optional[str] = Field(None, description="处理动作: reject, correct, auto_resolved")
     handled_at: Optional[datetime] = Field(None, description="处理时间")
 
     class Config:
@@ -48,3 +48,9 @@ class HandleAnomalyResponse(BaseModel):
     status: str = Field(..., description="处理后的状态")
     handled_at: datetime = Field(..., description="处理时间")
     message: str = Field(..., description="处理结果消息")
+
+
+class RedetectAnomaliesRequest(BaseModel):
+    """按年度重新检测异常请求模型"""
+    year: int = Field(..., description="考评年度")
+    dry_run: bool = Field(False, description="只计算差异，不写入")
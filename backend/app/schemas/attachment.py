@@ -10,6 +10,35 @@ class AttachmentUploadResponse(BaseModel):
     uploaded_count: int = Field(..., description="成功上传的文件数量")
 
 
+class InstantUploadRequest(BaseModel):
+    """秒传请求模型：服务端已有相同内容时不再上传文件"""
+    evaluation_id: UUID = Field(..., description="自评表ID")
+    indicator: str = Field(..., description="考核指标")
+    file_name: str = Field(..., min_length=1, description="文件名")
+    file_size: int = Field(..., gt=0, description="文件大小（字节）")
+    sha256: str = Field(..., pattern=r"^[0-9a-fA-F]{64}$", description="文件内容的SHA-256（十六进制）")
+    content_type: Optional[str] = Field(None, description="文件MIME类型")
+    challenge_token: Optional[str] = Field(None, description="上一次响应中挑战的令牌")
+    proof: Optional[str] = Field(
+        None, pattern=r"^[0-9a-fA-F]{64}$", description="持有证明：SHA-256(nonce + 挑战区间内的字节)（十六进制）"
+    )
+
+
+class InstantUploadChallenge(BaseModel):
+    """秒传挑战：客户端读取文件 [offset, offset + length) 的字节计算持有证明"""
+    token: str = Field(..., description="挑战令牌，提交证明时原样带回")
+    offset: int = Field(..., description="挑战区间起始位置")
+    length: int = Field(..., description="挑战区间长度")
+    nonce: str = Field(..., description="随机数")
+
+
+class InstantUploadResponse(BaseModel):
+    """秒传响应模型"""
+    hit: bool = Field(..., description="是否已秒传；为 false 且没有挑战时需上传文件")
+    attachment_id: Optional[UUID] = Field(None, description="命中时创建的附件ID")
+    challenge: Optional[InstantUploadChallenge] = Field(None, description="需先完成的持有证明挑战")
+
+
 class AttachmentInfo(BaseModel):
     """附件信息模型"""
     id: UUID = Field(..., description="附件ID")
@@ -19,7 +48,9 @@ class AttachmentInfo(BaseModel):
     file_size: int = Field(..., description="文件大小（字节）")
     file_type: str = Field(..., description="文件类型")
     storage_path: str = Field(..., description="存储路径")
-    classified_by: str = Field(..., description="分类方式: user 或 ai")
+    classified_by: str = Field(..., description="分类方式: user、ai 或 model（早期版本上传时本地模型分类）")
+    suggested_indicator: Optional[str] = Field(None, description="本地分类模型建议的分类")
+    classification_confidence: Optional[float] = Field(None, description="本地分类模型的置信度")
     uploaded_at: datetime = Field(..., description="上传时间")
     is_archived: bool = Field(..., description="是否已归档")
     archived_at: datetime = Field(..., description="归档时间")
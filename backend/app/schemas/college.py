@@ -22,3 +22,4 @@ class CollegeStats(BaseModel):
     avg_score: float
     rank_list: List[Dict[str, Any]]
     weakness_analysis: List[Dict[str, Any]]
+    year: Optional[int] = None
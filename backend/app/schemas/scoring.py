@@ -47,8 +47,8 @@ class AIScoreDetail(BaseModel):
     evaluation_id: UUID
     total_score: float
     indicator_scores: List[dict]
-    parsed_reform_projects: int
-    parsed_honorary_awards: int
+    parsed_reform_projects: Optional[int] = None
+    parsed_honorary_awards: Optional[int] = None
     scored_at: datetime
 
     class Config:
@@ -120,3 +120,17 @@ class ScoringAuditResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class BulkAIScoringRequest(BaseModel):
+    """Request model for management bulk AI scoring."""
+    year: Optional[int] = Field(None, description="考评年度")
+    evaluation_ids: Optional[List[UUID]] = Field(None, description="指定自评表ID，为空时选取全部已提交且未AI评分的自评表")
+    concurrency: Optional[int] = Field(None, ge=1, le=50, description="并发数，默认取配置")
+
+
+class AIScoringModeComparisonRequest(BaseModel):
+    """Request model for comparing full and hybrid AI scoring modes."""
+    year: Optional[int] = Field(None, description="考评年度")
+    evaluation_ids: Optional[List[UUID]] = Field(None, description="指定自评表ID，为空时按年度选取已提交的自评表")
+    limit: int = Field(10, ge=1, le=50, description="最多对比的自评表数量")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from uuid import UUID
 
@@ -64,6 +64,23 @@ class TriggerAIScoringRequest(BaseModel):
 class TriggerAIScoringResponse(BaseModel):
     """触发AI评分响应模型"""
     scoring_task_id: UUID = Field(..., description="评分任务ID")
+    job_id: Optional[UUID] = Field(None, description="AI评分队列任务ID")
     status: str = Field(..., description="任务状态: processing")
     message: str = Field(..., description="触发结果消息")
 
+
+class AIScoringJobResponse(BaseModel):
+    """AI评分任务状态响应模型"""
+    job_id: UUID = Field(..., description="任务ID")
+    evaluation_id: UUID = Field(..., description="自评表ID")
+    status: str = Field(..., description="任务状态: queued, running, succeeded, failed")
+    attempts: int = Field(..., description="已执行次数")
+    max_attempts: int = Field(..., description="最大执行次数")
+    next_run_at: Optional[datetime] = Field(None, description="下次执行时间（排队中）")
+    last_error: Optional[str] = Field(None, description="最近一次错误")
+    ai_score_id: Optional[UUID] = Field(None, description="AI评分记录ID（成功后）")
+    indicators_received: int = Field(0, description="流式评分已收到的指标数")
+    partial_scores: Optional[List[Dict[str, Any]]] = Field(None, description="流式评分已收到的指标评分")
+    created_at: datetime = Field(..., description="入队时间")
+    finished_at: Optional[datetime] = Field(None, description="结束时间")
+
@@ -4,15 +4,26 @@
 用于管理端向校长办公会端同步数据
 """
 
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional, Dict, Any
 from datetime import datetime
 from uuid import UUID
 
 
 class SyncToPresidentOfficeRequest(BaseModel):
     """上传至校长办公会的请求模型"""
-    evaluation_ids: List[UUID] = Field(..., min_items=1, description="要同步的自评表ID列表")
+    evaluation_ids: Optional[List[UUID]] = Field(
+        None, description="要同步的自评表ID列表；changes 模式下为空表示全部已审定的自评表"
+    )
+    mode: Literal["full", "changes"] = Field(
+        "full", description="full: 全量发送所选自评表；changes: 只发送上次成功同步以来新增、变化或删除的自评表"
+    )
+
+    @model_validator(mode="after")
+    def require_ids_for_full_sync(self):
+        if self.mode == "full" and not self.evaluation_ids:
+            raise ValueError("evaluation_ids is required for full sync")
+        return self
 
 
 class SyncToPresidentOfficeResponse(BaseModel):
@@ -21,6 +32,10 @@ class SyncToPresidentOfficeResponse(BaseModel):
     status: str = Field(..., description="同步状态")
     synced_count: int = Field(..., description="成功同步的数量")
     failed_count: int = Field(0, description="失败的数量")
+    mode: str = Field("full", description="同步模式")
+    changed_count: Optional[int] = Field(None, description="增量同步：新增或变化的自评表数量")
+    deleted_count: Optional[int] = Field(None, description="增量同步：发送墓碑的自评表数量")
+    unchanged_count: Optional[int] = Field(None, description="增量同步：未变化、不再发送的自评表数量")
     message: str = Field(..., description="同步结果消息")
     synced_at: datetime = Field(..., description="同步时间")
 
@@ -58,6 +73,7 @@ class SyncDataPackage(BaseModel):
     """完整的同步数据包"""
     sync_task_id: UUID
     evaluations: List[EvaluationSyncData]
+    deleted_evaluation_ids: List[UUID] = Field(default_factory=list, description="增量同步的墓碑")
     total_count: int
     synced_at: datetime
     checksum: str = Field(..., description="数据完整性校验和")
@@ -73,6 +89,7 @@ class SyncStatusResponse(BaseModel):
     started_at: datetime
     completed_at: Optional[datetime] = None
     error_message: Optional[str] = None
+    retry_count: int = Field(0, description="出站队列的重试次数")
 
     class Config:
         from_attributes = True
@@ -82,6 +99,8 @@ class SyncTaskListItem(BaseModel):
     """同步任务列表项"""
     id: UUID
     evaluation_ids: List[UUID]
+    mode: str = "full"
+    deleted_evaluation_ids: List[UUID] = Field(default_factory=list)
     status: str
     synced_count: int
     failed_count: int
@@ -89,3 +108,4 @@ class SyncTaskListItem(BaseModel):
     started_at: datetime
     completed_at: Optional[datetime] = None
     error_message: Optional[str] = None
+    retry_count: int = Field(0, description="出站队列的重试次数")
@@ -0,0 +1,162 @@
+"""
+AI响应缓存服务
+
+以 SHA256(提示词, 模型, 温度) 为键持久化解析后的评分结果：
+- 自评表解锁后内容未变重新提交、或数据库故障后重试评分时直接复用
+- 条目按 TTL 过期，超过容量时按最近使用时间（LRU）淘汰
+- 统计命中、未命中与节省的API耗时
+
+缓存读写使用独立会话提交，不受评分事务回滚影响。
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.ai_response_cache import AIResponseCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+class _CacheMetrics:
+    """进程内缓存统计"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.saved_latency_ms = 0
+        self.evictions = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "saved_latency_ms": self.saved_latency_ms,
+                "evictions": self.evictions,
+            }
+
+
+cache_metrics = _CacheMetrics()
+
+
+class AIResponseCache:
+    """AI响应缓存服务类"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def fingerprint(prompt: str, model: str, temperature: float) -> str:
+        """计算缓存键"""
+        payload = json.dumps(
+            {"prompt": prompt, "model": model, "temperature": round(float(temperature), 2)},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _session(self) -> Session:
+        return Session(bind=self.db.get_bind())
+
+    def get(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存（命中时刷新最近使用时间）
+
+        Returns:
+            Optional[Dict]: 解析后的评分数据；未命中或已过期返回None
+        """
+        session = self._session()
+        try:
+            now = datetime.utcnow()
+            entry = session.get(AIResponseCacheEntry, fingerprint)
+            if entry is None or entry.expires_at <= now:
+                with cache_metrics.lock:
+                    cache_metrics.misses += 1
+                return None
+
+            entry.hit_count += 1
+            entry.last_used_at = now
+            response = entry.response
+            saved = entry.api_latency_ms
+            session.commit()
+            with cache_metrics.lock:
+                cache_metrics.hits += 1
+                cache_metrics.saved_latency_ms += saved
+            return response
+        except Exception as e:
+            session.rollback()
+            logger.warning(f"读取AI响应缓存失败: {str(e)}")
+            with cache_metrics.lock:
+                cache_metrics.misses += 1
+            return None
+        finally:
+            session.close()
+
+    def put(
+        self,
+        fingerprint: str,
+        model: str,
+        temperature: float,
+        response: Dict[str, Any],
+        api_latency_ms: int,
+    ) -> None:
+        """写入缓存，并淘汰过期及超出容量的条目"""
+        session = self._session()
+        try:
+            now = datetime.utcnow()
+            entry = session.get(AIResponseCacheEntry, fingerprint)
+            if entry is None:
+                entry = AIResponseCacheEntry(fingerprint=fingerprint, hit_count=0, created_at=now)
+                session.add(entry)
+            entry.model = model
+            entry.temperature = temperature
+            entry.response = response
+            entry.api_latency_ms = api_latency_ms
+            entry.last_used_at = now
+            entry.expires_at = now + timedelta(seconds=settings.AI_RESPONSE_CACHE_TTL)
+            session.flush()
+
+            evicted = self._evict(session, now)
+            session.commit()
+            if evicted:
+                with cache_metrics.lock:
+                    cache_metrics.evictions += evicted
+        except Exception as e:
+            session.rollback()
+            logger.warning(f"写入AI响应缓存失败: {str(e)}")
+        finally:
+            session.close()
+
+    @staticmethod
+    def _evict(session: Session, now: datetime) -> int:
+        expired = (
+            session.query(AIResponseCacheEntry)
+            .filter(AIResponseCacheEntry.expires_at <= now)
+            .delete(synchronize_session=False)
+        )
+
+        overflow_keys = [
+            row.fingerprint
+            for row in session.query(AIResponseCacheEntry.fingerprint)
+            .order_by(AIResponseCacheEntry.last_used_at.desc(), AIResponseCacheEntry.created_at.desc())
+            .offset(settings.AI_RESPONSE_CACHE_MAX_ENTRIES)
+            .all()
+        ]
+        if overflow_keys:
+            session.query(AIResponseCacheEntry).filter(
+                AIResponseCacheEntry.fingerprint.in_(overflow_keys)
+            ).delete(synchronize_session=False)
+        return expired + len(overflow_keys)
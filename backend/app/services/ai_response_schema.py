@@ -0,0 +1,237 @@
+"""
+AI评分响应解码
+
+以编译好的 pydantic 模型校验 DeepSeek 返回的评分JSON：
+- 快速路径：整段文本直接交给 pydantic-core 解析并校验（不经过 json.loads 中间字典）
+- 修复路径：模型在JSON前后附加了说明文字或 ```json 代码块时，线性扫描出各个平衡的
+  顶层对象逐个校验，取第一个合法的结果
+
+任何路径返回的数据都经过同一份校验，缺字段、类型错误在解析阶段即报出，
+不会在异常检测或保存评分时才以 KeyError 暴露。
+"""
+
+import math
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, TypeAdapter, ValidationError, field_validator
+
+
+class AIResponseFormatError(ValueError):
+    """AI响应无法解析或不符合评分结构"""
+
+
+class IndicatorScoreItem(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    indicator: str
+    score: float
+    reasoning: str = ""
+
+    @field_validator("score")
+    @classmethod
+    def _finite(cls, value: float) -> float:
+        if not math.isfinite(value):
+            raise ValueError("评分必须是有限数值")
+        return value
+
+
+class AttachmentClassificationItem(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    file_name: str
+    classified_indicator: str
+
+
+class AIScoringResponse(BaseModel):
+    """DeepSeek 评分响应结构"""
+    model_config = ConfigDict(extra="ignore")
+
+    total_score: float
+    indicator_scores: List[IndicatorScoreItem]
+    parsed_reform_projects: int = Field(ge=0)
+    # 提示词要求 parsed_honors，AIScore 字段为 parsed_honorary_awards，两种写法均接受
+    parsed_honors: int = Field(ge=0, validation_alias=AliasChoices("parsed_honors", "parsed_honorary_awards"))
+    parsed_competitions: int = Field(ge=0)
+    parsed_innovations: int = Field(ge=0)
+    attachment_classifications: Optional[List[AttachmentClassificationItem]] = None
+
+    @field_validator("total_score")
+    @classmethod
+    def _finite(cls, value: float) -> float:
+        if not math.isfinite(value):
+            raise ValueError("总分必须是有限数值")
+        return value
+
+
+class PartialScoringResponse(AIScoringResponse):
+    """流式响应被截断时的部分结果：未收到的解析数量为空"""
+
+    parsed_reform_projects: Optional[int] = Field(None, ge=0)
+    parsed_honors: Optional[int] = Field(
+        None, ge=0, validation_alias=AliasChoices("parsed_honors", "parsed_honorary_awards")
+    )
+    parsed_competitions: Optional[int] = Field(None, ge=0)
+    parsed_innovations: Optional[int] = Field(None, ge=0)
+
+
+class SubjectiveScoringResponse(BaseModel):
+    """混合模式响应结构：只含常规教学指标评分"""
+    model_config = ConfigDict(extra="ignore")
+
+    indicator_scores: List[IndicatorScoreItem]
+
+
+_RESPONSE_ADAPTER = TypeAdapter(AIScoringResponse)
+_PARTIAL_ADAPTER = TypeAdapter(PartialScoringResponse)
+_SUBJECTIVE_ADAPTER = TypeAdapter(SubjectiveScoringResponse)
+
+
+def _to_score_data(response: AIScoringResponse) -> Dict[str, Any]:
+    data = response.model_dump()
+    data["attachment_classifications"] = data["attachment_classifications"] or []
+    data["parsed_honorary_awards"] = data["parsed_honors"]
+    return data
+
+
+def iter_json_objects(text: str) -> Iterator[str]:
+    """
+    依次产出文本中平衡的顶层 {...} 片段
+
+    线性扫描：跟踪字符串与转义状态，用栈记录未闭合的左括号，对象闭合且栈空时立即产出，
+    随后跳到下一个左括号。前面的说明文字中有孤立的左括号时，扫描到末尾栈仍不为空：
+    此时产出其中已闭合的最外层对象（相当于从各个左括号重新扫描的结果）；
+    只有在本轮扫描中落在字符串内的左括号需要重新扫描（字符串状态不同），
+    已作为左括号入栈过的位置不再重复扫描，"{" 重复多次等输入仍为线性。
+    """
+    length = len(text)
+    pushed = set()
+    produced = set()
+    pos = text.find("{")
+    while pos != -1:
+        stack: List[int] = []
+        # 已闭合、但外层左括号尚未闭合的对象
+        pending: List[Tuple[int, int]] = []
+        # 本轮扫描中位于字符串内的左括号
+        quoted: List[int] = []
+        in_string = False
+        escape = False
+        i = pos
+        while i < length:
+            if not stack:
+                i = text.find("{", i)
+                if i == -1:
+                    break
+            char = text[i]
+            if in_string:
+                if char == "{":
+                    quoted.append(i)
+                if escape:
+                    escape = False
+                elif char == "\\":
+                    escape = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == "{":
+                stack.append(i)
+                pushed.add(i)
+            elif char == "}":
+                start = stack.pop()
+                while pending and pending[-1][0] > start:
+                    pending.pop()
+                if stack:
+                    pending.append((start, i))
+                elif start not in produced:
+                    produced.add(start)
+                    yield text[start:i + 1]
+            i += 1
+
+        if not stack:
+            return
+        for start, end in pending:
+            if start not in produced:
+                produced.add(start)
+                yield text[start:end + 1]
+        pos = next((index for index in quoted if index not in pushed), -1)
+
+
+# 整段文本无法作为JSON解析（含孤立代理字符等无法解码的文本），需进入修复路径
+_UNPARSABLE_ERRORS = {"json_invalid", "string_unicode"}
+
+
+def _decode(text: str, adapter: TypeAdapter, convert: Callable[[Any], Dict[str, Any]]) -> Dict[str, Any]:
+    try:
+        return convert(adapter.validate_json(text))
+    except ValidationError as e:
+        first_error = e
+        if not any(error["type"] in _UNPARSABLE_ERRORS for error in e.errors()):
+            # JSON本身合法但结构不符，提取其中的对象也无济于事
+            raise AIResponseFormatError(f"AI响应不符合评分结构: {_summarize(e)}") from e
+
+    last_error: Optional[ValidationError] = None
+    for candidate in iter_json_objects(text):
+        try:
+            return convert(adapter.validate_json(candidate))
+        except ValidationError as e:
+            last_error = e
+
+    detail = _summarize(last_error or first_error)
+    raise AIResponseFormatError(f"无法解析AI响应: {detail}")
+
+
+def decode_ai_response(text: str) -> Dict[str, Any]:
+    """
+    解析并校验AI评分响应
+
+    Returns:
+        Dict: 评分数据（同时包含 parsed_honors 与 parsed_honorary_awards）
+
+    Raises:
+        AIResponseFormatError: 响应中没有符合评分结构的JSON对象
+    """
+    return _decode(text, _RESPONSE_ADAPTER, _to_score_data)
+
+
+def decode_partial_response(text: str) -> Dict[str, Any]:
+    """
+    解析并校验截断响应的部分结果（未收到的解析数量为 None）
+
+    Raises:
+        AIResponseFormatError: 部分结果不符合评分结构
+    """
+    return _decode(text, _PARTIAL_ADAPTER, _to_score_data)
+
+
+def decode_subjective_response(text: str) -> Dict[str, Any]:
+    """
+    解析并校验混合模式的AI响应
+
+    Returns:
+        Dict: {"indicator_scores": [...]}
+    """
+    return _decode(text, _SUBJECTIVE_ADAPTER, lambda response: response.model_dump())
+
+
+def validate_score_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    """校验已解析的评分数据（如缓存中读出的结果）"""
+    try:
+        return _to_score_data(_RESPONSE_ADAPTER.validate_python(data))
+    except ValidationError as e:
+        raise AIResponseFormatError(f"评分数据不符合评分结构: {_summarize(e)}") from e
+
+
+def validate_subjective_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    """校验已解析的混合模式评分数据"""
+    try:
+        return _SUBJECTIVE_ADAPTER.validate_python(data).model_dump()
+    except ValidationError as e:
+        raise AIResponseFormatError(f"评分数据不符合评分结构: {_summarize(e)}") from e
+
+
+def _summarize(error: ValidationError, limit: int = 3) -> str:
+    parts = []
+    for item in error.errors()[:limit]:
+        location = ".".join(str(part) for part in item["loc"]) or "<root>"
+        parts.append(f"{location}: {item['msg']}")
+    return "; ".join(parts)
@@ -0,0 +1,513 @@
+"""
+AI评分任务队列
+
+- AIScoringJobService: 入队（按自评表去重）与查询任务状态
+- AIScoringWorkerPool: 进程内worker池，轮询认领任务（行锁 + 条件更新），
+  每个任务使用独立的数据库会话执行，失败按指数退避重试
+
+任务持久化在 ai_scoring_jobs 表中，不依赖请求生命周期；进程重启后，
+排队中的任务和租约过期的运行中任务会被重新处理。
+"""
+
+import asyncio
+import logging
+import random
+import socket
+import os
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.circuit_breaker import CircuitOpenError
+from app.core.config import settings
+from app.models.ai_scoring_job import AIScoringJob
+from app.services.ai_response_schema import AIResponseFormatError
+from app.services.ai_scoring_service import AIScoringService
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_JOB_STATUSES = ("queued", "running")
+
+
+class AIScoringJobService:
+    """AI评分任务服务类"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(self, evaluation_id: UUID, requested_by: Optional[UUID] = None) -> Tuple[AIScoringJob, bool]:
+        """
+        提交AI评分任务
+
+        同一自评表已有排队中/运行中的任务时直接返回该任务，不重复入队。
+
+        Args:
+            evaluation_id: 自评表ID
+            requested_by: 触发人ID
+
+        Returns:
+            Tuple[AIScoringJob, bool]: (任务, 是否新建)
+        """
+        existing = self.get_active_job(evaluation_id)
+        if existing:
+            return existing, False
+
+        job = AIScoringJob(
+            evaluation_id=evaluation_id,
+            status="queued",
+            dedupe_key=str(evaluation_id),
+            max_attempts=settings.AI_SCORING_JOB_MAX_ATTEMPTS,
+            next_run_at=datetime.utcnow(),
+            requested_by=requested_by,
+        )
+        self.db.add(job)
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # 并发请求已抢先入队（dedupe_key 唯一约束）
+            self.db.rollback()
+            existing = self.get_active_job(evaluation_id)
+            if existing:
+                return existing, False
+            raise
+        self.db.refresh(job)
+        return job, True
+
+    def enqueue_many(
+        self,
+        evaluation_ids: List[UUID],
+        requested_by: Optional[UUID] = None
+    ) -> List[Tuple[AIScoringJob, bool]]:
+        """
+        批量提交AI评分任务（已有进行中任务的自评表复用原任务）
+
+        Returns:
+            List[Tuple[AIScoringJob, bool]]: 与 evaluation_ids 顺序一致的 (任务, 是否新建)
+        """
+        keys = [str(evaluation_id) for evaluation_id in evaluation_ids]
+        active = {
+            job.dedupe_key: job
+            for job in self.db.query(AIScoringJob).filter(AIScoringJob.dedupe_key.in_(keys)).all()
+        } if keys else {}
+
+        now = datetime.utcnow()
+        created_jobs = {}
+        for evaluation_id, key in zip(evaluation_ids, keys):
+            if key in active or key in created_jobs:
+                continue
+            job = AIScoringJob(
+                evaluation_id=evaluation_id,
+                status="queued",
+                dedupe_key=key,
+                max_attempts=settings.AI_SCORING_JOB_MAX_ATTEMPTS,
+                next_run_at=now,
+                requested_by=requested_by,
+            )
+            self.db.add(job)
+            created_jobs[key] = job
+
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # 与其他请求并发入队，逐个回退到单条入队
+            self.db.rollback()
+            return [self.enqueue(evaluation_id, requested_by) for evaluation_id in evaluation_ids]
+
+        results = []
+        for key in keys:
+            if key in active:
+                results.append((active[key], False))
+            else:
+                results.append((created_jobs[key], True))
+        return results
+
+    def get_job(self, job_id: UUID) -> Optional[AIScoringJob]:
+        return self.db.query(AIScoringJob).filter(AIScoringJob.id == job_id).first()
+
+    def get_active_job(self, evaluation_id: UUID) -> Optional[AIScoringJob]:
+        return self.db.query(AIScoringJob).filter(
+            AIScoringJob.dedupe_key == str(evaluation_id)
+        ).first()
+
+    def get_latest_job(self, evaluation_id: UUID) -> Optional[AIScoringJob]:
+        return self.db.query(AIScoringJob).filter(
+            AIScoringJob.evaluation_id == evaluation_id
+        ).order_by(AIScoringJob.created_at.desc()).first()
+
+
+def retry_delay(attempts: int) -> float:
+    """第 attempts 次失败后的重试等待秒数（指数退避 + 抖动）"""
+    delay = min(
+        settings.AI_SCORING_RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0)),
+        settings.AI_SCORING_RETRY_MAX_DELAY,
+    )
+    return delay * random.uniform(0.5, 1.0)
+
+
+class AIScoringWorkerPool:
+    """进程内AI评分worker池"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        concurrency: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+    ):
+        self._session_factory = session_factory
+        self.concurrency = settings.AI_SCORING_WORKERS if concurrency is None else concurrency
+        self.poll_interval = settings.AI_SCORING_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+
+    @property
+    def session_factory(self) -> Callable[[], Session]:
+        if self._session_factory is None:
+            from app.db.base import SessionLocal
+            return SessionLocal
+        return self._session_factory
+
+    @session_factory.setter
+    def session_factory(self, factory: Callable[[], Session]) -> None:
+        self._session_factory = factory
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    async def start(self) -> None:
+        """启动worker（应用启动时调用）"""
+        if self.concurrency <= 0 or self.running:
+            return
+        self._stopping = False
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        try:
+            requeued = await asyncio.to_thread(self.requeue_stale_jobs)
+            if requeued:
+                logger.info(f"重新排队 {requeued} 个租约过期的AI评分任务")
+        except Exception as e:
+            logger.warning(f"恢复AI评分任务失败: {str(e)}")
+        self._tasks = [
+            asyncio.create_task(self._worker_loop(f"{self.instance_id}:{index}"))
+            for index in range(self.concurrency)
+        ]
+        logger.info(f"AI评分worker已启动，并发数: {self.concurrency}")
+
+    async def stop(self) -> None:
+        """停止worker（应用关闭时调用），运行中的任务由租约过期机制恢复"""
+        self._stopping = True
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._wakeup = None
+        self._loop = None
+
+    def notify(self) -> None:
+        """有新任务入队时唤醒空闲worker"""
+        if self._wakeup is None or self._loop is None:
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run_once(self, worker_id: str = "inline") -> bool:
+        """
+        认领并执行一个到期任务
+
+        Returns:
+            bool: 是否处理了任务
+        """
+        job_id = await asyncio.to_thread(self.claim_next, worker_id)
+        if job_id is None:
+            return False
+        await self.run_job(job_id)
+        return True
+
+    async def drain(self, worker_id: str = "inline") -> int:
+        """执行所有到期任务，返回处理数量"""
+        processed = 0
+        while await self.run_once(worker_id):
+            processed += 1
+        return processed
+
+    def claim_next(self, worker_id: str) -> Optional[UUID]:
+        """
+        认领一个到期的排队任务
+
+        先以 SELECT ... FOR UPDATE SKIP LOCKED 选取候选，再用带状态条件的 UPDATE 认领，
+        不支持行锁的数据库（如SQLite）也不会被两个worker重复认领。
+        """
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            candidate = (
+                db.query(AIScoringJob.id)
+                .filter(
+                    AIScoringJob.status == "queued",
+                    AIScoringJob.next_run_at <= now,
+                )
+                .order_by(AIScoringJob.next_run_at, AIScoringJob.created_at)
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if candidate is None:
+                db.rollback()
+                return None
+
+            claimed = (
+                db.query(AIScoringJob)
+                .filter(AIScoringJob.id == candidate.id, AIScoringJob.status == "queued")
+                .update(
+                    {
+                        AIScoringJob.status: "running",
+                        AIScoringJob.locked_by: worker_id,
+                        AIScoringJob.locked_at: now,
+                        AIScoringJob.attempts: AIScoringJob.attempts + 1,
+                        AIScoringJob.updated_at: now,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            return candidate.id if claimed else None
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def claim_job(self, job_id: UUID, worker_id: str) -> bool:
+        """认领指定的排队任务（批量评分使用），已被其他worker认领时返回False"""
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            claimed = (
+                db.query(AIScoringJob)
+                .filter(AIScoringJob.id == job_id, AIScoringJob.status == "queued")
+                .update(
+                    {
+                        AIScoringJob.status: "running",
+                        AIScoringJob.locked_by: worker_id,
+                        AIScoringJob.locked_at: now,
+                        AIScoringJob.attempts: AIScoringJob.attempts + 1,
+                        AIScoringJob.updated_at: now,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            return bool(claimed)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def requeue_stale_jobs(self) -> int:
+        """
+        将租约过期（worker崩溃或进程重启）的运行中任务重新排队
+
+        认领时已计入尝试次数；已达到最大尝试次数的任务标记为失败，避免反复使worker崩溃的任务无限重试
+
+        Returns:
+            int: 重新排队的任务数
+        """
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            deadline = now - timedelta(seconds=settings.AI_SCORING_JOB_LEASE_SECONDS)
+            stale = db.query(AIScoringJob).filter(
+                AIScoringJob.status == "running", AIScoringJob.locked_at < deadline
+            )
+            exhausted = (
+                stale.filter(AIScoringJob.attempts >= AIScoringJob.max_attempts)
+                .update(
+                    {
+                        AIScoringJob.status: "failed",
+                        AIScoringJob.dedupe_key: None,
+                        AIScoringJob.locked_by: None,
+                        AIScoringJob.locked_at: None,
+                        AIScoringJob.last_error: "任务执行中断（worker租约过期），已达到最大尝试次数",
+                        AIScoringJob.finished_at: now,
+                        AIScoringJob.updated_at: now,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if exhausted:
+                logger.error(f"{exhausted} 个AI评分任务多次中断后标记为失败")
+            count = (
+                stale.filter(AIScoringJob.attempts < AIScoringJob.max_attempts)
+                .update(
+                    {
+                        AIScoringJob.status: "queued",
+                        AIScoringJob.locked_by: None,
+                        AIScoringJob.locked_at: None,
+                        AIScoringJob.next_run_at: now,
+                        AIScoringJob.updated_at: now,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            return count
+        finally:
+            db.close()
+
+    async def run_job(self, job_id: UUID) -> Dict[str, Any]:
+        """
+        使用独立会话执行已认领的任务
+
+        Returns:
+            Dict: status（succeeded / failed / queued 表示已安排重试）、error、attempts
+        """
+        db = self.session_factory()
+        try:
+            job = db.query(AIScoringJob).filter(AIScoringJob.id == job_id).first()
+            if job is None:
+                return {"status": "missing", "error": "任务不存在", "attempts": 0}
+            evaluation_id = job.evaluation_id
+            job.partial_scores = None
+            job.indicators_received = 0
+            db.commit()
+            try:
+                service = AIScoringService(db, on_progress=self._progress_recorder(job.id))
+                ai_score = await service.execute_ai_scoring(evaluation_id)
+            except CircuitOpenError as e:
+                # DeepSeek已熔断：不消耗重试次数，熔断冷却结束后再执行
+                db.rollback()
+                self._defer(db, job, e, e.retry_after)
+            except AIResponseFormatError as e:
+                # 模型输出格式错误属于偶发问题，按退避重试
+                db.rollback()
+                self._retry_or_fail(db, job, e)
+            except ValueError as e:
+                # 自评表状态不符、已评分等：重试也无法成功
+                db.rollback()
+                self._finish(db, job, "failed", error=str(e))
+                logger.warning(f"AI评分任务失败（不重试），job_id: {job_id}, error: {str(e)}")
+            except Exception as e:
+                db.rollback()
+                self._retry_or_fail(db, job, e)
+            else:
+                self._finish(db, job, "succeeded", ai_score_id=ai_score.id)
+                logger.info(f"AI评分任务完成，job_id: {job_id}, score_id: {ai_score.id}")
+            return {"status": job.status, "error": job.last_error, "attempts": job.attempts}
+        finally:
+            db.close()
+
+    def _progress_recorder(self, job_id: UUID) -> Callable[[List[Dict[str, Any]]], Awaitable[None]]:
+        """流式评分进度回调：用独立会话写入已收到的指标评分，不干扰评分事务"""
+
+        def save(indicator_scores: List[Dict[str, Any]]) -> None:
+            db = self.session_factory()
+            try:
+                db.query(AIScoringJob).filter(AIScoringJob.id == job_id).update(
+                    {
+                        "partial_scores": indicator_scores,
+                        "indicators_received": len(indicator_scores),
+                        "updated_at": datetime.utcnow(),
+                    },
+                    synchronize_session=False,
+                )
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"记录AI评分进度失败，job_id: {job_id}, error: {str(e)}")
+            finally:
+                db.close()
+
+        async def record(indicator_scores: List[Dict[str, Any]]) -> None:
+            await asyncio.to_thread(save, indicator_scores)
+
+        return record
+
+    @staticmethod
+    def _finish(
+        db: Session,
+        job: AIScoringJob,
+        status: str,
+        error: Optional[str] = None,
+        ai_score_id: Optional[UUID] = None,
+    ) -> None:
+        now = datetime.utcnow()
+        job.status = status
+        job.dedupe_key = None
+        job.locked_by = None
+        job.locked_at = None
+        job.last_error = error
+        job.ai_score_id = ai_score_id
+        job.finished_at = now
+        job.updated_at = now
+        db.commit()
+
+    @staticmethod
+    def _defer(db: Session, job: AIScoringJob, error: Exception, delay: float) -> None:
+        now = datetime.utcnow()
+        job.status = "queued"
+        job.attempts = max(job.attempts - 1, 0)
+        job.locked_by = None
+        job.locked_at = None
+        job.last_error = str(error)
+        job.next_run_at = now + timedelta(seconds=delay + random.uniform(0, 1))
+        job.updated_at = now
+        db.commit()
+        logger.info(f"AI评分任务延后 {delay:.0f} 秒执行（外部服务熔断），job_id: {job.id}")
+
+    def _retry_or_fail(self, db: Session, job: AIScoringJob, error: Exception) -> None:
+        if job.attempts >= job.max_attempts:
+            self._finish(db, job, "failed", error=str(error))
+            logger.error(f"AI评分任务重试 {job.attempts} 次后失败，job_id: {job.id}, error: {str(error)}")
+            return
+
+        delay = retry_delay(job.attempts)
+        now = datetime.utcnow()
+        job.status = "queued"
+        job.locked_by = None
+        job.locked_at = None
+        job.last_error = str(error)
+        job.next_run_at = now + timedelta(seconds=delay)
+        job.updated_at = now
+        db.commit()
+        logger.warning(
+            f"AI评分任务第 {job.attempts} 次失败，{delay:.0f} 秒后重试，job_id: {job.id}, error: {str(error)}"
+        )
+
+    async def _worker_loop(self, worker_id: str) -> None:
+        while not self._stopping:
+            try:
+                processed = await self.run_once(worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"AI评分worker异常，worker: {worker_id}, error: {str(e)}")
+                processed = False
+
+            if processed:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                try:
+                    await asyncio.to_thread(self.requeue_stale_jobs)
+                except Exception as e:
+                    logger.debug(f"恢复过期AI评分任务失败: {str(e)}")
+            if self._wakeup is not None:
+                self._wakeup.clear()
+
+
+# 全局worker池
+ai_scoring_workers = AIScoringWorkerPool()
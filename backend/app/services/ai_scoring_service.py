@@ -9,11 +9,13 @@ AI评分服务模块
 
 import httpx
 import json
-from typing import Dict, List, Any, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from uuid import UUID
 from sqlalchemy.orm import Session
 from datetime import datetime
+import asyncio
 import logging
+import time
 from tenacity import (
     retry,
     stop_after_attempt,
@@ -27,17 +29,59 @@ from app.models.attachment import Attachment
 from app.models.ai_score import AIScore
 from app.models.anomaly import Anomaly
 from app.core.config import settings
+from app.core.http_clients import http_clients, DEEPSEEK_CLIENT
+from app.core.rate_limiter import deepseek_rate_limiter
+from app.core.circuit_breaker import CircuitOpenError, outbound_guards
+from app.services.ai_response_cache import AIResponseCache
+from app.services.prompt_compiler import CompiledPrompt, compile_scoring_prompt, compile_subjective_prompt
+from app.services.ai_stream_decoder import IncrementalScoreDecoder
+from app.services.ai_response_schema import (
+    decode_ai_response,
+    decode_partial_response,
+    decode_subjective_response,
+    validate_score_data,
+    validate_subjective_data,
+)
+from app.services.attachment_text_service import AttachmentTextService
+from app.services.local_prescorer import prescore as local_prescore
+from app.services.anomaly_detection_service import ANOMALY_RULES, describe_count_mismatch, detect_anomalies
+from app.services.attachment_classifier import is_confidently_classified
+from app.models.ai_call_log import AICallLog
 
 logger = logging.getLogger(__name__)
 
+SYSTEM_PROMPT = "你是教研室工作考评专家，负责根据自评表和附件进行客观公正的评分。"
+
 
 class AIScoringService:
     """AI评分服务类"""
     
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Session,
+        on_progress: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+        mode: Optional[str] = None
+    ):
+        """
+        Args:
+            db: 数据库会话
+            on_progress: 流式评分时每收到一个指标评分回调一次（参数为已收到的全部指标评分）
+            mode: 评分模式 full / hybrid，默认取 AI_SCORING_MODE
+        """
         self.db = db
+        self.on_progress = on_progress
+        self.mode = mode or settings.AI_SCORING_MODE
+        self.use_cache = True
         self.api_key = settings.DEEPSEEK_API_KEY
         self.api_url = settings.DEEPSEEK_API_URL
+        self.model = settings.DEEPSEEK_MODEL
+        self.temperature = settings.DEEPSEEK_TEMPERATURE
+        self.last_prompt: Optional[CompiledPrompt] = None
+        self.last_usage: Dict[str, Any] = {}
+        # 流式响应被截断、使用部分结果时缺少的字段；完整响应为None
+        self.last_partial_missing: Optional[List[str]] = None
+        # 最近一次实际调用API的耗时（命中缓存时为None）
+        self.last_call_latency_ms: Optional[int] = None
     
     async def execute_ai_scoring(self, evaluation_id: UUID) -> AIScore:
         """
@@ -73,30 +117,33 @@ class AIScoringService:
         if not attachments:
             raise ValueError(f"自评表没有附件: {evaluation_id}")
         
-        # 2. 调用DeepSeek API进行评分
-        logger.info(f"调用DeepSeek API进行评分")
-        prompt = self._build_scoring_prompt(evaluation, attachments)
-        ai_response = await self._call_deepseek_api(prompt)
+        # 2. 调用DeepSeek API进行评分（相同提示词命中缓存时不再调用）
+        # 3. 解析AI响应（混合模式下与本地预评分结果合并）
+        score_data, partial_missing = await self.compute_score_data(evaluation, attachments)
         
-        # 3. 解析AI响应
-        logger.info(f"解析AI响应")
-        score_data = self._parse_ai_response(ai_response)
+        # 4. 保存AI评分结果（截断响应中未收到的解析数量存为空，批量重新检测异常时跳过）
+        def parsed_count(column: str) -> Optional[int]:
+            return None if column in partial_missing else score_data[column]
         
-        # 4. 保存AI评分结果
         ai_score = AIScore(
             evaluation_id=evaluation_id,
             total_score=score_data["total_score"],
             indicator_scores=score_data["indicator_scores"],
-            parsed_reform_projects=score_data["parsed_reform_projects"],
-            parsed_honorary_awards=score_data["parsed_honorary_awards"],
+            parsed_reform_projects=parsed_count("parsed_reform_projects"),
+            parsed_honorary_awards=parsed_count("parsed_honorary_awards"),
+            parsed_competitions=parsed_count("parsed_competitions"),
+            parsed_innovations=parsed_count("parsed_innovations"),
             scored_at=datetime.utcnow()
         )
         
         self.db.add(ai_score)
         
-        # 5. 检测异常数据
+        # 5. 检测异常数据（部分结果缺少解析数量时，不做数量一致性检测）
         logger.info(f"检测异常数据")
-        anomalies = self._detect_anomalies(evaluation, score_data)
+        if any(rule.score_column in partial_missing for rule in ANOMALY_RULES):
+            anomalies = []
+        else:
+            anomalies = self._detect_anomalies(evaluation, score_data)
         
         if anomalies:
             for anomaly in anomalies:
@@ -120,10 +167,98 @@ class AIScoringService:
         
         return ai_score
     
+    async def compute_score_data(
+        self,
+        evaluation: SelfEvaluation,
+        attachments: List[Attachment]
+    ) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        生成评分数据（不写入评分结果）
+        
+        full 模式由DeepSeek完成全部评分；hybrid 模式下负面清单、亮点合计、附件数量与
+        明确的附件分类由本地规则计算，DeepSeek只评8个常规教学指标；若此时AI响应被截断，
+        总分改用本地预评分的总分。
+        
+        Returns:
+            Tuple[Dict, List[str]]: (评分数据, 截断响应中缺少的字段)
+        """
+        hybrid = self.mode == "hybrid"
+        prescore = local_prescore(evaluation.content, attachments) if hybrid else None
+        if hybrid:
+            prompt = self._build_subjective_prompt(evaluation)
+        else:
+            prompt = self._build_scoring_prompt(evaluation, attachments)
+        
+        cache = AIResponseCache(self.db)
+        cache_enabled = self.use_cache and bool(self.api_key) and settings.AI_RESPONSE_CACHE_ENABLED
+        fingerprint = cache.fingerprint(SYSTEM_PROMPT + "\n" + prompt, self.model, self.temperature)
+        score_data = cache.get(fingerprint) if cache_enabled else None
+        
+        partial_missing: List[str] = []
+        self.last_call_latency_ms = None
+        if score_data is not None:
+            logger.info(f"AI响应缓存命中，fingerprint: {fingerprint[:12]}")
+            score_data = validate_subjective_data(score_data) if hybrid else validate_score_data(score_data)
+        else:
+            self.last_partial_missing = None
+            logger.info(f"调用DeepSeek API进行评分，mode: {self.mode}")
+            started = time.monotonic()
+            ai_response = await self._call_deepseek_api(prompt)
+            latency_ms = int((time.monotonic() - started) * 1000)
+            self.last_call_latency_ms = latency_ms
+            self._record_call(evaluation.id, latency_ms)
+            
+            logger.info(f"解析AI响应")
+            if hybrid:
+                score_data = decode_subjective_response(ai_response)
+            elif self.last_partial_missing is not None:
+                score_data = decode_partial_response(ai_response)
+            else:
+                score_data = self._parse_ai_response(ai_response)
+            if self.last_partial_missing is not None:
+                # 流式响应被截断时得到的部分结果不写入缓存
+                partial_missing = self.last_partial_missing
+                logger.warning(f"AI评分使用截断响应的部分结果，evaluation_id: {evaluation.id}, 缺少: {partial_missing}")
+            elif cache_enabled:
+                cache.put(fingerprint, self.model, self.temperature, score_data, latency_ms)
+        
+        if hybrid:
+            # 数量与分类由本地计算，截断响应只影响常规教学指标，总分退回本地预评分
+            return prescore.merge(score_data["indicator_scores"], partial=bool(partial_missing)), []
+        return score_data, partial_missing
+    
+    def _record_call(self, evaluation_id: UUID, latency_ms: int) -> None:
+        """记录本次调用的提示词token数与耗时（随评分结果一并提交）"""
+        prompt = self.last_prompt
+        log = AICallLog(
+            evaluation_id=evaluation_id,
+            model=self.model,
+            prompt_tokens_estimated=prompt.estimated_tokens if prompt else 0,
+            prompt_tokens=self.last_usage.get("prompt_tokens"),
+            completion_tokens=self.last_usage.get("completion_tokens"),
+            latency_ms=latency_ms,
+            truncated_sections=prompt.truncated_sections if prompt else [],
+            mode=self.mode,
+        )
+        self.db.add(log)
+        logger.info(
+            f"DeepSeek调用统计，evaluation_id: {evaluation_id}, "
+            f"prompt_tokens≈{log.prompt_tokens_estimated}, usage: {self.last_usage}, latency_ms: {latency_ms}"
+        )
+    
+    def _build_subjective_prompt(self, evaluation: SelfEvaluation) -> str:
+        """构建混合模式提示词（只含常规教学指标），编译结果保存在 self.last_prompt"""
+        self.last_prompt = compile_subjective_prompt(evaluation.content or {}, settings.AI_PROMPT_MAX_TOKENS)
+        return self.last_prompt.text
+    
     def _build_scoring_prompt(self, evaluation: SelfEvaluation, attachments: List[Attachment]) -> str:
         """
         构建评分提示词（支持新评分表结构）
         
+        使用预编译模板，并按 AI_PROMPT_MAX_TOKENS 预算截断过长的指标内容、
+        摘要过多的亮点项目和附件列表。上传时已提取的附件正文按
+        ATTACHMENT_TEXT_PROMPT_TOKENS 限额附在附件信息后。编译结果保存在 self.last_prompt。
+        
         Args:
             evaluation: 自评表
             attachments: 附件列表
@@ -131,157 +266,19 @@ class AIScoringService:
         Returns:
             str: 评分提示词
         """
-        content = evaluation.content
-        
-        # 提取常规教学工作内容
-        regular_teaching = content.get('regularTeaching', {})
-        
-        # 提取特色与亮点项目
-        highlights = content.get('highlights', {})
-        reform_projects = highlights.get('teachingReformProjects', {}).get('items', [])
-        honors = highlights.get('teachingHonors', {}).get('items', [])
-        competitions = highlights.get('teachingCompetitions', {}).get('items', [])
-        innovations = highlights.get('innovationCompetitions', {}).get('items', [])
-        
-        # 提取负面清单
-        negative_list = content.get('negativeList', {})
-        
-        prompt = f"""你是教研室工作考评专家，请根据以下自评表内容和附件信息进行评分。
-
-一、常规教学工作（每项满分10分，共80分）
-
-1. 教学过程管理（自评分：{regular_teaching.get('teachingProcessManagement', {}).get('selfScore', 0)}分）
-   内容：{regular_teaching.get('teachingProcessManagement', {}).get('content', '')}
-
-2. 教学质量管理（自评分：{regular_teaching.get('teachingQualityManagement', {}).get('selfScore', 0)}分）
-   内容：{regular_teaching.get('teachingQualityManagement', {}).get('content', '')}
-
-3. 课程考核（自评分：{regular_teaching.get('courseAssessment', {}).get('selfScore', 0)}分）
-   内容：{regular_teaching.get('courseAssessment', {}).get('content', '')}
-
-4. 教育教学科研工作（自评分：{regular_teaching.get('educationResearch', {}).get('selfScore', 0)}分）
-   内容：{regular_teaching.get('educationResearch', {}).get('content', '')}
-
-5. 课程建设（自评分：{regular_teaching.get('courseConstruction', {}).get('selfScore', 0)}分）
-   内容：{regular_teaching.get('courseConstruction', {}).get('content', '')}
-
-6. 教师队伍建设（自评分：{regular_teaching.get('teacherTeamBuilding', {}).get('selfScore', 0)}分）
-   内容：{regular_teaching.get('teacherTeamBuilding', {}).get('content', '')}
-
-7. 科学研究与学术交流（自评分：{regular_teaching.get('researchAndExchange', {}).get('selfScore', 0)}分）
-   内容：{regular_teaching.get('researchAndExchange', {}).get('content', '')}
-
-8. 教学档案室管理与建设（自评分：{regular_teaching.get('archiveManagement', {}).get('selfScore', 0)}分）
-   内容：{regular_teaching.get('archiveManagement', {}).get('content', '')}
-
-二、特色与亮点项目
-
-1. 教学改革项目（自评填写{len(reform_projects)}项）：
-"""
-        
-        for i, project in enumerate(reform_projects, 1):
-            prompt += f"   {i}. {project.get('name', '')} - {project.get('level', '')} - 自评{project.get('score', 0)}分\n"
-        
-        prompt += f"\n2. 年度获得教学相关荣誉表彰（自评填写{len(honors)}项）：\n"
-        for i, honor in enumerate(honors, 1):
-            prompt += f"   {i}. {honor.get('name', '')} - {honor.get('level', '')} - 自评{honor.get('score', 0)}分\n"
-        
-        prompt += f"\n3. 教学比赛（自评填写{len(competitions)}项）：\n"
-        for i, comp in enumerate(competitions, 1):
-            prompt += f"   {i}. {comp.get('name', '')} - {comp.get('levelPrize', '')} - 自评{comp.get('score', 0)}分\n"
-        
-        prompt += f"\n4. 指导创新创业比赛获奖情况（自评填写{len(innovations)}项）：\n"
-        for i, innov in enumerate(innovations, 1):
-            prompt += f"   {i}. {innov.get('name', '')} - {innov.get('levelPrize', '')} - 自评{innov.get('score', 0)}分\n"
-        
-        prompt += f"""
-三、负面清单
-
-1. 师德师风违规：{negative_list.get('ethicsViolations', {}).get('count', 0)}起，扣{negative_list.get('ethicsViolations', {}).get('deduction', 0)}分
-2. 教学事故：{negative_list.get('teachingAccidents', {}).get('count', 0)}起，扣{negative_list.get('teachingAccidents', {}).get('deduction', 0)}分
-3. 意识形态问题：{negative_list.get('ideologyIssues', {}).get('count', 0)}起，扣{negative_list.get('ideologyIssues', {}).get('deduction', 0)}分
-4. 工作量未完成：{negative_list.get('workloadIncomplete', {}).get('percentage', 0)}%，扣{negative_list.get('workloadIncomplete', {}).get('deduction', 0)}分
-
-附件信息（共{len(attachments)}个）：
-"""
-        
-        for i, attachment in enumerate(attachments, 1):
-            prompt += f"{i}. 文件名：{attachment.file_name}，考核指标：{attachment.indicator}\n"
-        
-        prompt += """
-评分任务：
-
-1. 对8个常规教学指标进行AI评分（每项0-10分）
-2. 验证特色亮点项目的附件支撑材料是否充分
-3. 检测自评填写的项目数量与附件数量是否一致
-4. 对附件进行分类（教学改革项目/荣誉表彰/教学比赛/创新创业比赛/其他）
-
-请按照以下JSON格式返回评分结果：
-{
-    "total_score": AI评定的总分（数字，包含负面清单扣分），
-    "indicator_scores": [
-        {
-            "indicator": "教学过程管理",
-            "score": AI评分（0-10），
-            "reasoning": "评分理由，需要对比自评分和AI评分的差异"
-        },
-        {
-            "indicator": "教学质量管理",
-            "score": AI评分（0-10），
-            "reasoning": "评分理由"
-        },
-        {
-            "indicator": "课程考核",
-            "score": AI评分（0-10），
-            "reasoning": "评分理由"
-        },
-        {
-            "indicator": "教育教学科研工作",
-            "score": AI评分（0-10），
-            "reasoning": "评分理由"
-        },
-        {
-            "indicator": "课程建设",
-            "score": AI评分（0-10），
-            "reasoning": "评分理由"
-        },
-        {
-            "indicator": "教师队伍建设",
-            "score": AI评分（0-10），
-            "reasoning": "评分理由"
-        },
-        {
-            "indicator": "科学研究与学术交流",
-            "score": AI评分（0-10），
-            "reasoning": "评分理由"
-        },
-        {
-            "indicator": "教学档案室管理与建设",
-            "score": AI评分（0-10），
-            "reasoning": "评分理由"
-        }
-    ],
-    "parsed_reform_projects": 从附件中解析出的教学改革项目个数（数字），
-    "parsed_honors": 从附件中解析出的荣誉表彰个数（数字），
-    "parsed_competitions": 从附件中解析出的教学比赛个数（数字），
-    "parsed_innovations": 从附件中解析出的创新创业比赛个数（数字），
-    "attachment_classifications": [
-        {
-            "file_name": "附件文件名",
-            "classified_indicator": "teaching_reform_projects 或 teaching_honors 或 teaching_competitions 或 innovation_competitions 或 other"
-        }
-    ]
-}
-
-注意事项：
-1. 常规教学工作每项满分10分，请根据内容质量客观评分
-2. 如果自评分明显偏高或偏低，请在reasoning中说明
-3. 特色亮点项目需要有附件支撑，请仔细核对数量
-4. 负面清单扣分已在自评表中计算，AI评分时需要考虑
-5. 附件分类要准确，便于后续管理和审核
-"""
-        
-        return prompt
+        self.last_prompt = compile_scoring_prompt(
+            evaluation.content or {},
+            attachments,
+            settings.AI_PROMPT_MAX_TOKENS,
+            attachment_texts=AttachmentTextService(self.db).get_texts(attachments),
+            excerpt_tokens=settings.ATTACHMENT_TEXT_PROMPT_TOKENS,
+        )
+        if self.last_prompt.truncated_sections:
+            logger.info(
+                f"提示词超出预算已压缩，evaluation_id: {evaluation.id}, "
+                f"sections: {self.last_prompt.truncated_sections}"
+            )
+        return self.last_prompt.text
     
     @retry(
         stop=stop_after_attempt(3),
@@ -313,42 +310,117 @@ class AIScoringService:
         }
         
         payload = {
-            "model": "deepseek-chat",
+            "model": self.model,
             "messages": [
                 {
                     "role": "system",
-                    "content": "你是教研室工作考评专家，负责根据自评表和附件进行客观公正的评分。"
+                    "content": SYSTEM_PROMPT
                 },
                 {
                     "role": "user",
                     "content": prompt
                 }
             ],
-            "temperature": 0.3
+            "temperature": self.temperature
         }
+        if settings.DEEPSEEK_JSON_MODE:
+            # JSON模式：模型只输出一个JSON对象（提示词中已包含“JSON”字样）
+            payload["response_format"] = {"type": "json_object"}
+        
+        if settings.DEEPSEEK_STREAMING:
+            return await self._stream_deepseek_api(headers, payload)
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
+            # 全局令牌桶限流，重试同样计入
+            await deepseek_rate_limiter.acquire()
+            # 熔断时直接失败（不进入重试）；并发上限随延迟与429/5xx自适应调整
+            async with outbound_guards.get(DEEPSEEK_CLIENT).call():
+                # 复用连接池中的长连接，避免每次调用重新握手
+                client = http_clients.get(DEEPSEEK_CLIENT)
                 response = await client.post(
                     self.api_url,
                     headers=headers,
                     json=payload
                 )
                 response.raise_for_status()
-                
-                result = response.json()
-                content = result["choices"][0]["message"]["content"]
-                
-                logger.info(f"DeepSeek API调用成功")
-                return content
-                
+            
+            result = response.json()
+            content = result["choices"][0]["message"]["content"]
+            self.last_usage = result.get("usage") or {}
+            
+            logger.info(f"DeepSeek API调用成功")
+            return content
+            
         except (httpx.HTTPError, httpx.TimeoutException) as e:
             logger.error(f"DeepSeek API调用失败: {str(e)}")
             raise
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"DeepSeek API调用发生未预期错误: {str(e)}")
             raise Exception(f"DeepSeek API调用失败: {str(e)}")
     
+    async def _stream_deepseek_api(self, headers: Dict[str, str], payload: Dict[str, Any]) -> str:
+        """
+        以流式方式调用DeepSeek API，边接收边增量解码
+        
+        每个指标评分到达时回调 on_progress。超过 DEEPSEEK_STREAM_DEADLINE、连接中断或数据行损坏时，
+        如果已收到的内容足以评分（8个常规指标齐全），返回部分结果而不是整体重试。
+        
+        Returns:
+            str: 完整响应文本，或部分结果的JSON
+        """
+        decoder = IncrementalScoreDecoder()
+        payload = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+        
+        async def consume(call) -> None:
+            client = http_clients.get(DEEPSEEK_CLIENT)
+            async with client.stream("POST", self.api_url, headers=headers, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    # 自适应并发按首个token的耗时判断拥塞，输出长短不影响
+                    call.record_first_byte()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError as e:
+                        # 数据行损坏按传输错误处理：已收到的内容可用时返回部分结果，否则整体重试
+                        raise httpx.RemoteProtocolError(f"DeepSeek流式响应数据损坏: {data[:80]}") from e
+                    if chunk.get("usage"):
+                        self.last_usage = chunk["usage"]
+                    choices = chunk.get("choices") or []
+                    delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                    if delta and decoder.feed(delta) and self.on_progress:
+                        await self.on_progress(list(decoder.indicator_scores))
+        
+        await deepseek_rate_limiter.acquire()
+        async with outbound_guards.get(DEEPSEEK_CLIENT).call() as call:
+            try:
+                await asyncio.wait_for(consume(call), timeout=settings.DEEPSEEK_STREAM_DEADLINE)
+            except (asyncio.TimeoutError, httpx.TransportError) as e:
+                if decoder.is_usable():
+                    # 部分结果可用，但超时/断连仍计入熔断与并发调整
+                    call.record_failure(e)
+                    logger.warning(
+                        f"DeepSeek流式响应未完整接收（{type(e).__name__}），"
+                        f"使用已收到的 {len(decoder.indicator_scores)} 个指标评分"
+                    )
+                    result = decoder.partial_result()
+                    result.pop("partial")
+                    self.last_partial_missing = result.pop("partial_missing")
+                    return json.dumps(result, ensure_ascii=False)
+                logger.error(f"DeepSeek流式调用失败: {type(e).__name__} {str(e)}")
+                if isinstance(e, asyncio.TimeoutError):
+                    raise httpx.ReadTimeout("DeepSeek流式响应超时") from e
+                raise
+        
+        logger.info(f"DeepSeek流式调用成功")
+        return decoder.text
+    
     def _get_mock_response(self) -> str:
         """获取模拟响应数据（用于测试）"""
         mock_data = {
@@ -411,41 +483,12 @@ class AIScoringService:
             response: AI响应内容
             
         Returns:
-            Dict: 解析后的评分数据
-        """
-        try:
-            # 尝试直接解析JSON
-            data = json.loads(response)
-            
-            # 验证必需字段
-            required_fields = [
-                "total_score", 
-                "indicator_scores", 
-                "parsed_reform_projects", 
-                "parsed_honors",
-                "parsed_competitions",
-                "parsed_innovations"
-            ]
-            for field in required_fields:
-                if field not in data:
-                    raise ValueError(f"AI响应缺少必需字段: {field}")
-            
-            return data
+            Dict: 解析并校验后的评分数据
             
-        except json.JSONDecodeError:
-            # 如果不是纯JSON，尝试提取JSON部分
-            logger.warning("AI响应不是纯JSON格式，尝试提取JSON部分")
-            
-            import re
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                try:
-                    data = json.loads(json_match.group())
-                    return data
-                except:
-                    pass
-            
-            raise ValueError(f"无法解析AI响应: {response}")
+        Raises:
+            AIResponseFormatError: 响应无法解析或缺少必需字段
+        """
+        return decode_ai_response(response)
     
     def _detect_anomalies(self, evaluation: SelfEvaluation, score_data: Dict[str, Any]) -> List[Anomaly]:
         """
@@ -457,6 +500,8 @@ class AIScoringService:
         - 4.9: 异常信息保存到数据库，同步至管理端
         - 4.10: 设置status="pending"，转人工复核流程
         
+        检测规则见 anomaly_detection_service.ANOMALY_RULES。
+        
         Args:
             evaluation: 自评表
             score_data: AI评分数据
@@ -464,103 +509,7 @@ class AIScoringService:
         Returns:
             List[Anomaly]: 异常数据列表
         """
-        anomalies = []
-        content = evaluation.content
-        highlights = content.get('highlights', {})
-        
-        # 检测教学改革项目数量不一致
-        declared_reform = len(highlights.get('teachingReformProjects', {}).get('items', []))
-        parsed_reform = score_data.get('parsed_reform_projects', 0)
-        
-        if declared_reform != parsed_reform:
-            description = self._generate_anomaly_description(
-                indicator_name="教学改革项目",
-                declared_count=declared_reform,
-                parsed_count=parsed_reform
-            )
-            
-            anomaly = Anomaly(
-                evaluation_id=evaluation.id,
-                type="count_mismatch",
-                indicator="teaching_reform_projects",
-                declared_count=declared_reform,
-                parsed_count=parsed_reform,
-                description=description,
-                status="pending"
-            )
-            anomalies.append(anomaly)
-            logger.warning(f"检测到异常: {description}")
-        
-        # 检测荣誉表彰数量不一致
-        declared_honors = len(highlights.get('teachingHonors', {}).get('items', []))
-        parsed_honors = score_data.get('parsed_honors', 0)
-        
-        if declared_honors != parsed_honors:
-            description = self._generate_anomaly_description(
-                indicator_name="荣誉表彰",
-                declared_count=declared_honors,
-                parsed_count=parsed_honors
-            )
-            
-            anomaly = Anomaly(
-                evaluation_id=evaluation.id,
-                type="count_mismatch",
-                indicator="teaching_honors",
-                declared_count=declared_honors,
-                parsed_count=parsed_honors,
-                description=description,
-                status="pending"
-            )
-            anomalies.append(anomaly)
-            logger.warning(f"检测到异常: {description}")
-        
-        # 检测教学比赛数量不一致
-        declared_competitions = len(highlights.get('teachingCompetitions', {}).get('items', []))
-        parsed_competitions = score_data.get('parsed_competitions', 0)
-        
-        if declared_competitions != parsed_competitions:
-            description = self._generate_anomaly_description(
-                indicator_name="教学比赛",
-                declared_count=declared_competitions,
-                parsed_count=parsed_competitions
-            )
-            
-            anomaly = Anomaly(
-                evaluation_id=evaluation.id,
-                type="count_mismatch",
-                indicator="teaching_competitions",
-                declared_count=declared_competitions,
-                parsed_count=parsed_competitions,
-                description=description,
-                status="pending"
-            )
-            anomalies.append(anomaly)
-            logger.warning(f"检测到异常: {description}")
-        
-        # 检测创新创业比赛数量不一致
-        declared_innovations = len(highlights.get('innovationCompetitions', {}).get('items', []))
-        parsed_innovations = score_data.get('parsed_innovations', 0)
-        
-        if declared_innovations != parsed_innovations:
-            description = self._generate_anomaly_description(
-                indicator_name="创新创业比赛",
-                declared_count=declared_innovations,
-                parsed_count=parsed_innovations
-            )
-            
-            anomaly = Anomaly(
-                evaluation_id=evaluation.id,
-                type="count_mismatch",
-                indicator="innovation_competitions",
-                declared_count=declared_innovations,
-                parsed_count=parsed_innovations,
-                description=description,
-                status="pending"
-            )
-            anomalies.append(anomaly)
-            logger.warning(f"检测到异常: {description}")
-        
-        return anomalies
+        return detect_anomalies(evaluation, score_data)
     
     def _generate_anomaly_description(
         self, 
@@ -568,33 +517,8 @@ class AIScoringService:
         declared_count: int, 
         parsed_count: int
     ) -> str:
-        """
-        生成清晰的异常对比说明 (需求 4.8)
-        
-        Args:
-            indicator_name: 考核指标名称
-            declared_count: 自评表声明的数量
-            parsed_count: AI从附件解析出的数量
-            
-        Returns:
-            str: 清晰的对比说明
-        """
-        diff = abs(declared_count - parsed_count)
-        
-        if declared_count > parsed_count:
-            return (
-                f"自评表填写{declared_count}项{indicator_name}，"
-                f"但附件仅解析出{parsed_count}份证书，"
-                f"缺少{diff}份支撑材料。"
-                f"请核实是否存在遗漏上传或填写错误。"
-            )
-        else:
-            return (
-                f"自评表填写{declared_count}项{indicator_name}，"
-                f"但附件解析出{parsed_count}份证书，"
-                f"多出{diff}份材料。"
-                f"请核实是否存在重复上传或分类错误。"
-            )
+        """生成清晰的异常对比说明 (需求 4.8)"""
+        return describe_count_mismatch(indicator_name, declared_count, parsed_count)
     
     def _classify_attachments(self, attachments: List[Attachment], score_data: Dict[str, Any]) -> int:
         """
@@ -609,6 +533,8 @@ class AIScoringService:
         - 5.6: 关联附件与对应教研室（已通过evaluation_id关联）
         - 5.7: 关联附件与对应考核指标（通过indicator字段）
         
+        上传时的分类已由本地模型高置信度确认的附件保持不变。
+        
         Args:
             attachments: 附件列表
             score_data: AI评分数据，包含attachment_classifications字段
@@ -642,6 +568,10 @@ class AIScoringService:
         
         # 更新每个附件的分类
         for attachment in attachments:
+            if is_confidently_classified(attachment):
+                # 上传时的分类已由本地模型高置信度确认，不采用AI分类
+                continue
+            
             # 查找该附件的AI分类结果
             ai_indicator = classification_map.get(attachment.file_name)
             
@@ -652,6 +582,8 @@ class AIScoringService:
                     attachment.indicator = ai_indicator
                     # 标记为AI分类
                     attachment.classified_by = 'ai'
+                    attachment.suggested_indicator = None
+                    attachment.classification_confidence = None
                     # 标记对象为已修改，确保SQLAlchemy跟踪变更
                     self.db.add(attachment)
                     classified_count += 1
@@ -0,0 +1,166 @@
+"""
+AI评分流式响应增量解码
+
+DeepSeek 流式返回的评分JSON分多个片段到达。解码器逐字符扫描新到达的文本
+（跟踪字符串/转义与嵌套深度），在 indicator_scores 数组中的每个对象闭合时立即解析产出，
+并记录已完成的顶层数值字段。响应被截断时，8个常规教学指标均已到达才据此生成部分评分结果。
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+from app.core.indicators import REGULAR_TEACHING_INDICATORS, regular_indicator_label
+
+SCALAR_FIELDS = (
+    "total_score",
+    "parsed_reform_projects",
+    "parsed_honors",
+    "parsed_competitions",
+    "parsed_innovations",
+)
+
+# 与 AIScore 列名不同的响应字段：partial_missing 使用列名，与保存评分、异常规则的 score_column 一致
+SCORE_COLUMNS = {"parsed_honors": "parsed_honorary_awards"}
+
+
+class IncrementalScoreDecoder:
+    """评分JSON增量解码器"""
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start: Optional[int] = None
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self._in_indicator_array = False
+        self._object_start: Optional[int] = None
+        self.indicator_scores: List[Dict[str, Any]] = []
+        self.scalars: Dict[str, Any] = {}
+
+    @property
+    def text(self) -> str:
+        """目前收到的完整文本"""
+        return self._text
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        输入一个文本片段
+
+        Returns:
+            List[Dict]: 本片段中新完成的指标评分
+        """
+        if not chunk:
+            return []
+        self._text += chunk
+        completed: List[Dict[str, Any]] = []
+        text = self._text
+
+        while self._pos < len(text):
+            char = text[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._string_start is not None:
+                        try:
+                            self._last_string = json.loads(text[self._string_start:self._pos + 1])
+                        except ValueError:
+                            self._last_string = None
+                self._pos += 1
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif char == ":" and self._depth == 1:
+                self._key = self._last_string
+                self._value_start = self._pos + 1
+            elif char in ",}" and self._depth == 1:
+                self._record_scalar(text[self._value_start:self._pos] if self._value_start else "")
+                self._key = None
+                self._value_start = None
+            elif char == "[":
+                if self._depth == 1 and self._key == "indicator_scores":
+                    self._in_indicator_array = True
+            elif char == "]":
+                if self._depth == 2 and self._in_indicator_array:
+                    self._in_indicator_array = False
+            elif char == "{" and self._depth == 2 and self._in_indicator_array:
+                self._object_start = self._pos
+
+            if char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth = max(self._depth - 1, 0)
+                if char == "}" and self._depth == 2 and self._in_indicator_array and self._object_start is not None:
+                    item = self._parse_object(text[self._object_start:self._pos + 1])
+                    if item is not None:
+                        self.indicator_scores.append(item)
+                        completed.append(item)
+                    self._object_start = None
+
+            self._pos += 1
+
+        return completed
+
+    def _record_scalar(self, raw: str) -> None:
+        if self._key not in SCALAR_FIELDS:
+            return
+        raw = raw.strip()
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.scalars[self._key] = value
+
+    @staticmethod
+    def _parse_object(raw: str) -> Optional[Dict[str, Any]]:
+        try:
+            item = json.loads(raw)
+        except ValueError:
+            return None
+        return item if isinstance(item, dict) else None
+
+    def regular_indicators_received(self) -> int:
+        labels = {regular_indicator_label(item.get("indicator")) for item in self.indicator_scores}
+        labels.discard(None)
+        return len(labels)
+
+    def is_usable(self) -> bool:
+        """截断时已到达的内容是否足以生成评分结果（8个常规教学指标均已到达，只有总分不够）"""
+        return self.regular_indicators_received() >= len(REGULAR_TEACHING_INDICATORS)
+
+    def partial_result(self) -> Dict[str, Any]:
+        """
+        根据已到达的内容生成部分评分结果
+
+        缺少的数量字段为 None，其 AIScore 列名列入 partial_missing，调用方据此跳过相应的数量异常检测；
+        缺少总分时以已到达的指标得分之和代替。
+        """
+        result: Dict[str, Any] = {"indicator_scores": list(self.indicator_scores)}
+        missing = []
+        for field in SCALAR_FIELDS:
+            if field in self.scalars:
+                result[field] = self.scalars[field]
+            else:
+                missing.append(SCORE_COLUMNS.get(field, field))
+                result[field] = None
+        if "total_score" in missing:
+            result["total_score"] = round(sum(
+                float(item.get("score", 0) or 0) for item in self.indicator_scores
+            ), 2)
+        result["parsed_honorary_awards"] = result["parsed_honors"]
+        result["attachment_classifications"] = []
+        result["partial"] = True
+        result["partial_missing"] = missing
+        return result
@@ -0,0 +1,264 @@
+"""
+异常数据检测
+
+检测规则以声明式规则表 ANOMALY_RULES 描述（自评表填写项数 vs AI解析出的附件数），
+单次评分与按年度批量重新检测共用同一份规则：
+- detect_anomalies: AI评分完成时检测单个自评表
+- AnomalyRedetectionService: 规则调整或人工修正后，按年度批量加载自评表与最新AI评分，
+  按列（每条规则一次遍历全部自评表）计算应有的异常，与现有异常记录比对后批量新增/关闭
+
+批量检测只处理 count_mismatch 类型、且仍为待处理（pending）的异常：
+- 仍然存在且数量未变：保持不动
+- 数量变化：关闭旧记录，新增一条待处理记录
+- 不再存在：关闭（status=resolved, handled_action=auto_resolved）
+已人工处理（handled）的记录不会被改动；数量与处理时一致时也不会重复生成。
+"""
+
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app.models.ai_score import AIScore
+from app.models.anomaly import Anomaly
+from app.models.self_evaluation import SelfEvaluation
+
+logger = logging.getLogger(__name__)
+
+COUNT_MISMATCH = "count_mismatch"
+RESOLVED_STATUS = "resolved"
+AUTO_RESOLVED_ACTION = "auto_resolved"
+
+
+@dataclass(frozen=True)
+class CountMismatchRule:
+    """填写项数与附件解析数量一致性规则"""
+    indicator: str
+    label: str
+    # 自评表 highlights 下的键
+    content_key: str
+    # AI评分数据中的字段
+    score_field: str
+    # AIScore 表中的列（旧评分记录未保存的列为 None）
+    score_column: str
+
+    def declared(self, content: Optional[Dict[str, Any]]) -> int:
+        highlights = (content or {}).get("highlights", {}) or {}
+        return len((highlights.get(self.content_key) or {}).get("items", []) or [])
+
+
+ANOMALY_RULES: Tuple[CountMismatchRule, ...] = (
+    CountMismatchRule("teaching_reform_projects", "教学改革项目", "teachingReformProjects",
+                      "parsed_reform_projects", "parsed_reform_projects"),
+    CountMismatchRule("teaching_honors", "荣誉表彰", "teachingHonors",
+                      "parsed_honors", "parsed_honorary_awards"),
+    CountMismatchRule("teaching_competitions", "教学比赛", "teachingCompetitions",
+                      "parsed_competitions", "parsed_competitions"),
+    CountMismatchRule("innovation_competitions", "创新创业比赛", "innovationCompetitions",
+                      "parsed_innovations", "parsed_innovations"),
+)
+
+
+def describe_count_mismatch(indicator_name: str, declared_count: int, parsed_count: int) -> str:
+    """生成清晰的异常对比说明 (需求 4.8)"""
+    diff = abs(declared_count - parsed_count)
+
+    if declared_count > parsed_count:
+        return (
+            f"自评表填写{declared_count}项{indicator_name}，"
+            f"但附件仅解析出{parsed_count}份证书，"
+            f"缺少{diff}份支撑材料。"
+            f"请核实是否存在遗漏上传或填写错误。"
+        )
+    return (
+        f"自评表填写{declared_count}项{indicator_name}，"
+        f"但附件解析出{parsed_count}份证书，"
+        f"多出{diff}份材料。"
+        f"请核实是否存在重复上传或分类错误。"
+    )
+
+
+def detect_anomalies(evaluation: SelfEvaluation, score_data: Dict[str, Any]) -> List[Anomaly]:
+    """按规则表检测单个自评表的异常（需求 4.7-4.10），异常状态为 pending 转人工复核"""
+    anomalies = []
+    for rule in ANOMALY_RULES:
+        declared = rule.declared(evaluation.content)
+        parsed = score_data.get(rule.score_field, 0)
+        if declared == parsed:
+            continue
+        description = describe_count_mismatch(rule.label, declared, parsed)
+        anomalies.append(Anomaly(
+            evaluation_id=evaluation.id,
+            type=COUNT_MISMATCH,
+            indicator=rule.indicator,
+            declared_count=declared,
+            parsed_count=parsed,
+            description=description,
+            status="pending",
+        ))
+        logger.warning(f"检测到异常: {description}")
+    return anomalies
+
+
+def evaluate_rules(
+    contents: Sequence[Optional[Dict[str, Any]]],
+    scores: Sequence[Dict[str, Optional[int]]],
+) -> Dict[str, List[Tuple[int, int, int]]]:
+    """
+    按列计算所有规则
+
+    Args:
+        contents: 自评表内容（与 scores 一一对应）
+        scores: 各自评表最新AI评分的解析数量（键为 AIScore 列名）
+
+    Returns:
+        Dict: 规则指标 -> [(行号, 填写项数, 解析数量)]，解析数量缺失的行不参与判断
+    """
+    results = {}
+    for rule in ANOMALY_RULES:
+        declared = [rule.declared(content) for content in contents]
+        parsed = [score.get(rule.score_column) for score in scores]
+        results[rule.indicator] = [
+            (row, d, p) for row, (d, p) in enumerate(zip(declared, parsed)) if p is not None and d != p
+        ]
+    return results
+
+
+class AnomalyRedetectionService:
+    """按年度批量重新检测异常"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def redetect_year(self, year: int, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        重新检测某年度全部已AI评分自评表的数量一致性异常
+
+        Args:
+            year: 考评年度
+            dry_run: 只计算差异，不写入
+
+        Returns:
+            Dict: 新增、关闭、保持不变的数量，以及各指标的不一致数和耗时
+        """
+        started = time.perf_counter()
+        contents = dict(
+            self.db.query(SelfEvaluation.id, SelfEvaluation.content)
+            .filter(SelfEvaluation.evaluation_year == year)
+            .all()
+        )
+
+        # 每个自评表取最新一次AI评分（按评分时间升序覆盖）
+        columns = [getattr(AIScore, rule.score_column) for rule in ANOMALY_RULES]
+        latest: Dict[UUID, Dict[str, Optional[int]]] = {}
+        for row in (
+            self.db.query(AIScore.evaluation_id, *columns)
+            .join(SelfEvaluation, SelfEvaluation.id == AIScore.evaluation_id)
+            .filter(SelfEvaluation.evaluation_year == year)
+            .order_by(AIScore.scored_at)
+        ):
+            latest[row.evaluation_id] = {rule.score_column: row[i + 1] for i, rule in enumerate(ANOMALY_RULES)}
+
+        evaluation_ids = list(latest)
+        mismatches = evaluate_rules(
+            [contents.get(evaluation_id) for evaluation_id in evaluation_ids],
+            [latest[evaluation_id] for evaluation_id in evaluation_ids],
+        )
+
+        desired: Dict[Tuple[UUID, str], Tuple[int, int]] = {}
+        labels = {rule.indicator: rule.label for rule in ANOMALY_RULES}
+        score_columns = {rule.indicator: rule.score_column for rule in ANOMALY_RULES}
+        for indicator, rows in mismatches.items():
+            for row, declared, parsed in rows:
+                desired[(evaluation_ids[row], indicator)] = (declared, parsed)
+
+        pending: Dict[Tuple[UUID, str], List[Any]] = {}
+        handled: Dict[Tuple[UUID, str], set] = {}
+        for anomaly in (
+            self.db.query(
+                Anomaly.id, Anomaly.evaluation_id, Anomaly.indicator,
+                Anomaly.declared_count, Anomaly.parsed_count, Anomaly.status,
+            )
+            .join(SelfEvaluation, SelfEvaluation.id == Anomaly.evaluation_id)
+            .filter(
+                SelfEvaluation.evaluation_year == year,
+                Anomaly.type == COUNT_MISMATCH,
+                Anomaly.indicator.in_(list(labels)),
+            )
+        ):
+            score = latest.get(anomaly.evaluation_id)
+            if score is None or score.get(score_columns[anomaly.indicator]) is None:
+                # 未评分或旧评分记录未保存该解析数量：无法判断，保留原记录
+                continue
+            key = (anomaly.evaluation_id, anomaly.indicator)
+            if anomaly.status == "pending":
+                pending.setdefault(key, []).append(anomaly)
+            elif anomaly.status == "handled":
+                handled.setdefault(key, set()).add((anomaly.declared_count, anomaly.parsed_count))
+
+        now = datetime.utcnow()
+        to_insert: List[Dict[str, Any]] = []
+        to_close: List[Dict[str, Any]] = []
+        unchanged = 0
+        for key in set(desired) | set(pending):
+            counts = desired.get(key)
+            keep = None
+            for anomaly in pending.get(key, []):
+                if keep is None and counts == (anomaly.declared_count, anomaly.parsed_count):
+                    keep = anomaly
+                else:
+                    to_close.append({
+                        "id": anomaly.id,
+                        "status": RESOLVED_STATUS,
+                        "handled_action": AUTO_RESOLVED_ACTION,
+                        "handled_at": now,
+                    })
+            if keep is not None:
+                unchanged += 1
+            elif counts is not None and counts not in handled.get(key, set()):
+                evaluation_id, indicator = key
+                declared, parsed = counts
+                to_insert.append({
+                    "id": uuid.uuid4(),
+                    "evaluation_id": evaluation_id,
+                    "type": COUNT_MISMATCH,
+                    "indicator": indicator,
+                    "declared_count": declared,
+                    "parsed_count": parsed,
+                    "description": describe_count_mismatch(labels[indicator], declared, parsed),
+                    "status": "pending",
+                })
+
+        if not dry_run:
+            if to_insert:
+                self.db.execute(insert(Anomaly), to_insert)
+            if to_close:
+                self.db.execute(update(Anomaly), to_close)
+            self.db.commit()
+
+        by_indicator = {rule.indicator: 0 for rule in ANOMALY_RULES}
+        for _, indicator in desired:
+            by_indicator[indicator] += 1
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(
+            f"重新检测 {year} 年度异常：{len(evaluation_ids)} 份已评分自评表，"
+            f"新增 {len(to_insert)}，关闭 {len(to_close)}，保持 {unchanged}，耗时 {elapsed_ms} ms"
+        )
+        return {
+            "year": year,
+            "dry_run": dry_run,
+            "evaluations": len(contents),
+            "scored_evaluations": len(evaluation_ids),
+            "rules": len(ANOMALY_RULES),
+            "inserted": len(to_insert),
+            "closed": len(to_close),
+            "unchanged": unchanged,
+            "mismatches_by_indicator": by_indicator,
+            "elapsed_ms": elapsed_ms,
+        }
@@ -0,0 +1,208 @@
+"""
+附件本地分类（字符 n-gram 朴素贝叶斯）
+
+以历史附件（classified_by 为 user 或 ai）的文件名与分类训练多项式朴素贝叶斯模型，
+上传时按文件名给出建议分类与置信度（suggested_indicator / classification_confidence），
+不修改用户选择的指标：
+- 建议与用户选择一致且置信度达到 ATTACHMENT_CLASSIFIER_CONFIDENCE 的附件视为已分类，
+  AI评分时不再请DeepSeek分类
+- 其余附件仍交由DeepSeek分类
+
+文件名关键词规则（local_prescorer）作为种子样本参与训练，历史数据很少时也能工作。
+模型在进程内缓存，超过 ATTACHMENT_CLASSIFIER_REFRESH_SECONDS 或管理端调整分类后重新训练。
+"""
+
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.attachment import Attachment
+from app.services.local_prescorer import attachment_category, filename_keywords
+
+logger = logging.getLogger(__name__)
+
+OTHER = "other"
+# 早期版本由模型直接改写分类的附件
+MODEL_CLASSIFIED = "model"
+TRAINING_SOURCES = ("user", "ai")
+
+_NGRAM_SIZES = (1, 2, 3)
+# 文件名中的数字、标点与扩展名不参与特征
+_NOISE_RE = re.compile(r"[\W\d_]+")
+
+
+def filename_features(file_name: str) -> List[str]:
+    """文件名（去扩展名、数字与标点）的字符 1-3 gram"""
+    stem = os.path.splitext(file_name or "")[0].lower()
+    features: List[str] = []
+    for segment in _NOISE_RE.split(stem):
+        for size in _NGRAM_SIZES:
+            features.extend(segment[i:i + size] for i in range(len(segment) - size + 1))
+    return features
+
+
+def training_label(indicator: Optional[str]) -> str:
+    """附件分类 -> 训练标签（常规教学等其他指标均归为 other）"""
+    return attachment_category(indicator) or OTHER
+
+
+def _seed_samples() -> List[Tuple[str, str]]:
+    """关键词规则中的每个关键词作为一条种子样本"""
+    return [(keyword, category) for category, keyword in filename_keywords()]
+
+
+@dataclass(frozen=True)
+class Prediction:
+    indicator: str
+    confidence: float
+
+
+class NaiveBayesClassifier:
+    """多项式朴素贝叶斯（拉普拉斯平滑）"""
+
+    def __init__(self, alpha: float = 1.0):
+        self.alpha = alpha
+        self.sample_count = 0
+        self._log_priors: Dict[str, float] = {}
+        self._log_likelihoods: Dict[str, Dict[str, float]] = {}
+        self._log_unseen: Dict[str, float] = {}
+        self._vocabulary: set = set()
+
+    def fit(self, samples: Iterable[Tuple[str, str]]) -> "NaiveBayesClassifier":
+        """
+        Args:
+            samples: (文件名, 标签)
+        """
+        doc_counts: Counter = Counter()
+        feature_counts: Dict[str, Counter] = {}
+        for file_name, label in samples:
+            doc_counts[label] += 1
+            feature_counts.setdefault(label, Counter()).update(filename_features(file_name))
+
+        self.sample_count = sum(doc_counts.values())
+        vocabulary = set()
+        for counts in feature_counts.values():
+            vocabulary.update(counts)
+        self._vocabulary = vocabulary
+        vocabulary_size = len(vocabulary) or 1
+
+        self._log_priors = {label: math.log(count / self.sample_count) for label, count in doc_counts.items()}
+        self._log_likelihoods = {}
+        self._log_unseen = {}
+        for label, counts in feature_counts.items():
+            denominator = math.log(sum(counts.values()) + self.alpha * vocabulary_size)
+            self._log_likelihoods[label] = {
+                feature: math.log(count + self.alpha) - denominator for feature, count in counts.items()
+            }
+            self._log_unseen[label] = math.log(self.alpha) - denominator
+        return self
+
+    def predict(self, file_name: str) -> Optional[Prediction]:
+        """返回后验概率最大的类别及其概率；未训练时返回None（未见过的特征不参与计算）"""
+        if not self._log_priors:
+            return None
+        features = [feature for feature in filename_features(file_name) if feature in self._vocabulary]
+        scores = {}
+        for label, log_prior in self._log_priors.items():
+            likelihoods = self._log_likelihoods[label]
+            unseen = self._log_unseen[label]
+            scores[label] = log_prior + sum(likelihoods.get(feature, unseen) for feature in features)
+
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        normalizer = sum(math.exp(score - top) for score in scores.values())
+        return Prediction(best, 1.0 / normalizer)
+
+
+# (过期时间, 模型)
+_cached_model: Optional[Tuple[float, NaiveBayesClassifier]] = None
+_model_lock = threading.Lock()
+
+
+def invalidate_attachment_classifier() -> None:
+    """分类样本变化后（如管理端调整分类）丢弃缓存的模型"""
+    global _cached_model
+    with _model_lock:
+        _cached_model = None
+
+
+class AttachmentClassifierService:
+    """附件本地分类服务"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def load_samples(self) -> List[Tuple[str, str]]:
+        """最近的人工/AI分类附件（最多 ATTACHMENT_CLASSIFIER_MAX_SAMPLES 条）"""
+        rows = (
+            self.db.query(Attachment.file_name, Attachment.indicator)
+            .filter(Attachment.classified_by.in_(TRAINING_SOURCES))
+            .order_by(Attachment.uploaded_at.desc())
+            .limit(settings.ATTACHMENT_CLASSIFIER_MAX_SAMPLES)
+            .all()
+        )
+        return [(file_name, training_label(indicator)) for file_name, indicator in rows]
+
+    def train(self) -> NaiveBayesClassifier:
+        started = time.perf_counter()
+        samples = self.load_samples()
+        model = NaiveBayesClassifier().fit(_seed_samples() + samples)
+        logger.info(
+            f"附件分类模型训练完成：{len(samples)} 条历史样本，"
+            f"耗时 {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+        return model
+
+    def get_model(self) -> NaiveBayesClassifier:
+        global _cached_model
+        now = time.monotonic()
+        with _model_lock:
+            cached = _cached_model
+        if cached and cached[0] > now:
+            return cached[1]
+        model = self.train()
+        with _model_lock:
+            _cached_model = (now + settings.ATTACHMENT_CLASSIFIER_REFRESH_SECONDS, model)
+        return model
+
+    def classify(self, file_name: str) -> Optional[Prediction]:
+        return self.get_model().predict(file_name)
+
+    def apply(self, attachment: Attachment) -> Optional[Prediction]:
+        """为新上传的附件记录模型的建议分类与置信度（用户选择的指标保持不变）"""
+        if not settings.ATTACHMENT_CLASSIFIER_ENABLED:
+            return None
+        prediction = self.classify(attachment.file_name)
+        if prediction is None:
+            return None
+        attachment.suggested_indicator = prediction.indicator
+        attachment.classification_confidence = round(prediction.confidence, 4)
+        return prediction
+
+
+def is_confidently_classified(attachment: Attachment) -> bool:
+    """
+    上传时的分类已得到本地模型高置信度确认，AI评分时无需再分类
+
+    模型建议为亮点类别、置信度达到阈值，且与用户选择的指标一致；
+    建议为 other 时用户选择的指标更具体，不视为确认。
+    """
+    if getattr(attachment, "classified_by", None) == MODEL_CLASSIFIED:
+        return True
+    suggested = getattr(attachment, "suggested_indicator", None)
+    confidence = getattr(attachment, "classification_confidence", None)
+    return (
+        suggested not in (None, OTHER)
+        and confidence is not None
+        and confidence >= settings.ATTACHMENT_CLASSIFIER_CONFIDENCE
+        and training_label(getattr(attachment, "indicator", None)) == suggested
+    )
@@ -0,0 +1,158 @@
+"""
+附件下载的 HTTP 缓存与断点续传
+
+- ETag 为内容哈希以 SECRET_KEY 计算的 HMAC（强校验），不直接暴露 SHA-256（否则可配合秒传引用他人的文件）；
+  没有哈希的早期附件使用弱校验值；Last-Modified 为上传时间
+- If-None-Match / If-Modified-Since 命中时返回 304
+- 支持单个区间的 Range 请求（206），If-Range 校验不通过时返回完整文件；多区间请求按完整文件返回
+- 本地存储的区间直接从文件路径定位读取（FileRangeResponse），不经过存储服务的文件流
+"""
+
+import hashlib
+import hmac
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Mapping, Optional, Tuple
+
+import anyio
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+from app.core.config import settings
+from app.models.attachment import Attachment
+
+
+class RangeNotSatisfiable(ValueError):
+    """Range 请求的起始位置超出文件大小（416）"""
+
+
+class FileRangeResponse(FileResponse):
+    """
+    本地文件的区间响应（206）
+
+    打开文件后定位到 start，按 chunk_size 分段读取 length 字节发送；
+    Content-Length / Content-Range 由调用方在 headers 中给出。
+    """
+
+    def __init__(self, path: str, start: int, length: int, chunk_size: int, **kwargs):
+        super().__init__(path, **kwargs)
+        self.start = start
+        self.length = length
+        self.chunk_size = chunk_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() != "HEAD":
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(self.start)
+                remaining = self.length
+                while remaining > 0:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
+
+
+def entity_tag(attachment: Attachment) -> str:
+    """附件的 ETag：内容哈希相同即内容相同"""
+    if attachment.content_hash:
+        digest = hmac.new(
+            settings.SECRET_KEY.encode("utf-8"), attachment.content_hash.encode("ascii"), hashlib.sha256
+        ).hexdigest()
+        return f'"{digest[:32]}"'
+    return f'W/"{attachment.id.hex}-{attachment.file_size}"'
+
+
+def last_modified(attachment: Attachment) -> datetime:
+    """附件的最后修改时间（上传后内容不再变化），精确到秒"""
+    return attachment.uploaded_at.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value, usegmt=True)
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _etag_matches(header: str, etag: str, weak: bool) -> bool:
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    if weak:
+        # If-None-Match 使用弱比较：忽略 W/ 前缀
+        return _opaque(etag) in {_opaque(tag) for tag in candidates}
+    return not etag.startswith("W/") and etag in candidates
+
+
+def _opaque(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(headers: Mapping[str, str], etag: str, modified: datetime) -> bool:
+    """条件请求是否命中缓存（304）；同时提供 If-None-Match 时忽略 If-Modified-Since"""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match:
+        return _etag_matches(if_none_match, etag, weak=True)
+    since = _parse_http_date(headers.get("if-modified-since"))
+    return since is not None and modified <= since
+
+
+def requested_range(
+    headers: Mapping[str, str], size: int, etag: str, modified: datetime
+) -> Optional[Tuple[int, int]]:
+    """
+    解析 Range 请求头
+
+    Returns:
+        Optional[Tuple[int, int]]: 请求的区间 [start, end]（含 end）；应返回完整文件时为 None
+
+    Raises:
+        RangeNotSatisfiable: 区间起始位置超出文件大小
+    """
+    header = headers.get("range")
+    if not header:
+        return None
+
+    # If-Range：客户端缓存的部分内容已过期时返回完整文件
+    if_range = headers.get("if-range")
+    if if_range:
+        if if_range.strip().startswith(('"', 'W/"')):
+            if not _etag_matches(if_range, etag, weak=False):
+                return None
+        else:
+            since = _parse_http_date(if_range)
+            if since is None or modified != since:
+                return None
+
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = (part.strip() for part in spec.partition("-"))
+    if not sep or not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        end = int(last) if last else size - 1
+    else:
+        # 后缀区间：最后 N 个字节
+        suffix = int(last)
+        if suffix == 0:
+            raise RangeNotSatisfiable(header)
+        start, end = max(size - suffix, 0), size - 1
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, size - 1)
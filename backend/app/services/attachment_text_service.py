@@ -0,0 +1,333 @@
+"""
+附件正文提取服务
+
+附件上传后在进程池中提取 PDF / DOCX / 纯文本的正文，按文件内容SHA256缓存到
+attachment_texts 表；AI评分时只读取缓存的正文，评分耗时不包含提取过程。
+
+- PDF 依赖可选的 pypdf，未安装时记为 unsupported
+- DOCX 直接解析 word/document.xml，无需额外依赖
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import re
+import zipfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from xml.etree import ElementTree
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.attachment import Attachment
+from app.models.attachment_text import AttachmentText
+from app.services.minio_service import minio_service
+
+try:
+    from pypdf import PdfReader
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+# document.xml 解压后大小上限，防止压缩炸弹
+_DOCX_MAX_XML_SIZE = 64 * 1024 * 1024
+_WHITESPACE_RE = re.compile(r"[ \t\r\f\v　]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+_TEXT_EXTENSIONS = (".txt", ".md", ".csv")
+
+
+@dataclass
+class _PendingFile:
+    """待提取正文的文件，内容在提取时才读取"""
+    size: int
+    file_name: str
+    content_type: Optional[str]
+    load: Callable[[], Optional[bytes]]
+
+
+@dataclass
+class ExtractionResult:
+    """单个文件的提取结果"""
+    extractor: str
+    status: str  # succeeded, failed, unsupported
+    text: str = ""
+    char_count: int = 0
+    error: Optional[str] = None
+
+
+def content_hash(content: bytes) -> str:
+    """计算文件内容SHA256"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def normalize_text(text: str) -> str:
+    """规整空白：合并行内空白，去掉空行堆积"""
+    lines = [_WHITESPACE_RE.sub(" ", line).strip() for line in text.splitlines()]
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def _detect_extractor(file_name: str, content_type: Optional[str]) -> Optional[str]:
+    name = (file_name or "").lower()
+    content_type = (content_type or "").lower()
+    if name.endswith(".pdf") or content_type == "application/pdf":
+        return "pdf"
+    if name.endswith(".docx") or "wordprocessingml" in content_type:
+        return "docx"
+    if name.endswith(_TEXT_EXTENSIONS) or content_type.startswith("text/"):
+        return "text"
+    return None
+
+
+def _extract_pdf(content: bytes) -> str:
+    reader = PdfReader(io.BytesIO(content))
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def _extract_docx(content: bytes) -> str:
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        info = archive.getinfo("word/document.xml")
+        if info.file_size > _DOCX_MAX_XML_SIZE:
+            raise ValueError("DOCX正文过大")
+        root = ElementTree.fromstring(archive.read(info))
+
+    paragraphs = []
+    for paragraph in root.iter(f"{_WORD_NS}p"):
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == f"{_WORD_NS}t" and node.text:
+                parts.append(node.text)
+            elif node.tag == f"{_WORD_NS}tab":
+                parts.append("\t")
+            elif node.tag in (f"{_WORD_NS}br", f"{_WORD_NS}cr"):
+                parts.append("\n")
+        paragraphs.append("".join(parts))
+    return "\n".join(paragraphs)
+
+
+def _extract_plain(content: bytes) -> str:
+    for encoding in ("utf-8-sig", "gb18030"):
+        try:
+            return content.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return content.decode("utf-8", errors="replace")
+
+
+def extract_text(content: bytes, file_name: str, content_type: Optional[str], max_chars: int) -> ExtractionResult:
+    """
+    提取文件正文（在进程池中执行，须为模块级函数）
+
+    Args:
+        content: 文件内容
+        file_name: 原始文件名（用于判断类型）
+        content_type: MIME类型
+        max_chars: 保存的正文长度上限
+
+    Returns:
+        ExtractionResult: 提取结果，失败时不抛异常
+    """
+    extractor = _detect_extractor(file_name, content_type)
+    if extractor is None:
+        return ExtractionResult(extractor="none", status="unsupported", error="不支持的文件类型")
+    if extractor == "pdf" and not PYPDF_AVAILABLE:
+        return ExtractionResult(extractor="pdf", status="unsupported", error="未安装pypdf，无法提取PDF正文")
+
+    try:
+        if extractor == "pdf":
+            raw = _extract_pdf(content)
+        elif extractor == "docx":
+            raw = _extract_docx(content)
+        else:
+            raw = _extract_plain(content)
+    except Exception as e:
+        return ExtractionResult(extractor=extractor, status="failed", error=f"{type(e).__name__}: {e}")
+
+    text = normalize_text(raw)
+    return ExtractionResult(
+        extractor=extractor,
+        status="succeeded",
+        text=text[:max_chars],
+        char_count=len(text),
+    )
+
+
+_executor: Optional[Executor] = None
+
+
+def _get_executor() -> Optional[Executor]:
+    global _executor
+    if settings.ATTACHMENT_TEXT_WORKERS <= 0:
+        return None
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.ATTACHMENT_TEXT_WORKERS)
+    return _executor
+
+
+def shutdown_extraction_pool() -> None:
+    """关闭提取进程池（应用关闭时调用）"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def run_extraction(content: bytes, file_name: str, content_type: Optional[str]) -> ExtractionResult:
+    """在进程池中提取正文，不阻塞事件循环"""
+    executor = _get_executor()
+    args = (content, file_name, content_type, settings.ATTACHMENT_TEXT_MAX_CHARS)
+    if executor is None:
+        return await asyncio.to_thread(extract_text, *args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, extract_text, *args)
+
+
+class AttachmentTextService:
+    """附件正文服务类"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _session(self) -> Session:
+        return Session(bind=self.db.get_bind())
+
+    async def extract_and_store(self, items: Iterable[Tuple[str, bytes, str, Optional[str]]]) -> Dict[str, str]:
+        """
+        提取并缓存一批文件的正文（已缓存的内容哈希直接跳过）
+
+        Args:
+            items: (内容哈希, 文件内容, 文件名, MIME类型)
+
+        Returns:
+            Dict[str, str]: 内容哈希 -> 提取状态
+        """
+        unique: Dict[str, _PendingFile] = {}
+        for digest, content, file_name, content_type in items:
+            unique.setdefault(digest, _PendingFile(len(content), file_name, content_type, lambda content=content: content))
+        return await self._extract_missing(unique)
+
+    async def extract_stored(self, items: Iterable[Tuple[str, str, int, str, Optional[str]]]) -> Dict[str, str]:
+        """
+        提取并缓存已写入存储的文件的正文
+
+        文件逐个从存储读取，内存中最多同时保留一个文件；超过 ATTACHMENT_TEXT_MAX_FILE_SIZE 的文件不读取。
+
+        Args:
+            items: (内容哈希, 存储路径, 文件大小, 文件名, MIME类型)
+
+        Returns:
+            Dict[str, str]: 内容哈希 -> 提取状态
+        """
+        unique: Dict[str, _PendingFile] = {}
+        for digest, storage_path, size, file_name, content_type in items:
+            unique.setdefault(
+                digest,
+                _PendingFile(size, file_name, content_type, partial(minio_service.read_file_bytes, storage_path)),
+            )
+        return await self._extract_missing(unique)
+
+    async def _extract_missing(self, unique: Dict[str, _PendingFile]) -> Dict[str, str]:
+        if not unique:
+            return {}
+
+        session = self._session()
+        try:
+            cached = {
+                row.content_hash: row.status
+                for row in session.query(AttachmentText.content_hash, AttachmentText.status)
+                .filter(AttachmentText.content_hash.in_(list(unique)))
+                .all()
+            }
+        finally:
+            session.close()
+
+        statuses = dict(cached)
+        for digest, pending in unique.items():
+            if digest in cached:
+                continue
+            if pending.size > settings.ATTACHMENT_TEXT_MAX_FILE_SIZE:
+                result = ExtractionResult(extractor="none", status="unsupported", error="文件过大，跳过正文提取")
+            else:
+                content = await asyncio.to_thread(pending.load)
+                if content is None:
+                    # 存储中读不到文件，不缓存结果，下次上传相同内容时重试
+                    logger.warning(f"附件正文提取时读取文件失败，文件: {pending.file_name}")
+                    continue
+                result = await run_extraction(content, pending.file_name, pending.content_type)
+            self._store(digest, result)
+            statuses[digest] = result.status
+            if result.status == "failed":
+                logger.warning(f"附件正文提取失败，文件: {pending.file_name}, error: {result.error}")
+        return statuses
+
+    def _store(self, digest: str, result: ExtractionResult) -> None:
+        session = self._session()
+        try:
+            session.add(AttachmentText(
+                content_hash=digest,
+                extractor=result.extractor,
+                status=result.status,
+                text=result.text or None,
+                char_count=result.char_count,
+                error=result.error,
+                created_at=datetime.utcnow(),
+            ))
+            session.commit()
+        except IntegrityError:
+            # 同一内容被并发提取，已有结果即可
+            session.rollback()
+        except Exception as e:
+            session.rollback()
+            logger.warning(f"保存附件正文失败: {str(e)}")
+        finally:
+            session.close()
+
+    def get_texts(self, attachments: Sequence[Attachment]) -> Dict[Any, str]:
+        """
+        读取附件已缓存的正文（一次查询）
+
+        Returns:
+            Dict: 附件ID -> 正文；没有正文的附件不在结果中
+        """
+        by_hash: Dict[str, List[Any]] = {}
+        for attachment in attachments:
+            if attachment.content_hash:
+                by_hash.setdefault(attachment.content_hash, []).append(attachment.id)
+        if not by_hash:
+            return {}
+
+        rows = (
+            self.db.query(AttachmentText.content_hash, AttachmentText.text)
+            .filter(
+                AttachmentText.content_hash.in_(list(by_hash)),
+                AttachmentText.status == "succeeded",
+            )
+            .all()
+        )
+        texts: Dict[Any, str] = {}
+        for digest, text in rows:
+            if not text:
+                continue
+            for attachment_id in by_hash[digest]:
+                texts[attachment_id] = text
+        return texts
+
+
+async def extract_uploaded_attachments(bind: Any, items: List[Tuple[str, str, int, str, Optional[str]]]) -> None:
+    """上传接口的后台任务：从存储读取本次上传的文件并提取正文"""
+    db = Session(bind=bind)
+    try:
+        await AttachmentTextService(db).extract_stored(items)
+    except Exception as e:
+        logger.exception(f"附件正文提取任务失败: {str(e)}")
+    finally:
+        db.close()
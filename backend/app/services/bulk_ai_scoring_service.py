@@ -0,0 +1,250 @@
+"""
+批量AI评分服务
+
+管理端一次性为多个已提交（locked）的自评表触发AI评分：
+- 通过AI评分任务队列入队（与教研室端触发去重）
+- 以有限并发直接执行本批任务，总耗时约为 任务数 / 并发数 × 单次评分耗时
+- 以 Server-Sent Events 逐条推送进度，最后推送失败汇总
+
+客户端中途断开时，尚未开始的任务留在队列中由后台worker继续处理。
+
+评分进度页另通过 stream_job_progress 订阅评分任务进度（含流式评分已收到的指标数）。
+"""
+
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.indicators import REGULAR_TEACHING_INDICATORS
+from app.models.ai_score import AIScore
+from app.models.ai_scoring_job import AIScoringJob
+from app.models.self_evaluation import SelfEvaluation
+from app.models.teaching_office import TeachingOffice
+from app.services.ai_scoring_queue import (
+    ACTIVE_JOB_STATUSES,
+    AIScoringJobService,
+    AIScoringWorkerPool,
+    ai_scoring_workers,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """格式化一条 SSE 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+class BulkAIScoringService:
+    """批量AI评分服务类"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def prepare_batch(
+        self,
+        year: Optional[int] = None,
+        evaluation_ids: Optional[List[UUID]] = None,
+        requested_by: Optional[UUID] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        选取待AI评分的自评表并入队
+
+        仅选取 locked 状态且尚无AI评分的自评表（一次查询）。
+
+        Args:
+            year: 考评年度
+            evaluation_ids: 指定自评表ID；为空时选取全部符合条件的自评表
+            requested_by: 触发人ID
+
+        Returns:
+            List[Dict]: 本批任务 evaluation_id, teaching_office_name, job_id, created
+        """
+        query = (
+            self.db.query(SelfEvaluation.id, TeachingOffice.name)
+            .outerjoin(TeachingOffice, SelfEvaluation.teaching_office_id == TeachingOffice.id)
+            .outerjoin(AIScore, AIScore.evaluation_id == SelfEvaluation.id)
+            .filter(SelfEvaluation.status == "locked", AIScore.id.is_(None))
+        )
+        if year is not None:
+            query = query.filter(SelfEvaluation.evaluation_year == year)
+        if evaluation_ids:
+            query = query.filter(SelfEvaluation.id.in_(evaluation_ids))
+        rows = query.order_by(SelfEvaluation.submitted_at).all()
+        if not rows:
+            return []
+
+        jobs = AIScoringJobService(self.db).enqueue_many([row.id for row in rows], requested_by)
+        return [
+            {
+                "evaluation_id": str(row.id),
+                "teaching_office_name": row.name,
+                "job_id": job.id,
+                "created": created,
+            }
+            for row, (job, created) in zip(rows, jobs)
+        ]
+
+
+async def stream_bulk_scoring(
+    batch: List[Dict[str, Any]],
+    concurrency: Optional[int] = None,
+    pool: Optional[AIScoringWorkerPool] = None,
+) -> AsyncIterator[str]:
+    """
+    以有限并发执行本批任务并生成 SSE 进度事件
+
+    事件:
+        start:    total, concurrency
+        progress: evaluation_id, teaching_office_name, job_id, status, error, completed, total, duration_ms
+        summary:  total, succeeded, failed, retry_scheduled, skipped, duration_ms, failures
+    """
+    pool = pool or ai_scoring_workers
+    concurrency = max(1, concurrency or settings.AI_SCORING_BULK_CONCURRENCY)
+    total = len(batch)
+    started = time.monotonic()
+    semaphore = asyncio.Semaphore(concurrency)
+    results: asyncio.Queue = asyncio.Queue()
+    abandoned = False
+
+    async def run_item(item: Dict[str, Any]) -> None:
+        async with semaphore:
+            if abandoned:
+                return
+            item_started = time.monotonic()
+            try:
+                claimed = await asyncio.to_thread(pool.claim_job, item["job_id"], "bulk")
+                if claimed:
+                    outcome = await pool.run_job(item["job_id"])
+                else:
+                    # 已被后台worker认领或已结束
+                    outcome = {"status": "skipped", "error": "任务已由其他worker处理"}
+            except Exception as e:
+                logger.error(f"批量AI评分执行失败，evaluation_id: {item['evaluation_id']}, error: {str(e)}")
+                outcome = {"status": "failed", "error": str(e)}
+            outcome["duration_ms"] = round((time.monotonic() - item_started) * 1000)
+            await results.put((item, outcome))
+
+    yield format_sse("start", {"total": total, "concurrency": concurrency})
+
+    tasks = [asyncio.create_task(run_item(item)) for item in batch]
+    counts = {"succeeded": 0, "failed": 0, "queued": 0, "skipped": 0}
+    failures = []
+    try:
+        for completed in range(1, total + 1):
+            item, outcome = await results.get()
+            status = outcome["status"]
+            if status == "queued":
+                status = "retry_scheduled"
+                counts["queued"] += 1
+            elif status in counts:
+                counts[status] += 1
+            else:
+                counts["failed"] += 1
+            if status in ("failed", "retry_scheduled", "missing"):
+                failures.append({
+                    "evaluation_id": item["evaluation_id"],
+                    "teaching_office_name": item["teaching_office_name"],
+                    "status": status,
+                    "error": outcome.get("error"),
+                })
+            yield format_sse("progress", {
+                "evaluation_id": item["evaluation_id"],
+                "teaching_office_name": item["teaching_office_name"],
+                "job_id": str(item["job_id"]),
+                "status": status,
+                "error": outcome.get("error"),
+                "completed": completed,
+                "total": total,
+                "duration_ms": outcome["duration_ms"],
+            })
+    finally:
+        # 客户端断开：未开始的任务不再认领，留给后台worker；已开始的任务继续完成
+        abandoned = True
+
+    await asyncio.gather(*tasks, return_exceptions=True)
+    yield format_sse("summary", {
+        "total": total,
+        "succeeded": counts["succeeded"],
+        "failed": counts["failed"],
+        "retry_scheduled": counts["queued"],
+        "skipped": counts["skipped"],
+        "duration_ms": round((time.monotonic() - started) * 1000),
+        "failures": failures,
+    })
+
+
+async def stream_job_progress(
+    year: Optional[int] = None,
+    poll_interval: Optional[float] = None,
+    session_factory: Optional[Callable[[], Session]] = None,
+    max_polls: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """
+    轮询评分任务表，推送进度变化的 SSE 事件
+
+    每轮只查询进行中或自上一轮以来有更新的任务，状态或已收到指标数变化时推送。
+
+    事件:
+        progress: evaluation_id, job_id, status, indicators_received, indicators_total,
+                  partial_scores, last_error
+    """
+    poll_interval = poll_interval or settings.AI_PROGRESS_POLL_INTERVAL
+    session_factory = session_factory or ai_scoring_workers.session_factory
+    indicators_total = len(REGULAR_TEACHING_INDICATORS)
+    last_seen: Dict[str, tuple] = {}
+    since = None
+    polls = 0
+
+    while max_polls is None or polls < max_polls:
+        polls += 1
+        poll_started = datetime.utcnow()
+        rows = await asyncio.to_thread(_load_job_progress, session_factory, year, since)
+        since = poll_started
+        for job in rows:
+            state = (job.status, job.indicators_received or 0)
+            job_key = str(job.id)
+            if last_seen.get(job_key) == state:
+                continue
+            last_seen[job_key] = state
+            yield format_sse("progress", {
+                "evaluation_id": str(job.evaluation_id),
+                "job_id": job_key,
+                "status": job.status,
+                "indicators_received": job.indicators_received or 0,
+                "indicators_total": indicators_total,
+                "partial_scores": job.partial_scores or [],
+                "last_error": job.last_error,
+            })
+        if max_polls is None or polls < max_polls:
+            await asyncio.sleep(poll_interval)
+
+
+def _load_job_progress(
+    session_factory: Callable[[], Session],
+    year: Optional[int],
+    since: Optional[datetime],
+) -> List[AIScoringJob]:
+    db = session_factory()
+    try:
+        condition = AIScoringJob.status.in_(ACTIVE_JOB_STATUSES)
+        if since is not None:
+            condition = or_(condition, AIScoringJob.updated_at >= since)
+        query = db.query(AIScoringJob).filter(condition)
+        if year is not None:
+            query = query.join(SelfEvaluation, SelfEvaluation.id == AIScoringJob.evaluation_id).filter(
+                SelfEvaluation.evaluation_year == year
+            )
+        rows = query.order_by(AIScoringJob.updated_at).all()
+        db.expunge_all()
+        return rows
+    finally:
+        db.close()
@@ -0,0 +1,317 @@
+"""
+分块上传服务
+
+会话与已接收的分块保存在 upload_sessions / upload_chunks 表中，多个worker进程共享：
+
+- 分块可以落在任意worker上、并行乱序到达；每个分块写入独立的临时对象，
+  以 (upload_id, chunk_index) 为主键登记，重复或并发上传同一分块只保留一份
+- 完成时把会话从 uploading 条件更新为 merging，只有一个worker执行合并：
+  MinIO 用 compose_object（分块不小于5MiB）或分段上传，本地存储用 copy_file_range 拼接，
+  合并结果纳入内容寻址存储（相同内容只保留一份）
+- 每收到一个分块顺延有效期；过期未完成的会话由存储清理任务（StorageJanitor）删除其分块
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import BinaryIO, List, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.error_handling import ChunkedUploadManager
+from app.models.attachment import Attachment
+from app.models.upload_session import UploadChunk, UploadSession
+from app.models.user import User
+from app.services.attachment_classifier import AttachmentClassifierService
+from app.services.content_store import ContentStore
+from app.services.minio_service import MINIO_MAX_COMPOSE_SOURCES, minio_service
+from app.services.storage_stream import attachment_storage_path
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("uploading", "merging")
+
+
+class ChunkedUploadError(ValueError):
+    """分块上传请求无效或会话状态不允许该操作"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def chunk_prefix(upload_id: UUID) -> str:
+    """会话临时分块的存储前缀"""
+    return f"chunks/{upload_id}"
+
+
+class ChunkedUploadService:
+    """分块上传服务类"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _expires_at(self, now: datetime) -> datetime:
+        return now + timedelta(seconds=settings.CHUNKED_UPLOAD_SESSION_TTL)
+
+    def create_session(
+        self,
+        user: User,
+        evaluation_id: UUID,
+        indicator: str,
+        file_name: str,
+        file_size: int,
+        chunk_size: Optional[int] = None,
+        content_type: Optional[str] = None
+    ) -> UploadSession:
+        """
+        创建上传会话
+
+        Raises:
+            ChunkedUploadError: 文件大小或分块大小无效
+        """
+        chunk_size = chunk_size or ChunkedUploadManager.DEFAULT_CHUNK_SIZE
+        if file_size <= 0:
+            raise ChunkedUploadError("文件为空，无法上传")
+        if chunk_size <= 0 or chunk_size > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+            raise ChunkedUploadError(f"分块大小须在 1 到 {settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE} 字节之间")
+        total_chunks = ChunkedUploadManager.calculate_chunks(file_size, chunk_size)
+        if total_chunks > MINIO_MAX_COMPOSE_SOURCES:
+            raise ChunkedUploadError(f"分块数不能超过 {MINIO_MAX_COMPOSE_SOURCES}，请增大分块大小")
+
+        now = datetime.utcnow()
+        session = UploadSession(
+            id=uuid4(),
+            user_id=user.id,
+            evaluation_id=evaluation_id,
+            indicator=indicator,
+            file_name=file_name,
+            file_size=file_size,
+            content_type=content_type,
+            chunk_size=chunk_size,
+            total_chunks=total_chunks,
+            status="uploading",
+            created_at=now,
+            updated_at=now,
+            expires_at=self._expires_at(now),
+        )
+        self.db.add(session)
+        self.db.commit()
+        return session
+
+    def get_session(self, upload_id: UUID, user: User) -> UploadSession:
+        """
+        获取当前用户的上传会话
+
+        Raises:
+            ChunkedUploadError: 会话不存在、属于其他用户或已过期（404）
+        """
+        session = self.db.get(UploadSession, upload_id)
+        if session is None or session.user_id != user.id or session.status == "expired":
+            raise ChunkedUploadError("上传会话不存在或已过期", status_code=404)
+        return session
+
+    def expected_chunk_size(self, session: UploadSession, chunk_index: int) -> int:
+        if chunk_index == session.total_chunks - 1:
+            return session.file_size - session.chunk_size * (session.total_chunks - 1)
+        return session.chunk_size
+
+    def uploaded_chunks(self, session: UploadSession) -> List[int]:
+        rows = (
+            self.db.query(UploadChunk.chunk_index)
+            .filter(UploadChunk.upload_id == session.id)
+            .order_by(UploadChunk.chunk_index)
+            .all()
+        )
+        return [row.chunk_index for row in rows]
+
+    def missing_chunks(self, session: UploadSession) -> List[int]:
+        uploaded = set(self.uploaded_chunks(session))
+        return [index for index in range(session.total_chunks) if index not in uploaded]
+
+    async def accept_chunk(self, session: UploadSession, chunk_index: int, source: BinaryIO) -> str:
+        """
+        接收一个分块
+
+        Returns:
+            str: uploaded（本次写入）或 already_uploaded（此前已接收，断点续传时跳过）
+
+        Raises:
+            ChunkedUploadError: 分块索引或大小无效、会话已在合并
+        """
+        if session.status != "uploading":
+            raise ChunkedUploadError("上传已完成或正在合并，不再接收分块", status_code=409)
+        if chunk_index < 0 or chunk_index >= session.total_chunks:
+            raise ChunkedUploadError(f"无效的分块索引: {chunk_index}")
+        if self.db.get(UploadChunk, (session.id, chunk_index)) is not None:
+            return "already_uploaded"
+
+        # 每次写入独立的对象：并发上传同一分块时互不覆盖，登记失败的一方删除自己的对象
+        storage_path = f"{chunk_prefix(session.id)}/{chunk_index:05d}-{uuid4().hex}"
+        stored = await asyncio.to_thread(minio_service.upload_stream, storage_path, source)
+        if stored is None:
+            raise ChunkedUploadError("分块上传失败", status_code=500)
+        expected = self.expected_chunk_size(session, chunk_index)
+        if stored.size != expected:
+            await asyncio.to_thread(minio_service.delete_file, storage_path)
+            raise ChunkedUploadError(f"分块 {chunk_index} 大小不符：应为 {expected} 字节，实际 {stored.size} 字节")
+
+        now = datetime.utcnow()
+        self.db.add(UploadChunk(
+            upload_id=session.id,
+            chunk_index=chunk_index,
+            size=stored.size,
+            sha256=stored.sha256,
+            storage_path=storage_path,
+            created_at=now,
+        ))
+        self.db.execute(
+            update(UploadSession)
+            .where(UploadSession.id == session.id)
+            .values(updated_at=now, expires_at=self._expires_at(now))
+        )
+        try:
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            await asyncio.to_thread(minio_service.delete_file, storage_path)
+            return "already_uploaded"
+        return "uploaded"
+
+    async def complete(self, session: UploadSession) -> Attachment:
+        """
+        合并全部分块并创建附件记录
+
+        重复调用已完成的会话时返回同一附件。
+
+        Raises:
+            ChunkedUploadError: 分块缺失、其他请求正在合并或合并失败
+        """
+        if session.status == "completed" and session.attachment_id:
+            attachment = self.db.get(Attachment, session.attachment_id)
+            if attachment is not None:
+                return attachment
+        if session.status != "uploading":
+            raise ChunkedUploadError("分块正在合并，请稍后查询上传状态", status_code=409)
+        missing = self.missing_chunks(session)
+        if missing:
+            raise ChunkedUploadError(f"上传未完成，缺失分块: {missing}")
+
+        # 条件更新：多个worker同时收到完成请求时只有一个执行合并
+        now = datetime.utcnow()
+        claimed = self.db.execute(
+            update(UploadSession)
+            .where(UploadSession.id == session.id, UploadSession.status == "uploading")
+            .values(status="merging", updated_at=now, expires_at=self._expires_at(now))
+        ).rowcount
+        self.db.commit()
+        if not claimed:
+            raise ChunkedUploadError("分块正在合并，请稍后查询上传状态", status_code=409)
+        self.db.refresh(session)
+
+        chunks = (
+            self.db.query(UploadChunk)
+            .filter(UploadChunk.upload_id == session.id)
+            .order_by(UploadChunk.chunk_index)
+            .all()
+        )
+        content_type = session.content_type or "application/octet-stream"
+        storage_path = attachment_storage_path(session.evaluation_id, session.indicator, session.file_name)
+        stored = await asyncio.to_thread(
+            minio_service.merge_objects,
+            storage_path,
+            [(chunk.storage_path, chunk.size) for chunk in chunks],
+            content_type,
+            session.file_name,
+        )
+        if stored is None or stored.size != session.file_size:
+            if stored is not None:
+                await asyncio.to_thread(minio_service.delete_file, storage_path)
+            session.status = "uploading"
+            self.db.commit()
+            raise ChunkedUploadError("合并分块失败，请重试", status_code=500)
+        storage_path = await asyncio.to_thread(ContentStore(self.db).adopt, storage_path, stored, content_type)
+
+        now = datetime.utcnow()
+        attachment = Attachment(
+            evaluation_id=session.evaluation_id,
+            indicator=session.indicator,
+            file_name=session.file_name,
+            file_size=stored.size,
+            file_type=content_type,
+            storage_path=storage_path,
+            content_hash=stored.sha256,
+            classified_by="user",
+            uploaded_at=now,
+            is_archived=True,
+            archived_at=now,
+        )
+        try:
+            AttachmentClassifierService(self.db).apply(attachment)
+            self.db.add(attachment)
+            self.db.flush()
+            session.status = "completed"
+            session.attachment_id = attachment.id
+            self.db.execute(delete(UploadChunk).where(UploadChunk.upload_id == session.id))
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            await asyncio.to_thread(ContentStore(self.db).discard, storage_path, stored.sha256)
+            session.status = "uploading"
+            self.db.commit()
+            raise
+        self.db.refresh(attachment)
+
+        await asyncio.to_thread(minio_service.delete_prefix, chunk_prefix(session.id))
+        return attachment
+
+    def expire_sessions(self, now: Optional[datetime] = None, limit: int = 100) -> int:
+        """
+        清理过期的上传会话：删除未完成会话的分块，并删除早已结束的会话记录
+
+        Returns:
+            int: 本次过期的未完成会话数
+        """
+        now = now or datetime.utcnow()
+        candidates = [
+            row.id
+            for row in self.db.query(UploadSession.id)
+            .filter(UploadSession.status.in_(ACTIVE_STATUSES), UploadSession.expires_at < now)
+            .limit(limit)
+            .all()
+        ]
+        expired = 0
+        for upload_id in candidates:
+            # 条件更新：多个worker同时清理时只有一个删除分块；期间刚收到分块的会话已顺延，不会命中
+            claimed = self.db.execute(
+                update(UploadSession)
+                .where(
+                    UploadSession.id == upload_id,
+                    UploadSession.status.in_(ACTIVE_STATUSES),
+                    UploadSession.expires_at < now,
+                )
+                .values(status="expired", updated_at=now)
+            ).rowcount
+            self.db.commit()
+            if not claimed:
+                continue
+            minio_service.delete_prefix(chunk_prefix(upload_id))
+            self.db.execute(delete(UploadChunk).where(UploadChunk.upload_id == upload_id))
+            self.db.commit()
+            expired += 1
+
+        retention = timedelta(seconds=settings.CHUNKED_UPLOAD_SESSION_TTL)
+        self.db.execute(
+            delete(UploadSession).where(
+                UploadSession.status.in_(("completed", "expired")),
+                UploadSession.updated_at < now - retention,
+            )
+        )
+        self.db.commit()
+        if expired:
+            logger.info(f"清理过期分块上传会话 {expired} 个")
+        return expired
@@ -0,0 +1,244 @@
+"""
+学院看板统计服务
+
+按学院汇总其下各教研室的考评结果：
+- 平均最终得分
+- 教研室得分排名
+- 常规教学指标平均失分率（薄弱环节分析）
+
+统计结果按 (学院, 年度) 缓存，写入AI评分/手动评分/最终得分并提交后自动失效。
+"""
+
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import settings
+from app.core.indicators import REGULAR_INDICATOR_MAX_SCORE, regular_indicator_label
+from app.models.ai_score import AIScore
+from app.models.final_score import FinalScore
+from app.models.manual_score import ManualScore
+from app.models.self_evaluation import SelfEvaluation
+from app.models.teaching_office import TeachingOffice
+
+# 缓存: (college_id, year) -> (过期时间戳, 统计结果)
+_stats_cache: Dict[Tuple[str, Optional[int]], Tuple[float, Dict[str, Any]]] = {}
+_cache_lock = threading.Lock()
+
+_DIRTY_FLAG = "college_stats_dirty"
+
+
+def invalidate_college_stats_cache() -> None:
+    """清空学院看板统计缓存"""
+    with _cache_lock:
+        _stats_cache.clear()
+
+
+def _mark_session_dirty(mapper, connection, target) -> None:
+    """评分记录写入时标记会话，待事务提交后再失效缓存"""
+    session = object_session(target)
+    if session is not None:
+        session.info[_DIRTY_FLAG] = True
+
+
+for _score_model in (AIScore, ManualScore, FinalScore):
+    event.listen(_score_model, "after_insert", _mark_session_dirty)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session) -> None:
+    if session.info.pop(_DIRTY_FLAG, False):
+        invalidate_college_stats_cache()
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_flag_on_rollback(session) -> None:
+    session.info.pop(_DIRTY_FLAG, None)
+
+
+class CollegeStatsService:
+    """学院看板统计服务类"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_dashboard_stats(self, college_id: UUID, year: Optional[int] = None) -> Dict[str, Any]:
+        """
+        获取学院看板统计（优先读缓存）
+
+        Args:
+            college_id: 学院ID
+            year: 考评年度；不指定时使用该学院最近一个有最终得分的年度
+
+        Returns:
+            Dict: avg_score, rank_list, weakness_analysis
+        """
+        key = (str(college_id), year)
+        now = time.monotonic()
+        with _cache_lock:
+            cached = _stats_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        stats = self.compute_dashboard_stats(college_id, year)
+        with _cache_lock:
+            _stats_cache[key] = (now + settings.COLLEGE_STATS_CACHE_TTL, stats)
+        return stats
+
+    def compute_dashboard_stats(self, college_id: UUID, year: Optional[int] = None) -> Dict[str, Any]:
+        """
+        实时汇总学院统计数据（3次查询，与教研室数量无关）
+
+        Args:
+            college_id: 学院ID
+            year: 考评年度
+
+        Returns:
+            Dict: avg_score, rank_list, weakness_analysis
+        """
+        query = (
+            self.db.query(
+                TeachingOffice.id.label("office_id"),
+                TeachingOffice.name.label("office_name"),
+                SelfEvaluation.id.label("evaluation_id"),
+                SelfEvaluation.evaluation_year,
+                FinalScore.final_score,
+                FinalScore.determined_at,
+            )
+            .join(SelfEvaluation, SelfEvaluation.teaching_office_id == TeachingOffice.id)
+            .join(FinalScore, FinalScore.evaluation_id == SelfEvaluation.id)
+            .filter(TeachingOffice.college_id == college_id)
+        )
+
+        if year is None:
+            latest_year = (
+                self.db.query(func.max(SelfEvaluation.evaluation_year))
+                .join(TeachingOffice, SelfEvaluation.teaching_office_id == TeachingOffice.id)
+                .join(FinalScore, FinalScore.evaluation_id == SelfEvaluation.id)
+                .filter(TeachingOffice.college_id == college_id)
+                .scalar()
+            )
+            if latest_year is None:
+                return self._empty_stats()
+            year = latest_year
+
+        rows = query.filter(SelfEvaluation.evaluation_year == year).all()
+        if not rows:
+            return self._empty_stats()
+
+        # 同一教研室同年度多次考评时，取最近确定的最终得分
+        latest_by_office: Dict[Any, Any] = {}
+        for row in rows:
+            current = latest_by_office.get(row.office_id)
+            if current is None or row.determined_at > current.determined_at:
+                latest_by_office[row.office_id] = row
+
+        rank_list = sorted(
+            (
+                {
+                    "teaching_office_id": str(row.office_id),
+                    "name": row.office_name,
+                    "score": round(float(row.final_score), 2),
+                }
+                for row in latest_by_office.values()
+            ),
+            key=lambda item: item["score"],
+            reverse=True,
+        )
+        for position, item in enumerate(rank_list, 1):
+            item["rank"] = position
+
+        avg_score = sum(item["score"] for item in rank_list) / len(rank_list)
+
+        evaluation_ids = [row.evaluation_id for row in latest_by_office.values()]
+        weakness_analysis = self._compute_weakness_analysis(evaluation_ids)
+
+        return {
+            "avg_score": round(avg_score, 2),
+            "rank_list": rank_list,
+            "weakness_analysis": weakness_analysis,
+            "year": year,
+        }
+
+    def _compute_weakness_analysis(self, evaluation_ids: List[UUID]) -> List[Dict[str, Any]]:
+        """
+        计算常规教学指标的平均失分率
+
+        每个考评优先使用手动评分（多名评审取平均），没有手动评分时使用AI评分；
+        失分率 = 1 - 得分 / 满分，按失分率从高到低排序。
+        """
+        manual_rows = (
+            self.db.query(ManualScore.evaluation_id, ManualScore.scores)
+            .filter(ManualScore.evaluation_id.in_(evaluation_ids))
+            .all()
+        )
+        # 重新评分会新增AI评分记录：按评分时间倒序，每个考评取最新一次
+        ai_rows = (
+            self.db.query(AIScore.evaluation_id, AIScore.indicator_scores)
+            .filter(AIScore.evaluation_id.in_(evaluation_ids))
+            .order_by(AIScore.scored_at.desc())
+            .all()
+        )
+
+        manual_by_eval: Dict[Any, List[Any]] = defaultdict(list)
+        for row in manual_rows:
+            manual_by_eval[row.evaluation_id].append(row.scores)
+        ai_by_eval: Dict[Any, Any] = {}
+        for row in ai_rows:
+            ai_by_eval.setdefault(row.evaluation_id, row.indicator_scores)
+
+        loss_rates: Dict[str, List[float]] = defaultdict(list)
+        for evaluation_id in evaluation_ids:
+            per_indicator: Dict[str, List[float]] = defaultdict(list)
+            for items in manual_by_eval.get(evaluation_id, []):
+                for label, score in self._iter_regular_scores(items):
+                    per_indicator[label].append(score)
+            if not per_indicator:
+                for label, score in self._iter_regular_scores(ai_by_eval.get(evaluation_id)):
+                    per_indicator[label].append(score)
+
+            for label, scores in per_indicator.items():
+                avg = sum(scores) / len(scores)
+                normalized = min(max(avg / REGULAR_INDICATOR_MAX_SCORE, 0.0), 1.0)
+                loss_rates[label].append(1.0 - normalized)
+
+        weakness = [
+            {
+                "indicator": label,
+                "avg_loss_rate": round(sum(rates) / len(rates), 4),
+                "sample_count": len(rates),
+            }
+            for label, rates in loss_rates.items()
+        ]
+        weakness.sort(key=lambda item: item["avg_loss_rate"], reverse=True)
+        return weakness
+
+    @staticmethod
+    def _iter_regular_scores(items: Any):
+        """从评分JSON中提取常规教学指标得分 (中文名称, 得分)"""
+        if not isinstance(items, list):
+            return
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            label = regular_indicator_label(item.get("indicator"))
+            if label is None:
+                continue
+            try:
+                yield label, float(item.get("score", 0))
+            except (TypeError, ValueError):
+                continue
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, Any]:
+        return {
+            "avg_score": 0.0,
+            "rank_list": [],
+            "weakness_analysis": [],
+            "year": None,
+        }
@@ -0,0 +1,212 @@
+"""
+内容寻址附件存储
+
+相同内容（SHA-256 + 大小）的附件只存一份，存放在 objects/<前2位>/<sha256>，由 content_objects 记录引用计数：
+
+- 上传的文件先写入临时路径（边写边算哈希），再由 adopt 纳入内容寻址存储：
+  内容已存在时删除临时文件、引用计数+1；否则登记并把临时文件移动到内容寻址路径
+- 客户端可先提交哈希（秒传），内容已存在时直接创建附件，不再上传文件
+- 引用计数的增加在独立的短事务中提交，调用方失败时用 discard 撤销；
+  附件删除时的减少由 Attachment 的 after_delete 事件在同一事务中完成（见 models.content_object）
+- 引用计数归零超过 CONTENT_STORE_GC_GRACE 秒的对象、以及 storage_orphans 中的文件由清理任务删除
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.attachment import Attachment
+from app.models.content_object import ContentObject, StorageOrphan
+from app.services.minio_service import minio_service
+from app.services.storage_stream import StoredObject
+
+logger = logging.getLogger(__name__)
+
+
+def content_path(sha256: str) -> str:
+    """内容寻址存储路径"""
+    return f"objects/{sha256[:2]}/{sha256}"
+
+
+class ContentStore:
+    """内容寻址存储服务类"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _session(self) -> Session:
+        return Session(bind=self.db.get_bind())
+
+    def lookup(self, sha256: str, size: int) -> Optional[ContentObject]:
+        """查询可引用的内容对象（正在被清理的对象视为不存在）"""
+        return (
+            self.db.query(ContentObject)
+            .filter(ContentObject.sha256 == sha256, ContentObject.size == size, ContentObject.ref_count >= 0)
+            .first()
+        )
+
+    def claim(self, sha256: str, size: int) -> Optional[str]:
+        """
+        引用已存储的内容（引用计数+1，立即提交）
+
+        Returns:
+            Optional[str]: 内容对象的存储路径；内容不存在或正在被清理时为 None
+        """
+        session = self._session()
+        try:
+            claimed = session.execute(
+                update(ContentObject)
+                .where(ContentObject.sha256 == sha256, ContentObject.size == size, ContentObject.ref_count >= 0)
+                .values(ref_count=ContentObject.ref_count + 1, updated_at=datetime.utcnow())
+            ).rowcount
+            session.commit()
+            if not claimed:
+                return None
+            return session.execute(
+                select(ContentObject.storage_path).where(ContentObject.sha256 == sha256)
+            ).scalar_one()
+        finally:
+            session.close()
+
+    def _register(self, stored: StoredObject, content_type: Optional[str]) -> None:
+        session = self._session()
+        try:
+            now = datetime.utcnow()
+            session.add(ContentObject(
+                sha256=stored.sha256,
+                storage_path=content_path(stored.sha256),
+                size=stored.size,
+                content_type=content_type,
+                ref_count=0,
+                created_at=now,
+                updated_at=now,
+            ))
+            session.commit()
+        except IntegrityError:
+            # 并发上传了相同内容，已由另一请求登记
+            session.rollback()
+        finally:
+            session.close()
+
+    def adopt(self, temp_path: str, stored: StoredObject, content_type: Optional[str] = None) -> str:
+        """
+        把刚写入临时路径的文件纳入内容寻址存储（引用计数+1）
+
+        Args:
+            temp_path: 临时存储路径
+            stored: 文件的大小与哈希
+            content_type: MIME类型
+
+        Returns:
+            str: 附件应使用的存储路径；相同内容正在被清理时保留临时路径，作为独立文件保存
+        """
+        path = self.claim(stored.sha256, stored.size)
+        if path is None:
+            self._register(stored, content_type)
+            path = self.claim(stored.sha256, stored.size)
+            if path is None:
+                return temp_path
+
+        # 并发上传相同内容时可能都还没有写入对象：写入的内容相同，重复移动不影响结果
+        if minio_service.check_file_exists(path):
+            minio_service.delete_file(temp_path)
+        elif not minio_service.move_file(temp_path, path):
+            self.discard(path, stored.sha256)
+            return temp_path
+        return path
+
+    def discard(self, storage_path: str, sha256: Optional[str]) -> None:
+        """撤销一次引用（调用方创建附件失败时）；不是内容对象的文件直接删除"""
+        session = self._session()
+        try:
+            released = 0
+            if sha256:
+                released = session.execute(
+                    update(ContentObject)
+                    .where(
+                        ContentObject.sha256 == sha256,
+                        ContentObject.storage_path == storage_path,
+                        ContentObject.ref_count > 0,
+                    )
+                    .values(ref_count=ContentObject.ref_count - 1, updated_at=datetime.utcnow())
+                ).rowcount
+                session.commit()
+        finally:
+            session.close()
+        if not released:
+            minio_service.delete_file(storage_path)
+
+    def collect_orphans(self, paths: Optional[List[str]] = None, limit: int = 500) -> int:
+        """
+        删除 storage_orphans 中不再被引用的文件
+
+        Args:
+            paths: 只处理这些路径（删除附件后立即清理），默认按登记顺序处理
+            limit: 单次处理上限
+
+        Returns:
+            int: 删除的文件数
+        """
+        query = self.db.query(StorageOrphan).order_by(StorageOrphan.id)
+        if paths is not None:
+            query = query.filter(StorageOrphan.storage_path.in_(paths))
+        orphans = query.limit(limit).all()
+
+        removed = 0
+        for orphan in orphans:
+            referenced = (
+                self.db.query(Attachment.id).filter(Attachment.storage_path == orphan.storage_path).first()
+                or self.db.query(ContentObject.sha256).filter(ContentObject.storage_path == orphan.storage_path).first()
+            )
+            if not referenced and minio_service.delete_file(orphan.storage_path):
+                removed += 1
+            self.db.execute(delete(StorageOrphan).where(StorageOrphan.id == orphan.id))
+            self.db.commit()
+        return removed
+
+    def collect_garbage(self, now: Optional[datetime] = None, limit: int = 500) -> int:
+        """
+        删除引用计数归零超过宽限期的内容对象及孤立文件
+
+        Returns:
+            int: 删除的文件数
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(seconds=settings.CONTENT_STORE_GC_GRACE)
+        candidates = [
+            row.sha256
+            for row in self.db.query(ContentObject.sha256)
+            .filter(ContentObject.ref_count == 0, ContentObject.updated_at < cutoff)
+            .limit(limit)
+            .all()
+        ]
+        removed = 0
+        for sha256 in candidates:
+            # 先标记为 -1：之后的 claim 不会再引用该对象，同一内容的新上传作为独立文件保存
+            marked = self.db.execute(
+                update(ContentObject)
+                .where(ContentObject.sha256 == sha256, ContentObject.ref_count == 0, ContentObject.updated_at < cutoff)
+                .values(ref_count=-1, updated_at=now)
+            ).rowcount
+            self.db.commit()
+            if not marked:
+                continue
+            storage_path = self.db.execute(
+                select(ContentObject.storage_path).where(ContentObject.sha256 == sha256)
+            ).scalar_one()
+            if not minio_service.delete_file(storage_path):
+                # 删除失败时转入孤立文件，下次清理时重试
+                self.db.add(StorageOrphan(storage_path=storage_path, created_at=now))
+            self.db.execute(delete(ContentObject).where(ContentObject.sha256 == sha256))
+            self.db.commit()
+            removed += 1
+
+        removed += self.collect_orphans(limit=limit)
+        if removed:
+            logger.info(f"清理未引用的附件文件 {removed} 个")
+        return removed
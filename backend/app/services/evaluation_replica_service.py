@@ -0,0 +1,208 @@
+"""
+考评数据副本服务（校长办公会端）
+
+- apply: 批量写入接收到的同步记录与墓碑（每批一次 IN 查询 + 批量 insert/update）。
+  写入是幂等的：同一同步任务重复投递的记录、数据哈希未变化的记录都不重复写入；
+  较早发送的数据（如旧同步任务的重试）不覆盖较新的数据
+- 数据看板与结果审定读取副本，不查询管理端的业务表
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app.models.evaluation_replica import EvaluationReplica
+from app.schemas.sync import EvaluationSyncData, SyncDataPackage
+from app.services.sync_stream import record_digest
+
+logger = logging.getLogger(__name__)
+
+# 每次 IN 查询与批量写入的记录数上限
+REPLICA_BATCH_SIZE = 500
+
+# 数据看板展示的自评表状态
+DASHBOARD_STATUSES = (
+    "ai_scored", "manually_scored", "ready_for_final", "finalized", "approved", "published", "distributed",
+)
+
+
+@dataclass
+class ReplicaRecord:
+    """一条接收到的同步记录；data 为空表示墓碑"""
+    evaluation_id: UUID
+    payload_hash: Optional[str]
+    data: Optional[EvaluationSyncData] = None
+
+
+def manual_score_total(scores: Any) -> float:
+    if not scores or not isinstance(scores, list):
+        return 0.0
+    total = 0.0
+    for item in scores:
+        try:
+            total += float(item.get("score", 0))
+        except (AttributeError, TypeError, ValueError):
+            pass
+    return total
+
+
+def _record_values(data: EvaluationSyncData) -> Dict[str, Any]:
+    return {
+        "teaching_office_id": data.teaching_office_id,
+        "teaching_office_name": data.teaching_office_name,
+        "evaluation_year": data.evaluation_year,
+        "status": data.status,
+        "ai_score": data.ai_score.get("total_score") if data.ai_score else None,
+        "final_score": data.final_score.get("final_score") if data.final_score else None,
+        "manual_scores": [
+            {
+                "reviewer_id": score.get("reviewer_id"),
+                "reviewer_name": score.get("reviewer_name"),
+                "reviewer_role": score.get("reviewer_role"),
+                "total_score": manual_score_total(score.get("scores")),
+            }
+            for score in data.manual_scores
+        ],
+        "payload": data.model_dump(mode="json"),
+        "deleted": False,
+    }
+
+
+class EvaluationReplicaService:
+    """校长办公会端考评数据副本"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def apply(
+        self,
+        sync_task_id: UUID,
+        synced_at: Optional[datetime],
+        records: Sequence[ReplicaRecord]
+    ) -> Dict[str, int]:
+        """
+        写入一批同步记录（不提交事务：流式接收时与分块回执在同一事务中提交）
+
+        Returns:
+            Dict[str, int]: inserted / updated / deleted / unchanged / stale 数量
+        """
+        counts = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0, "stale": 0}
+        # 同一批中同一自评表出现多次时以最后一条为准
+        latest = {record.evaluation_id: record for record in records}
+        ids = list(latest)
+        now = datetime.utcnow()
+        for start in range(0, len(ids), REPLICA_BATCH_SIZE):
+            batch = ids[start:start + REPLICA_BATCH_SIZE]
+            existing = {
+                row.evaluation_id: row
+                for row in self.db.query(
+                    EvaluationReplica.evaluation_id,
+                    EvaluationReplica.payload_hash,
+                    EvaluationReplica.deleted,
+                    EvaluationReplica.source_synced_at,
+                ).filter(EvaluationReplica.evaluation_id.in_(batch))
+            }
+            to_insert: List[Dict[str, Any]] = []
+            new_tombstones: List[Dict[str, Any]] = []
+            to_update: List[Dict[str, Any]] = []
+            to_delete: List[Dict[str, Any]] = []
+            for evaluation_id in batch:
+                record = latest[evaluation_id]
+                tombstone = record.data is None
+                row = existing.get(evaluation_id)
+                if row is not None:
+                    if row.payload_hash == record.payload_hash and row.deleted == tombstone:
+                        counts["unchanged"] += 1
+                        continue
+                    if synced_at and row.source_synced_at and synced_at < row.source_synced_at:
+                        counts["stale"] += 1
+                        continue
+                values = {
+                    "evaluation_id": evaluation_id,
+                    "sync_task_id": sync_task_id,
+                    "payload_hash": record.payload_hash,
+                    "source_synced_at": synced_at,
+                    "updated_at": now,
+                }
+                if tombstone:
+                    values["deleted"] = True
+                    if row is None:
+                        new_tombstones.append({**values, "received_at": now})
+                    else:
+                        to_delete.append(values)
+                    counts["deleted"] += 1
+                    continue
+                values.update(_record_values(record.data))
+                if row is None:
+                    to_insert.append({**values, "received_at": now})
+                    counts["inserted"] += 1
+                else:
+                    to_update.append(values)
+                    counts["updated"] += 1
+
+            # 批量写入要求各行的列相同：墓碑与普通记录分开执行
+            if to_insert:
+                self.db.execute(insert(EvaluationReplica), to_insert)
+            if new_tombstones:
+                self.db.execute(insert(EvaluationReplica), new_tombstones)
+            if to_update:
+                self.db.execute(update(EvaluationReplica), to_update)
+            if to_delete:
+                self.db.execute(update(EvaluationReplica), to_delete)
+        return counts
+
+    def apply_package(self, sync_package: SyncDataPackage) -> Dict[str, int]:
+        """写入整包同步数据（不提交事务）"""
+        records = [
+            ReplicaRecord(
+                evaluation_id=eval_data.evaluation_id,
+                payload_hash=record_digest(eval_data.model_dump(mode="json")).hex(),
+                data=eval_data,
+            )
+            for eval_data in sync_package.evaluations
+        ]
+        records.extend(
+            ReplicaRecord(evaluation_id=evaluation_id, payload_hash=None)
+            for evaluation_id in sync_package.deleted_evaluation_ids
+        )
+        return self.apply(sync_package.sync_task_id, sync_package.synced_at, records)
+
+    def dashboard_rows(self, year: Optional[int] = None) -> List[EvaluationReplica]:
+        query = self.db.query(EvaluationReplica).filter(
+            EvaluationReplica.deleted.is_(False),
+            EvaluationReplica.status.in_(DASHBOARD_STATUSES),
+        )
+        if year:
+            query = query.filter(EvaluationReplica.evaluation_year == year)
+        return query.order_by(EvaluationReplica.teaching_office_name).all()
+
+    def active(self, evaluation_ids: Iterable[UUID]) -> Dict[UUID, EvaluationReplica]:
+        """已接收且未删除的自评表副本"""
+        ids = list(dict.fromkeys(evaluation_ids))
+        result: Dict[UUID, EvaluationReplica] = {}
+        for start in range(0, len(ids), REPLICA_BATCH_SIZE):
+            batch = ids[start:start + REPLICA_BATCH_SIZE]
+            result.update(
+                (replica.evaluation_id, replica)
+                for replica in self.db.query(EvaluationReplica).filter(
+                    EvaluationReplica.evaluation_id.in_(batch),
+                    EvaluationReplica.deleted.is_(False),
+                )
+            )
+        return result
+
+    def set_status(self, evaluation_ids: Sequence[UUID], status: str) -> None:
+        """审定结果写入副本（不提交事务）"""
+        if evaluation_ids:
+            self.db.execute(
+                update(EvaluationReplica)
+                .where(EvaluationReplica.evaluation_id.in_(list(evaluation_ids)))
+                .values(status=status, updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+
@@ -5,11 +5,14 @@
 """
 import os
 import shutil
+import tempfile
 from pathlib import Path
 from fastapi import UploadFile
-from typing import Optional
+from typing import BinaryIO, List, Optional
 
+from app.core.config import settings
 from app.core.safe_log import safe_print
+from app.services.storage_stream import HashingReader, StoredObject
 
 class LocalFileService:
     def __init__(self, base_path: str = "uploads"):
@@ -35,14 +38,18 @@ class LocalFileService:
             safe_print("Error uploading file to local storage:", e)
             return False
 
+    def _resolve(self, object_name: str) -> Path:
+        # 规范为 POSIX 风格路径，避免 Windows 下混用导致的问题
+        parts = object_name.replace("\\", "/").strip("/").split("/")
+        file_path = self.base_path
+        for p in parts:
+            file_path = file_path / p
+        return file_path
+
     def upload_bytes(self, object_name: str, content: bytes) -> bool:
         """直接使用字节内容写入本地文件，避免 UploadFile 二次读取或 seek 失败"""
         try:
-            # 规范为 POSIX 风格路径，避免 Windows 下混用导致的问题
-            parts = object_name.replace("\\", "/").strip("/").split("/")
-            file_path = self.base_path
-            for p in parts:
-                file_path = file_path / p
+            file_path = self._resolve(object_name)
             file_path.parent.mkdir(parents=True, exist_ok=True)
             with open(file_path, "wb") as buffer:
                 buffer.write(content)
@@ -53,25 +60,141 @@ class LocalFileService:
         except Exception as e:
             safe_print("Error uploading bytes to local storage:", e)
             return False
-    
-    def get_file_stream(self, object_name: str):
+
+    def upload_stream(self, object_name: str, source: BinaryIO) -> Optional[StoredObject]:
+        """
+        按分段把文件流写入本地文件，同时计算大小和SHA-256
+
+        先写入同目录的临时文件，写完后重命名，失败时不会留下半个文件。
+
+        Args:
+            object_name: 文件存储路径（相对路径）
+            source: 可读的文件对象
+
+        Returns:
+            Optional[StoredObject]: 写入的大小与哈希，失败时为 None
+        """
+        part_size = settings.ATTACHMENT_UPLOAD_PART_SIZE
+        reader = HashingReader(source)
+        temp_path = None
+        try:
+            file_path = self._resolve(object_name)
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=file_path.parent, suffix=".part")
+            with os.fdopen(fd, "wb") as buffer:
+                while True:
+                    data = reader.read(part_size)
+                    if not data:
+                        break
+                    buffer.write(data)
+            os.replace(temp_path, file_path)
+            return reader.result()
+        except Exception as e:
+            safe_print("Error streaming file to local storage:", e)
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+
+    def merge_files(self, object_name: str, sources: List[str]) -> bool:
+        """
+        按顺序拼接多个文件为一个文件（分块上传合并）
+
+        优先使用 os.copy_file_range 在内核中复制，数据不经过用户态；
+        不支持时（非Linux、跨文件系统）退回分段复制。
+
+        Args:
+            object_name: 合并后的文件路径（相对路径）
+            sources: 按顺序排列的源文件路径（相对路径）
+
+        Returns:
+            bool: 合并是否成功
+        """
+        temp_path = None
+        try:
+            file_path = self._resolve(object_name)
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=file_path.parent, suffix=".part")
+            with os.fdopen(fd, "wb") as target:
+                for source_name in sources:
+                    with open(self._resolve(source_name), "rb") as source:
+                        self._copy_file(source, target)
+            os.replace(temp_path, file_path)
+            return True
+        except Exception as e:
+            safe_print("Error merging files in local storage:", e)
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+    @staticmethod
+    def _copy_file(source: BinaryIO, target: BinaryIO) -> None:
+        remaining = os.fstat(source.fileno()).st_size
+        target.flush()
+        if hasattr(os, "copy_file_range"):
+            try:
+                while remaining > 0:
+                    copied = os.copy_file_range(source.fileno(), target.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                if remaining == 0:
+                    return
+            except OSError:
+                pass
+        # copy_file_range 不可用或中途失败：从已复制的位置继续分段复制
+        source.seek(os.fstat(source.fileno()).st_size - remaining)
+        target.seek(0, os.SEEK_END)
+        shutil.copyfileobj(source, target, settings.ATTACHMENT_UPLOAD_PART_SIZE)
+
+    def move_file(self, source_name: str, object_name: str) -> bool:
+        """移动文件（同一文件系统内为原子重命名）"""
+        try:
+            target = self._resolve(object_name)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self._resolve(source_name), target)
+            return True
+        except Exception as e:
+            safe_print("Error moving file in local storage:", e)
+            return False
+
+    def delete_prefix(self, prefix: str) -> bool:
+        """删除目录前缀下的所有文件（清理分块上传的临时分块）"""
+        try:
+            directory = self._resolve(prefix)
+            if directory.is_dir():
+                shutil.rmtree(directory)
+            return True
+        except Exception as e:
+            safe_print("Error deleting directory from local storage:", e)
+            return False
+
+    def get_file_stream(self, object_name: str, offset: int = 0):
         """
         获取文件流用于下载
         
         Args:
             object_name: 文件存储路径（相对路径）
+            offset: 起始偏移（断点续传、Range 请求）
         
         Returns:
             文件对象或 None
         """
         try:
-            file_path = self.base_path / object_name
+            file_path = self._resolve(object_name)
             if file_path.exists():
-                return open(file_path, "rb")
+                stream = open(file_path, "rb")
+                if offset:
+                    stream.seek(offset)
+                return stream
             return None
         except Exception as e:
             safe_print("Error getting file stream:", e)
             return None
+
+    def get_file_path(self, object_name: str) -> Optional[Path]:
+        """文件在本地文件系统中的路径（用于 sendfile / X-Accel-Redirect 直接发送），不存在时为 None"""
+        file_path = self._resolve(object_name)
+        return file_path if file_path.is_file() else None
     
     def check_file_exists(self, object_name: str) -> bool:
         """
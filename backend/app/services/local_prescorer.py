@@ -0,0 +1,175 @@
+"""
+AI评分本地预评分
+
+评分中可确定计算的部分由本地规则完成，混合模式（AI_SCORING_MODE=hybrid）下
+DeepSeek 只负责8个常规教学指标的主观评分：
+- 负面清单扣分（按自评表填写的次数/比例重新计算，规则与自评表页面一致）
+- 自评分合计（常规教学、特色亮点）
+- 各亮点类别的填写项数与附件数
+- 文件名含明确关键词的附件分类
+
+总分 = 常规教学AI评分之和 + 特色亮点自评分 - 负面清单扣分
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.indicators import REGULAR_TEACHING_INDICATORS
+
+# 亮点类别: (自评表键, 附件分类指标, 评分数据中的解析数量字段)
+HIGHLIGHT_CATEGORIES: Tuple[Tuple[str, str, str], ...] = (
+    ("teachingReformProjects", "teaching_reform_projects", "parsed_reform_projects"),
+    ("teachingHonors", "teaching_honors", "parsed_honors"),
+    ("teachingCompetitions", "teaching_competitions", "parsed_competitions"),
+    ("innovationCompetitions", "innovation_competitions", "parsed_innovations"),
+)
+
+# 上传时使用的指标键（自评表页面字段名或分类指标名） -> 分类指标
+_ATTACHMENT_INDICATOR_ALIASES: Dict[str, str] = {
+    "reformProjects": "teaching_reform_projects",
+    "teachingReformProjects": "teaching_reform_projects",
+    "teachingHonors": "teaching_honors",
+    "teachingCompetitions": "teaching_competitions",
+    "innovationCompetitions": "innovation_competitions",
+    **{category: category for _, category, _ in HIGHLIGHT_CATEGORIES},
+}
+
+# 文件名关键词（按顺序匹配：创新创业比赛须先于教学比赛）
+_FILENAME_RULES: Tuple[Tuple[str, "re.Pattern[str]"], ...] = (
+    ("innovation_competitions", re.compile(r"创新创业|互联网\+|挑战杯|大创|创业计划|三创")),
+    ("teaching_competitions", re.compile(r"教学比赛|教学竞赛|讲课比赛|授课比赛|青教赛|说课|教学创新大赛|教学技能")),
+    ("teaching_reform_projects", re.compile(r"教改|教学改革|教研项目|立项|结题|质量工程")),
+    ("teaching_honors", re.compile(r"荣誉|表彰|优秀教师|教学名师|先进|称号|教学成果奖")),
+)
+
+
+def negative_list_deduction(negative_list: Dict[str, Any]) -> float:
+    """按填写的次数/比例计算负面清单扣分"""
+    negative_list = negative_list or {}
+
+    def count(key: str) -> float:
+        return float((negative_list.get(key) or {}).get("count", 0) or 0)
+
+    deduction = count("ethicsViolations") * 10 + count("teachingAccidents") * 5 + count("ideologyIssues") * 5
+    percentage = float((negative_list.get("workloadIncomplete") or {}).get("percentage", 0) or 0)
+    if percentage > 30:
+        deduction += 10
+    elif percentage > 20:
+        deduction += 5
+    elif percentage > 10:
+        deduction += 2
+    return deduction
+
+
+def attachment_category(indicator: Any) -> Optional[str]:
+    """上传时的指标键 -> 亮点分类指标（非亮点类别返回None）"""
+    return _ATTACHMENT_INDICATOR_ALIASES.get(str(indicator))
+
+
+def filename_keywords() -> List[Tuple[str, str]]:
+    """文件名关键词规则展开为 (分类指标, 关键词)"""
+    return [
+        (category, keyword.replace("\\", ""))
+        for category, pattern in _FILENAME_RULES
+        for keyword in pattern.pattern.split("|")
+    ]
+
+
+def classify_filename(file_name: str) -> Optional[str]:
+    """文件名只命中一个类别的关键词时返回该类别，否则返回None（交由人工/原分类）"""
+    matched = [category for category, pattern in _FILENAME_RULES if pattern.search(file_name or "")]
+    if len(matched) == 1:
+        return matched[0]
+    # 创新创业比赛的文件名常同时含“比赛”类关键词
+    if set(matched) == {"innovation_competitions", "teaching_competitions"}:
+        return "innovation_competitions"
+    return None
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+@dataclass
+class PreScore:
+    """本地预评分结果"""
+    regular_self_total: float
+    highlights_total: float
+    negative_deduction: float
+    declared_counts: Dict[str, int]
+    parsed_counts: Dict[str, int]
+    attachment_classifications: List[Dict[str, str]] = field(default_factory=list)
+
+    @property
+    def local_total(self) -> float:
+        """只用本地数据计算的总分（常规教学指标取自评分）"""
+        return round(self.regular_self_total + self.highlights_total - self.negative_deduction, 2)
+
+    def merge(self, indicator_scores: List[Dict[str, Any]], partial: bool = False) -> Dict[str, Any]:
+        """
+        合并DeepSeek返回的常规教学指标评分，生成完整评分数据
+
+        Args:
+            indicator_scores: 常规教学指标评分
+            partial: 评分来自被截断的响应，总分改用本地总分（见 local_total）
+        """
+        if partial:
+            total_score = self.local_total
+        else:
+            regular_total = sum(_number(item.get("score")) for item in indicator_scores)
+            total_score = round(regular_total + self.highlights_total - self.negative_deduction, 2)
+        data: Dict[str, Any] = {
+            "total_score": total_score,
+            "indicator_scores": indicator_scores,
+            "attachment_classifications": self.attachment_classifications,
+        }
+        data.update(self.parsed_counts)
+        data["parsed_honorary_awards"] = data["parsed_honors"]
+        return data
+
+
+def prescore(content: Dict[str, Any], attachments: Sequence[Any]) -> PreScore:
+    """
+    计算本地可确定的评分字段
+
+    Args:
+        content: 自评表内容
+        attachments: 附件列表（需有 file_name、indicator 属性）
+    """
+    content = content or {}
+    regular = content.get("regularTeaching", {}) or {}
+    highlights = content.get("highlights", {}) or {}
+
+    regular_self_total = sum(
+        _number((regular.get(key) or {}).get("selfScore")) for key in REGULAR_TEACHING_INDICATORS
+    )
+
+    declared_counts: Dict[str, int] = {}
+    highlights_total = 0.0
+    for content_key, category, _ in HIGHLIGHT_CATEGORIES:
+        items = (highlights.get(content_key) or {}).get("items", []) or []
+        declared_counts[category] = len(items)
+        highlights_total += sum(_number(item.get("score")) for item in items)
+
+    classifications = []
+    category_counts = {category: 0 for _, category, _ in HIGHLIGHT_CATEGORIES}
+    for attachment in attachments:
+        classified = classify_filename(attachment.file_name)
+        if classified:
+            classifications.append({"file_name": attachment.file_name, "classified_indicator": classified})
+        category = classified or attachment_category(attachment.indicator)
+        if category in category_counts:
+            category_counts[category] += 1
+
+    return PreScore(
+        regular_self_total=regular_self_total,
+        highlights_total=highlights_total,
+        negative_deduction=negative_list_deduction(content.get("negativeList", {}) or {}),
+        declared_counts=declared_counts,
+        parsed_counts={field_name: category_counts[category] for _, category, field_name in HIGHLIGHT_CATEGORIES},
+        attachment_classifications=classifications,
+    )
@@ -4,9 +4,20 @@ from minio.error import S3Error
 from minio.lifecycleconfig import LifecycleConfig, Rule, Expiration
 from fastapi import UploadFile
 from io import BytesIO
+from functools import partial
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Tuple
+from minio.commonconfig import ComposeSource
+from minio.deleteobjects import DeleteObject
 from app.core.config import settings
 from app.core.safe_log import safe_print
 from app.services.local_file_service import local_file_service
+from app.services.storage_stream import ConcatReader, HashingReader, StoredObject, close_stream, digest_stream
+
+# compose_object 要求除最后一个外的每个源对象不小于5MiB，源对象最多10000个
+MINIO_MIN_COMPOSE_PART_SIZE = 5 * 1024 * 1024
+MINIO_MAX_COMPOSE_SOURCES = 10000
+
 
 class MinIOService:
     def __init__(self):
@@ -157,6 +168,184 @@ class MinIOService:
             safe_print("[MinIO] 上传失败，切换到本地存储:", e)
             return local_file_service.upload_bytes(object_name, content)
     
+    def upload_stream(
+        self,
+        object_name: str,
+        source: BinaryIO,
+        content_type: str = "application/octet-stream",
+        original_filename: str = "",
+    ) -> Optional[StoredObject]:
+        """
+        流式上传文件，内存中最多保留一个分段
+
+        - MinIO：put_object(length=-1) 按 ATTACHMENT_UPLOAD_PART_SIZE 分段上传
+        - 本地存储：按分段写入临时文件后重命名
+        - 读取时同时计算大小和SHA-256
+
+        Args:
+            object_name: 存储路径
+            source: 可读（且可 seek）的文件对象，如 UploadFile.file
+            content_type: MIME类型
+            original_filename: 原始文件名
+
+        Returns:
+            Optional[StoredObject]: 写入的大小与哈希，失败时为 None
+        """
+        self._initialize()
+
+        if self._use_local_storage or not self.client:
+            safe_print("[MinIO] 使用本地文件存储:", object_name)
+            return local_file_service.upload_stream(object_name, source)
+
+        reader = HashingReader(source)
+        try:
+            self.client.put_object(
+                settings.MINIO_BUCKET,
+                object_name,
+                reader,
+                length=-1,
+                part_size=settings.ATTACHMENT_UPLOAD_PART_SIZE,
+                content_type=content_type,
+                metadata={
+                    "original-filename": quote(original_filename),
+                    "archived": "true",
+                    "retention": "permanent",
+                },
+            )
+            safe_print("[MinIO] 文件已上传:", object_name)
+            return reader.result()
+        except S3Error as e:
+            safe_print("[MinIO] 上传失败，切换到本地存储:", e)
+            source.seek(0)
+            return local_file_service.upload_stream(object_name, source)
+
+    def merge_objects(
+        self,
+        object_name: str,
+        sources: List[Tuple[str, int]],
+        content_type: str = "application/octet-stream",
+        original_filename: str = "",
+    ) -> Optional[StoredObject]:
+        """
+        按顺序合并多个已存储的对象（分块上传完成时调用）
+
+        - MinIO：各分块满足 compose_object 的大小要求时在服务端合并，数据不经过应用；
+          否则把各分块依次读出，以分段上传（length=-1）写入合并后的对象
+        - 本地存储：copy_file_range 拼接
+        - 合并后文件的SHA-256需读取一遍数据（分块可能乱序到达，无法在接收时累计）
+
+        Args:
+            object_name: 合并后的存储路径
+            sources: 按顺序排列的 (分块存储路径, 分块大小)
+            content_type: MIME类型
+            original_filename: 原始文件名
+
+        Returns:
+            Optional[StoredObject]: 合并后文件的大小与哈希，失败时为 None
+        """
+        self._initialize()
+        names = [name for name, _ in sources]
+        part_size = settings.ATTACHMENT_UPLOAD_PART_SIZE
+
+        if self._use_local_storage or not self.client:
+            if not local_file_service.merge_files(object_name, names):
+                return None
+            stream = local_file_service.get_file_stream(object_name)
+            try:
+                return digest_stream(stream, part_size)
+            finally:
+                close_stream(stream)
+
+        metadata = {
+            "original-filename": quote(original_filename),
+            "archived": "true",
+            "retention": "permanent",
+        }
+        composable = len(sources) <= MINIO_MAX_COMPOSE_SOURCES and all(
+            size >= MINIO_MIN_COMPOSE_PART_SIZE for _, size in sources[:-1]
+        )
+        try:
+            if composable:
+                self.client.compose_object(
+                    settings.MINIO_BUCKET,
+                    object_name,
+                    [ComposeSource(settings.MINIO_BUCKET, name) for name in names],
+                    metadata={"Content-Type": content_type, **metadata},
+                )
+                reader = ConcatReader(partial(self.client.get_object, settings.MINIO_BUCKET, name) for name in names)
+                try:
+                    return digest_stream(reader, part_size)
+                finally:
+                    reader.close()
+
+            reader = ConcatReader(partial(self.client.get_object, settings.MINIO_BUCKET, name) for name in names)
+            hashing = HashingReader(reader)
+            try:
+                self.client.put_object(
+                    settings.MINIO_BUCKET,
+                    object_name,
+                    hashing,
+                    length=-1,
+                    part_size=max(part_size, MINIO_MIN_COMPOSE_PART_SIZE),
+                    content_type=content_type,
+                    metadata=metadata,
+                )
+            finally:
+                reader.close()
+            return hashing.result()
+        except S3Error as e:
+            safe_print("[MinIO] 合并分块失败:", e)
+            return None
+
+    def move_file(self, source_name: str, object_name: str) -> bool:
+        """
+        移动已存储的对象（写入内容寻址路径时调用）
+
+        MinIO 没有重命名操作：以单个源的 compose_object 在服务端复制（超过5GiB时自动分段复制）后删除源对象
+        """
+        self._initialize()
+        if self._use_local_storage or not self.client:
+            return local_file_service.move_file(source_name, object_name)
+        try:
+            self.client.compose_object(
+                settings.MINIO_BUCKET,
+                object_name,
+                [ComposeSource(settings.MINIO_BUCKET, source_name)],
+            )
+            self.client.remove_object(settings.MINIO_BUCKET, source_name)
+            return True
+        except S3Error as e:
+            safe_print("[MinIO] 移动对象失败:", e)
+            return False
+
+    def delete_prefix(self, prefix: str) -> bool:
+        """删除前缀下的所有对象（清理分块上传的临时分块）"""
+        self._initialize()
+        if self._use_local_storage or not self.client:
+            return local_file_service.delete_prefix(prefix)
+        try:
+            objects = self.client.list_objects(settings.MINIO_BUCKET, prefix=prefix.rstrip("/") + "/", recursive=True)
+            errors = self.client.remove_objects(
+                settings.MINIO_BUCKET,
+                (DeleteObject(item.object_name) for item in objects),
+            )
+            for error in errors:
+                safe_print("Error deleting object from MinIO:", error)
+            return True
+        except S3Error as e:
+            safe_print("Error deleting objects from MinIO:", e)
+            return False
+
+    def read_file_bytes(self, object_name: str) -> Optional[bytes]:
+        """读取整个文件内容（用于正文提取等需要完整内容的场景），文件不存在时为 None"""
+        stream = self.get_file_stream(object_name)
+        if stream is None:
+            return None
+        try:
+            return stream.read()
+        finally:
+            close_stream(stream)
+
     def download_file(self, object_name: str, file_path: str):
         """Download a file from MinIO"""
         self._initialize()
@@ -193,34 +382,47 @@ class MinIOService:
             safe_print("Error generating presigned URL:", e)
             return ""
     
-    def get_file_stream(self, object_name: str):
+    def get_file_stream(self, object_name: str, offset: int = 0, length: Optional[int] = None):
         """
         Get file as stream for download
         
         用于附件下载（需求 18.6）
-        支持从 MinIO 或本地文件系统获取文件
+        支持从 MinIO 或本地文件系统获取文件；offset/length 指定时只读取该区间（Range 请求），
+        本地文件流不限制长度，由调用方按 length 读取
         """
         self._initialize()
         
         # 如果使用本地存储
         if self._use_local_storage:
-            return local_file_service.get_file_stream(object_name)
+            return local_file_service.get_file_stream(object_name, offset)
         
         # 使用 MinIO 存储
         try:
             if not self.client:
                 # MinIO 不可用，尝试从本地存储获取
-                return local_file_service.get_file_stream(object_name)
+                return local_file_service.get_file_stream(object_name, offset)
             
             response = self.client.get_object(
                 settings.MINIO_BUCKET,
-                object_name
+                object_name,
+                offset=offset,
+                length=length or 0
             )
             return response
         except S3Error as e:
             safe_print("Error getting file stream from MinIO, trying local storage:", e)
             # 如果 MinIO 获取失败，尝试从本地存储获取
-            return local_file_service.get_file_stream(object_name)
+            return local_file_service.get_file_stream(object_name, offset)
+
+    def get_local_file_path(self, object_name: str) -> Optional[Path]:
+        """
+        使用本地存储时文件的路径，可由 sendfile / X-Accel-Redirect 直接发送；
+        存储在 MinIO 中或文件不存在时为 None
+        """
+        self._initialize()
+        if self._use_local_storage or not self.client:
+            return local_file_service.get_file_path(object_name)
+        return None
     
     def check_file_exists(self, object_name: str) -> bool:
         """
@@ -0,0 +1,476 @@
+"""
+AI评分提示词编译
+
+- 预编译的提示词模板（静态部分只构建一次）
+- 提示词token估算
+- 按token预算分配各可变段落：超长的指标内容截断中间部分，
+  过多的亮点项目/附件列表只保留前若干项并附数量摘要
+- 附件正文摘录单独限额，各附件按最大最小公平分摊
+"""
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from string import Template
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from app.core.indicators import REGULAR_TEACHING_INDICATORS
+from app.services.attachment_classifier import is_confidently_classified
+
+# DeepSeek 官方估算：1个中文字符约0.6 token，1个英文字符约0.3 token
+_CJK_TOKEN_COST = 0.6
+_OTHER_TOKEN_COST = 0.3
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+HEADER = "你是教研室工作考评专家，请根据以下自评表内容和附件信息进行评分。"
+
+INSTRUCTIONS = """评分任务：
+
+1. 对8个常规教学指标进行AI评分（每项0-10分）
+2. 验证特色亮点项目的附件支撑材料是否充分
+3. 检测自评填写的项目数量与附件数量是否一致
+4. 对附件进行分类（教学改革项目/荣誉表彰/教学比赛/创新创业比赛/其他），标注“已分类”的附件无需返回分类
+
+请按照以下JSON格式返回评分结果：
+{
+    "total_score": AI评定的总分（数字，包含负面清单扣分），
+    "indicator_scores": [
+        {
+            "indicator": "教学过程管理",
+            "score": AI评分（0-10），
+            "reasoning": "评分理由，需要对比自评分和AI评分的差异"
+        },
+        {
+            "indicator": "教学质量管理",
+            "score": AI评分（0-10），
+            "reasoning": "评分理由"
+        },
+        {
+            "indicator": "课程考核",
+            "score": AI评分（0-10），
+            "reasoning": "评分理由"
+        },
+        {
+            "indicator": "教育教学科研工作",
+            "score": AI评分（0-10），
+            "reasoning": "评分理由"
+        },
+        {
+            "indicator": "课程建设",
+            "score": AI评分（0-10），
+            "reasoning": "评分理由"
+        },
+        {
+            "indicator": "教师队伍建设",
+            "score": AI评分（0-10），
+            "reasoning": "评分理由"
+        },
+        {
+            "indicator": "科学研究与学术交流",
+            "score": AI评分（0-10），
+            "reasoning": "评分理由"
+        },
+        {
+            "indicator": "教学档案室管理与建设",
+            "score": AI评分（0-10），
+            "reasoning": "评分理由"
+        }
+    ],
+    "parsed_reform_projects": 从附件中解析出的教学改革项目个数（数字），
+    "parsed_honors": 从附件中解析出的荣誉表彰个数（数字），
+    "parsed_competitions": 从附件中解析出的教学比赛个数（数字），
+    "parsed_innovations": 从附件中解析出的创新创业比赛个数（数字），
+    "attachment_classifications": [
+        {
+            "file_name": "附件文件名",
+            "classified_indicator": "teaching_reform_projects 或 teaching_honors 或 teaching_competitions 或 innovation_competitions 或 other"
+        }
+    ]
+}
+
+注意事项：
+1. 常规教学工作每项满分10分，请根据内容质量客观评分
+2. 如果自评分明显偏高或偏低，请在reasoning中说明
+3. 特色亮点项目需要有附件支撑，请仔细核对数量
+4. 负面清单扣分已在自评表中计算，AI评分时需要考虑
+5. 附件分类要准确，便于后续管理和审核"""
+
+_TEMPLATE = Template("""${header}
+
+一、常规教学工作（每项满分10分，共80分）
+
+${regular_teaching}
+
+二、特色与亮点项目
+
+${highlights}
+
+三、负面清单
+
+${negative_list}
+
+附件信息（共${attachment_count}个）：
+${attachments}${attachment_excerpts}
+
+${instructions}
+""")
+
+# 混合模式：特色亮点、负面清单与附件核对由本地预评分完成，只请求常规教学指标评分
+SUBJECTIVE_HEADER = "你是教研室工作考评专家，请根据以下自评表中的常规教学工作内容进行评分。"
+
+SUBJECTIVE_INSTRUCTIONS = """评分任务：对8个常规教学指标进行AI评分（每项0-10分）。
+特色亮点项目、负面清单扣分和附件核对已由系统计算，无需评分。
+
+请按照以下JSON格式返回评分结果：
+{
+    "indicator_scores": [
+        {
+            "indicator": "指标名称（与上文一致，共8项）",
+            "score": AI评分（0-10），
+            "reasoning": "评分理由，需要对比自评分和AI评分的差异"
+        }
+    ]
+}
+
+注意事项：
+1. 常规教学工作每项满分10分，请根据内容质量客观评分
+2. 如果自评分明显偏高或偏低，请在reasoning中说明"""
+
+_SUBJECTIVE_TEMPLATE = Template("""${header}
+
+常规教学工作（每项满分10分，共80分）
+
+${regular_teaching}
+
+${instructions}
+""")
+
+# 特色与亮点项目: (内容键, 标题, 等级字段)
+HIGHLIGHT_GROUPS: Tuple[Tuple[str, str, str], ...] = (
+    ("teachingReformProjects", "教学改革项目", "level"),
+    ("teachingHonors", "年度获得教学相关荣誉表彰", "level"),
+    ("teachingCompetitions", "教学比赛", "levelPrize"),
+    ("innovationCompetitions", "指导创新创业比赛获奖情况", "levelPrize"),
+)
+
+_TRUNCATION_MARKER = "……（中间省略约{omitted}字）……"
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的token数"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return int(math.ceil(cjk * _CJK_TOKEN_COST + (len(text) - cjk) * _OTHER_TOKEN_COST))
+
+
+def _char_cost(char: str) -> float:
+    return _CJK_TOKEN_COST if _CJK_RE.match(char) else _OTHER_TOKEN_COST
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """
+    将文本截断到token预算内，保留开头约2/3和结尾约1/3，中间以省略标记代替
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+    marker_cost = estimate_tokens(_TRUNCATION_MARKER.format(omitted=len(text)))
+    available = budget - marker_cost
+    if available <= 0:
+        return _TRUNCATION_MARKER.format(omitted=len(text))
+
+    head_budget = available * 2 / 3
+    tail_budget = available - head_budget
+
+    head_end, spent = 0, 0.0
+    while head_end < len(text):
+        cost = _char_cost(text[head_end])
+        if spent + cost > head_budget:
+            break
+        spent += cost
+        head_end += 1
+
+    tail_start, spent = len(text), 0.0
+    while tail_start > head_end:
+        cost = _char_cost(text[tail_start - 1])
+        if spent + cost > tail_budget:
+            break
+        spent += cost
+        tail_start -= 1
+
+    omitted = tail_start - head_end
+    return text[:head_end] + _TRUNCATION_MARKER.format(omitted=omitted) + text[tail_start:]
+
+
+def fit_lines(lines: Sequence[str], budget: int, summarize) -> Tuple[List[str], bool]:
+    """
+    保留能放入预算的前若干行，其余行以一行摘要代替
+
+    Args:
+        lines: 候选行
+        budget: token预算
+        summarize: 函数(被省略的行下标列表) -> 摘要行
+
+    Returns:
+        Tuple[List[str], bool]: (保留的行, 是否有省略)
+    """
+    costs = [estimate_tokens(line) + 1 for line in lines]
+    if sum(costs) <= budget:
+        return list(lines), False
+
+    kept: List[str] = []
+    spent = 0
+    for index, (line, cost) in enumerate(zip(lines, costs)):
+        summary = summarize(list(range(index, len(lines))))
+        if spent + cost + estimate_tokens(summary) + 1 > budget:
+            return kept + [summary], True
+        kept.append(line)
+        spent += cost
+    return kept, False
+
+
+def allocate_budget(demands: Dict[str, int], available: int) -> Dict[str, int]:
+    """
+    最大最小公平分配：需求小于平均份额的段落全额满足，剩余预算由其余段落平分
+    """
+    allocation: Dict[str, int] = {}
+    remaining = max(available, 0)
+    pending = sorted(demands.items(), key=lambda item: item[1])
+    while pending:
+        share = remaining // len(pending)
+        name, demand = pending[0]
+        if demand <= share:
+            allocation[name] = demand
+            remaining -= demand
+            pending.pop(0)
+            continue
+        for name, _ in pending:
+            allocation[name] = share
+        break
+    return allocation
+
+
+@dataclass
+class CompiledPrompt:
+    """编译结果"""
+    text: str
+    estimated_tokens: int
+    budget: int
+    section_tokens: Dict[str, int] = field(default_factory=dict)
+    truncated_sections: List[str] = field(default_factory=list)
+
+
+def _regular_teaching_blocks(regular_teaching: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+    """常规教学指标: (键, 段落前缀, 内容)"""
+    blocks = []
+    for index, (key, label) in enumerate(REGULAR_TEACHING_INDICATORS.items(), 1):
+        item = regular_teaching.get(key) or {}
+        prefix = f"{index}. {label}（自评分：{item.get('selfScore', 0)}分）\n   内容："
+        blocks.append((key, prefix, str(item.get("content", "") or "")))
+    return blocks
+
+
+def _highlight_lines(highlights: Dict[str, Any]) -> List[Tuple[str, List[str]]]:
+    groups = []
+    for index, (key, title, level_field) in enumerate(HIGHLIGHT_GROUPS, 1):
+        items = (highlights.get(key) or {}).get("items", []) or []
+        header = f"{index}. {title}（自评填写{len(items)}项）："
+        lines = [
+            f"   {i}. {item.get('name', '')} - {item.get(level_field, '')} - 自评{item.get('score', 0)}分"
+            for i, item in enumerate(items, 1)
+        ]
+        groups.append((header, lines))
+    return groups
+
+
+def _negative_list_text(negative_list: Dict[str, Any]) -> str:
+    ethics = negative_list.get("ethicsViolations", {}) or {}
+    accidents = negative_list.get("teachingAccidents", {}) or {}
+    ideology = negative_list.get("ideologyIssues", {}) or {}
+    workload = negative_list.get("workloadIncomplete", {}) or {}
+    return "\n".join([
+        f"1. 师德师风违规：{ethics.get('count', 0)}起，扣{ethics.get('deduction', 0)}分",
+        f"2. 教学事故：{accidents.get('count', 0)}起，扣{accidents.get('deduction', 0)}分",
+        f"3. 意识形态问题：{ideology.get('count', 0)}起，扣{ideology.get('deduction', 0)}分",
+        f"4. 工作量未完成：{workload.get('percentage', 0)}%，扣{workload.get('deduction', 0)}分",
+    ])
+
+
+def _excerpt_blocks(attachments: Sequence[Any], attachment_texts: Mapping[Any, str]) -> List[Tuple[str, str]]:
+    """附件正文摘录: (段落前缀, 正文)，序号与附件信息列表一致"""
+    blocks = []
+    for i, attachment in enumerate(attachments, 1):
+        text = attachment_texts.get(getattr(attachment, "id", None))
+        if text:
+            blocks.append((f"{i}. {attachment.file_name}：", text))
+    return blocks
+
+
+def compile_scoring_prompt(
+    content: Dict[str, Any],
+    attachments: Sequence[Any],
+    max_tokens: int,
+    attachment_texts: Optional[Mapping[Any, str]] = None,
+    excerpt_tokens: int = 0,
+) -> CompiledPrompt:
+    """
+    编译评分提示词
+
+    Args:
+        content: 自评表内容
+        attachments: 附件列表（需有 file_name、indicator 属性）
+        max_tokens: 提示词token预算
+        attachment_texts: 附件ID -> 提取的正文
+        excerpt_tokens: 附件正文摘录的token上限
+
+    Returns:
+        CompiledPrompt: 提示词文本及token统计
+    """
+    content = content or {}
+    regular_blocks = _regular_teaching_blocks(content.get("regularTeaching", {}) or {})
+    highlight_groups = _highlight_lines(content.get("highlights", {}) or {})
+    negative_text = _negative_list_text(content.get("negativeList", {}) or {})
+    attachment_lines = [
+        f"{i}. 文件名：{attachment.file_name}，考核指标：{attachment.indicator}"
+        + ("（已分类）" if is_confidently_classified(attachment) else "")
+        for i, attachment in enumerate(attachments, 1)
+    ]
+    excerpt_blocks = _excerpt_blocks(attachments, attachment_texts or {}) if excerpt_tokens > 0 else []
+    excerpt_header = "\n\n附件正文摘录：\n" if excerpt_blocks else ""
+
+    # 固定部分：模板 + 各段落标题/前缀 + 负面清单
+    fixed_text = _TEMPLATE.substitute(
+        header=HEADER,
+        regular_teaching="\n\n".join(prefix for _, prefix, _ in regular_blocks),
+        highlights="\n\n".join(header for header, _ in highlight_groups),
+        negative_list=negative_text,
+        attachment_count=len(attachment_lines),
+        attachments="",
+        attachment_excerpts=excerpt_header + "\n".join(prefix for prefix, _ in excerpt_blocks),
+        instructions=INSTRUCTIONS,
+    )
+    available = max_tokens - estimate_tokens(fixed_text)
+
+    demands: Dict[str, int] = {key: estimate_tokens(text) for key, _, text in regular_blocks}
+    demands["highlights"] = sum(estimate_tokens(line) + 1 for _, lines in highlight_groups for line in lines)
+    demands["attachments"] = sum(estimate_tokens(line) + 1 for line in attachment_lines)
+    if excerpt_blocks:
+        demands["attachment_excerpts"] = min(
+            sum(estimate_tokens(text) for _, text in excerpt_blocks), excerpt_tokens
+        )
+    allocation = allocate_budget(demands, available)
+
+    truncated: List[str] = []
+
+    regular_parts = []
+    for key, prefix, text in regular_blocks:
+        fitted = truncate_to_tokens(text, allocation[key])
+        if fitted != text:
+            truncated.append(key)
+        regular_parts.append(prefix + fitted)
+
+    # 亮点项目各组按条目数分摊本段预算
+    highlight_parts = []
+    total_items = sum(len(lines) for _, lines in highlight_groups) or 1
+    highlights_truncated = False
+    for header, lines in highlight_groups:
+        group_budget = allocation["highlights"] * len(lines) // total_items
+        kept, omitted = fit_lines(
+            lines, group_budget,
+            lambda rest: f"   ……另有{len(rest)}项未列出",
+        )
+        highlights_truncated = highlights_truncated or omitted
+        highlight_parts.append("\n".join([header] + kept))
+    if highlights_truncated:
+        truncated.append("highlights")
+
+    def summarize_attachments(rest: List[int]) -> str:
+        counts = Counter(str(attachments[i].indicator) for i in rest)
+        detail = "，".join(f"{indicator}: {count}个" for indicator, count in counts.most_common())
+        return f"……另有{len(rest)}个附件未列出（{detail}）"
+
+    kept_attachments, attachments_truncated = fit_lines(
+        attachment_lines, allocation["attachments"], summarize_attachments
+    )
+    if attachments_truncated:
+        truncated.append("attachments")
+
+    excerpt_parts = []
+    if excerpt_blocks:
+        excerpt_allocation = allocate_budget(
+            {index: estimate_tokens(text) for index, (_, text) in enumerate(excerpt_blocks)},
+            allocation["attachment_excerpts"],
+        )
+        excerpts_truncated = False
+        for index, (prefix, excerpt) in enumerate(excerpt_blocks):
+            fitted = truncate_to_tokens(excerpt, excerpt_allocation[index])
+            excerpts_truncated = excerpts_truncated or fitted != excerpt
+            excerpt_parts.append(prefix + fitted)
+        if excerpts_truncated:
+            truncated.append("attachment_excerpts")
+
+    text = _TEMPLATE.substitute(
+        header=HEADER,
+        regular_teaching="\n\n".join(regular_parts),
+        highlights="\n\n".join(highlight_parts),
+        negative_list=negative_text,
+        attachment_count=len(attachment_lines),
+        attachments="\n".join(kept_attachments),
+        attachment_excerpts=excerpt_header + "\n".join(excerpt_parts),
+        instructions=INSTRUCTIONS,
+    )
+
+    return CompiledPrompt(
+        text=text,
+        estimated_tokens=estimate_tokens(text),
+        budget=max_tokens,
+        section_tokens={
+            "regular_teaching": sum(estimate_tokens(part) for part in regular_parts),
+            "highlights": sum(estimate_tokens(part) for part in highlight_parts),
+            "attachments": sum(estimate_tokens(line) for line in kept_attachments),
+            "attachment_excerpts": sum(estimate_tokens(part) for part in excerpt_parts),
+        },
+        truncated_sections=truncated,
+    )
+
+
+def compile_subjective_prompt(content: Dict[str, Any], max_tokens: int) -> CompiledPrompt:
+    """
+    编译混合模式的提示词：只包含8个常规教学指标
+
+    Args:
+        content: 自评表内容
+        max_tokens: 提示词token预算
+    """
+    regular_blocks = _regular_teaching_blocks((content or {}).get("regularTeaching", {}) or {})
+    fixed_text = _SUBJECTIVE_TEMPLATE.substitute(
+        header=SUBJECTIVE_HEADER,
+        regular_teaching="\n\n".join(prefix for _, prefix, _ in regular_blocks),
+        instructions=SUBJECTIVE_INSTRUCTIONS,
+    )
+    allocation = allocate_budget(
+        {key: estimate_tokens(text) for key, _, text in regular_blocks},
+        max_tokens - estimate_tokens(fixed_text),
+    )
+
+    truncated: List[str] = []
+    regular_parts = []
+    for key, prefix, text in regular_blocks:
+        fitted = truncate_to_tokens(text, allocation[key])
+        if fitted != text:
+            truncated.append(key)
+        regular_parts.append(prefix + fitted)
+
+    text = _SUBJECTIVE_TEMPLATE.substitute(
+        header=SUBJECTIVE_HEADER,
+        regular_teaching="\n\n".join(regular_parts),
+        instructions=SUBJECTIVE_INSTRUCTIONS,
+    )
+    return CompiledPrompt(
+        text=text,
+        estimated_tokens=estimate_tokens(text),
+        budget=max_tokens,
+        section_tokens={"regular_teaching": sum(estimate_tokens(part) for part in regular_parts)},
+        truncated_sections=truncated,
+    )
@@ -0,0 +1,182 @@
+"""
+AI评分模式对比
+
+对同一批自评表分别以 full 与 hybrid 模式生成评分（不写入评分结果、不使用缓存），
+报告两种模式的耗时、token用量以及评分一致性，用于决定是否切换 AI_SCORING_MODE。
+"""
+
+import logging
+import time
+from statistics import mean
+from typing import Any, Dict, List, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.core.indicators import regular_indicator_label
+from app.models.attachment import Attachment
+from app.models.self_evaluation import SelfEvaluation
+from app.services.ai_scoring_service import AIScoringService
+
+logger = logging.getLogger(__name__)
+
+SCORING_MODES = ("full", "hybrid")
+PARSED_COUNT_FIELDS = ("parsed_reform_projects", "parsed_honors", "parsed_competitions", "parsed_innovations")
+
+
+def _average(values: Sequence[Optional[float]]) -> Optional[float]:
+    present = [value for value in values if value is not None]
+    return round(mean(present), 2) if present else None
+
+
+def _reduction(before: Optional[float], after: Optional[float]) -> Optional[float]:
+    if not before or after is None:
+        return None
+    return round(1 - after / before, 4)
+
+
+def _indicator_map(score_data: Dict[str, Any]) -> Dict[str, float]:
+    scores = {}
+    for item in score_data.get("indicator_scores", []):
+        label = regular_indicator_label(item.get("indicator"))
+        if label:
+            scores[label] = float(item.get("score", 0) or 0)
+    return scores
+
+
+def _agreement(full: Dict[str, Any], hybrid: Dict[str, Any]) -> Dict[str, Any]:
+    full_scores = _indicator_map(full)
+    hybrid_scores = _indicator_map(hybrid)
+    diffs = [abs(full_scores[label] - hybrid_scores[label]) for label in full_scores if label in hybrid_scores]
+
+    full_classes = {item["file_name"]: item["classified_indicator"] for item in full.get("attachment_classifications", [])}
+    compared = [
+        item["classified_indicator"] == full_classes[item["file_name"]]
+        for item in hybrid.get("attachment_classifications", [])
+        if item["file_name"] in full_classes
+    ]
+    return {
+        "total_score_diff": round(abs(float(full["total_score"]) - float(hybrid["total_score"])), 2),
+        "indicator_diffs": diffs,
+        "parsed_counts_matched": sum(full.get(name) == hybrid.get(name) for name in PARSED_COUNT_FIELDS),
+        "classifications_compared": len(compared),
+        "classifications_matched": sum(compared),
+    }
+
+
+class ScoringModeComparison:
+    """评分模式对比服务类"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    async def compare(self, evaluation_ids: List[UUID]) -> Dict[str, Any]:
+        """
+        对比两种评分模式
+
+        调用产生的调用记录随会话回滚丢弃，不计入生产统计。
+
+        Returns:
+            Dict: modes（各模式平均耗时与token用量）、agreement（一致性汇总）、items（逐个自评表）
+        """
+        evaluations = (
+            self.db.query(SelfEvaluation).filter(SelfEvaluation.id.in_(evaluation_ids)).all()
+            if evaluation_ids else []
+        )
+        attachments_by_evaluation: Dict[Any, List[Attachment]] = {}
+        if evaluations:
+            for attachment in self.db.query(Attachment).filter(
+                Attachment.evaluation_id.in_([evaluation.id for evaluation in evaluations])
+            ).all():
+                attachments_by_evaluation.setdefault(attachment.evaluation_id, []).append(attachment)
+
+        items = []
+        stats: Dict[str, List[Dict[str, Any]]] = {mode: [] for mode in SCORING_MODES}
+        try:
+            for evaluation in evaluations:
+                attachments = attachments_by_evaluation.get(evaluation.id, [])
+                results = {}
+                for mode in SCORING_MODES:
+                    service = AIScoringService(self.db, mode=mode)
+                    service.use_cache = False
+                    started = time.monotonic()
+                    try:
+                        score_data, _ = await service.compute_score_data(evaluation, attachments)
+                    except Exception as e:
+                        logger.warning(f"评分模式对比失败，evaluation_id: {evaluation.id}, mode: {mode}, error: {str(e)}")
+                        results[mode] = None
+                        continue
+                    metrics = {
+                        "latency_ms": int((time.monotonic() - started) * 1000),
+                        "prompt_tokens_estimated": service.last_prompt.estimated_tokens if service.last_prompt else None,
+                        "prompt_tokens": service.last_usage.get("prompt_tokens"),
+                        "completion_tokens": service.last_usage.get("completion_tokens"),
+                    }
+                    stats[mode].append(metrics)
+                    results[mode] = {"score_data": score_data, **metrics}
+
+                item: Dict[str, Any] = {"evaluation_id": str(evaluation.id)}
+                for mode in SCORING_MODES:
+                    result = results.get(mode)
+                    item[mode] = None if result is None else {
+                        "total_score": result["score_data"]["total_score"],
+                        "latency_ms": result["latency_ms"],
+                        "prompt_tokens_estimated": result["prompt_tokens_estimated"],
+                    }
+                if results.get("full") and results.get("hybrid"):
+                    item["agreement"] = _agreement(results["full"]["score_data"], results["hybrid"]["score_data"])
+                items.append(item)
+        finally:
+            self.db.rollback()
+
+        return {
+            "evaluations": len(items),
+            "modes": {mode: self._summarize_mode(stats[mode]) for mode in SCORING_MODES},
+            "reduction": self._reduction(stats),
+            "agreement": self._summarize_agreement([item["agreement"] for item in items if "agreement" in item]),
+            "items": [
+                {**item, "agreement": {
+                    key: value for key, value in item["agreement"].items() if key != "indicator_diffs"
+                }} if "agreement" in item else item
+                for item in items
+            ],
+        }
+
+    @staticmethod
+    def _summarize_mode(metrics: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "scored": len(metrics),
+            "avg_latency_ms": _average([item["latency_ms"] for item in metrics]),
+            "avg_prompt_tokens_estimated": _average([item["prompt_tokens_estimated"] for item in metrics]),
+            "avg_prompt_tokens": _average([item["prompt_tokens"] for item in metrics]),
+            "avg_completion_tokens": _average([item["completion_tokens"] for item in metrics]),
+        }
+
+    def _reduction(self, stats: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Optional[float]]:
+        full = self._summarize_mode(stats["full"])
+        hybrid = self._summarize_mode(stats["hybrid"])
+        return {
+            "latency": _reduction(full["avg_latency_ms"], hybrid["avg_latency_ms"]),
+            "prompt_tokens_estimated": _reduction(
+                full["avg_prompt_tokens_estimated"], hybrid["avg_prompt_tokens_estimated"]
+            ),
+            "completion_tokens": _reduction(full["avg_completion_tokens"], hybrid["avg_completion_tokens"]),
+        }
+
+    @staticmethod
+    def _summarize_agreement(agreements: List[Dict[str, Any]]) -> Dict[str, Any]:
+        diffs = [diff for item in agreements for diff in item["indicator_diffs"]]
+        compared = sum(item["classifications_compared"] for item in agreements)
+        return {
+            "compared": len(agreements),
+            "mean_total_score_diff": _average([item["total_score_diff"] for item in agreements]),
+            "max_total_score_diff": max((item["total_score_diff"] for item in agreements), default=None),
+            "mean_indicator_diff": _average(diffs),
+            "indicators_within_1_point_rate": round(sum(diff <= 1 for diff in diffs) / len(diffs), 4) if diffs else None,
+            "parsed_counts_match_rate": round(
+                sum(item["parsed_counts_matched"] for item in agreements) / (len(agreements) * len(PARSED_COUNT_FIELDS)), 4
+            ) if agreements else None,
+            "classification_agreement_rate": round(
+                sum(item["classifications_matched"] for item in agreements) / compared, 4
+            ) if compared else None,
+        }
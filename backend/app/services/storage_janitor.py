@@ -0,0 +1,70 @@
+"""
+存储清理任务
+
+定时清理过期的分块上传会话、引用计数归零的内容对象和孤立的附件文件。
+多个worker同时运行时由各清理步骤的条件更新保证同一对象只处理一次
+"""
+
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.chunked_upload_service import ChunkedUploadService
+from app.services.content_store import ContentStore
+
+logger = logging.getLogger(__name__)
+
+
+class StorageJanitor:
+    """进程内存储清理任务"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        interval: Optional[float] = None,
+    ):
+        self._session_factory = session_factory
+        self.interval = settings.STORAGE_GC_INTERVAL if interval is None else interval
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def session_factory(self) -> Callable[[], Session]:
+        if self._session_factory is None:
+            from app.db.base import SessionLocal
+            return SessionLocal
+        return self._session_factory
+
+    def run_once(self) -> None:
+        db = self.session_factory()
+        try:
+            ChunkedUploadService(db).expire_sessions()
+            ContentStore(db).collect_garbage()
+        finally:
+            db.close()
+
+    async def start(self) -> None:
+        """启动清理任务（应用启动时调用）"""
+        if self.interval <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """停止清理任务（应用关闭时调用）"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.warning(f"存储清理失败: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+
+storage_janitor = StorageJanitor()
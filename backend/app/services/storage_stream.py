@@ -0,0 +1,120 @@
+"""
+附件流式写入存储
+
+上传文件按固定大小的分段读取并写入存储，同时计算大小和SHA-256，
+内存中最多保留一个分段，不再把整个文件读入内存。
+"""
+
+import hashlib
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, Optional
+from uuid import UUID, uuid4
+
+
+def sanitize_path_segment(segment: str) -> str:
+    """移除路径中非法字符，避免 Windows/本地存储报错"""
+    if not segment or not isinstance(segment, str):
+        return "unknown"
+    # 保留字母数字、中文、下划线、连字符，其余替换为下划线
+    segment = re.sub(r'[<>:"/\\|?*\x00-\x1f]', "_", segment)
+    return segment.strip() or "unknown"
+
+
+def attachment_storage_path(evaluation_id: UUID, indicator: str, file_name: str) -> str:
+    """附件存储路径: evaluation_id/indicator_safe/<uuid><扩展名>（路径中只用安全字符）"""
+    file_extension = os.path.splitext(file_name)[1]
+    return f"{evaluation_id}/{sanitize_path_segment(indicator)}/{uuid4()}{file_extension}"
+
+
+@dataclass
+class StoredObject:
+    """已写入存储的文件"""
+    size: int
+    sha256: str
+
+
+class HashingReader:
+    """
+    包装可读的文件对象，读取时累计大小和SHA-256
+
+    MinIO 客户端（length=-1 时按 part_size 分段读取）与本地存储都通过 read() 取数据，
+    读完即可得到整个文件的哈希，无需再读一遍。
+    """
+
+    def __init__(self, source: BinaryIO):
+        self.source = source
+        self.size = 0
+        self._hash = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.source.read(size)
+        if data:
+            self._hash.update(data)
+            self.size += len(data)
+        return data
+
+    def result(self) -> StoredObject:
+        return StoredObject(size=self.size, sha256=self._hash.hexdigest())
+
+
+def close_stream(stream: Any) -> None:
+    """关闭存储返回的文件流（MinIO 的响应还需归还连接）"""
+    stream.close()
+    if hasattr(stream, "release_conn"):
+        stream.release_conn()
+
+
+def iter_stream(stream: Any, length: int, chunk_size: int) -> Iterator[bytes]:
+    """按分段读取文件流中的 length 字节后关闭（用于下载响应，内存中只保留一个分段）"""
+    try:
+        remaining = length
+        while remaining > 0:
+            chunk = stream.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            chunk = chunk[:remaining]
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        close_stream(stream)
+
+
+class ConcatReader:
+    """
+    依次读取多个文件流，对外表现为一个文件流
+
+    用于把分块上传的各个分块拼接后写入存储；每个流在用到时才打开，读完即关闭。
+    """
+
+    def __init__(self, openers: Iterable[Callable[[], Optional[BinaryIO]]]):
+        self._openers = iter(openers)
+        self._current = None
+
+    def read(self, size: int = -1) -> bytes:
+        while True:
+            if self._current is None:
+                opener = next(self._openers, None)
+                if opener is None:
+                    return b""
+                self._current = opener()
+                if self._current is None:
+                    raise FileNotFoundError("分块文件不存在")
+            data = self._current.read(size)
+            if data:
+                return data
+            self.close()
+
+    def close(self) -> None:
+        if self._current is not None:
+            close_stream(self._current)
+            self._current = None
+
+
+def digest_stream(source: BinaryIO, part_size: int) -> StoredObject:
+    """按分段读完文件流，返回大小与SHA-256"""
+    reader = HashingReader(source)
+    while reader.read(part_size):
+        pass
+    return reader.result()
@@ -0,0 +1,256 @@
+"""
+离线同步包
+
+管理端无法通过HTTPS直连校长办公会端时，将同步数据导出为文件，在校长办公会端导入。
+同步包由一行签名清单和压缩的同步数据流组成（数据流格式与在线流式同步相同，见 sync_stream）：
+
+    {"type":"sync-bundle","format":1,"codec":"gzip","sync_task_id":...,"chunk_roots":[...],
+     "merkle_root":...,"payload_sha256":...,"payload_size":...,"key_id":...,"signature":...}\\n
+    <压缩的 NDJSON 同步数据流>
+
+- 清单以 HMAC-SHA256 签名（两端配置相同的 SYNC_BUNDLE_SIGNING_KEY，未配置时拒绝导出与导入），
+  包含每个分块的Merkle根；
+  导入时先验证签名，再边解压边校验：每个分块的根与签名清单一致后才交给接收服务写入副本，
+  因此不需要先完整读取文件
+- 文件按数据流的 SHA-256 命名（内容寻址），同一同步包重复导入时直接返回
+- 导入与在线接收使用同一套校验规则（记录哈希、分块与数据包Merkle根、evaluation_sync_errors）
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence
+from uuid import UUID, uuid4
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.sync_receiver_service import SyncReceiverService
+from app.services.sync_service import SyncAttempt, get_sync_service
+from app.services.sync_stream import (
+    FORMAT_VERSION,
+    StreamMessage,
+    SyncStreamDecoder,
+    SyncStreamError,
+    canonical_json,
+    merkle_root,
+    resolve_codec,
+)
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_SUFFIX = ".syncbundle"
+BUNDLE_READ_SIZE = 64 * 1024
+# 清单行长度上限（每个分块的根占约70字节）
+MAX_MANIFEST_BYTES = 8 * 1024 * 1024
+
+
+@dataclass
+class SyncBundle:
+    """导出的同步包"""
+    path: Path
+    manifest: Dict[str, Any]
+    skipped: List[str] = field(default_factory=list)  # 数据不完整、未导出的自评表说明
+
+
+class SyncBundleConfigError(SyncStreamError):
+    """未配置同步包签名密钥"""
+
+    def __init__(self) -> None:
+        super().__init__("未配置 SYNC_BUNDLE_SIGNING_KEY，无法签名或验证同步包", status_code=503)
+
+
+def _signing_key() -> bytes:
+    """
+    Raises:
+        SyncBundleConfigError: 未配置 SYNC_BUNDLE_SIGNING_KEY（不使用 SECRET_KEY 代替）
+    """
+    if not settings.SYNC_BUNDLE_SIGNING_KEY:
+        raise SyncBundleConfigError()
+    return settings.SYNC_BUNDLE_SIGNING_KEY.encode("utf-8")
+
+
+def key_id() -> str:
+    """签名密钥的指纹（不泄露密钥），导入端据此提示密钥不一致"""
+    return hashlib.sha256(_signing_key()).hexdigest()[:16]
+
+
+def sign_manifest(manifest: Dict[str, Any]) -> str:
+    unsigned = {key: value for key, value in manifest.items() if key != "signature"}
+    return hmac.new(_signing_key(), canonical_json(unsigned), hashlib.sha256).hexdigest()
+
+
+async def export_bundle(
+    db: Session,
+    evaluation_ids: Sequence[UUID],
+    deleted_ids: Sequence[UUID] = (),
+    output_dir: Optional[str] = None,
+    sync_task_id: Optional[UUID] = None
+) -> SyncBundle:
+    """
+    导出同步包
+
+    数据流先写入临时文件（边生成边计算SHA-256），签名清单生成后与数据流合并为最终文件。
+
+    Args:
+        db: 数据库会话
+        evaluation_ids: 要导出的自评表ID
+        deleted_ids: 要导出墓碑的自评表ID（增量同步）
+        output_dir: 输出目录，默认 SYNC_BUNDLE_DIR
+        sync_task_id: 同步任务ID，默认新建
+
+    Returns:
+        SyncBundle: 同步包文件路径与清单
+
+    Raises:
+        SyncBundleConfigError: 未配置签名密钥
+    """
+    _signing_key()
+    directory = Path(output_dir or settings.SYNC_BUNDLE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    sync_task_id = sync_task_id or uuid4()
+    codec = resolve_codec(settings.SYNC_STREAM_COMPRESSION)
+    ids = list(dict.fromkeys([*evaluation_ids, *deleted_ids]))
+    attempt = SyncAttempt(deleted=set(deleted_ids))
+
+    payload_hash = hashlib.sha256()
+    payload_size = 0
+    fd, payload_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as payload:
+            async for data in get_sync_service()._stream_body(
+                db, ids, sync_task_id, codec, [], attempt, authenticate=False
+            ):
+                payload.write(data)
+                payload_hash.update(data)
+                payload_size += len(data)
+
+        tombstones = sum(1 for value in attempt.payload_hashes.values() if value is None)
+        manifest: Dict[str, Any] = {
+            "type": "sync-bundle",
+            "format": BUNDLE_FORMAT_VERSION,
+            "stream_format": FORMAT_VERSION,
+            "codec": codec,
+            "sync_task_id": str(sync_task_id),
+            "created_at": datetime.utcnow().isoformat(),
+            "evaluation_count": len(attempt.payload_hashes) - tombstones,
+            "deleted_count": tombstones,
+            "total_count": len(attempt.payload_hashes),
+            "chunk_roots": list(attempt.chunk_roots),
+            "merkle_root": merkle_root(bytes.fromhex(root) for root in attempt.chunk_roots),
+            "payload_sha256": payload_hash.hexdigest(),
+            "payload_size": payload_size,
+            "key_id": key_id(),
+        }
+        manifest["signature"] = sign_manifest(manifest)
+
+        path = directory / f"{manifest['payload_sha256']}{BUNDLE_SUFFIX}"
+        with open(path, "wb") as bundle, open(payload_path, "rb") as payload:
+            bundle.write(canonical_json(manifest) + b"\n")
+            shutil.copyfileobj(payload, bundle, BUNDLE_READ_SIZE)
+    finally:
+        os.remove(payload_path)
+
+    logger.info(f"Exported sync bundle {path.name}: {manifest['total_count']} records")
+    return SyncBundle(path=path, manifest=manifest, skipped=list(attempt.problems))
+
+
+def read_manifest(source: BinaryIO) -> Dict[str, Any]:
+    """读取并验证同步包清单（读取位置停在数据流开头）"""
+    line = source.readline(MAX_MANIFEST_BYTES + 1)
+    if not line.endswith(b"\n"):
+        raise SyncStreamError("同步包缺少清单或清单过长")
+    try:
+        manifest = json.loads(line)
+    except ValueError as e:
+        raise SyncStreamError(f"无法解析同步包清单: {e}") from e
+    if not isinstance(manifest, dict) or manifest.get("type") != "sync-bundle":
+        raise SyncStreamError("不是同步包文件")
+    if manifest.get("format") != BUNDLE_FORMAT_VERSION:
+        raise SyncStreamError(f"不支持的同步包格式版本: {manifest.get('format')}")
+    signature = manifest.get("signature")
+    if not isinstance(signature, str) or not hmac.compare_digest(signature, sign_manifest(manifest)):
+        detail = "签名密钥不一致" if manifest.get("key_id") != key_id() else "清单被篡改"
+        raise SyncStreamError(f"Bundle signature verification failed: {detail}", status_code=403)
+    return manifest
+
+
+def import_bundle(db: Session, source: BinaryIO) -> Dict[str, Any]:
+    """
+    导入同步包（校长办公会端）
+
+    Args:
+        db: 数据库会话
+        source: 同步包文件（二进制读取）
+
+    Returns:
+        Dict[str, Any]: 与在线接收相同的接收结果，另含 bundle（清单摘要）
+
+    Raises:
+        SyncStreamError: 签名、格式或数据校验失败
+    """
+    manifest = read_manifest(source)
+    sync_task_id = UUID(manifest["sync_task_id"])
+    chunk_roots: List[str] = manifest.get("chunk_roots") or []
+    summary = {
+        "payload_sha256": manifest.get("payload_sha256"),
+        "merkle_root": manifest.get("merkle_root"),
+        "created_at": manifest.get("created_at"),
+    }
+    receiver = SyncReceiverService(db, sync_task_id, transport="bundle")
+
+    receipts = receiver.acked_receipts(sync_task_id)
+    if receipts and [receipt.chunk_root for receipt in receipts] == chunk_roots:
+        # 同一同步包已完整导入
+        return {
+            "status": "success",
+            "message": "Sync bundle already imported",
+            "sync_task_id": str(sync_task_id),
+            "evaluations_count": manifest.get("evaluation_count"),
+            "deleted_count": manifest.get("deleted_count"),
+            "chunks": len(receipts),
+            "merkle_root": manifest.get("merkle_root"),
+            "already_imported": True,
+            "bundle": summary,
+        }
+
+    def check(message: StreamMessage) -> None:
+        if message.type == "header" and int(message.fields.get("resume_from") or 0) != 0:
+            raise SyncStreamError("同步包的数据流必须从第0个分块开始")
+        if message.type == "chunk":
+            index = message.fields.get("index")
+            expected = chunk_roots[index] if isinstance(index, int) and 0 <= index < len(chunk_roots) else None
+            if expected is None or message.fields.get("root") != expected:
+                raise SyncStreamError(f"Data integrity check failed: chunk {index} does not match signed manifest")
+        if message.type == "footer" and message.fields.get("merkle_root") != manifest.get("merkle_root"):
+            raise SyncStreamError("Data integrity check failed: merkle root does not match signed manifest")
+
+    payload_hash = hashlib.sha256()
+    payload_size = 0
+    decoder = SyncStreamDecoder(manifest.get("codec") or "identity", settings.SYNC_STREAM_MAX_RECORD_BYTES)
+    while True:
+        data = source.read(BUNDLE_READ_SIZE)
+        if not data:
+            break
+        payload_hash.update(data)
+        payload_size += len(data)
+        for message in decoder.feed(data):
+            check(message)
+            receiver.handle(message)
+    for message in decoder.close():
+        check(message)
+        receiver.handle(message)
+
+    if payload_size != manifest.get("payload_size") or payload_hash.hexdigest() != manifest.get("payload_sha256"):
+        raise SyncStreamError("Data integrity check failed: bundle checksum mismatch")
+    result = receiver.finish()
+    result["bundle"] = summary
+    return result
@@ -0,0 +1,540 @@
+"""
+同步出站队列（transactional outbox）
+
+- SyncOutboxService: 创建同步任务时在同一事务中写入每份自评表的投递记录（含同步数据快照），
+  汇总投递记录更新同步任务的状态，重新投递死信
+- SyncOutboxDispatcher: 进程内dispatcher，按同步任务认领到期的投递记录并投递存储的快照，
+  失败按指数退避重试（中断时已确认的分块中的自评表记为已投递，下次只投递其余的自评表），
+  达到最大次数后转入死信
+
+投递不依赖请求生命周期：进程重启后，待投递的记录和租约过期的投递中记录会被重新处理。
+"""
+
+import asyncio
+import logging
+import os
+import random
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from tenacity import RetryError
+
+from app.core.circuit_breaker import CircuitOpenError
+from app.core.config import settings
+from app.models.sync_outbox import SyncOutboxEntry
+from app.models.sync_task import SyncTask
+from app.services.sync_service import get_sync_service
+from app.services.sync_stream import merkle_root, record_digest
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ("pending", "sending")
+
+
+def retry_delay(attempts: int) -> float:
+    """第 attempts 次投递失败后的重试等待秒数（指数退避 + 抖动）"""
+    delay = min(
+        settings.SYNC_OUTBOX_RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0)),
+        settings.SYNC_OUTBOX_RETRY_MAX_DELAY,
+    )
+    return delay * random.uniform(0.5, 1.0)
+
+
+class SyncOutboxService:
+    """同步出站队列服务类"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(
+        self,
+        sync_task: SyncTask,
+        evaluation_ids: Sequence[UUID],
+        deleted_ids: Sequence[UUID] = ()
+    ) -> List[str]:
+        """
+        为同步任务写入投递记录（不提交事务：与同步任务在同一事务中提交）
+
+        记录创建时的同步数据快照，重试时投递的是同一份数据；数据不完整的自评表直接记为死信。
+
+        Returns:
+            List[str]: 数据不完整、未入队的自评表说明
+        """
+        # 投递记录引用同步任务（外键），先写入任务
+        self.db.add(sync_task)
+        self.db.flush()
+        sync_service = get_sync_service()
+        now = datetime.utcnow()
+        collected = sync_service.collect_evaluations_data(self.db, evaluation_ids)
+        rows: List[Dict[str, Any]] = []
+        problems: List[str] = []
+        payload_hashes: Dict[str, Optional[str]] = {}
+        tombstones = set(deleted_ids)
+        for seq, eval_id in enumerate(dict.fromkeys([*evaluation_ids, *deleted_ids])):
+            row = {
+                "sync_task_id": sync_task.id,
+                "evaluation_id": eval_id,
+                "seq": seq,
+                "kind": "record",
+                "payload": None,
+                "payload_hash": None,
+                "status": "pending",
+                "attempts": 0,
+                "max_attempts": settings.SYNC_OUTBOX_MAX_ATTEMPTS,
+                "next_run_at": now,
+                "last_error": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+            if eval_id in tombstones:
+                row["kind"] = "tombstone"
+                payload_hashes[str(eval_id)] = None
+            else:
+                eval_data = collected.get(eval_id)
+                problem = sync_service._sync_problem(eval_id, eval_data)
+                if problem:
+                    problems.append(problem)
+                    row.update(status="dead", last_error=problem)
+                else:
+                    payload = eval_data.model_dump(mode="json")
+                    row.update(payload=payload, payload_hash=record_digest(payload).hex())
+                    payload_hashes[str(eval_id)] = row["payload_hash"]
+            rows.append(row)
+
+        if rows:
+            self.db.execute(insert(SyncOutboxEntry), rows)
+        sync_task.sync_data = {"payload_hashes": payload_hashes, "skipped": problems}
+        sync_task.checksum = merkle_root(
+            bytes.fromhex(payload_hash) for payload_hash in payload_hashes.values() if payload_hash
+        )
+        self.refresh_task(sync_task)
+        return problems
+
+    def refresh_task(self, sync_task: SyncTask) -> None:
+        """按投递记录汇总同步任务的进度与状态（不提交事务）"""
+        counts: Dict[str, int] = {}
+        max_attempts = 0
+        for status, count, attempts in (
+            self.db.query(SyncOutboxEntry.status, func.count(SyncOutboxEntry.id), func.max(SyncOutboxEntry.attempts))
+            .filter(SyncOutboxEntry.sync_task_id == sync_task.id)
+            .group_by(SyncOutboxEntry.status)
+        ):
+            counts[status] = count
+            max_attempts = max(max_attempts, attempts or 0)
+
+        sync_task.synced_count = counts.get("delivered", 0)
+        sync_task.failed_count = counts.get("dead", 0)
+        sync_task.retry_count = max(max_attempts - 1, 0)
+        last_error = (
+            self.db.query(SyncOutboxEntry.last_error)
+            .filter(
+                SyncOutboxEntry.sync_task_id == sync_task.id,
+                SyncOutboxEntry.status != "delivered",
+                SyncOutboxEntry.last_error.isnot(None),
+            )
+            .order_by(SyncOutboxEntry.updated_at.desc())
+            .first()
+        )
+        sync_task.error_message = last_error[0] if last_error else None
+        if any(counts.get(status) for status in OPEN_STATUSES):
+            sync_task.status = "syncing"
+            sync_task.completed_at = None
+        else:
+            sync_task.status = "failed" if sync_task.failed_count else "completed"
+            sync_task.completed_at = sync_task.completed_at or datetime.utcnow()
+
+    def requeue_dead(self, sync_task: SyncTask) -> int:
+        """
+        重新投递同步任务的死信（提交事务）
+
+        自评表记录按当前数据重新生成快照，仍不完整的保留为死信。
+
+        Returns:
+            int: 重新排队的投递记录数量
+        """
+        sync_service = get_sync_service()
+        entries = self.db.query(SyncOutboxEntry).filter(
+            SyncOutboxEntry.sync_task_id == sync_task.id,
+            SyncOutboxEntry.status == "dead",
+        ).all()
+        collected = sync_service.collect_evaluations_data(
+            self.db, [entry.evaluation_id for entry in entries if entry.kind == "record"]
+        )
+        now = datetime.utcnow()
+        requeued = 0
+        for entry in entries:
+            entry.updated_at = now
+            if entry.kind == "record":
+                eval_data = collected.get(entry.evaluation_id)
+                problem = sync_service._sync_problem(entry.evaluation_id, eval_data)
+                if problem:
+                    entry.last_error = problem
+                    continue
+                entry.payload = eval_data.model_dump(mode="json")
+                entry.payload_hash = record_digest(entry.payload).hex()
+            entry.status = "pending"
+            entry.attempts = 0
+            entry.next_run_at = now
+            entry.last_error = None
+            requeued += 1
+        self.db.flush()
+        self.refresh_task(sync_task)
+        self.db.commit()
+        return requeued
+
+
+class SyncOutboxDispatcher:
+    """进程内同步投递dispatcher"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        concurrency: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+    ):
+        self._session_factory = session_factory
+        self.concurrency = settings.SYNC_OUTBOX_WORKERS if concurrency is None else concurrency
+        self.poll_interval = settings.SYNC_OUTBOX_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+
+    @property
+    def session_factory(self) -> Callable[[], Session]:
+        if self._session_factory is None:
+            from app.db.base import SessionLocal
+            return SessionLocal
+        return self._session_factory
+
+    @session_factory.setter
+    def session_factory(self, factory: Callable[[], Session]) -> None:
+        self._session_factory = factory
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    async def start(self) -> None:
+        """启动dispatcher（应用启动时调用）"""
+        if self.concurrency <= 0 or self.running:
+            return
+        self._stopping = False
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        try:
+            requeued = await asyncio.to_thread(self.requeue_stale_entries)
+            if requeued:
+                logger.info(f"重新排队 {requeued} 条租约过期的同步投递记录")
+        except Exception as e:
+            logger.warning(f"恢复同步投递记录失败: {str(e)}")
+        self._tasks = [
+            asyncio.create_task(self._worker_loop(f"{self.instance_id}:{index}"))
+            for index in range(self.concurrency)
+        ]
+        logger.info(f"同步投递dispatcher已启动，并发数: {self.concurrency}")
+
+    async def stop(self) -> None:
+        """停止dispatcher（应用关闭时调用），投递中的记录由租约过期机制恢复"""
+        self._stopping = True
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._wakeup = None
+        self._loop = None
+
+    def notify(self) -> None:
+        """有新的同步任务时唤醒空闲dispatcher"""
+        if self._wakeup is None or self._loop is None:
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run_once(self, worker_id: str = "inline") -> bool:
+        """
+        认领并投递一个同步任务的到期记录
+
+        Returns:
+            bool: 是否处理了投递
+        """
+        sync_task_id = await asyncio.to_thread(self.claim_next, worker_id)
+        if sync_task_id is None:
+            return False
+        await self.deliver(sync_task_id, worker_id)
+        return True
+
+    async def drain(self, worker_id: str = "inline") -> int:
+        """投递所有到期记录，返回处理的投递次数"""
+        processed = 0
+        while await self.run_once(worker_id):
+            processed += 1
+        return processed
+
+    def claim_next(self, worker_id: str) -> Optional[UUID]:
+        """
+        认领一个同步任务的到期投递记录（最多 SYNC_OUTBOX_BATCH_SIZE 条）
+
+        同一同步任务同时只由一个worker投递（接收端按同步任务续传）；
+        先以 SELECT ... FOR UPDATE SKIP LOCKED 选取候选，再用带状态条件的 UPDATE 认领。
+
+        Returns:
+            Optional[UUID]: 认领的同步任务ID
+        """
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            sending = db.query(SyncOutboxEntry.sync_task_id).filter(SyncOutboxEntry.status == "sending")
+            candidate = (
+                db.query(SyncOutboxEntry.sync_task_id)
+                .filter(
+                    SyncOutboxEntry.status == "pending",
+                    SyncOutboxEntry.next_run_at <= now,
+                    SyncOutboxEntry.sync_task_id.notin_(sending),
+                )
+                .order_by(SyncOutboxEntry.next_run_at, SyncOutboxEntry.seq)
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if candidate is None:
+                db.rollback()
+                return None
+
+            entry_ids = [
+                row.id for row in
+                db.query(SyncOutboxEntry.id)
+                .filter(
+                    SyncOutboxEntry.sync_task_id == candidate.sync_task_id,
+                    SyncOutboxEntry.status == "pending",
+                    SyncOutboxEntry.next_run_at <= now,
+                )
+                .order_by(SyncOutboxEntry.seq)
+                .limit(max(settings.SYNC_OUTBOX_BATCH_SIZE, 1))
+            ]
+            claimed = (
+                db.query(SyncOutboxEntry)
+                .filter(SyncOutboxEntry.id.in_(entry_ids), SyncOutboxEntry.status == "pending")
+                .update(
+                    {
+                        SyncOutboxEntry.status: "sending",
+                        SyncOutboxEntry.locked_by: worker_id,
+                        SyncOutboxEntry.locked_at: now,
+                        SyncOutboxEntry.attempts: SyncOutboxEntry.attempts + 1,
+                        SyncOutboxEntry.updated_at: now,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            return candidate.sync_task_id if claimed else None
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def requeue_stale_entries(self) -> int:
+        """
+        将租约过期（worker崩溃或进程重启）的投递中记录重新排队
+
+        认领时已计入尝试次数；已达到最大尝试次数的记录转入死信，避免反复使worker崩溃的投递无限重试
+
+        Returns:
+            int: 重新排队的记录数
+        """
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            deadline = now - timedelta(seconds=settings.SYNC_OUTBOX_LEASE_SECONDS)
+            stale = db.query(SyncOutboxEntry).filter(
+                SyncOutboxEntry.status == "sending", SyncOutboxEntry.locked_at < deadline
+            )
+            task_ids = [row.sync_task_id for row in stale.with_entities(SyncOutboxEntry.sync_task_id).distinct()]
+            exhausted = (
+                stale.filter(SyncOutboxEntry.attempts >= SyncOutboxEntry.max_attempts)
+                .update(
+                    {
+                        SyncOutboxEntry.status: "dead",
+                        SyncOutboxEntry.locked_by: None,
+                        SyncOutboxEntry.locked_at: None,
+                        SyncOutboxEntry.last_error: "投递中断（worker租约过期），已达到最大尝试次数",
+                        SyncOutboxEntry.updated_at: now,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if exhausted:
+                logger.error(f"{exhausted} 条同步投递记录多次中断后转入死信")
+            count = (
+                stale.filter(SyncOutboxEntry.attempts < SyncOutboxEntry.max_attempts)
+                .update(
+                    {
+                        SyncOutboxEntry.status: "pending",
+                        SyncOutboxEntry.locked_by: None,
+                        SyncOutboxEntry.locked_at: None,
+                        SyncOutboxEntry.next_run_at: now,
+                        SyncOutboxEntry.updated_at: now,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if exhausted:
+                outbox = SyncOutboxService(db)
+                for sync_task in db.query(SyncTask).filter(SyncTask.id.in_(task_ids)):
+                    outbox.refresh_task(sync_task)
+            db.commit()
+            return count
+        finally:
+            db.close()
+
+    async def deliver(self, sync_task_id: UUID, worker_id: str) -> Dict[str, int]:
+        """
+        使用独立会话投递已认领的记录
+
+        Returns:
+            Dict[str, int]: delivered / retrying / dead 数量
+        """
+        db = self.session_factory()
+        try:
+            entries = (
+                db.query(SyncOutboxEntry)
+                .filter(
+                    SyncOutboxEntry.sync_task_id == sync_task_id,
+                    SyncOutboxEntry.status == "sending",
+                    SyncOutboxEntry.locked_by == worker_id,
+                )
+                .order_by(SyncOutboxEntry.seq)
+                .all()
+            )
+            result = {"delivered": 0, "retrying": 0, "dead": 0}
+            if not entries:
+                return result
+            sync_task = db.query(SyncTask).filter(SyncTask.id == sync_task_id).first()
+            payloads = {
+                entry.evaluation_id: entry.payload if entry.kind == "record" else None
+                for entry in entries
+            }
+            sync_service = get_sync_service()
+            try:
+                await sync_service.deliver_snapshot(
+                    db, sync_task_id, payloads, sync_task.started_at if sync_task else None
+                )
+            except CircuitOpenError as e:
+                # 校长办公会端已熔断：不消耗重试次数，熔断冷却结束后再投递
+                db.rollback()
+                self._defer(db, entries, e, e.retry_after)
+                result["retrying"] = len(entries)
+            except Exception as e:
+                db.rollback()
+                if isinstance(e, RetryError) and e.last_attempt.exception() is not None:
+                    e = e.last_attempt.exception()
+                # 流式投递中断时，已确认分块中的自评表不再重发
+                acked = set(await sync_service.acked_evaluations(sync_task_id, payloads))
+                self._delivered(db, sync_task_id, [entry for entry in entries if entry.evaluation_id in acked])
+                pending = [entry for entry in entries if entry.evaluation_id not in acked]
+                result["dead"] = self._retry_or_dead(db, pending, e)
+                result["delivered"] = len(acked)
+                result["retrying"] = len(pending) - result["dead"]
+            else:
+                self._delivered(db, sync_task_id, entries)
+                result["delivered"] = len(entries)
+                logger.info(f"同步任务投递完成，sync_task_id: {sync_task_id}, 记录数: {len(entries)}")
+
+            if sync_task is not None:
+                SyncOutboxService(db).refresh_task(sync_task)
+                db.commit()
+            return result
+        finally:
+            db.close()
+
+    @staticmethod
+    def _delivered(db: Session, sync_task_id: UUID, entries: List[SyncOutboxEntry]) -> None:
+        if not entries:
+            return
+        now = datetime.utcnow()
+        for entry in entries:
+            entry.status = "delivered"
+            entry.locked_by = None
+            entry.locked_at = None
+            entry.last_error = None
+            entry.delivered_at = now
+            entry.updated_at = now
+        db.commit()
+        get_sync_service().record_watermarks(
+            db, sync_task_id, {entry.evaluation_id: entry.payload_hash for entry in entries}
+        )
+
+    @staticmethod
+    def _defer(db: Session, entries: List[SyncOutboxEntry], error: Exception, delay: float) -> None:
+        now = datetime.utcnow()
+        for entry in entries:
+            entry.status = "pending"
+            entry.attempts = max(entry.attempts - 1, 0)
+            entry.locked_by = None
+            entry.locked_at = None
+            entry.last_error = str(error)
+            entry.next_run_at = now + timedelta(seconds=delay + random.uniform(0, 1))
+            entry.updated_at = now
+        db.commit()
+        logger.info(f"同步投递延后 {delay:.0f} 秒（校长办公会端熔断），记录数: {len(entries)}")
+
+    @staticmethod
+    def _retry_or_dead(db: Session, entries: List[SyncOutboxEntry], error: Exception) -> int:
+        """安排重试，达到最大次数的记录转入死信；返回死信数量"""
+        now = datetime.utcnow()
+        dead = 0
+        for entry in entries:
+            entry.locked_by = None
+            entry.locked_at = None
+            entry.last_error = str(error)
+            entry.updated_at = now
+            if entry.attempts >= entry.max_attempts:
+                entry.status = "dead"
+                dead += 1
+                continue
+            entry.status = "pending"
+            entry.next_run_at = now + timedelta(seconds=retry_delay(entry.attempts))
+        db.commit()
+        if dead:
+            logger.error(f"{dead} 条同步投递记录重试后失败，转入死信, error: {str(error)}")
+        if len(entries) > dead:
+            logger.warning(f"同步投递失败，{len(entries) - dead} 条记录稍后重试, error: {str(error)}")
+        return dead
+
+    async def _worker_loop(self, worker_id: str) -> None:
+        while not self._stopping:
+            try:
+                processed = await self.run_once(worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"同步投递dispatcher异常，worker: {worker_id}, error: {str(e)}")
+                processed = False
+
+            if processed:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                try:
+                    await asyncio.to_thread(self.requeue_stale_entries)
+                except Exception as e:
+                    logger.debug(f"恢复过期同步投递记录失败: {str(e)}")
+            if self._wakeup is not None:
+                self._wakeup.clear()
+
+
+# 全局dispatcher
+sync_outbox_dispatcher = SyncOutboxDispatcher()
@@ -0,0 +1,305 @@
+"""
+同步数据接收（校长办公会端）
+
+- evaluation_sync_errors: 单个自评表同步数据的完整性检查（需求 10.1-10.4），整包与流式接收共用
+- SyncReceiverService: 逐行处理流式同步数据，按分块校验记录哈希与Merkle根，
+  每个分块校验通过后写入回执并提交；数据流结束时核对分块数、记录总数与数据包Merkle根；
+  在线接收时头部、分块结束标记与结束标记须带 SYNC_SHARED_SECRET 的 HMAC（请求签名不覆盖流式请求体，
+  分块根又覆盖块内每条记录的哈希），离线同步包由签名清单认证；
+  增量同步的墓碑记录同样校验哈希，记入回执的 deleted_ids；
+  分块内的记录与回执在同一事务中写入考评数据副本（见 evaluation_replica_service）
+"""
+
+import hmac
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app.core.security import SYNC_STREAM_MAC_FIELD, sync_stream_mac
+from app.models.operation_log import OperationLog
+from app.models.sync_receipt import SyncReceipt
+from app.schemas.sync import EvaluationSyncData
+from app.services.evaluation_replica_service import EvaluationReplicaService, ReplicaRecord
+from app.services.sync_stream import (
+    FORMAT_VERSION,
+    RECORD_TYPES,
+    MerkleBuilder,
+    StreamMessage,
+    SyncStreamError,
+    leaf_hash,
+    merkle_root,
+)
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_OPERATOR_ID = UUID("00000000-0000-0000-0000-000000000000")
+
+# 带 HMAC 的控制行
+CONTROL_TYPES = ("header", "chunk", "footer")
+
+
+def evaluation_sync_errors(eval_data: EvaluationSyncData) -> List[str]:
+    """检查单个自评表的同步数据，返回缺失项"""
+    errors = []
+
+    # 考评数据（需求 10.1）
+    if not eval_data.evaluation_id:
+        errors.append("missing evaluation_id")
+    if not eval_data.teaching_office_id:
+        errors.append("missing teaching_office_id")
+    if not eval_data.content:
+        errors.append("missing content")
+
+    # 评分记录（需求 10.2）
+    if not eval_data.ai_score:
+        errors.append("missing ai_score")
+    if not eval_data.manual_scores:
+        errors.append("missing manual_scores")
+    if not eval_data.final_score:
+        errors.append("missing final_score")
+
+    # 附件与异常处理结果（需求 10.3, 10.4），可以为空列表
+    if eval_data.attachments is None:
+        errors.append("missing attachments list")
+    if eval_data.anomalies is None:
+        errors.append("missing anomalies list")
+
+    return errors
+
+
+class SyncReceiverService:
+    """流式同步数据接收"""
+
+    def __init__(self, db: Session, sync_task_id: Optional[UUID] = None, transport: str = "stream"):
+        self.db = db
+        # 请求头中的同步任务ID（可选），与数据流头部核对
+        self.expected_task_id = sync_task_id
+        self.transport = transport  # stream: 在线流式同步, bundle: 离线同步包导入
+        # 在线接收须认证控制行；同步包的分块根已由签名清单认证
+        self.authenticate = transport == "stream"
+        self.sync_task_id: Optional[UUID] = None
+        self.synced_at: Optional[str] = None
+        self.replica_counts: Dict[str, int] = {}
+        self.next_chunk = 0
+        self.result: Optional[Dict[str, Any]] = None
+        self._chunk_hashes = MerkleBuilder()
+        self._chunk_evaluation_ids: List[str] = []
+        self._chunk_deleted_ids: List[str] = []
+        self._chunk_records: List[ReplicaRecord] = []
+        self._chunk_errors: List[str] = []
+
+    def acked_receipts(self, sync_task_id: UUID) -> List[SyncReceipt]:
+        return (
+            self.db.query(SyncReceipt)
+            .filter(SyncReceipt.sync_task_id == sync_task_id)
+            .order_by(SyncReceipt.chunk_index)
+            .all()
+        )
+
+    def status(self, sync_task_id: UUID) -> Dict[str, Any]:
+        """已确认的分块（发送端据此续传）"""
+        return {
+            "sync_task_id": str(sync_task_id),
+            "acked_chunks": [
+                {"index": receipt.chunk_index, "count": receipt.record_count, "root": receipt.chunk_root}
+                for receipt in self.acked_receipts(sync_task_id)
+            ],
+        }
+
+    def handle(self, message: StreamMessage) -> None:
+        if self.authenticate and message.type in CONTROL_TYPES:
+            self._check_mac(message.fields)
+        if message.type == "header":
+            self._begin(message.fields)
+        elif self.sync_task_id is None:
+            raise SyncStreamError("数据流缺少头部")
+        elif self.result is not None:
+            raise SyncStreamError("数据流结束标记之后还有数据")
+        elif message.type in RECORD_TYPES:
+            self._add_record(message)
+        elif message.type == "chunk":
+            self._end_chunk(message.fields)
+        elif message.type == "footer":
+            self._finish(message.fields)
+        else:
+            raise SyncStreamError(f"未知的数据行类型: {message.type}")
+
+    def finish(self) -> Dict[str, Any]:
+        """数据流读取完毕，返回接收结果"""
+        if self.result is None:
+            raise SyncStreamError(
+                f"数据流不完整：已确认 {self.next_chunk} 个分块",
+                errors=[f"acked_chunks={self.next_chunk}"],
+            )
+        return self.result
+
+    def _check_mac(self, fields: Dict[str, Any]) -> None:
+        sync_task_id = self.sync_task_id or fields.get("sync_task_id")
+        mac = fields.get(SYNC_STREAM_MAC_FIELD)
+        if not isinstance(mac, str) or not hmac.compare_digest(mac, sync_stream_mac(str(sync_task_id), fields)):
+            raise SyncStreamError(
+                f"Sync stream authentication failed: invalid {fields.get('type')} signature", status_code=401
+            )
+
+    def _begin(self, header: Dict[str, Any]) -> None:
+        if self.sync_task_id is not None:
+            raise SyncStreamError("重复的数据流头部")
+        if header.get("format") != FORMAT_VERSION:
+            raise SyncStreamError(f"不支持的数据流格式版本: {header.get('format')}")
+        try:
+            sync_task_id = UUID(str(header.get("sync_task_id")))
+        except ValueError:
+            raise SyncStreamError("数据流头部缺少有效的 sync_task_id")
+        if self.expected_task_id and sync_task_id != self.expected_task_id:
+            raise SyncStreamError("Sync task ID in header does not match payload")
+
+        resume_from = int(header.get("resume_from") or 0)
+        receipts = self.acked_receipts(sync_task_id)
+        if resume_from == 0:
+            if receipts:
+                # 从头重新发送：丢弃旧回执
+                self.db.query(SyncReceipt).filter(SyncReceipt.sync_task_id == sync_task_id).delete()
+                self.db.commit()
+        elif [receipt.chunk_index for receipt in receipts[:resume_from]] != list(range(resume_from)):
+            raise SyncStreamError(f"无法从第 {resume_from} 个分块续传：之前的分块未全部确认", status_code=409)
+        elif len(receipts) > resume_from:
+            # 发送端发现之后的分块数据已变化，从更早的分块重新发送
+            self.db.query(SyncReceipt).filter(
+                SyncReceipt.sync_task_id == sync_task_id,
+                SyncReceipt.chunk_index >= resume_from
+            ).delete()
+            self.db.commit()
+
+        self.sync_task_id = sync_task_id
+        self.synced_at = header.get("synced_at")
+        self.next_chunk = resume_from
+
+    def _add_record(self, message: StreamMessage) -> None:
+        if message.fields.get("chunk") != self.next_chunk:
+            raise SyncStreamError(f"记录所属分块 {message.fields.get('chunk')} 与当前分块 {self.next_chunk} 不符")
+        digest = leaf_hash(message.raw_data)
+        if digest.hex() != message.fields.get("hash"):
+            raise SyncStreamError(
+                "Data integrity check failed: record hash mismatch",
+                errors=[f"chunk {self.next_chunk} record {self._chunk_hashes.count}"],
+            )
+        self._chunk_hashes.add(digest)
+        if message.type == "tombstone":
+            self._add_tombstone(message.raw_data)
+            return
+        try:
+            eval_data = EvaluationSyncData.model_validate_json(message.raw_data)
+        except ValidationError as e:
+            self._chunk_errors.append(f"chunk {self.next_chunk} record {self._chunk_hashes.count - 1}: {e.errors()[0]['msg']}")
+            return
+        errors = evaluation_sync_errors(eval_data)
+        if errors:
+            self._chunk_errors.append(f"Evaluation {eval_data.evaluation_id}: {', '.join(errors)}")
+        self._chunk_evaluation_ids.append(str(eval_data.evaluation_id))
+        self._chunk_records.append(ReplicaRecord(eval_data.evaluation_id, digest.hex(), eval_data))
+
+    def _add_tombstone(self, raw_data: bytes) -> None:
+        try:
+            evaluation_id = UUID(str(json.loads(raw_data).get("evaluation_id")))
+        except (ValueError, AttributeError):
+            self._chunk_errors.append(f"chunk {self.next_chunk} record {self._chunk_hashes.count - 1}: invalid tombstone")
+            return
+        self._chunk_deleted_ids.append(str(evaluation_id))
+        self._chunk_records.append(ReplicaRecord(evaluation_id, None))
+
+    def _end_chunk(self, trailer: Dict[str, Any]) -> None:
+        index = trailer.get("index")
+        if index != self.next_chunk:
+            raise SyncStreamError(f"分块序号 {index} 与预期 {self.next_chunk} 不符")
+        if trailer.get("count") != self._chunk_hashes.count:
+            raise SyncStreamError(
+                f"Total count mismatch: expected {trailer.get('count')}, got {self._chunk_hashes.count}"
+            )
+        if trailer.get("root") != self._chunk_hashes.root():
+            raise SyncStreamError("Data integrity check failed: chunk merkle root mismatch")
+        if self._chunk_errors:
+            raise SyncStreamError("Data validation failed", errors=self._chunk_errors)
+
+        counts = EvaluationReplicaService(self.db).apply(self.sync_task_id, self._synced_at(), self._chunk_records)
+        for key, value in counts.items():
+            self.replica_counts[key] = self.replica_counts.get(key, 0) + value
+        self.db.add(SyncReceipt(
+            sync_task_id=self.sync_task_id,
+            chunk_index=index,
+            record_count=self._chunk_hashes.count,
+            chunk_root=trailer["root"],
+            evaluation_ids=self._chunk_evaluation_ids,
+            deleted_ids=self._chunk_deleted_ids,
+        ))
+        self.db.commit()
+        self.next_chunk += 1
+        self._chunk_hashes = MerkleBuilder()
+        self._chunk_evaluation_ids = []
+        self._chunk_deleted_ids = []
+        self._chunk_records = []
+
+    def _finish(self, footer: Dict[str, Any]) -> None:
+        if self._chunk_hashes.count:
+            raise SyncStreamError("最后一个分块缺少结束标记")
+        receipts = self.acked_receipts(self.sync_task_id)
+        if footer.get("chunks") != len(receipts) or len(receipts) != self.next_chunk:
+            raise SyncStreamError(f"分块数不符：数据流声明 {footer.get('chunks')}，已确认 {len(receipts)}")
+        total = sum(receipt.record_count for receipt in receipts)
+        if footer.get("total_count") != total:
+            raise SyncStreamError(f"Total count mismatch: expected {footer.get('total_count')}, got {total}")
+        root = merkle_root(bytes.fromhex(receipt.chunk_root) for receipt in receipts)
+        if footer.get("merkle_root") != root:
+            # 已确认的分块与发送端不一致（如续传期间数据变化），丢弃回执以便从头重传
+            self.db.query(SyncReceipt).filter(SyncReceipt.sync_task_id == self.sync_task_id).delete()
+            self.db.commit()
+            raise SyncStreamError("Data integrity check failed: merkle root mismatch", status_code=409)
+
+        evaluation_ids = [evaluation_id for receipt in receipts for evaluation_id in receipt.evaluation_ids]
+        deleted_ids = [evaluation_id for receipt in receipts for evaluation_id in (receipt.deleted_ids or [])]
+        try:
+            self.db.add(OperationLog(
+                operation_type="receive_sync_data",
+                operator_id=SYSTEM_OPERATOR_ID,
+                operator_name="System",
+                operator_role="system",
+                target_id=self.sync_task_id,
+                target_type="sync_task",
+                details={
+                    "sync_task_id": str(self.sync_task_id),
+                    "total_count": total,
+                    "evaluation_ids": evaluation_ids,
+                    "deleted_evaluation_ids": deleted_ids,
+                    "synced_at": self.synced_at,
+                    "checksum": root,
+                    "checksum_verified": True,
+                    "transport": self.transport,
+                    "chunks": len(receipts),
+                },
+            ))
+            self.db.commit()
+        except Exception:
+            logger.exception("记录同步接收日志失败")
+            self.db.rollback()
+
+        self.result = {
+            "status": "success",
+            "message": f"Successfully received and validated {len(evaluation_ids)} evaluations",
+            "sync_task_id": str(self.sync_task_id),
+            "received_at": datetime.utcnow().isoformat(),
+            "evaluations_count": len(evaluation_ids),
+            "deleted_count": len(deleted_ids),
+            "chunks": len(receipts),
+            "merkle_root": root,
+            "replica": self.replica_counts,
+        }
+
+    def _synced_at(self) -> Optional[datetime]:
+        try:
+            return datetime.fromisoformat(self.synced_at) if self.synced_at else None
+        except ValueError:
+            return None
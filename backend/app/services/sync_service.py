@@ -3,11 +3,14 @@
 
 负责将考评数据从管理端同步至校长办公会端
 包含HTTPS传输、数据完整性验证、失败重试机制
+默认以分块NDJSON流传输（见 sync_stream），中断后从最后确认的分块续传
+校长办公会端确认后记录每份自评表的同步水位（数据哈希与版本），增量同步只发送变化的自评表与墓碑
 """
 
 import hashlib
 import json
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 from uuid import UUID
 from datetime import datetime
 from sqlalchemy.orm import Session
@@ -21,6 +24,10 @@ from tenacity import (
 )
 import logging
 
+from app.core.config import settings
+from app.core.http_clients import http_clients, PRESIDENT_OFFICE_CLIENT
+from app.core.circuit_breaker import CircuitOpenError, outbound_guards
+from app.core.security import SYNC_STREAM_MAC_FIELD, sync_request_auth, sync_stream_auth, sync_stream_mac
 from app.models.self_evaluation import SelfEvaluation
 from app.models.teaching_office import TeachingOffice
 from app.models.ai_score import AIScore
@@ -29,32 +36,75 @@ from app.models.final_score import FinalScore
 from app.models.attachment import Attachment
 from app.models.anomaly import Anomaly
 from app.models.sync_task import SyncTask
+from app.models.sync_watermark import SyncWatermark
 from app.schemas.sync import EvaluationSyncData, SyncDataPackage
+from app.services.sync_stream import (
+    FORMAT_VERSION,
+    MEDIA_TYPE,
+    MerkleBuilder,
+    compressor,
+    encode_message,
+    encode_record,
+    merkle_root,
+    record_digest,
+    resolve_codec,
+)
 
 logger = logging.getLogger(__name__)
 
+# 批量收集时每次 IN 查询的自评表数量上限
+SYNC_COLLECT_BATCH_SIZE = 500
+
+
+class SyncDeliveryError(Exception):
+    """校长办公会端返回同步失败"""
+
+
+@dataclass
+class SyncDelta:
+    """增量同步计划：上次确认以来新增或变化的自评表，以及需要发送墓碑的自评表"""
+    changed: List[UUID] = field(default_factory=list)
+    deleted: List[UUID] = field(default_factory=list)
+    unchanged: int = 0
+    skipped: List[str] = field(default_factory=list)  # 数据不完整、本次不发送的说明
+
+
+@dataclass
+class SyncAttempt:
+    """一次发送尝试：deleted 为要发送墓碑的自评表；其余字段每次尝试重新填充"""
+    deleted: Set[UUID] = field(default_factory=set)
+    # 出站队列投递时为创建任务时存储的同步数据快照（自评表ID -> 数据），不再查询业务表
+    snapshot: Optional[Dict[UUID, Dict[str, Any]]] = None
+    # 数据的采集时间（快照为创建任务的时间），接收端据此忽略晚到的旧数据；为空时取发送时间
+    synced_at: Optional[datetime] = None
+    problems: List[str] = field(default_factory=list)
+    # 已发送（含续传时已确认）的记录：自评表ID -> 数据哈希，墓碑为None
+    payload_hashes: Dict[UUID, Optional[str]] = field(default_factory=dict)
+    # 各分块的Merkle根（含续传时已确认的分块），离线同步包写入签名清单
+    chunk_roots: List[str] = field(default_factory=list)
+
+    def reset(self) -> None:
+        self.problems.clear()
+        self.payload_hashes.clear()
+        self.chunk_roots.clear()
+
 
 class SyncService:
     """数据同步服务类"""
     
-    def __init__(self, president_office_url: str = "https://president-office.example.com/api"):
+    def __init__(self, president_office_url: Optional[str] = None):
         """
         初始化同步服务
         
         Args:
-            president_office_url: 校长办公会端API地址 (HTTPS)
+            president_office_url: 校长办公会端API地址 (HTTPS)，默认取配置
         """
-        self.president_office_url = president_office_url
-        # Configure HTTPS client with timeout and SSL verification
-        self.client = httpx.AsyncClient(
-            timeout=httpx.Timeout(30.0, connect=10.0),
-            verify=True,  # Enable SSL certificate verification
-            follow_redirects=True
-        )
+        self.president_office_url = president_office_url or settings.PRESIDENT_OFFICE_API_URL
     
-    async def close(self):
-        """关闭HTTP客户端"""
-        await self.client.aclose()
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """共享的HTTPS客户端（连接池由应用生命周期统一管理）"""
+        return http_clients.get(PRESIDENT_OFFICE_CLIENT)
     
     def collect_evaluation_data(
         self, 
@@ -73,128 +123,91 @@ class SyncService:
         Returns:
             EvaluationSyncData: 完整的自评表数据，如果不存在则返回None
         """
-        # Get evaluation
-        evaluation = db.query(SelfEvaluation).filter(
-            SelfEvaluation.id == evaluation_id
-        ).first()
-        
-        if not evaluation:
-            logger.warning(f"Evaluation {evaluation_id} not found")
-            return None
-        
-        # Get teaching office
-        teaching_office = db.query(TeachingOffice).filter(
-            TeachingOffice.id == evaluation.teaching_office_id
-        ).first()
-        
-        if not teaching_office:
-            logger.warning(f"Teaching office {evaluation.teaching_office_id} not found")
-            return None
-        
-        # Get AI score
-        ai_score = db.query(AIScore).filter(
-            AIScore.evaluation_id == evaluation_id
-        ).first()
-        
-        ai_score_data = None
-        if ai_score:
-            ai_score_data = {
-                "id": str(ai_score.id),
-                "total_score": float(ai_score.total_score),
-                "indicator_scores": ai_score.indicator_scores,
-                "parsed_reform_projects": ai_score.parsed_reform_projects,
-                "parsed_honorary_awards": ai_score.parsed_honorary_awards,
-                "scored_at": ai_score.scored_at.isoformat()
-            }
+        return self.collect_evaluations_data(db, [evaluation_id]).get(evaluation_id)
+    
+    def collect_evaluations_data(
+        self,
+        db: Session,
+        evaluation_ids: Sequence[UUID]
+    ) -> Dict[UUID, EvaluationSyncData]:
+        """
+        批量收集自评表的完整数据
         
-        # Get manual scores
-        manual_scores = db.query(ManualScore).filter(
-            ManualScore.evaluation_id == evaluation_id
-        ).all()
-        
-        manual_scores_data = [
-            {
-                "id": str(score.id),
-                "reviewer_id": str(score.reviewer_id),
-                "reviewer_name": score.reviewer_name,
-                "reviewer_role": score.reviewer_role,
-                "weight": float(score.weight),
-                "scores": score.scores,
-                "submitted_at": score.submitted_at.isoformat()
-            }
-            for score in manual_scores
-        ]
-        
-        # Get final score
-        final_score = db.query(FinalScore).filter(
-            FinalScore.evaluation_id == evaluation_id
-        ).first()
-        
-        final_score_data = None
-        if final_score:
-            final_score_data = {
-                "id": str(final_score.id),
-                "final_score": float(final_score.final_score),
-                "summary": final_score.summary,
-                "determined_by": str(final_score.determined_by),
-                "determined_at": final_score.determined_at.isoformat()
-            }
+        每张表按自评表ID做一次 IN 查询（ID较多时按 SYNC_COLLECT_BATCH_SIZE 分批），
+        在内存中组装 EvaluationSyncData，查询次数与自评表数量无关。
         
-        # Get attachments
-        attachments = db.query(Attachment).filter(
-            Attachment.evaluation_id == evaluation_id
-        ).all()
-        
-        attachments_data = [
-            {
-                "id": str(att.id),
-                "indicator": att.indicator,
-                "file_name": att.file_name,
-                "file_size": att.file_size,
-                "file_type": att.file_type,
-                "storage_path": att.storage_path,
-                "classified_by": att.classified_by,
-                "uploaded_at": att.uploaded_at.isoformat()
-            }
-            for att in attachments
-        ]
-        
-        # Get anomalies
-        anomalies = db.query(Anomaly).filter(
-            Anomaly.evaluation_id == evaluation_id
-        ).all()
-        
-        anomalies_data = [
-            {
-                "id": str(anomaly.id),
-                "type": anomaly.type,
-                "indicator": anomaly.indicator,
-                "declared_count": anomaly.declared_count,
-                "parsed_count": anomaly.parsed_count,
-                "description": anomaly.description,
-                "status": anomaly.status,
-                "handled_by": str(anomaly.handled_by) if anomaly.handled_by else None,
-                "handled_action": anomaly.handled_action,
-                "handled_at": anomaly.handled_at.isoformat() if anomaly.handled_at else None
-            }
-            for anomaly in anomalies
-        ]
-        
-        # Build sync data
-        return EvaluationSyncData(
-            evaluation_id=evaluation.id,
-            teaching_office_id=evaluation.teaching_office_id,
-            teaching_office_name=teaching_office.name,
-            evaluation_year=evaluation.evaluation_year,
-            content=evaluation.content,
-            status=evaluation.status,
-            submitted_at=evaluation.submitted_at,
-            ai_score=ai_score_data,
-            manual_scores=manual_scores_data,
-            final_score=final_score_data,
-            attachments=attachments_data,
-            anomalies=anomalies_data
+        Args:
+            db: 数据库会话
+            evaluation_ids: 自评表ID列表
+            
+        Returns:
+            Dict[UUID, EvaluationSyncData]: 自评表ID -> 同步数据（不存在的自评表不在结果中）
+        """
+        unique_ids = list(dict.fromkeys(evaluation_ids))
+        result: Dict[UUID, EvaluationSyncData] = {}
+        for start in range(0, len(unique_ids), SYNC_COLLECT_BATCH_SIZE):
+            result.update(self._collect_batch(db, unique_ids[start:start + SYNC_COLLECT_BATCH_SIZE]))
+        return result
+    
+    def _collect_batch(self, db: Session, evaluation_ids: List[UUID]) -> Dict[UUID, EvaluationSyncData]:
+        evaluations = db.query(SelfEvaluation).filter(SelfEvaluation.id.in_(evaluation_ids)).all()
+        found = {evaluation.id for evaluation in evaluations}
+        for evaluation_id in evaluation_ids:
+            if evaluation_id not in found:
+                logger.warning(f"Evaluation {evaluation_id} not found")
+        if not evaluations:
+            return {}
+        
+        office_ids = {evaluation.teaching_office_id for evaluation in evaluations}
+        office_names = dict(
+            db.query(TeachingOffice.id, TeachingOffice.name).filter(TeachingOffice.id.in_(office_ids)).all()
+        )
+        ids = list(found)
+        
+        # AI评分不可修改，重新评分会新增记录：取最新一次
+        ai_scores: Dict[UUID, AIScore] = {}
+        for ai_score in (
+            db.query(AIScore).filter(AIScore.evaluation_id.in_(ids)).order_by(AIScore.scored_at)
+        ):
+            ai_scores[ai_score.evaluation_id] = ai_score
+        
+        final_scores = {
+            final_score.evaluation_id: final_score
+            for final_score in db.query(FinalScore).filter(FinalScore.evaluation_id.in_(ids))
+        }
+        manual_scores = _group_by_evaluation(
+            db.query(ManualScore).filter(ManualScore.evaluation_id.in_(ids)).order_by(ManualScore.submitted_at)
         )
+        attachments = _group_by_evaluation(
+            db.query(Attachment).filter(Attachment.evaluation_id.in_(ids)).order_by(Attachment.uploaded_at)
+        )
+        anomalies = _group_by_evaluation(
+            db.query(Anomaly).filter(Anomaly.evaluation_id.in_(ids))
+        )
+        
+        result: Dict[UUID, EvaluationSyncData] = {}
+        for evaluation in evaluations:
+            office_name = office_names.get(evaluation.teaching_office_id)
+            if office_name is None:
+                logger.warning(f"Teaching office {evaluation.teaching_office_id} not found")
+                continue
+            ai_score = ai_scores.get(evaluation.id)
+            final_score = final_scores.get(evaluation.id)
+            result[evaluation.id] = EvaluationSyncData(
+                evaluation_id=evaluation.id,
+                teaching_office_id=evaluation.teaching_office_id,
+                teaching_office_name=office_name,
+                evaluation_year=evaluation.evaluation_year,
+                content=evaluation.content,
+                status=evaluation.status,
+                submitted_at=evaluation.submitted_at,
+                ai_score=_ai_score_data(ai_score) if ai_score else None,
+                manual_scores=[_manual_score_data(score) for score in manual_scores.get(evaluation.id, [])],
+                final_score=_final_score_data(final_score) if final_score else None,
+                attachments=[_attachment_data(att) for att in attachments.get(evaluation.id, [])],
+                anomalies=[_anomaly_data(anomaly) for anomaly in anomalies.get(evaluation.id, [])]
+            )
+        return result
     
     def calculate_checksum(self, data: Dict[str, Any]) -> str:
         """
@@ -255,6 +268,112 @@ class SyncService:
         is_complete = len(missing_items) == 0
         return is_complete, missing_items
     
+    def _sync_problem(self, eval_id: UUID, eval_data: Optional[EvaluationSyncData]) -> Optional[str]:
+        """自评表不存在或数据不完整时返回原因"""
+        if eval_data is None:
+            return f"Evaluation {eval_id} not found"
+        is_complete, missing_items = self.verify_data_integrity(eval_data)
+        if not is_complete:
+            logger.warning(f"Evaluation {eval_id} data incomplete. Missing: {missing_items}")
+            return f"Data incomplete for evaluation {eval_id}: missing {', '.join(missing_items)}"
+        return None
+
+    def plan_changes(
+        self,
+        db: Session,
+        evaluation_ids: Optional[Sequence[UUID]] = None
+    ) -> SyncDelta:
+        """
+        计算上次成功同步以来的变化
+
+        与同步水位比较数据哈希：没有水位或哈希变化的自评表需要发送；有水位但自评表已不存在
+        或已没有最终得分的发送墓碑。
+
+        Args:
+            db: 数据库会话
+            evaluation_ids: 限定范围；为空时为全部有最终得分的自评表和全部未删除的水位
+
+        Returns:
+            SyncDelta: 增量同步计划
+        """
+        if evaluation_ids:
+            scope = list(dict.fromkeys(evaluation_ids))
+        else:
+            ready = [row[0] for row in db.query(FinalScore.evaluation_id).distinct()]
+            tracked = [
+                row[0] for row in
+                db.query(SyncWatermark.evaluation_id).filter(SyncWatermark.deleted.is_(False))
+            ]
+            scope = list(dict.fromkeys(ready + tracked))
+
+        delta = SyncDelta()
+        for start in range(0, len(scope), SYNC_COLLECT_BATCH_SIZE):
+            batch = scope[start:start + SYNC_COLLECT_BATCH_SIZE]
+            collected = self.collect_evaluations_data(db, batch)
+            watermarks = {
+                watermark.evaluation_id: watermark
+                for watermark in db.query(SyncWatermark).filter(SyncWatermark.evaluation_id.in_(batch))
+            }
+            for eval_id in batch:
+                eval_data = collected.get(eval_id)
+                watermark = watermarks.get(eval_id)
+                synced = watermark is not None and not watermark.deleted
+                if eval_data is None or not eval_data.final_score:
+                    if synced:
+                        delta.deleted.append(eval_id)
+                    continue
+                problem = self._sync_problem(eval_id, eval_data)
+                if problem:
+                    delta.skipped.append(problem)
+                    continue
+                payload_hash = record_digest(eval_data.model_dump(mode="json")).hex()
+                if synced and watermark.payload_hash == payload_hash:
+                    delta.unchanged += 1
+                else:
+                    delta.changed.append(eval_id)
+        return delta
+
+    def record_watermarks(
+        self,
+        db: Session,
+        sync_task_id: UUID,
+        payload_hashes: Dict[UUID, Optional[str]]
+    ) -> None:
+        """校长办公会端确认后更新同步水位（数据变化时版本加1）；失败只影响下次增量同步的范围"""
+        now = datetime.utcnow()
+        ids = list(payload_hashes)
+        try:
+            for start in range(0, len(ids), SYNC_COLLECT_BATCH_SIZE):
+                batch = ids[start:start + SYNC_COLLECT_BATCH_SIZE]
+                existing = {
+                    watermark.evaluation_id: watermark
+                    for watermark in db.query(SyncWatermark).filter(SyncWatermark.evaluation_id.in_(batch))
+                }
+                for eval_id in batch:
+                    payload_hash = payload_hashes[eval_id]
+                    deleted = payload_hash is None
+                    watermark = existing.get(eval_id)
+                    if watermark is None:
+                        db.add(SyncWatermark(
+                            evaluation_id=eval_id,
+                            payload_hash=payload_hash,
+                            version=1,
+                            deleted=deleted,
+                            sync_task_id=sync_task_id,
+                            synced_at=now
+                        ))
+                        continue
+                    if watermark.payload_hash != payload_hash or watermark.deleted != deleted:
+                        watermark.version += 1
+                    watermark.payload_hash = payload_hash
+                    watermark.deleted = deleted
+                    watermark.sync_task_id = sync_task_id
+                    watermark.synced_at = now
+            db.commit()
+        except Exception:
+            logger.exception(f"Failed to record sync watermarks for task {sync_task_id}")
+            db.rollback()
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
@@ -279,6 +398,7 @@ class SyncService:
         Raises:
             httpx.HTTPError: HTTP请求失败
             httpx.TimeoutException: 请求超时
+            CircuitOpenError: 校长办公会端已熔断
         """
         url = f"{self.president_office_url}/receive-sync-data"
         
@@ -288,17 +408,20 @@ class SyncService:
         logger.info(f"Sending sync request to {url} for task {sync_package.sync_task_id}")
         
         try:
-            response = await self.client.post(
-                url,
-                json=payload,
-                headers={
-                    "Content-Type": "application/json",
-                    "X-Sync-Task-Id": str(sync_package.sync_task_id),
-                    "X-Checksum": sync_package.checksum
-                }
-            )
-            
-            response.raise_for_status()
+            # 校长办公会端熔断时直接失败，不再逐次重试
+            async with outbound_guards.get(PRESIDENT_OFFICE_CLIENT).call():
+                response = await self.client.post(
+                    url,
+                    json=payload,
+                    auth=sync_request_auth,
+                    headers={
+                        "Content-Type": "application/json",
+                        "X-Sync-Task-Id": str(sync_package.sync_task_id),
+                        "X-Checksum": sync_package.checksum
+                    }
+                )
+                
+                response.raise_for_status()
             
             logger.info(f"Sync request successful for task {sync_package.sync_task_id}")
             return response.json()
@@ -309,15 +432,322 @@ class SyncService:
         except httpx.TimeoutException as e:
             logger.error(f"Timeout during sync: {str(e)}")
             raise
+        except CircuitOpenError as e:
+            logger.warning(f"Sync skipped: {str(e)}")
+            raise
         except Exception as e:
             logger.error(f"Unexpected error during sync: {str(e)}")
             raise
     
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10),
+        retry=retry_if_exception_type((httpx.HTTPError, httpx.TimeoutException)),
+        before_sleep=before_sleep_log(logger, logging.WARNING)
+    )
+    async def send_sync_stream(
+        self,
+        db: Session,
+        evaluation_ids: List[UUID],
+        sync_task_id: UUID,
+        attempt: SyncAttempt
+    ) -> Dict[str, Any]:
+        """
+        以分块NDJSON流发送同步数据 (带重试机制，重试时从最后一个已确认的分块续传)
+        
+        Args:
+            db: 数据库会话
+            evaluation_ids: 要同步的自评表ID（已去重，含要发送墓碑的自评表）
+            sync_task_id: 同步任务ID
+            attempt: 墓碑范围；每次尝试重新填充跳过的自评表说明与已发送记录的哈希
+            
+        Returns:
+            Dict[str, Any]: 校长办公会端的响应
+        """
+        url = f"{self.president_office_url}/receive-sync-stream"
+        codec = resolve_codec(settings.SYNC_STREAM_COMPRESSION)
+        
+        try:
+            async with outbound_guards.get(PRESIDENT_OFFICE_CLIENT).call():
+                status_response = await self.client.get(f"{url}/{sync_task_id}", auth=sync_request_auth)
+                status_response.raise_for_status()
+                acked = _contiguous_chunks(status_response.json().get("acked_chunks", []))
+                if acked:
+                    logger.info(f"Resuming sync stream for task {sync_task_id} after {len(acked)} acked chunks")
+                
+                response = await self.client.post(
+                    url,
+                    content=self._stream_body(db, evaluation_ids, sync_task_id, codec, acked, attempt),
+                    auth=sync_stream_auth,
+                    headers={
+                        "Content-Type": MEDIA_TYPE,
+                        "Content-Encoding": codec,
+                        "X-Sync-Task-Id": str(sync_task_id)
+                    }
+                )
+                response.raise_for_status()
+            
+            logger.info(f"Sync stream successful for task {sync_task_id}")
+            return response.json()
+        
+        except httpx.HTTPStatusError as e:
+            logger.error(f"HTTP error during sync: {e.response.status_code} - {e.response.text}")
+            raise
+        except CircuitOpenError as e:
+            logger.warning(f"Sync skipped: {str(e)}")
+            raise
+    
+    def _encode_chunk(
+        self,
+        db: Session,
+        index: int,
+        chunk_ids: List[UUID],
+        attempt: SyncAttempt
+    ) -> Tuple[List[Tuple[UUID, bytes, bytes]], List[str]]:
+        """收集并编码一个分块：([(自评表ID, NDJSON行, 记录哈希)], 跳过的自评表说明)"""
+        deleted = attempt.deleted
+        snapshot = attempt.snapshot
+        if snapshot is None:
+            collected = self.collect_evaluations_data(db, [eval_id for eval_id in chunk_ids if eval_id not in deleted])
+        records = []
+        problems = []
+        for eval_id in chunk_ids:
+            if eval_id in deleted:
+                line, digest = encode_record(index, {"evaluation_id": str(eval_id)}, "tombstone")
+            elif snapshot is not None:
+                # 快照在入队时已校验完整性
+                line, digest = encode_record(index, snapshot[eval_id])
+            else:
+                eval_data = collected.get(eval_id)
+                problem = self._sync_problem(eval_id, eval_data)
+                if problem:
+                    problems.append(problem)
+                    continue
+                line, digest = encode_record(index, eval_data.model_dump(mode="json"))
+            records.append((eval_id, line, digest))
+        return records, problems
+    
+    async def _stream_body(
+        self,
+        db: Session,
+        evaluation_ids: List[UUID],
+        sync_task_id: UUID,
+        codec: str,
+        acked: List[Dict[str, Any]],
+        attempt: SyncAttempt,
+        authenticate: bool = True
+    ) -> AsyncIterator[bytes]:
+        """
+        逐块收集、编码并压缩同步数据，内存中只保留当前分块
+        
+        authenticate 为真时头部、分块结束标记与结束标记附带 SYNC_SHARED_SECRET 的 HMAC
+        （请求签名不覆盖流式请求体，接收端据此认证内容）；离线同步包由签名清单认证，不附带。
+        """
+        chunk_size = max(settings.SYNC_STREAM_CHUNK_SIZE, 1)
+        chunks = [evaluation_ids[start:start + chunk_size] for start in range(0, len(evaluation_ids), chunk_size)]
+        packer = compressor(codec)
+        attempt.reset()
+        
+        def emit(data: bytes) -> bytes:
+            return packer.compress(data) if packer else data
+        
+        def control(message: Dict[str, Any]) -> bytes:
+            if authenticate:
+                message[SYNC_STREAM_MAC_FIELD] = sync_stream_mac(str(sync_task_id), message)
+            return emit(encode_message(message))
+        
+        def accept(records: List[Tuple[UUID, bytes, bytes]], problems: List[str]) -> None:
+            attempt.problems.extend(problems)
+            for eval_id, _, digest in records:
+                attempt.payload_hashes[eval_id] = None if eval_id in attempt.deleted else digest.hex()
+        
+        # 已确认的分块不再发送，但重新计算分块根：中断期间数据有变化时从该分块起重新发送
+        chunk_roots = MerkleBuilder()
+        total = 0
+        for index, ack in enumerate(acked[:len(chunks)]):
+            records, problems = self._encode_chunk(db, index, chunks[index], attempt)
+            if merkle_root(digest for _, _, digest in records) != ack["root"]:
+                logger.info(f"Acked chunk {index} of sync task {sync_task_id} changed, resending from it")
+                break
+            accept(records, problems)
+            attempt.chunk_roots.append(ack["root"])
+            chunk_roots.add(bytes.fromhex(ack["root"]))
+            total += len(records)
+        resume_from = chunk_roots.count
+        
+        yield control({
+            "type": "header",
+            "format": FORMAT_VERSION,
+            "sync_task_id": str(sync_task_id),
+            "synced_at": (attempt.synced_at or datetime.utcnow()).isoformat(),
+            "chunk_size": chunk_size,
+            "resume_from": resume_from,
+        })
+        
+        for index in range(resume_from, len(chunks)):
+            records, problems = self._encode_chunk(db, index, chunks[index], attempt)
+            accept(records, problems)
+            chunk_hashes = MerkleBuilder()
+            for _, line, digest in records:
+                chunk_hashes.add(digest)
+                data = emit(line)
+                if data:
+                    yield data
+            
+            root = chunk_hashes.root()
+            attempt.chunk_roots.append(root)
+            chunk_roots.add(bytes.fromhex(root))
+            total += chunk_hashes.count
+            yield control({"type": "chunk", "index": index, "count": chunk_hashes.count, "root": root})
+        
+        footer = control({
+            "type": "footer",
+            "chunks": chunk_roots.count,
+            "total_count": total,
+            "merkle_root": chunk_roots.root(),
+        })
+        yield footer + (packer.flush() if packer else b"")
+    
+    async def _sync_streamed(
+        self,
+        db: Session,
+        evaluation_ids: List[UUID],
+        sync_task_id: UUID,
+        deleted_ids: Sequence[UUID]
+    ) -> tuple[int, int, Optional[str]]:
+        ids = list(dict.fromkeys([*evaluation_ids, *deleted_ids]))
+        attempt = SyncAttempt(deleted=set(deleted_ids))
+        try:
+            response = await self.send_sync_stream(db, ids, sync_task_id, attempt)
+        except Exception as e:
+            error_message = f"Sync request failed after retries: {str(e)}"
+            logger.error(error_message)
+            return 0, len(ids), error_message
+        
+        if response.get("status") != "success":
+            error_message = response.get("message", "Unknown error from president office")
+            logger.error(f"Sync failed: {error_message}")
+            return 0, len(ids), error_message
+        
+        self.record_watermarks(db, sync_task_id, attempt.payload_hashes)
+        synced_count = int(response.get("evaluations_count", 0)) + int(response.get("deleted_count", 0))
+        failed_count = len(ids) - synced_count
+        error_message = None
+        if failed_count:
+            error_message = attempt.problems[-1] if attempt.problems else f"{failed_count} evaluations incomplete or not found"
+        if not synced_count:
+            error_message = error_message or "No valid evaluations to sync"
+        logger.info(f"Successfully synced {synced_count} evaluations (merkle root {response.get('merkle_root')})")
+        return synced_count, failed_count, error_message
+    
+    def build_package(
+        self,
+        sync_task_id: UUID,
+        evaluations_data: List[EvaluationSyncData],
+        deleted_ids: Sequence[UUID],
+        synced_at: Optional[datetime] = None
+    ) -> SyncDataPackage:
+        """组装整包同步数据并计算校验和（兼容旧版接收端的 package 传输）"""
+        sync_package = SyncDataPackage(
+            sync_task_id=sync_task_id,
+            evaluations=evaluations_data,
+            deleted_evaluation_ids=list(deleted_ids),
+            total_count=len(evaluations_data),
+            synced_at=synced_at or datetime.utcnow(),
+            checksum=""  # Will be calculated below
+        )
+        
+        # Calculate checksum
+        package_dict = sync_package.model_dump(mode='json')
+        package_dict.pop('checksum', None)  # Remove checksum field before calculating
+        sync_package.checksum = self.calculate_checksum(package_dict)
+        return sync_package
+    
+    async def deliver_snapshot(
+        self,
+        db: Session,
+        sync_task_id: UUID,
+        payloads: Dict[UUID, Optional[Dict[str, Any]]],
+        synced_at: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        投递出站队列中存储的同步数据快照（不查询业务表，不更新同步水位）
+        
+        Args:
+            db: 数据库会话
+            sync_task_id: 同步任务ID
+            payloads: 按发送顺序排列的 自评表ID -> 同步数据快照，墓碑为None
+            synced_at: 快照的采集时间
+            
+        Returns:
+            Dict[str, Any]: 校长办公会端的响应
+            
+        Raises:
+            SyncDeliveryError: 校长办公会端返回失败
+            CircuitOpenError: 校长办公会端已熔断
+        """
+        deleted = [eval_id for eval_id, payload in payloads.items() if payload is None]
+        if settings.SYNC_TRANSPORT == "stream":
+            snapshot = {eval_id: payload for eval_id, payload in payloads.items() if payload is not None}
+            attempt = SyncAttempt(deleted=set(deleted), snapshot=snapshot, synced_at=synced_at)
+            response = await self.send_sync_stream(db, list(payloads), sync_task_id, attempt)
+        else:
+            evaluations_data = [
+                EvaluationSyncData.model_validate(payload) for payload in payloads.values() if payload is not None
+            ]
+            sync_package = self.build_package(sync_task_id, evaluations_data, deleted, synced_at)
+            response = await self.send_sync_request(sync_package)
+        if response.get("status") != "success":
+            raise SyncDeliveryError(response.get("message", "Unknown error from president office"))
+        return response
+    
+    async def acked_evaluations(
+        self,
+        sync_task_id: UUID,
+        payloads: Dict[UUID, Optional[Dict[str, Any]]]
+    ) -> List[UUID]:
+        """
+        流式投递中断后，校长办公会端已确认分块中的自评表（按发送顺序的前缀）
+        
+        同一同步任务的多次投递共用回执：只有分块根与本次投递的分块一致的回执才计入，
+        之前投递（分块内容不同）留下的回执不算本次的自评表已送达。
+        查询失败或使用 package 传输时返回空列表，下次投递时整体重发。
+        
+        Args:
+            sync_task_id: 同步任务ID
+            payloads: 本次投递的 自评表ID -> 同步数据快照（按发送顺序），墓碑为None
+        """
+        if settings.SYNC_TRANSPORT != "stream":
+            return []
+        try:
+            response = await self.client.get(
+                f"{self.president_office_url}/receive-sync-stream/{sync_task_id}", auth=sync_request_auth
+            )
+            response.raise_for_status()
+            acked = _contiguous_chunks(response.json().get("acked_chunks", []))
+        except Exception as e:
+            logger.warning(f"Failed to query acked chunks for sync task {sync_task_id}: {str(e)}")
+            return []
+        chunk_size = max(settings.SYNC_STREAM_CHUNK_SIZE, 1)
+        evaluation_ids = list(payloads)
+        delivered: List[UUID] = []
+        for ack in acked:
+            chunk_ids = evaluation_ids[ack["index"] * chunk_size:(ack["index"] + 1) * chunk_size]
+            digests = (
+                record_digest(payloads[eval_id] if payloads[eval_id] is not None else {"evaluation_id": str(eval_id)})
+                for eval_id in chunk_ids
+            )
+            if not chunk_ids or merkle_root(digests) != ack["root"]:
+                break
+            delivered.extend(chunk_ids)
+        return delivered
+    
     async def sync_evaluations(
         self,
         db: Session,
         evaluation_ids: List[UUID],
-        sync_task_id: UUID
+        sync_task_id: UUID,
+        deleted_ids: Optional[Sequence[UUID]] = None
     ) -> tuple[int, int, Optional[str]]:
         """
         同步多个自评表数据至校长办公会端
@@ -328,6 +758,7 @@ class SyncService:
             db: 数据库会话
             evaluation_ids: 要同步的自评表ID列表
             sync_task_id: 同步任务ID
+            deleted_ids: 增量同步时要发送墓碑的自评表ID
             
         Returns:
             tuple[int, int, Optional[str]]: (成功数量, 失败数量, 错误消息)
@@ -335,44 +766,27 @@ class SyncService:
         synced_count = 0
         failed_count = 0
         error_message = None
+        deleted_ids = list(dict.fromkeys(deleted_ids or []))
+        
+        if settings.SYNC_TRANSPORT == "stream":
+            return await self._sync_streamed(db, evaluation_ids, sync_task_id, deleted_ids)
         
         # Collect all evaluation data
+        collected = self.collect_evaluations_data(db, evaluation_ids)
         evaluations_data = []
         for eval_id in evaluation_ids:
-            eval_data = self.collect_evaluation_data(db, eval_id)
-            if eval_data:
-                # Verify data integrity
-                is_complete, missing_items = self.verify_data_integrity(eval_data)
-                if not is_complete:
-                    logger.warning(
-                        f"Evaluation {eval_id} data incomplete. Missing: {missing_items}"
-                    )
-                    failed_count += 1
-                    error_message = f"Data incomplete for evaluation {eval_id}: missing {', '.join(missing_items)}"
-                    continue
-                
-                evaluations_data.append(eval_data)
-            else:
+            eval_data = collected.get(eval_id)
+            problem = self._sync_problem(eval_id, eval_data)
+            if problem:
                 failed_count += 1
-                error_message = f"Evaluation {eval_id} not found"
+                error_message = problem
+                continue
+            evaluations_data.append(eval_data)
         
-        if not evaluations_data:
+        if not evaluations_data and not deleted_ids:
             return synced_count, failed_count, error_message or "No valid evaluations to sync"
         
-        # Build sync package
-        sync_package = SyncDataPackage(
-            sync_task_id=sync_task_id,
-            evaluations=evaluations_data,
-            total_count=len(evaluations_data),
-            synced_at=datetime.utcnow(),
-            checksum=""  # Will be calculated below
-        )
-        
-        # Calculate checksum
-        package_dict = sync_package.model_dump(mode='json')
-        package_dict.pop('checksum', None)  # Remove checksum field before calculating
-        checksum = self.calculate_checksum(package_dict)
-        sync_package.checksum = checksum
+        sync_package = self.build_package(sync_task_id, evaluations_data, deleted_ids)
         
         # Send sync request with retry
         try:
@@ -380,21 +794,105 @@ class SyncService:
             
             # Check response
             if response.get("status") == "success":
-                synced_count = len(evaluations_data)
+                synced_count = len(evaluations_data) + len(deleted_ids)
+                payload_hashes: Dict[UUID, Optional[str]] = {
+                    eval_data.evaluation_id: record_digest(eval_data.model_dump(mode="json")).hex()
+                    for eval_data in evaluations_data
+                }
+                payload_hashes.update(dict.fromkeys(deleted_ids))
+                self.record_watermarks(db, sync_task_id, payload_hashes)
                 logger.info(f"Successfully synced {synced_count} evaluations")
             else:
-                failed_count = len(evaluations_data)
+                failed_count = len(evaluations_data) + len(deleted_ids)
                 error_message = response.get("message", "Unknown error from president office")
                 logger.error(f"Sync failed: {error_message}")
         
         except Exception as e:
-            failed_count = len(evaluations_data)
+            failed_count = len(evaluations_data) + len(deleted_ids)
             error_message = f"Sync request failed after retries: {str(e)}"
             logger.error(error_message)
         
         return synced_count, failed_count, error_message
 
 
+def _contiguous_chunks(acked_chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """从第0块起连续确认的分块（续传起点）"""
+    contiguous = []
+    for chunk in sorted(acked_chunks, key=lambda item: item["index"]):
+        if chunk["index"] != len(contiguous):
+            break
+        contiguous.append(chunk)
+    return contiguous
+
+
+def _group_by_evaluation(rows: Iterable[Any]) -> Dict[UUID, List[Any]]:
+    grouped: Dict[UUID, List[Any]] = {}
+    for row in rows:
+        grouped.setdefault(row.evaluation_id, []).append(row)
+    return grouped
+
+
+def _ai_score_data(ai_score: AIScore) -> Dict[str, Any]:
+    return {
+        "id": str(ai_score.id),
+        "total_score": float(ai_score.total_score),
+        "indicator_scores": ai_score.indicator_scores,
+        "parsed_reform_projects": ai_score.parsed_reform_projects,
+        "parsed_honorary_awards": ai_score.parsed_honorary_awards,
+        "scored_at": ai_score.scored_at.isoformat()
+    }
+
+
+def _manual_score_data(score: ManualScore) -> Dict[str, Any]:
+    return {
+        "id": str(score.id),
+        "reviewer_id": str(score.reviewer_id),
+        "reviewer_name": score.reviewer_name,
+        "reviewer_role": score.reviewer_role,
+        "weight": float(score.weight),
+        "scores": score.scores,
+        "submitted_at": score.submitted_at.isoformat()
+    }
+
+
+def _final_score_data(final_score: FinalScore) -> Dict[str, Any]:
+    return {
+        "id": str(final_score.id),
+        "final_score": float(final_score.final_score),
+        "summary": final_score.summary,
+        "determined_by": str(final_score.determined_by),
+        "determined_at": final_score.determined_at.isoformat()
+    }
+
+
+def _attachment_data(att: Attachment) -> Dict[str, Any]:
+    return {
+        "id": str(att.id),
+        "indicator": att.indicator,
+        "file_name": att.file_name,
+        "file_size": att.file_size,
+        "file_type": att.file_type,
+        "storage_path": att.storage_path,
+        "classified_by": att.classified_by,
+        "uploaded_at": att.uploaded_at.isoformat()
+    }
+
+
+def _anomaly_data(anomaly: Anomaly) -> Dict[str, Any]:
+    return {
+        "id": str(anomaly.id),
+        "type": anomaly.type,
+        "indicator": anomaly.indicator,
+        "declared_count": anomaly.declared_count,
+        "parsed_count": anomaly.parsed_count,
+        "description": anomaly.description,
+        "status": anomaly.status,
+        "handled_by": str(anomaly.handled_by) if anomaly.handled_by else None,
+        "handled_action": anomaly.handled_action,
+        "handled_at": anomaly.handled_at.isoformat() if anomaly.handled_at else None
+    }
+
+
 # Global sync service instance
 _sync_service: Optional[SyncService] = None
 
@@ -403,6 +901,5 @@ def get_sync_service() -> SyncService:
     """获取同步服务实例"""
     global _sync_service
     if _sync_service is None:
-        # TODO: Get URL from config
-        _sync_service = SyncService()
+        _sync_service = SyncService(settings.PRESIDENT_OFFICE_API_URL)
     return _sync_service
@@ -0,0 +1,298 @@
+"""
+流式同步传输格式
+
+管理端向校长办公会端同步时以 NDJSON 流发送（可选 zstd/gzip 压缩），两端内存占用只与分块大小有关：
+
+    {"type":"header","format":1,"sync_task_id":...,"synced_at":...,"chunk_size":100,"resume_from":0,"mac":...}
+    {"type":"record","chunk":0,"hash":"<记录哈希>","data":{...规范化JSON...}}
+    {"type":"tombstone","chunk":0,"hash":"<记录哈希>","data":{"evaluation_id":...}}
+    ...
+    {"type":"chunk","index":0,"count":98,"root":"<分块Merkle根>","mac":...}
+    ...
+    {"type":"footer","chunks":5,"total_count":480,"merkle_root":"<数据包Merkle根>","mac":...}
+
+- 记录数据按规范化JSON（键排序、紧凑分隔符、UTF-8）序列化一次，哈希直接对该字节串计算，
+  接收端截取原始字节校验，不需要重新序列化
+- 分块按请求的自评表ID切分（第k块为第k段ID中数据完整的自评表），分块根为块内记录哈希的
+  Merkle根（RFC 6962），数据包根为各分块根的Merkle根
+- 在线同步时头部、分块结束标记与结束标记带 SYNC_SHARED_SECRET 的 HMAC（见 security.sync_stream_mac），
+  记录由分块根覆盖；离线同步包不带，由签名清单认证分块根
+- 接收端每收完一个分块即校验并持久化回执；连接中断后发送端查询已确认的分块，从下一块继续
+- 增量同步时，已同步过但不再存在（或不再具备同步条件）的自评表以墓碑记录（tombstone）发送，
+  与普通记录一样计入哈希与分块
+"""
+
+import hashlib
+import json
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+FORMAT_VERSION = 1
+MEDIA_TYPE = "application/x-ndjson"
+CODECS = ("identity", "gzip", "zstd")
+RECORD_TYPES = ("record", "tombstone")
+
+_RECORD_DATA_MARKER = b',"data":'
+# 每次解压输出的上限，压缩炸弹不会一次性展开到内存
+_DECOMPRESS_STEP = 64 * 1024
+
+
+class SyncStreamError(ValueError):
+    """同步数据流格式错误或校验失败"""
+
+    def __init__(self, message: str, status_code: int = 400, errors: Optional[List[str]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.errors = errors or []
+
+
+def canonical_json(value: Any) -> bytes:
+    """规范化JSON：键排序、无多余空白、UTF-8（安装 orjson 时使用 orjson）"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(value, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def leaf_hash(data: bytes) -> bytes:
+    return hashlib.sha256(b"\x00" + data).digest()
+
+
+def _node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+class MerkleBuilder:
+    """
+    增量计算 Merkle 根（RFC 6962 Merkle Tree Hash）
+
+    只保留各完整子树的根（O(log n)），叶子可以逐个加入。
+    """
+
+    def __init__(self) -> None:
+        self._stack: List[Tuple[int, bytes]] = []
+        self.count = 0
+
+    def add(self, leaf: bytes) -> None:
+        self.count += 1
+        size, node = 1, leaf
+        while self._stack and self._stack[-1][0] == size:
+            left_size, left = self._stack.pop()
+            size, node = left_size + size, _node_hash(left, node)
+        self._stack.append((size, node))
+
+    def root(self) -> str:
+        if not self._stack:
+            return hashlib.sha256(b"").hexdigest()
+        node = self._stack[-1][1]
+        for _, left in reversed(self._stack[:-1]):
+            node = _node_hash(left, node)
+        return node.hex()
+
+
+def merkle_root(leaves: Iterable[bytes]) -> str:
+    builder = MerkleBuilder()
+    for leaf in leaves:
+        builder.add(leaf)
+    return builder.root()
+
+
+def record_digest(data: Dict[str, Any]) -> bytes:
+    """记录哈希（与数据流中的记录哈希一致，增量同步用作数据指纹）"""
+    return leaf_hash(canonical_json(data))
+
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    return canonical_json(message) + b"\n"
+
+
+def encode_record(chunk: int, data: Dict[str, Any], record_type: str = "record") -> Tuple[bytes, bytes]:
+    """
+    编码一条记录（record_type 为 record 或 tombstone）
+
+    Returns:
+        Tuple[bytes, bytes]: (NDJSON行, 记录哈希)
+    """
+    body = canonical_json(data)
+    digest = leaf_hash(body)
+    prefix = canonical_json({"chunk": chunk, "hash": digest.hex(), "type": record_type})
+    # data 放在最后，接收端可直接截取原始字节校验哈希
+    return prefix[:-1] + _RECORD_DATA_MARKER + body + b"}\n", digest
+
+
+def compressor(codec: str):
+    """返回增量压缩器（compress/flush），identity 返回None"""
+    if codec == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise SyncStreamError("未安装 zstandard，无法使用 zstd 压缩", status_code=415)
+        return zstandard.ZstdCompressor().compressobj()
+    if codec == "gzip":
+        return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if codec == "identity":
+        return None
+    raise SyncStreamError(f"不支持的压缩格式: {codec}", status_code=415)
+
+
+def resolve_codec(codec: str) -> str:
+    """配置的压缩格式不可用时回退为 gzip"""
+    return "gzip" if codec == "zstd" and not ZSTD_AVAILABLE else codec
+
+
+class _ZlibInflater:
+    """gzip 分段解压：每次最多输出 _DECOMPRESS_STEP 字节，未处理的输入留在 unconsumed_tail"""
+
+    def __init__(self) -> None:
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def inflate(self, data: bytes, max_pending: int) -> Iterator[bytes]:
+        while True:
+            out = self._decompressor.decompress(data, _DECOMPRESS_STEP)
+            data = self._decompressor.unconsumed_tail
+            if out:
+                yield out
+            if not data and len(out) < _DECOMPRESS_STEP:
+                return
+
+    def flush(self) -> bytes:
+        return self._decompressor.flush()
+
+
+class _ZstdInflater:
+    """
+    zstd 分段解压
+
+    zstandard 的解压对象不支持 max_length，改用 stream_writer 按 _DECOMPRESS_STEP 分段写出；
+    单次输入解压出的数据超过 max_pending 时立即中止。
+    """
+
+    def __init__(self) -> None:
+        self._pieces: List[bytes] = []
+        self._pending = 0
+        self._max_pending = 0
+        self._writer = zstandard.ZstdDecompressor().stream_writer(
+            self, write_size=_DECOMPRESS_STEP, closefd=False
+        )
+
+    def write(self, data: bytes) -> int:
+        self._pending += len(data)
+        if self._pending > self._max_pending:
+            raise SyncStreamError("解压后的数据超过大小上限", status_code=413)
+        self._pieces.append(bytes(data))
+        return len(data)
+
+    def inflate(self, data: bytes, max_pending: int) -> Iterator[bytes]:
+        self._pieces, self._pending, self._max_pending = [], 0, max_pending
+        self._writer.write(data)
+        pieces, self._pieces = self._pieces, []
+        yield from pieces
+
+    def flush(self) -> bytes:
+        return b""
+
+
+def _decompressor(codec: str):
+    if codec == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise SyncStreamError("未安装 zstandard，无法解压 zstd 数据", status_code=415)
+        return _ZstdInflater()
+    if codec == "gzip":
+        return _ZlibInflater()
+    if codec == "identity":
+        return None
+    raise SyncStreamError(f"不支持的压缩格式: {codec}", status_code=415)
+
+
+class StreamMessage:
+    """解码后的一行消息；record/tombstone 行同时保留 data 的原始字节"""
+
+    __slots__ = ("type", "fields", "raw_data")
+
+    def __init__(self, type_: str, fields: Dict[str, Any], raw_data: Optional[bytes] = None):
+        self.type = type_
+        self.fields = fields
+        self.raw_data = raw_data
+
+
+class SyncStreamDecoder:
+    """
+    增量解码同步数据流：分段解压、按行切分
+
+    解压输出逐段切分成行，未完整的行超过 max_line_bytes 时立即报错，
+    内存占用不随压缩比增长。
+    """
+
+    def __init__(self, codec: str = "identity", max_line_bytes: int = 16 * 1024 * 1024):
+        self._decompressor = _decompressor(codec or "identity")
+        self.max_line_bytes = max_line_bytes
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> Iterator[StreamMessage]:
+        if self._decompressor is None:
+            yield from self._append(data)
+            return
+        pieces = self._decompressor.inflate(data, self.max_line_bytes)
+        while True:
+            try:
+                piece = next(pieces, None)
+            except SyncStreamError:
+                raise
+            except Exception as e:
+                raise SyncStreamError(f"数据解压失败: {e}") from e
+            if piece is None:
+                return
+            yield from self._append(piece)
+
+    def _append(self, data: bytes) -> Iterator[StreamMessage]:
+        self._buffer.extend(data)
+        while True:
+            end = self._buffer.find(b"\n")
+            if end == -1:
+                if len(self._buffer) > self.max_line_bytes:
+                    raise SyncStreamError("单条记录超过大小上限", status_code=413)
+                return
+            line = bytes(self._buffer[:end])
+            del self._buffer[:end + 1]
+            if line.strip():
+                yield self._parse(line)
+
+    def close(self) -> Iterator[StreamMessage]:
+        if self._decompressor is not None:
+            try:
+                tail = self._decompressor.flush()
+            except Exception as e:
+                raise SyncStreamError(f"数据解压失败: {e}") from e
+            yield from self._append(tail)
+        if self._buffer.strip():
+            line = bytes(self._buffer)
+            self._buffer.clear()
+            yield self._parse(line)
+
+    @staticmethod
+    def _parse(line: bytes) -> StreamMessage:
+        raw_data = None
+        if line.startswith(b'{"chunk":'):
+            marker = line.find(_RECORD_DATA_MARKER)
+            if marker == -1 or not line.endswith(b"}"):
+                raise SyncStreamError("记录行格式错误")
+            raw_data = line[marker + len(_RECORD_DATA_MARKER):-1]
+            line = line[:marker] + b"}"
+        try:
+            fields = json.loads(line)
+        except ValueError as e:
+            raise SyncStreamError(f"无法解析的数据行: {e}") from e
+        if not isinstance(fields, dict) or "type" not in fields:
+            raise SyncStreamError("数据行缺少 type 字段")
+        if fields["type"] in RECORD_TYPES and raw_data is None:
+            raise SyncStreamError("记录行格式错误")
+        return StreamMessage(fields["type"], fields, raw_data)
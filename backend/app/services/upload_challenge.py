@@ -0,0 +1,90 @@
+"""
+秒传的持有证明
+
+只知道文件的 SHA-256 不足以引用已存储的内容：服务端随机选取一个字节区间和随机数作为挑战，
+客户端返回 SHA-256(随机数 + 区间内的字节)，与存储中的内容一致才视为持有该文件。
+
+- 挑战以签名令牌下发（绑定内容哈希、大小与用户，INSTANT_UPLOAD_CHALLENGE_TTL 秒内有效），服务端不保存状态
+- 无论内容是否存在都下发挑战，不能通过秒传接口探测他人上传过的文件
+"""
+
+import hashlib
+import hmac
+import logging
+import secrets
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from jose import JWTError, jwt
+
+from app.core.config import settings
+from app.services.minio_service import minio_service
+from app.services.storage_stream import close_stream
+
+logger = logging.getLogger(__name__)
+
+_PURPOSE = "instant-upload"
+
+
+def possession_proof(nonce: str, data: bytes) -> str:
+    """客户端按挑战计算的持有证明：SHA-256(随机数 + 区间内的字节)"""
+    return hashlib.sha256(nonce.encode("utf-8") + data).hexdigest()
+
+
+def issue_challenge(sha256: str, size: int, user_id: Any) -> Dict[str, Any]:
+    """
+    生成挑战
+
+    Returns:
+        Dict[str, Any]: token（提交证明时原样带回）、offset、length、nonce
+    """
+    length = min(size, settings.INSTANT_UPLOAD_CHALLENGE_BYTES)
+    offset = secrets.randbelow(size - length + 1)
+    nonce = secrets.token_hex(16)
+    claims = {
+        "purpose": _PURPOSE,
+        "sub": str(user_id),
+        "sha256": sha256,
+        "size": size,
+        "offset": offset,
+        "length": length,
+        "nonce": nonce,
+        "exp": datetime.utcnow() + timedelta(seconds=settings.INSTANT_UPLOAD_CHALLENGE_TTL),
+    }
+    token = jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    return {"token": token, "offset": offset, "length": length, "nonce": nonce}
+
+
+def decode_challenge(token: str, sha256: str, size: int, user_id: Any) -> Optional[Dict[str, Any]]:
+    """校验挑战令牌（签名、有效期，以及与本次请求的内容哈希、大小、用户一致），无效时返回None"""
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    if (
+        claims.get("purpose") != _PURPOSE
+        or claims.get("sub") != str(user_id)
+        or claims.get("sha256") != sha256
+        or claims.get("size") != size
+    ):
+        return None
+    return claims
+
+
+def verify_proof(storage_path: str, challenge: Dict[str, Any], proof: str) -> bool:
+    """读取存储中挑战区间的字节，校验持有证明"""
+    stream = None
+    try:
+        stream = minio_service.get_file_stream(storage_path, challenge["offset"], challenge["length"])
+        if stream is None:
+            return False
+        data = stream.read(challenge["length"])[:challenge["length"]]
+    except Exception as e:
+        logger.warning(f"读取秒传挑战区间失败: {storage_path}, {e}")
+        return False
+    finally:
+        if stream is not None:
+            close_stream(stream)
+    if len(data) != challenge["length"]:
+        return False
+    return hmac.compare_digest(possession_proof(challenge["nonce"], data), proof.lower())
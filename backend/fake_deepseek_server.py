@@ -0,0 +1,319 @@
+"""
+本地 DeepSeek 替身服务（chat completions）
+
+用于离线压测AI评分链路：请求经过真实的HTTP连接池、限流、熔断、重试、流式解码与响应校验，
+只有模型本身被替换。可配置：
+- 延迟分布：fixed / uniform / exponential / lognormal（毫秒）
+- 故障注入：500、429（带 Retry-After）、截断的JSON、非JSON正文
+- 流式响应（stream=true 时按 SSE 分片返回，截断时不发送 [DONE] 直接断开）
+
+运行:
+    python fake_deepseek_server.py --port 8900 --latency-ms 800 --distribution lognormal --error-rate 0.05
+
+运行时可通过 POST /_control 修改配置，GET /_stats 查看请求统计。
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+# 添加backend目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from app.core.indicators import REGULAR_TEACHING_INDICATORS
+from app.services.prompt_compiler import SUBJECTIVE_HEADER
+
+DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+@dataclass
+class FakeDeepSeekConfig:
+    """替身服务配置（比例均为 0-1）"""
+    latency_ms: float = 500.0
+    distribution: str = "fixed"
+    # uniform: ±jitter；lognormal: 对数标准差
+    latency_jitter: float = 0.5
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: int = 1
+    truncate_rate: float = 0.0
+    non_json_rate: float = 0.0
+    # 流式分片大小（字符）；总延迟在各分片间平均分配
+    stream_chunk_chars: int = 40
+    seed: Optional[int] = None
+
+
+class _Stats:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def incr(self, key: str) -> None:
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {**self.counts, "in_flight": self.in_flight, "max_in_flight": self.max_in_flight}
+
+
+def sample_latency(config: FakeDeepSeekConfig, rng: random.Random) -> float:
+    """按配置的分布抽取一次延迟（秒）"""
+    mean = max(config.latency_ms, 0.0) / 1000
+    if mean == 0 or config.distribution == "fixed":
+        return mean
+    if config.distribution == "uniform":
+        spread = mean * config.latency_jitter
+        return max(rng.uniform(mean - spread, mean + spread), 0.0)
+    if config.distribution == "exponential":
+        return rng.expovariate(1 / mean)
+    if config.distribution == "lognormal":
+        sigma = config.latency_jitter
+        # 使分布均值等于 latency_ms
+        return rng.lognormvariate(math.log(mean) - sigma * sigma / 2, sigma)
+    raise ValueError(f"未知的延迟分布: {config.distribution}")
+
+
+def score_content(prompt: str, rng: random.Random) -> str:
+    """按提示词类型生成评分JSON（混合模式只含常规教学指标）"""
+    indicator_scores = [
+        {"indicator": label, "score": round(rng.uniform(6, 10) * 2) / 2, "reasoning": f"{label}工作扎实，材料齐全"}
+        for label in REGULAR_TEACHING_INDICATORS.values()
+    ]
+    if prompt.startswith(SUBJECTIVE_HEADER):
+        return json.dumps({"indicator_scores": indicator_scores}, ensure_ascii=False)
+    return json.dumps({
+        "total_score": sum(item["score"] for item in indicator_scores),
+        "indicator_scores": indicator_scores,
+        "parsed_reform_projects": 0,
+        "parsed_honors": 0,
+        "parsed_competitions": 0,
+        "parsed_innovations": 0,
+        "attachment_classifications": [],
+    }, ensure_ascii=False)
+
+
+def create_app(config: Optional[FakeDeepSeekConfig] = None) -> FastAPI:
+    """创建替身服务应用（也可直接配合 httpx.ASGITransport 使用）"""
+    app = FastAPI(title="Fake DeepSeek")
+    app.state.config = config or FakeDeepSeekConfig()
+    app.state.stats = _Stats()
+    app.state.rng = random.Random(app.state.config.seed)
+
+    def fault(config: FakeDeepSeekConfig, rng: random.Random) -> Optional[str]:
+        roll = rng.random()
+        for name, rate in (
+            ("error", config.error_rate),
+            ("rate_limited", config.rate_limit_rate),
+            ("truncated", config.truncate_rate),
+            ("non_json", config.non_json_rate),
+        ):
+            if roll < rate:
+                return name
+            roll -= rate
+        return None
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        config: FakeDeepSeekConfig = app.state.config
+        stats: _Stats = app.state.stats
+        rng: random.Random = app.state.rng
+        payload = await request.json()
+        stats.incr("requests")
+        with stats.lock:
+            stats.in_flight += 1
+            stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+
+        def done() -> None:
+            with stats.lock:
+                stats.in_flight -= 1
+
+        streaming = False
+        try:
+            kind = fault(config, rng)
+            delay = sample_latency(config, rng)
+            if kind == "rate_limited":
+                stats.incr("rate_limited")
+                return JSONResponse(
+                    {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                    status_code=429,
+                    headers={"Retry-After": str(config.retry_after)},
+                )
+            if kind == "error":
+                await asyncio.sleep(delay)
+                stats.incr("error")
+                return JSONResponse({"error": {"message": "Internal server error"}}, status_code=500)
+
+            prompt = next(
+                (message["content"] for message in payload.get("messages", []) if message.get("role") == "user"), ""
+            )
+            content = score_content(prompt, rng)
+            if kind == "non_json":
+                content = "抱歉，我无法完成该评分任务，请稍后再试。"
+            usage = {"prompt_tokens": len(prompt) // 2, "completion_tokens": len(content) // 2}
+            stats.incr(kind or "ok")
+
+            if payload.get("stream"):
+                if kind == "truncated":
+                    content = content[: len(content) // 2]
+                streaming = True
+                return StreamingResponse(
+                    _stream(content, usage, delay, config.stream_chunk_chars, kind != "truncated", done),
+                    media_type="text/event-stream",
+                )
+
+            await asyncio.sleep(delay)
+            body = json.dumps({
+                "id": f"fake-{time.time_ns()}",
+                "object": "chat.completion",
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            }, ensure_ascii=False)
+            if kind == "truncated":
+                return PlainTextResponse(body[: len(body) // 2], media_type="application/json")
+            return PlainTextResponse(body, media_type="application/json")
+        finally:
+            if not streaming:
+                done()
+
+    @app.get("/_stats")
+    async def get_stats():
+        return app.state.stats.snapshot()
+
+    @app.post("/_control")
+    async def control(request: Request):
+        """修改配置（只更新提交的字段），同时清空统计"""
+        updates = await request.json()
+        names = {item.name for item in fields(FakeDeepSeekConfig)}
+        unknown = set(updates) - names
+        if unknown:
+            return JSONResponse({"detail": f"未知配置项: {sorted(unknown)}"}, status_code=400)
+        config = FakeDeepSeekConfig(**{**asdict(app.state.config), **updates})
+        if config.distribution not in DISTRIBUTIONS:
+            return JSONResponse({"detail": f"未知的延迟分布: {config.distribution}"}, status_code=400)
+        app.state.config = config
+        app.state.stats = _Stats()
+        if "seed" in updates:
+            app.state.rng = random.Random(config.seed)
+        return asdict(config)
+
+    return app
+
+
+async def _stream(
+    content: str,
+    usage: Dict[str, int],
+    delay: float,
+    chunk_chars: int,
+    complete: bool,
+    done: Callable[[], None],
+):
+    try:
+        chunks = [content[i:i + chunk_chars] for i in range(0, len(content), max(chunk_chars, 1))] or [""]
+        step = delay / len(chunks)
+        for piece in chunks:
+            await asyncio.sleep(step)
+            chunk = {"choices": [{"index": 0, "delta": {"content": piece}}]}
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        if not complete:
+            # 模拟连接中途断开
+            raise ConnectionResetError("fake stream truncated")
+        yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+    finally:
+        done()
+
+
+class FakeDeepSeekServer:
+    """在后台线程中以 uvicorn 运行替身服务（真实TCP连接）"""
+
+    def __init__(self, config: Optional[FakeDeepSeekConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        import uvicorn
+
+        self.app = create_app(config)
+        self._server = uvicorn.Server(uvicorn.Config(
+            self.app, host=host, port=port, log_level="warning", access_log=False,
+            # 压测时连接数可能较多
+            limit_concurrency=None, backlog=2048,
+        ))
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return self.app.state.stats.snapshot()
+
+    def start(self, timeout: float = 10.0) -> "FakeDeepSeekServer":
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("替身服务启动失败")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def __enter__(self) -> "FakeDeepSeekServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    """命令行参数（与 FakeDeepSeekConfig 对应，压测脚本复用）"""
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="平均延迟（毫秒）")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="fixed", help="延迟分布")
+    parser.add_argument("--latency-jitter", type=float, default=0.5, help="uniform: 相对抖动；lognormal: 对数标准差")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回500的比例")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回429的比例")
+    parser.add_argument("--retry-after", type=int, default=1, help="429响应的Retry-After（秒）")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="返回截断正文的比例")
+    parser.add_argument("--non-json-rate", type=float, default=0.0, help="返回非JSON内容的比例")
+    parser.add_argument("--stream-chunk-chars", type=int, default=40, help="流式分片大小（字符）")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+
+
+def config_from_args(args: argparse.Namespace) -> FakeDeepSeekConfig:
+    return FakeDeepSeekConfig(**{item.name: getattr(args, item.name) for item in fields(FakeDeepSeekConfig)})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地 DeepSeek 替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    print(f"DeepSeek 替身服务: http://{args.host}:{args.port}/v1/chat/completions")
+    print(f"将 DEEPSEEK_API_URL 指向该地址，并设置任意 DEEPSEEK_API_KEY")
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+AI评分链路压测
+
+在临时SQLite库中准备N份已锁定的自评表，以指定并发执行 execute_ai_scoring，
+请求经真实HTTP发往 DeepSeek 替身服务（默认在本进程内启动，也可用 --url 指向已运行的服务），
+报告吞吐量、延迟分位数、错误分布以及熔断器/并发上限状态。
+
+运行:
+    python load_test_ai_scoring.py --jobs 200 --concurrency 20 --latency-ms 800 --distribution lognormal
+    python load_test_ai_scoring.py --jobs 100 --error-rate 0.1 --rate-limit-rate 0.05 --stream
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from statistics import mean
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+# 添加backend目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  注册全部表
+from app.core.circuit_breaker import outbound_guards
+from app.core.config import settings
+from app.core.http_clients import DEEPSEEK_CLIENT, http_clients, register_default_clients
+from app.core.indicators import REGULAR_TEACHING_INDICATORS
+from app.core.rate_limiter import deepseek_rate_limiter
+from app.db.base import Base
+from app.models.attachment import Attachment
+from app.models.self_evaluation import SelfEvaluation
+from app.models.teaching_office import TeachingOffice
+from app.services.ai_scoring_service import AIScoringService
+from fake_deepseek_server import FakeDeepSeekServer, add_config_arguments, config_from_args
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """最近秩法分位数（q 取 0-100）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 1)
+
+
+@contextmanager
+def _override_settings(**values: Any) -> Iterator[None]:
+    original = {name: getattr(settings, name) for name in values}
+    for name, value in values.items():
+        setattr(settings, name, value)
+    try:
+        yield
+    finally:
+        for name, value in original.items():
+            setattr(settings, name, value)
+
+
+def _seed_evaluations(session_factory, jobs: int) -> List[Any]:
+    db = session_factory()
+    try:
+        office = TeachingOffice(name="压测教研室", code=f"LOAD{int(time.time())}")
+        db.add(office)
+        db.flush()
+        evaluation_ids = []
+        for index in range(jobs):
+            evaluation = SelfEvaluation(
+                teaching_office_id=office.id,
+                # 每份自评表使用不同年份，避免同一教研室同年唯一约束
+                evaluation_year=1000 + index,
+                content={
+                    "regularTeaching": {
+                        key: {"selfScore": 8, "content": f"{label}：第{index}份压测自评内容"}
+                        for key, label in REGULAR_TEACHING_INDICATORS.items()
+                    },
+                },
+                status="locked",
+                submitted_at=datetime.utcnow(),
+            )
+            db.add(evaluation)
+            db.flush()
+            db.add(Attachment(
+                evaluation_id=evaluation.id,
+                indicator="teaching_honors",
+                file_name=f"honor_{index}.pdf",
+                file_size=1024,
+                file_type="application/pdf",
+                storage_path=f"{evaluation.id}/honor_{index}.pdf",
+                classified_by="user",
+            ))
+            evaluation_ids.append(evaluation.id)
+        db.commit()
+        return evaluation_ids
+    finally:
+        db.close()
+
+
+async def run_load_test(
+    url: str,
+    jobs: int,
+    concurrency: int,
+    mode: str = "full",
+    streaming: bool = False,
+    rate_limit_per_second: Optional[float] = 0.0,
+    database_url: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    以指定并发执行 jobs 次AI评分
+
+    Args:
+        url: chat completions 地址
+        rate_limit_per_second: DeepSeek令牌桶速率；0 表示不限流，None 表示沿用配置
+        database_url: 压测库地址，默认在临时目录中新建SQLite库
+
+    Returns:
+        Dict: 吞吐量、延迟分位数（毫秒）、错误分布与熔断器状态
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = create_engine(
+            database_url or f"sqlite:///{workdir}/load_test.db",
+            connect_args={"check_same_thread": False} if not database_url else {},
+        )
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        evaluation_ids = _seed_evaluations(session_factory, jobs)
+
+        original_rate = deepseek_rate_limiter.rate
+        if rate_limit_per_second is not None:
+            deepseek_rate_limiter.rate = rate_limit_per_second
+        latencies: List[float] = []
+        errors: Dict[str, int] = {}
+        partial = 0
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+        async def score(evaluation_id) -> None:
+            nonlocal partial
+            async with semaphore:
+                db = session_factory()
+                started = time.monotonic()
+                try:
+                    service = AIScoringService(db, mode=mode)
+                    await service.execute_ai_scoring(evaluation_id)
+                    latencies.append((time.monotonic() - started) * 1000)
+                    if service.last_partial_missing:
+                        partial += 1
+                except Exception as e:
+                    db.rollback()
+                    name = type(e).__name__
+                    errors[name] = errors.get(name, 0) + 1
+                finally:
+                    db.close()
+
+        try:
+            with _override_settings(
+                DEEPSEEK_API_URL=url,
+                DEEPSEEK_API_KEY=settings.DEEPSEEK_API_KEY or "load-test",
+                DEEPSEEK_STREAMING=streaming,
+                AI_RESPONSE_CACHE_ENABLED=False,
+            ):
+                # 使用真实的TCP传输与当前配置（覆盖测试中注入的传输）
+                register_default_clients(http_clients)
+                outbound_guards.reset()
+                started = time.monotonic()
+                await asyncio.gather(*(score(evaluation_id) for evaluation_id in evaluation_ids))
+                wall = time.monotonic() - started
+                outbound = outbound_guards.metrics()[DEEPSEEK_CLIENT]
+                pool = http_clients.metrics()[DEEPSEEK_CLIENT]
+                await http_clients.aclose()
+        finally:
+            deepseek_rate_limiter.rate = original_rate
+            engine.dispose()
+
+    return {
+        "jobs": jobs,
+        "concurrency": concurrency,
+        "mode": mode,
+        "streaming": streaming,
+        "succeeded": len(latencies),
+        "failed": jobs - len(latencies),
+        "partial_results": partial,
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "throughput_per_second": round(len(latencies) / wall, 2) if wall > 0 else None,
+        "latency_ms": {
+            "mean": round(mean(latencies), 1) if latencies else None,
+            "p50": _round(percentile(latencies, 50)),
+            "p95": _round(percentile(latencies, 95)),
+            "p99": _round(percentile(latencies, 99)),
+            "max": _round(max(latencies, default=None)),
+        },
+        "outbound": outbound,
+        "http_pool": pool,
+    }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    def ms(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.0f} ms"
+
+    latency = report["latency_ms"]
+    print(f"\n{'=' * 60}")
+    print(f"  AI评分压测：{report['jobs']} 个任务，并发 {report['concurrency']}，"
+          f"模式 {report['mode']}，{'流式' if report['streaming'] else '非流式'}")
+    print(f"{'=' * 60}")
+    print(f"  成功 / 失败      : {report['succeeded']} / {report['failed']}（部分结果 {report['partial_results']}）")
+    print(f"  错误分布         : {report['errors'] or '-'}")
+    print(f"  总耗时           : {report['wall_seconds']:.2f} s")
+    print(f"  吞吐量           : {report['throughput_per_second']} 个/秒")
+    print(f"  延迟 p50/p95/p99 : {ms(latency['p50'])} / {ms(latency['p95'])} / {ms(latency['p99'])}")
+    print(f"  最大延迟         : {ms(latency['max'])}")
+    outbound = report["outbound"]
+    print(f"  熔断器           : {outbound['state']}（打开 {outbound['times_opened']} 次，拒绝 {outbound['rejected_calls']} 次）")
+    print(f"  并发上限         : {outbound['concurrency_limit']}（{outbound['min_limit']}-{outbound['max_limit']}）")
+    if report.get("server"):
+        print(f"  替身服务统计     : {report['server']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="AI评分链路压测")
+    parser.add_argument("--jobs", type=int, default=50, help="评分任务数")
+    parser.add_argument("--concurrency", type=int, default=10, help="并发执行的任务数")
+    parser.add_argument("--mode", choices=("full", "hybrid"), default="full", help="评分模式")
+    parser.add_argument("--stream", action="store_true", help="使用流式响应")
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="DeepSeek令牌桶速率（每秒），0 不限流，负数沿用配置")
+    parser.add_argument("--url", default=None, help="已运行的替身服务地址（不指定则在本进程内启动）")
+    parser.add_argument("--json", action="store_true", help="以JSON输出报告")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    rate = None if args.rate_limit < 0 else args.rate_limit
+
+    if args.url:
+        report = asyncio.run(run_load_test(args.url, args.jobs, args.concurrency, args.mode, args.stream, rate))
+    else:
+        with FakeDeepSeekServer(config_from_args(args)) as server:
+            report = asyncio.run(run_load_test(server.url, args.jobs, args.concurrency, args.mode, args.stream, rate))
+            report["server"] = server.stats
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    else:
+        _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
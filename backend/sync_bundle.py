@@ -0,0 +1,96 @@
+"""
+离线同步包命令行工具
+
+管理端无法通过HTTPS直连校长办公会端时，在管理端导出签名的同步包文件，拷贝到校长办公会端导入。
+两端需配置相同的 SYNC_BUNDLE_SIGNING_KEY。
+
+运行:
+    python sync_bundle.py export --changes --out ./sync_bundles
+    python sync_bundle.py export --ids <自评表ID> <自评表ID> --out ./sync_bundles
+    python sync_bundle.py import ./sync_bundles/<sha256>.syncbundle
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+from uuid import UUID
+
+# 添加backend目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+import app.models  # noqa: F401  注册全部表
+from app.db.base import SessionLocal
+from app.services.sync_bundle import export_bundle, import_bundle
+from app.services.sync_service import get_sync_service
+from app.services.sync_stream import SyncStreamError
+
+
+def export_command(args: argparse.Namespace) -> int:
+    db = SessionLocal()
+    try:
+        deleted_ids = []
+        if args.changes:
+            delta = get_sync_service().plan_changes(db, args.ids or None)
+            evaluation_ids, deleted_ids = delta.changed, delta.deleted
+            for problem in delta.skipped:
+                print(f"跳过: {problem}", file=sys.stderr)
+        else:
+            evaluation_ids = args.ids
+        if not evaluation_ids and not deleted_ids:
+            print("没有需要导出的自评表", file=sys.stderr)
+            return 1
+        bundle = asyncio.run(export_bundle(db, evaluation_ids, deleted_ids, args.out))
+    except SyncStreamError as e:
+        print(f"导出失败: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+
+    for problem in bundle.skipped:
+        print(f"跳过: {problem}", file=sys.stderr)
+    print(bundle.path)
+    print(
+        f"自评表 {bundle.manifest['evaluation_count']} 份，墓碑 {bundle.manifest['deleted_count']} 条，"
+        f"Merkle根 {bundle.manifest['merkle_root']}"
+    )
+    return 0
+
+
+def import_command(args: argparse.Namespace) -> int:
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as source:
+            result = import_bundle(db, source)
+    except SyncStreamError as e:
+        print(f"导入失败: {e}", file=sys.stderr)
+        for error in e.errors:
+            print(f"  {error}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="离线同步包导出/导入")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="导出同步包（管理端）")
+    export_parser.add_argument("--ids", nargs="*", type=UUID, default=[], help="自评表ID")
+    export_parser.add_argument("--changes", action="store_true", help="导出上次成功同步以来的变化（含墓碑）")
+    export_parser.add_argument("--out", default=None, help="输出目录，默认 SYNC_BUNDLE_DIR")
+    export_parser.set_defaults(handler=export_command)
+
+    import_parser = subparsers.add_parser("import", help="导入同步包（校长办公会端）")
+    import_parser.add_argument("path", help="同步包文件")
+    import_parser.set_defaults(handler=import_command)
+
+    args = parser.parse_args()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,13 @@
+import os
+
+# 测试中不启动后台AI评分worker、同步投递与存储清理（由用例显式驱动），附件正文在线程中提取
+os.environ.setdefault("AI_SCORING_WORKERS", "0")
+os.environ.setdefault("SYNC_OUTBOX_WORKERS", "0")
+os.environ.setdefault("STORAGE_GC_INTERVAL", "0")
+os.environ.setdefault("ATTACHMENT_TEXT_WORKERS", "0")
+# 管理端与校长办公会端的同步请求签名密钥
+os.environ.setdefault("SYNC_SHARED_SECRET", "test-sync-secret")
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -5,6 +15,8 @@ from sqlalchemy.orm import sessionmaker
 from app.main import app
 from app.db.base import Base
 from app.core.deps import get_db  # Import from deps, not db.base
+from app.core.circuit_breaker import outbound_guards
+from app.services.attachment_classifier import invalidate_attachment_classifier
 from app.models.user import User
 from app.core.security import get_password_hash, create_access_token
 
@@ -16,6 +28,31 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+@pytest.fixture(autouse=True)
+def reset_outbound_guards():
+    """熔断器与并发状态为进程级共享，每个用例从初始状态开始"""
+    outbound_guards.reset()
+    yield
+
+@pytest.fixture(autouse=True)
+def reset_attachment_classifier():
+    """本地分类模型按进程缓存，每个用例按当前测试库重新训练"""
+    invalidate_attachment_classifier()
+    yield
+
+@pytest.fixture
+def local_storage(monkeypatch, tmp_path):
+    """附件写入临时目录的本地存储（不连接MinIO）"""
+    from app.services import minio_service as minio_module
+    from app.services.local_file_service import LocalFileService
+
+    storage = LocalFileService(str(tmp_path / "uploads"))
+    monkeypatch.setattr(minio_module, "local_file_service", storage)
+    monkeypatch.setattr(minio_module.minio_service, "client", None)
+    monkeypatch.setattr(minio_module.minio_service, "_initialized", True)
+    monkeypatch.setattr(minio_module.minio_service, "_use_local_storage", True)
+    return storage
+
 @pytest.fixture(scope="function")
 def db():
     Base.metadata.create_all(bind=engine)
@@ -0,0 +1,134 @@
+"""
+测试AI响应缓存
+
+需求: 相同提示词/模型/温度的评分复用缓存结果，支持TTL与LRU容量淘汰，并统计命中与节省耗时
+"""
+
+import json
+import pytest
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.models.teaching_office import TeachingOffice
+from app.models.self_evaluation import SelfEvaluation
+from app.models.attachment import Attachment
+from app.models.ai_response_cache import AIResponseCacheEntry
+from app.services.ai_response_cache import AIResponseCache, cache_metrics
+from app.services.ai_scoring_service import AIScoringService
+
+
+SCORE_DATA = {
+    "total_score": 80,
+    "indicator_scores": [{"indicator": "课程建设", "score": 8, "reasoning": "良好"}],
+    "parsed_reform_projects": 1,
+    "parsed_honorary_awards": 0,
+    "parsed_honors": 0,
+    "parsed_competitions": 0,
+    "parsed_innovations": 0,
+    "attachment_classifications": [],
+}
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    with cache_metrics.lock:
+        cache_metrics.reset()
+    yield
+
+
+def test_fingerprint_covers_prompt_model_and_temperature():
+    base = AIResponseCache.fingerprint("prompt", "deepseek-chat", 0.3)
+
+    assert base == AIResponseCache.fingerprint("prompt", "deepseek-chat", 0.30)
+    assert base != AIResponseCache.fingerprint("prompt2", "deepseek-chat", 0.3)
+    assert base != AIResponseCache.fingerprint("prompt", "deepseek-reasoner", 0.3)
+    assert base != AIResponseCache.fingerprint("prompt", "deepseek-chat", 0.7)
+
+
+def test_get_put_and_ttl(db):
+    cache = AIResponseCache(db)
+    key = cache.fingerprint("prompt", "deepseek-chat", 0.3)
+
+    assert cache.get(key) is None
+    cache.put(key, "deepseek-chat", 0.3, SCORE_DATA, api_latency_ms=1200)
+    assert cache.get(key) == SCORE_DATA
+
+    entry = db.get(AIResponseCacheEntry, key)
+    assert entry.hit_count == 1
+    entry.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert cache.get(key) is None
+
+    metrics = cache_metrics.snapshot()
+    assert metrics["hits"] == 1
+    assert metrics["misses"] == 2
+    assert metrics["saved_latency_ms"] == 1200
+
+
+def test_lru_eviction(db, monkeypatch):
+    monkeypatch.setattr(settings, "AI_RESPONSE_CACHE_MAX_ENTRIES", 2)
+    cache = AIResponseCache(db)
+    keys = [cache.fingerprint(f"prompt-{i}", "deepseek-chat", 0.3) for i in range(3)]
+
+    cache.put(keys[0], "deepseek-chat", 0.3, SCORE_DATA, 100)
+    cache.put(keys[1], "deepseek-chat", 0.3, SCORE_DATA, 100)
+    # 访问最早的条目，使第二条成为最久未使用
+    db.query(AIResponseCacheEntry).filter(AIResponseCacheEntry.fingerprint == keys[1]).update(
+        {"last_used_at": datetime.utcnow() - timedelta(hours=1)}
+    )
+    db.commit()
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[2], "deepseek-chat", 0.3, SCORE_DATA, 100)
+
+    db.expire_all()
+    remaining = {row.fingerprint for row in db.query(AIResponseCacheEntry).all()}
+    assert remaining == {keys[0], keys[2]}
+    assert cache_metrics.snapshot()["evictions"] == 1
+
+
+def _locked_evaluation(db, office):
+    evaluation = SelfEvaluation(
+        teaching_office_id=office.id,
+        evaluation_year=2024,
+        content={"regularTeaching": {"courseConstruction": {"selfScore": 9, "content": "课程建设"}}},
+        status="locked",
+        submitted_at=datetime.utcnow(),
+    )
+    db.add(evaluation)
+    db.commit()
+    db.add(Attachment(
+        evaluation_id=evaluation.id,
+        indicator="teaching_reform_projects",
+        file_name="reform.pdf",
+        file_size=1024,
+        file_type="application/pdf",
+        storage_path=f"{evaluation.id}/teaching_reform_projects/reform.pdf",
+        classified_by="user",
+    ))
+    db.commit()
+    return evaluation
+
+
+async def test_identical_prompt_skips_api_call(db, monkeypatch):
+    office = TeachingOffice(name="化学教研室", code="CHEM01")
+    db.add(office)
+    db.commit()
+    first = _locked_evaluation(db, office)
+    second = _locked_evaluation(db, office)
+
+    calls = []
+
+    async def fake_call(self, prompt):
+        calls.append(prompt)
+        return json.dumps(SCORE_DATA, ensure_ascii=False)
+
+    monkeypatch.setattr(settings, "DEEPSEEK_API_KEY", "test-key")
+    monkeypatch.setattr(AIScoringService, "_call_deepseek_api", fake_call)
+
+    first_score = await AIScoringService(db).execute_ai_scoring(first.id)
+    second_score = await AIScoringService(db).execute_ai_scoring(second.id)
+
+    assert len(calls) == 1
+    assert float(first_score.total_score) == float(second_score.total_score) == 80.0
+    assert second.status == "ai_scored"
+    assert cache_metrics.snapshot()["hits"] == 1
@@ -0,0 +1,119 @@
+"""
+测试AI评分响应解码
+
+需求: AI响应按评分结构校验，修复代码块/前后说明文字包裹的输出，
+线性时间提取JSON对象，格式错误统一报 AIResponseFormatError
+"""
+
+import json
+import time
+from pathlib import Path
+
+import pytest
+from hypothesis import given, settings as hypothesis_settings, strategies as st
+
+from app.services.ai_response_schema import (
+    AIResponseFormatError,
+    decode_ai_response,
+    iter_json_objects,
+    validate_score_data,
+)
+from app.services.ai_scoring_service import AIScoringService
+
+RECORDED = Path(__file__).parent / "fixtures" / "ai_responses"
+VALID_RECORDINGS = ["plain.json", "fenced.txt", "trailing_text.txt", "honorary_alias.json", "leading_braces.txt", "stray_brace.txt"]
+
+
+def _recorded(name):
+    return (RECORDED / name).read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("name", VALID_RECORDINGS)
+def test_recorded_responses_decode(name):
+    data = decode_ai_response(_recorded(name))
+
+    assert data["total_score"] == 78.5
+    assert len(data["indicator_scores"]) == 8
+    assert data["parsed_honors"] == data["parsed_honorary_awards"] == 2
+    assert data["attachment_classifications"][0]["classified_indicator"] == "teaching_reform_projects"
+
+
+def test_missing_field_rejected_even_when_extracted():
+    with pytest.raises(AIResponseFormatError, match="parsed_competitions"):
+        decode_ai_response(_recorded("missing_field.txt"))
+
+
+def test_wrong_types_rejected():
+    data = json.loads(_recorded("plain.json"))
+    data["parsed_reform_projects"] = -1
+    data["indicator_scores"][0]["score"] = "很好"
+
+    with pytest.raises(AIResponseFormatError):
+        decode_ai_response(json.dumps(data, ensure_ascii=False))
+    with pytest.raises(AIResponseFormatError):
+        validate_score_data(data)
+
+
+def test_mock_response_is_valid():
+    data = AIScoringService(db=None)._parse_ai_response(AIScoringService(db=None)._get_mock_response())
+
+    assert data["parsed_honorary_awards"] == 2
+
+
+@hypothesis_settings(max_examples=200, deadline=None)
+@given(
+    prefix=st.text(),
+    suffix=st.text(),
+)
+def test_fuzz_wrapped_response(prefix, suffix):
+    body = _recorded("plain.json")
+
+    data = decode_ai_response(prefix + body + suffix)
+
+    assert data["total_score"] == 78.5
+
+
+@hypothesis_settings(max_examples=300, deadline=None)
+@given(text=st.text(alphabet=st.sampled_from('{}[]":,\\ab1 \n')))
+def test_fuzz_arbitrary_text_only_raises_format_error(text):
+    for candidate in iter_json_objects(text):
+        assert candidate.startswith("{") and candidate.endswith("}")
+    try:
+        decode_ai_response(text)
+    except AIResponseFormatError:
+        pass
+
+
+def _time_extract(text):
+    started = time.perf_counter()
+    list(iter_json_objects(text))
+    return time.perf_counter() - started
+
+
+def test_extractor_is_linear_on_pathological_input():
+    # 大量未闭合的左括号：回溯式提取为平方级
+    small = "{" * 50_000
+    large = "{" * 200_000
+
+    small_time = _time_extract(small)
+    large_time = _time_extract(large)
+
+    assert large_time < 1.0
+    assert large_time < max(small_time, 0.005) * 12
+
+    # 孤立的左括号与引号交替：落在字符串内的左括号需要重新扫描，但每个位置只扫描一次
+    quoted = '{"' * 100_000 + _recorded("plain.json")
+    assert _time_extract(quoted) < 1.0
+    assert decode_ai_response(quoted)["total_score"] == 78.5
+
+
+def test_decode_benchmark_over_recorded_responses():
+    texts = [_recorded(name) for name in VALID_RECORDINGS] * 200
+
+    started = time.perf_counter()
+    for text in texts:
+        decode_ai_response(text)
+    elapsed = time.perf_counter() - started
+
+    # 1000 次解码（含修复路径）应远低于一次API调用耗时
+    assert elapsed < 2.0
@@ -0,0 +1,213 @@
+"""
+测试AI评分任务队列
+
+需求: AI评分任务持久化入队、按自评表去重、独立会话执行、失败退避重试、限流
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from app.models.teaching_office import TeachingOffice
+from app.models.self_evaluation import SelfEvaluation
+from app.models.attachment import Attachment
+from app.models.ai_score import AIScore
+from app.models.ai_scoring_job import AIScoringJob
+from app.models.user import User
+from app.core.security import get_password_hash, create_access_token
+from app.core.rate_limiter import TokenBucket
+from app.services.ai_scoring_queue import AIScoringJobService, AIScoringWorkerPool
+from app.services.ai_scoring_service import AIScoringService
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def office(db):
+    office = TeachingOffice(name="数学教研室", code="MATH01")
+    db.add(office)
+    db.commit()
+    db.refresh(office)
+    return office
+
+
+@pytest.fixture
+def office_headers(db, office):
+    user = User(
+        username="math_director",
+        password_hash=get_password_hash("password123"),
+        role="teaching_office",
+        teaching_office_id=office.id,
+        name="数学教研室主任",
+    )
+    db.add(user)
+    db.commit()
+    token = create_access_token({"sub": user.username, "user_id": str(user.id), "role": user.role})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def locked_evaluation(db, office):
+    evaluation = SelfEvaluation(
+        teaching_office_id=office.id,
+        evaluation_year=2024,
+        content={"regularTeaching": {}},
+        status="locked",
+        submitted_at=datetime.utcnow(),
+    )
+    db.add(evaluation)
+    db.commit()
+    db.add(Attachment(
+        evaluation_id=evaluation.id,
+        indicator="teaching_reform_projects",
+        file_name="reform.pdf",
+        file_size=1024,
+        file_type="application/pdf",
+        storage_path=f"{evaluation.id}/teaching_reform_projects/reform.pdf",
+        classified_by="user",
+    ))
+    db.commit()
+    db.refresh(evaluation)
+    return evaluation
+
+
+@pytest.fixture
+def pool():
+    return AIScoringWorkerPool(session_factory=TestingSessionLocal, concurrency=0)
+
+
+def test_trigger_enqueues_single_job(client, db, office_headers, locked_evaluation):
+    payload = {"evaluation_id": str(locked_evaluation.id)}
+
+    first = client.post("/api/teaching-office/trigger-ai-scoring", json=payload, headers=office_headers)
+    second = client.post("/api/teaching-office/trigger-ai-scoring", json=payload, headers=office_headers)
+
+    assert first.status_code == 200
+    assert first.json()["job_id"] == second.json()["job_id"]
+    assert db.query(AIScoringJob).count() == 1
+
+    status_response = client.get(
+        f"/api/teaching-office/ai-scoring-jobs/{first.json()['job_id']}", headers=office_headers
+    )
+    assert status_response.status_code == 200
+    assert status_response.json()["status"] == "queued"
+
+
+async def test_worker_runs_job_with_own_session(client, db, pool, office_headers, locked_evaluation, monkeypatch):
+    sessions = []
+
+    async def fake_scoring(self, evaluation_id):
+        sessions.append(self.db)
+        ai_score = AIScore(
+            evaluation_id=evaluation_id,
+            total_score=Decimal("80"),
+            indicator_scores=[],
+            parsed_reform_projects=0,
+            parsed_honorary_awards=0,
+        )
+        self.db.add(ai_score)
+        self.db.query(SelfEvaluation).filter(SelfEvaluation.id == evaluation_id).update({"status": "ai_scored"})
+        self.db.commit()
+        return ai_score
+
+    monkeypatch.setattr(AIScoringService, "execute_ai_scoring", fake_scoring)
+    job, created = AIScoringJobService(db).enqueue(locked_evaluation.id)
+    assert created
+
+    assert await pool.drain() == 1
+
+    assert sessions and sessions[0] is not db
+    db.expire_all()
+    assert job.status == "succeeded"
+    assert job.ai_score_id is not None
+    assert job.dedupe_key is None
+    assert locked_evaluation.status == "ai_scored"
+
+    response = client.get(
+        f"/api/teaching-office/self-evaluation/{locked_evaluation.id}/ai-scoring-job", headers=office_headers
+    )
+    assert response.json()["status"] == "succeeded"
+    assert response.json()["attempts"] == 1
+
+
+async def test_transient_failure_backs_off_then_fails(db, pool, locked_evaluation, monkeypatch):
+    async def flaky(self, evaluation_id):
+        raise RuntimeError("DeepSeek unavailable")
+
+    monkeypatch.setattr(AIScoringService, "execute_ai_scoring", flaky)
+    job, _ = AIScoringJobService(db).enqueue(locked_evaluation.id)
+
+    assert await pool.drain() == 1
+    db.expire_all()
+    assert job.status == "queued"
+    assert job.attempts == 1
+    assert job.next_run_at > datetime.utcnow()
+    assert "unavailable" in job.last_error
+
+    # 退避期间不会被认领
+    assert await pool.drain() == 0
+
+    for _ in range(job.max_attempts - 1):
+        job.next_run_at = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+        await pool.drain()
+
+    db.expire_all()
+    assert job.status == "failed"
+    assert job.attempts == job.max_attempts
+    assert job.dedupe_key is None
+
+
+async def test_invalid_evaluation_fails_without_retry(db, pool, locked_evaluation):
+    locked_evaluation.status = "draft"
+    db.commit()
+    job, _ = AIScoringJobService(db).enqueue(locked_evaluation.id)
+
+    await pool.drain()
+
+    db.expire_all()
+    assert job.status == "failed"
+    assert job.attempts == 1
+    assert "状态不正确" in job.last_error
+
+
+def test_claim_is_exclusive_and_stale_jobs_requeued(db, pool, locked_evaluation):
+    job, _ = AIScoringJobService(db).enqueue(locked_evaluation.id)
+
+    assert pool.claim_next("worker-a") == job.id
+    assert pool.claim_next("worker-b") is None
+
+    db.expire_all()
+    assert job.status == "running"
+    assert job.locked_by == "worker-a"
+
+    job.locked_at = datetime.utcnow() - timedelta(days=1)
+    db.commit()
+    assert pool.requeue_stale_jobs() == 1
+    assert pool.claim_next("worker-b") == job.id
+
+
+def test_stale_job_fails_after_max_attempts(db, pool, locked_evaluation):
+    job, _ = AIScoringJobService(db).enqueue(locked_evaluation.id)
+
+    # 每次认领后worker都在执行中崩溃，租约过期
+    for _ in range(job.max_attempts):
+        assert pool.claim_next("worker-a") == job.id
+        db.expire_all()
+        job.locked_at = datetime.utcnow() - timedelta(days=1)
+        db.commit()
+        pool.requeue_stale_jobs()
+
+    db.expire_all()
+    assert job.status == "failed"
+    assert job.attempts == job.max_attempts
+    assert "最大尝试次数" in job.last_error
+    assert pool.claim_next("worker-a") is None
+
+
+def test_token_bucket_limits_burst():
+    bucket = TokenBucket(rate=1.0, capacity=2)
+
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() > 0
+    assert TokenBucket(rate=0, capacity=1).try_acquire() == 0
@@ -0,0 +1,242 @@
+"""
+测试AI评分流式响应
+
+需求: 流式接收DeepSeek评分结果并增量解码，指标评分到达即记录进度，
+接近超时时使用已收到的部分结果而不是整体重试
+"""
+
+import asyncio
+import json
+from datetime import datetime
+
+import httpx
+import pytest
+from tenacity import RetryError, wait_none
+
+from app.core.config import settings
+from app.core.http_clients import DEEPSEEK_CLIENT, HTTPClientConfig, http_clients, register_default_clients
+from app.core.indicators import REGULAR_TEACHING_INDICATORS
+from app.models.teaching_office import TeachingOffice
+from app.models.self_evaluation import SelfEvaluation
+from app.models.attachment import Attachment
+from app.models.ai_scoring_job import AIScoringJob
+from app.services.ai_scoring_queue import AIScoringJobService, AIScoringWorkerPool
+from app.services.ai_scoring_service import AIScoringService
+from app.services.ai_stream_decoder import IncrementalScoreDecoder
+from app.services.bulk_ai_scoring_service import stream_job_progress
+from tests.conftest import TestingSessionLocal
+
+
+INDICATORS = [
+    {"indicator": label, "score": 8, "reasoning": f"{label}，良好"}
+    for label in REGULAR_TEACHING_INDICATORS.values()
+]
+
+SCORE_DATA = {
+    "indicator_scores": INDICATORS,
+    "total_score": 64,
+    "parsed_reform_projects": 1,
+    "parsed_honorary_awards": 0,
+    "parsed_honors": 0,
+    "parsed_competitions": 0,
+    "parsed_innovations": 0,
+    "attachment_classifications": [],
+}
+
+
+def _split(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _sse_lines(pieces, done=True):
+    for piece in pieces:
+        chunk = {"choices": [{"delta": {"content": piece}}]}
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8")
+    if done:
+        usage = {"choices": [], "usage": {"prompt_tokens": 900, "completion_tokens": 400}}
+        yield f"data: {json.dumps(usage)}\n\n".encode("utf-8")
+        yield b"data: [DONE]\n\n"
+
+
+@pytest.fixture
+def deepseek_stream(monkeypatch):
+    """将DeepSeek客户端替换为返回流式分片的 MockTransport"""
+    state = {"pieces": [], "stall": False, "corrupt": False, "requests": []}
+
+    async def body():
+        for line in _sse_lines(state["pieces"], done=not (state["stall"] or state["corrupt"])):
+            yield line
+        if state["corrupt"]:
+            yield b'data: {"choices": [{"delta": {"content": "\n\n'
+        if state["stall"]:
+            await asyncio.sleep(10)
+
+    def handler(request):
+        state["requests"].append(json.loads(request.content))
+        return httpx.Response(200, content=body(), headers={"content-type": "text/event-stream"})
+
+    monkeypatch.setattr(settings, "DEEPSEEK_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "DEEPSEEK_STREAMING", True)
+    monkeypatch.setattr(settings, "AI_RESPONSE_CACHE_ENABLED", False)
+    http_clients.register(DEEPSEEK_CLIENT, HTTPClientConfig(), transport=httpx.MockTransport(handler))
+    yield state
+    http_clients._clients.pop(DEEPSEEK_CLIENT, None)
+    register_default_clients(http_clients)
+
+
+@pytest.fixture
+def evaluation(db):
+    office = TeachingOffice(name="地理教研室", code="GEO01")
+    db.add(office)
+    db.commit()
+    evaluation = SelfEvaluation(
+        teaching_office_id=office.id,
+        evaluation_year=2024,
+        content={"regularTeaching": {"courseConstruction": {"selfScore": 9, "content": "课程建设"}}},
+        status="locked",
+        submitted_at=datetime.utcnow(),
+    )
+    db.add(evaluation)
+    db.commit()
+    db.add(Attachment(
+        evaluation_id=evaluation.id,
+        indicator="teaching_reform_projects",
+        file_name="reform.pdf",
+        file_size=1024,
+        file_type="application/pdf",
+        storage_path=f"{evaluation.id}/teaching_reform_projects/reform.pdf",
+        classified_by="user",
+    ))
+    db.commit()
+    return evaluation
+
+
+def test_decoder_emits_indicators_across_chunk_boundaries():
+    text = json.dumps(SCORE_DATA, ensure_ascii=False)
+    decoder = IncrementalScoreDecoder()
+
+    emitted = []
+    for piece in _split(text, 7):
+        emitted.extend(decoder.feed(piece))
+
+    assert emitted == INDICATORS
+    assert decoder.scalars["total_score"] == 64
+    assert decoder.scalars["parsed_reform_projects"] == 1
+    assert json.loads(decoder.text) == SCORE_DATA
+
+
+def test_decoder_partial_result_after_truncation():
+    text = json.dumps({**SCORE_DATA, "indicator_scores": INDICATORS[:5]}, ensure_ascii=False)
+    decoder = IncrementalScoreDecoder()
+    decoder.feed(text[:text.index('"total_score"')])
+
+    assert len(decoder.indicator_scores) == 5
+    assert not decoder.is_usable()
+
+    decoder = IncrementalScoreDecoder()
+    full = json.dumps(SCORE_DATA, ensure_ascii=False)
+    decoder.feed(full[:full.index('"parsed_reform_projects"')])
+
+    assert decoder.is_usable()
+    result = decoder.partial_result()
+    assert result["partial"] is True
+    assert result["total_score"] == 64
+    # partial_missing 使用 AIScore 列名
+    assert {"parsed_reform_projects", "parsed_honorary_awards"} <= set(result["partial_missing"])
+    assert result["parsed_reform_projects"] is None
+    assert result["parsed_honorary_awards"] is None
+    assert result["indicator_scores"] == INDICATORS
+
+    # 总分先到、指标评分不全时不可用
+    decoder = IncrementalScoreDecoder()
+    leading_total = json.dumps({"total_score": 64, "indicator_scores": INDICATORS}, ensure_ascii=False)
+    decoder.feed(leading_total[:leading_total.index(INDICATORS[3]["indicator"])])
+    assert "total_score" in decoder.scalars
+    assert not decoder.is_usable()
+
+
+async def test_streaming_call_reports_progress(db, deepseek_stream):
+    deepseek_stream["pieces"] = _split(json.dumps(SCORE_DATA, ensure_ascii=False), 11)
+    progress = []
+
+    async def on_progress(indicator_scores):
+        progress.append(len(indicator_scores))
+
+    service = AIScoringService(db, on_progress=on_progress)
+    response = await service._call_deepseek_api("prompt")
+
+    assert json.loads(response) == SCORE_DATA
+    assert progress == list(range(1, len(INDICATORS) + 1))
+    assert deepseek_stream["requests"][0]["stream"] is True
+    assert deepseek_stream["requests"][0]["response_format"] == {"type": "json_object"}
+    assert service.last_usage == {"prompt_tokens": 900, "completion_tokens": 400}
+
+
+async def test_stalled_stream_returns_partial_result(db, evaluation, deepseek_stream, monkeypatch):
+    full = json.dumps(SCORE_DATA, ensure_ascii=False)
+    deepseek_stream["pieces"] = _split(full[:full.index('"parsed_reform_projects"')], 13)
+    deepseek_stream["stall"] = True
+    monkeypatch.setattr(settings, "DEEPSEEK_STREAM_DEADLINE", 0.3)
+
+    ai_score = await AIScoringService(db).execute_ai_scoring(evaluation.id)
+
+    # 只调用一次，没有因超时整体重试
+    assert len(deepseek_stream["requests"]) == 1
+    assert float(ai_score.total_score) == 64.0
+    assert len(ai_score.indicator_scores) == len(INDICATORS)
+    # 未收到的解析数量存为空，不以0代替
+    assert ai_score.parsed_reform_projects is None
+    assert ai_score.parsed_honorary_awards is None
+    assert evaluation.status == "ai_scored"
+
+
+async def test_corrupted_stream_line_is_retryable(db, evaluation, deepseek_stream, monkeypatch):
+    monkeypatch.setattr(AIScoringService._call_deepseek_api.retry, "wait", wait_none())
+    full = json.dumps(SCORE_DATA, ensure_ascii=False)
+    deepseek_stream["pieces"] = _split(full[:full.index(INDICATORS[4]["indicator"])], 13)
+    deepseek_stream["corrupt"] = True
+
+    # 损坏的数据行按传输错误处理并重试，而不是当作不可重试的失败
+    with pytest.raises(RetryError) as exc_info:
+        await AIScoringService(db)._call_deepseek_api("prompt")
+    assert isinstance(exc_info.value.last_attempt.exception(), httpx.TransportError)
+    assert len(deepseek_stream["requests"]) == 3
+
+    deepseek_stream["pieces"] = _split(full[:full.index('"total_score"')], 13)
+    ai_score = await AIScoringService(db).execute_ai_scoring(evaluation.id)
+    assert len(ai_score.indicator_scores) == len(INDICATORS)
+    assert ai_score.parsed_competitions is None
+
+
+async def test_job_progress_persisted_and_streamed(db, evaluation, deepseek_stream):
+    deepseek_stream["pieces"] = _split(json.dumps(SCORE_DATA, ensure_ascii=False), 17)
+    job, _ = AIScoringJobService(db).enqueue(evaluation.id)
+    pool = AIScoringWorkerPool(session_factory=TestingSessionLocal, concurrency=1)
+
+    assert pool.claim_job(job.id, "test")
+    outcome = await pool.run_job(job.id)
+
+    assert outcome["status"] == "succeeded"
+    db.expire_all()
+    job = db.get(AIScoringJob, job.id)
+    assert job.indicators_received == len(INDICATORS)
+    assert job.partial_scores == INDICATORS
+
+    events = [
+        event async for event in stream_job_progress(
+            session_factory=TestingSessionLocal, poll_interval=0.01, max_polls=1
+        )
+    ]
+    assert events == []
+
+    job.status = "running"
+    db.commit()
+    events = [
+        event async for event in stream_job_progress(
+            session_factory=TestingSessionLocal, poll_interval=0.01, max_polls=2
+        )
+    ]
+    assert len(events) == 1
+    payload = json.loads(events[0].split("data: ", 1)[1])
+    assert payload["indicators_received"] == len(INDICATORS)
+    assert payload["indicators_total"] == len(REGULAR_TEACHING_INDICATORS)
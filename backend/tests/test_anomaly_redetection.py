@@ -0,0 +1,226 @@
+"""
+测试按年度批量重新检测异常
+
+需求: 声明式异常规则表；按年度批量加载自评表与AI评分，按列计算规则，
+与现有异常记录比对后批量新增/关闭；1000份自评表的耗时基准
+"""
+
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app.models.teaching_office import TeachingOffice
+from app.models.self_evaluation import SelfEvaluation
+from app.models.ai_score import AIScore
+from app.models.anomaly import Anomaly
+from app.services.anomaly_detection_service import (
+    ANOMALY_RULES,
+    AnomalyRedetectionService,
+    detect_anomalies,
+    evaluate_rules,
+)
+
+
+def _content(reform=0, honors=0, competitions=0, innovations=0):
+    def items(count):
+        return {"items": [{"name": f"项目{i}"} for i in range(count)]}
+
+    return {"highlights": {
+        "teachingReformProjects": items(reform),
+        "teachingHonors": items(honors),
+        "teachingCompetitions": items(competitions),
+        "innovationCompetitions": items(innovations),
+    }}
+
+
+def _score(evaluation_id, reform=0, honors=0, competitions=0, innovations=0, scored_at=None):
+    return {
+        "id": uuid.uuid4(),
+        "evaluation_id": evaluation_id,
+        "total_score": 80,
+        "indicator_scores": [],
+        "parsed_reform_projects": reform,
+        "parsed_honorary_awards": honors,
+        "parsed_competitions": competitions,
+        "parsed_innovations": innovations,
+        "scored_at": scored_at or datetime.utcnow(),
+    }
+
+
+def _evaluation(db, office, year, content):
+    evaluation = SelfEvaluation(teaching_office_id=office.id, evaluation_year=year, content=content, status="locked")
+    db.add(evaluation)
+    db.flush()
+    return evaluation
+
+
+def _anomaly(evaluation_id, indicator, declared, parsed, status="pending"):
+    return Anomaly(
+        evaluation_id=evaluation_id, type="count_mismatch", indicator=indicator,
+        declared_count=declared, parsed_count=parsed, description="旧说明", status=status,
+    )
+
+
+def test_rule_table_matches_single_evaluation_detection():
+    evaluation = SelfEvaluation(id=uuid.uuid4(), content=_content(reform=2, honors=1, innovations=1))
+    anomalies = detect_anomalies(evaluation, {
+        "parsed_reform_projects": 1, "parsed_honors": 1, "parsed_competitions": 0, "parsed_innovations": 3,
+    })
+
+    assert [(a.indicator, a.declared_count, a.parsed_count) for a in anomalies] == [
+        ("teaching_reform_projects", 2, 1),
+        ("innovation_competitions", 1, 3),
+    ]
+    assert "缺少1份支撑材料" in anomalies[0].description
+    assert "多出2份材料" in anomalies[1].description
+
+    result = evaluate_rules(
+        [_content(reform=2), _content(honors=1)],
+        [{"parsed_reform_projects": 2, "parsed_honorary_awards": 1}, {"parsed_honorary_awards": 0}],
+    )
+    # 解析数量缺失（None）的规则不参与判断
+    assert result == {
+        "teaching_reform_projects": [],
+        "teaching_honors": [(0, 0, 1), (1, 1, 0)],
+        "teaching_competitions": [],
+        "innovation_competitions": [],
+    }
+
+
+def test_redetect_diffs_against_existing_anomalies(db):
+    office = TeachingOffice(name="化学教研室", code="CHE01")
+    db.add(office)
+    db.flush()
+    # A: 教改项目仍不一致（已有待处理记录）；荣誉已修正（旧待处理记录应关闭）
+    a = _evaluation(db, office, 2024, _content(reform=3, honors=1))
+    # B: 比赛数量不一致且已人工处理过（数量相同，不重复生成）；创新创业新出现不一致
+    b = _evaluation(db, office, 2024, _content(competitions=2, innovations=1))
+    # C: 旧评分记录未保存比赛数量，原有比赛异常无法判断应保留
+    c = _evaluation(db, office, 2024, _content(competitions=1))
+    # 其他年度不受影响
+    other = _evaluation(db, office, 2023, _content(reform=5))
+    earlier = datetime.utcnow() - timedelta(days=1)
+    db.execute(insert(AIScore), [
+        _score(a.id, reform=5, honors=0, scored_at=earlier),
+        _score(a.id, reform=2, honors=1),
+        _score(b.id, competitions=1),
+        {**_score(c.id), "parsed_competitions": None, "parsed_innovations": None},
+        _score(other.id),
+    ])
+    kept = _anomaly(a.id, "teaching_reform_projects", 3, 2)
+    stale = _anomaly(a.id, "teaching_honors", 2, 1)
+    db.add_all([
+        kept, stale,
+        _anomaly(b.id, "teaching_competitions", 2, 1, status="handled"),
+        _anomaly(c.id, "teaching_competitions", 1, 0),
+        _anomaly(other.id, "teaching_honors", 1, 0),
+    ])
+    db.commit()
+
+    preview = AnomalyRedetectionService(db).redetect_year(2024, dry_run=True)
+    assert (preview["inserted"], preview["closed"], preview["unchanged"]) == (1, 1, 1)
+    assert db.query(Anomaly).count() == 5
+
+    result = AnomalyRedetectionService(db).redetect_year(2024)
+
+    assert result["scored_evaluations"] == 3
+    assert (result["inserted"], result["closed"], result["unchanged"]) == (1, 1, 1)
+    db.expire_all()
+    assert kept.status == "pending"
+    assert stale.status == "resolved"
+    assert stale.handled_action == "auto_resolved"
+    inserted = db.query(Anomaly).filter(Anomaly.indicator == "innovation_competitions").one()
+    assert (inserted.evaluation_id, inserted.declared_count, inserted.parsed_count) == (b.id, 1, 0)
+    assert inserted.description.startswith("自评表填写1项创新创业比赛")
+    assert db.query(Anomaly).filter(Anomaly.status == "pending").count() == 4
+
+    again = AnomalyRedetectionService(db).redetect_year(2024)
+    assert (again["inserted"], again["closed"], again["unchanged"]) == (0, 0, 2)
+
+
+def test_redetect_skips_counts_missing_from_partial_results(db):
+    office = TeachingOffice(name="生物教研室", code="BIO01")
+    db.add(office)
+    db.flush()
+    evaluation = _evaluation(db, office, 2024, _content(reform=2, honors=1, competitions=1))
+    # 截断响应的部分结果：只收到比赛数量
+    db.execute(insert(AIScore), [{
+        **_score(evaluation.id, competitions=1),
+        "parsed_reform_projects": None,
+        "parsed_honorary_awards": None,
+        "parsed_innovations": None,
+    }])
+    db.commit()
+
+    result = AnomalyRedetectionService(db).redetect_year(2024)
+
+    assert result["inserted"] == 0
+    assert db.query(Anomaly).count() == 0
+
+
+def test_redetect_endpoint(client, db, evaluation_office_token, evaluation_team_token):
+    office = TeachingOffice(name="生物教研室", code="BIO01")
+    db.add(office)
+    db.flush()
+    evaluation = _evaluation(db, office, 2024, _content(honors=2))
+    db.execute(insert(AIScore), [_score(evaluation.id, honors=1)])
+    db.commit()
+
+    response = client.post(
+        "/api/review/anomalies/redetect",
+        json={"year": 2024},
+        headers={"Authorization": f"Bearer {evaluation_team_token}"},
+    )
+    assert response.status_code == 403
+
+    response = client.post(
+        "/api/review/anomalies/redetect",
+        json={"year": 2024},
+        headers={"Authorization": f"Bearer {evaluation_office_token}"},
+    )
+    assert response.status_code == 200
+    assert response.json()["mismatches_by_indicator"]["teaching_honors"] == 1
+    assert db.query(Anomaly).filter(Anomaly.evaluation_id == evaluation.id).count() == 1
+
+
+def test_redetect_benchmark_1000_evaluations(db):
+    office = TeachingOffice(name="压测教研室", code="BENCH1")
+    db.add(office)
+    db.flush()
+    evaluations, scores, anomalies = [], [], []
+    for index in range(1000):
+        evaluation_id = uuid.uuid4()
+        counts = [index % 3, index % 2, index % 4, 0]
+        evaluations.append({
+            "id": evaluation_id,
+            "teaching_office_id": office.id,
+            "evaluation_year": 2025,
+            "content": _content(*counts),
+            "status": "locked",
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+        })
+        scores.append(_score(evaluation_id, *[max(count - index % 2, 0) for count in counts]))
+        if index % 5 == 0:
+            anomalies.append({
+                "id": uuid.uuid4(), "evaluation_id": evaluation_id, "type": "count_mismatch",
+                "indicator": "teaching_honors", "declared_count": 9, "parsed_count": 0,
+                "description": "旧说明", "status": "pending",
+            })
+    db.execute(insert(SelfEvaluation), evaluations)
+    db.execute(insert(AIScore), scores)
+    db.execute(insert(Anomaly), anomalies)
+    db.commit()
+
+    started = time.perf_counter()
+    result = AnomalyRedetectionService(db).redetect_year(2025)
+    elapsed = time.perf_counter() - started
+
+    assert result["scored_evaluations"] == 1000
+    assert result["closed"] == len(anomalies)
+    assert result["inserted"] == sum(result["mismatches_by_indicator"].values())
+    assert len(ANOMALY_RULES) == result["rules"]
+    # 单次批量加载 + 批量写入，1000份自评表应在数秒内完成
+    assert elapsed < 5.0
@@ -17,11 +17,24 @@ from app.models.teaching_office import TeachingOffice
 from app.models.self_evaluation import SelfEvaluation
 from app.models.final_score import FinalScore
 from app.models.approval import Approval
+from app.services.evaluation_replica_service import EvaluationReplicaService, ReplicaRecord
+from app.services.sync_service import SyncService
 
 
 # president_office_user and president_office_token fixtures are provided by conftest.py
 
 
+def _replicate(db: Session, *evaluations: SelfEvaluation) -> None:
+    """模拟管理端已将自评表同步至校长办公会端（审定只读取副本）"""
+    collected = SyncService("https://president-office.test/api").collect_evaluations_data(
+        db, [evaluation.id for evaluation in evaluations]
+    )
+    EvaluationReplicaService(db).apply(uuid4(), datetime.utcnow(), [
+        ReplicaRecord(evaluation_id, "hash", data) for evaluation_id, data in collected.items()
+    ])
+    db.commit()
+
+
 @pytest.fixture
 def teaching_office_with_evaluation(db: Session) -> tuple:
     """创建教研室和评估数据"""
@@ -60,6 +73,7 @@ def teaching_office_with_evaluation(db: Session) -> tuple:
     )
     db.add(final_score)
     db.commit()
+    _replicate(db, evaluation)
     
     return teaching_office, evaluation
 
@@ -200,6 +214,7 @@ def test_approve_multiple_evaluations(
         )
         db.add(final_score)
         db.commit()
+        _replicate(db, evaluation)
         
         evaluation_ids.append(str(evaluation.id))
     
@@ -11,6 +11,12 @@ from app.models.self_evaluation import SelfEvaluation
 from app.models.attachment import Attachment
 
 
+@pytest.fixture(autouse=True)
+def isolated_storage(local_storage):
+    """上传的附件写入临时目录，不写入仓库下的 uploads 目录"""
+    return local_storage
+
+
 def test_attachment_auto_archived_on_upload(client, db, teaching_office_token, teaching_office_user):
     """
     测试附件上传时自动归档
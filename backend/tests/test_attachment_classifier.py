@@ -0,0 +1,179 @@
+"""
+测试附件本地分类模型
+
+需求: 以历史人工/AI分类的附件训练字符 n-gram 朴素贝叶斯模型，上传时记录建议分类与置信度
+（不覆盖用户选择的指标），只有未被高置信度建议确认的附件才交由DeepSeek分类
+"""
+
+import time
+from datetime import datetime
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.attachment import Attachment
+from app.models.self_evaluation import SelfEvaluation
+from app.services.ai_scoring_service import AIScoringService
+from app.services.attachment_classifier import (
+    AttachmentClassifierService,
+    NaiveBayesClassifier,
+    filename_features,
+    invalidate_attachment_classifier,
+    is_confidently_classified,
+    training_label,
+)
+from app.services.prompt_compiler import compile_scoring_prompt
+
+HISTORY = [
+    ("2023年校级教改项目立项通知.pdf", "teaching_reform_projects"),
+    ("教学改革研究项目结题证书.pdf", "teachingReformProjects"),
+    ("省级教学改革项目申报书.docx", "teaching_reform_projects"),
+    ("优秀教师荣誉证书.jpg", "teaching_honors"),
+    ("教学名师称号表彰文件.pdf", "teaching_honors"),
+    ("青年教师讲课比赛一等奖.pdf", "teaching_competitions"),
+    ("教学创新大赛二等奖证书.png", "teaching_competitions"),
+    ("互联网+大学生创新创业大赛金奖.pdf", "innovation_competitions"),
+    ("挑战杯创业计划竞赛获奖证书.pdf", "innovation_competitions"),
+    ("期末试卷分析报告.docx", "courseAssessment"),
+    ("教研室会议记录.docx", "teachingProcessManagement"),
+]
+
+
+def _attachment(evaluation_id, file_name, indicator, classified_by="user"):
+    return Attachment(
+        evaluation_id=evaluation_id,
+        indicator=indicator,
+        file_name=file_name,
+        file_size=1024,
+        file_type="application/pdf",
+        storage_path=f"{evaluation_id}/{file_name}",
+        classified_by=classified_by,
+        uploaded_at=datetime.utcnow(),
+    )
+
+
+@pytest.fixture
+def evaluation(db, test_teaching_office):
+    evaluation = SelfEvaluation(teaching_office_id=test_teaching_office.id, evaluation_year=2024, content={}, status="draft")
+    db.add(evaluation)
+    db.commit()
+    return evaluation
+
+
+def test_naive_bayes_predicts_from_filename_ngrams():
+    assert filename_features("A1_教改.pdf") == ["a", "教", "改", "教改"]
+    assert training_label("teachingHonors") == "teaching_honors"
+    assert training_label("courseAssessment") == "other"
+
+    model = NaiveBayesClassifier().fit((name, training_label(label)) for name, label in HISTORY)
+
+    prediction = model.predict("2024年教改项目结题报告.pdf")
+    assert prediction.indicator == "teaching_reform_projects"
+    assert prediction.confidence > 0.9
+    assert model.predict("试卷分析.docx").indicator == "other"
+    # 完全没有见过的特征时只按先验判断，置信度低
+    assert model.predict("scan_0001.pdf").confidence < 0.5
+    assert NaiveBayesClassifier().predict("教改.pdf") is None
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        model.predict("2024年省级青年教师讲课比赛获奖证书.pdf")
+    # 单次预测在百微秒量级
+    assert (time.perf_counter() - started) / 1000 < 0.001
+
+
+def test_service_trains_on_user_and_ai_rows_and_caches(db, evaluation):
+    db.add_all([_attachment(evaluation.id, name, label) for name, label in HISTORY])
+    # 模型自己的分类结果不参与训练
+    db.add(_attachment(evaluation.id, "会议记录汇总.pdf", "teaching_honors", classified_by="model"))
+    db.commit()
+
+    service = AttachmentClassifierService(db)
+    samples = service.load_samples()
+    assert len(samples) == len(HISTORY)
+    assert ("会议记录汇总.pdf", "teaching_honors") not in samples
+
+    model = service.get_model()
+    assert service.get_model() is model
+    assert service.classify("教研室会议记录（第3次）.docx").indicator == "other"
+
+    invalidate_attachment_classifier()
+    assert service.get_model() is not model
+
+
+def test_upload_records_suggestion_without_overriding_user(client, db, evaluation, teaching_office_token, local_storage):
+    db.add_all([_attachment(evaluation.id, name, label) for name, label in HISTORY])
+    db.commit()
+
+    response = client.post(
+        "/api/teaching-office/attachments",
+        data={"evaluation_id": str(evaluation.id), "indicator": "teachingCompetitions"},
+        files=[
+            ("files", ("2024年青年教师讲课比赛一等奖证书.pdf", BytesIO(b"%PDF-1.4 a"), "application/pdf")),
+            ("files", ("2024年优秀教师荣誉证书.pdf", BytesIO(b"%PDF-1.4 b"), "application/pdf")),
+            ("files", ("scan_0001.pdf", BytesIO(b"%PDF-1.4 c"), "application/pdf")),
+        ],
+        headers={"Authorization": f"Bearer {teaching_office_token}"},
+    )
+
+    assert response.status_code == 201
+    agreed, disagreed, unsure = [db.get(Attachment, attachment_id) for attachment_id in response.json()["attachment_ids"]]
+    # 用户选择的指标一律保留，模型建议单独保存
+    for attachment in (agreed, disagreed, unsure):
+        assert (attachment.indicator, attachment.classified_by) == ("teachingCompetitions", "user")
+    assert agreed.suggested_indicator == "teaching_competitions"
+    assert agreed.classification_confidence >= 0.9
+    assert is_confidently_classified(agreed)
+    # 建议与用户选择不一致或置信度不足：仍由DeepSeek分类
+    assert disagreed.suggested_indicator == "teaching_honors"
+    assert disagreed.classification_confidence >= 0.9
+    assert not is_confidently_classified(disagreed)
+    assert unsure.classification_confidence < 0.9
+    assert not is_confidently_classified(unsure)
+
+
+def test_llm_only_classifies_low_confidence_attachments(db, evaluation):
+    confident = _attachment(evaluation.id, "讲课比赛一等奖.pdf", "teachingCompetitions")
+    confident.suggested_indicator = "teaching_competitions"
+    confident.classification_confidence = 0.97
+    unsure = _attachment(evaluation.id, "scan_0001.pdf", "teachingHonors")
+    unsure.classification_confidence = 0.4
+    db.add_all([confident, unsure])
+    db.commit()
+
+    prompt = compile_scoring_prompt({}, [confident, unsure], max_tokens=6000).text
+    assert "文件名：讲课比赛一等奖.pdf，考核指标：teachingCompetitions（已分类）" in prompt
+    assert "文件名：scan_0001.pdf，考核指标：teachingHonors\n" in prompt
+
+    classified = AIScoringService(db)._classify_attachments([confident, unsure], {
+        "attachment_classifications": [
+            {"file_name": "讲课比赛一等奖.pdf", "classified_indicator": "innovation_competitions"},
+            {"file_name": "scan_0001.pdf", "classified_indicator": "teaching_honors"},
+        ]
+    })
+
+    assert classified == 1
+    assert (confident.indicator, confident.classified_by) == ("teachingCompetitions", "user")
+    assert (unsure.indicator, unsure.classified_by, unsure.classification_confidence) == ("teaching_honors", "ai", None)
+
+
+def test_manual_reclassification_becomes_training_sample(client, db, evaluation, evaluation_office_token):
+    attachment = _attachment(evaluation.id, "讲课比赛一等奖.pdf", "teaching_competitions", classified_by="model")
+    db.add(attachment)
+    db.commit()
+    model = AttachmentClassifierService(db).get_model()
+
+    response = client.put(
+        f"/api/teaching-office/attachments/{attachment.id}/classification",
+        json={"indicator": "innovation_competitions"},
+        headers={"Authorization": f"Bearer {evaluation_office_token}"},
+    )
+
+    assert response.status_code == 200
+    db.refresh(attachment)
+    assert attachment.classified_by == "user"
+    assert attachment.suggested_indicator is None
+    assert attachment.classification_confidence is None
+    assert AttachmentClassifierService(db).get_model() is not model
+    assert ("讲课比赛一等奖.pdf", "innovation_competitions") in AttachmentClassifierService(db).load_samples()
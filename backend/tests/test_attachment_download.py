@@ -0,0 +1,145 @@
+"""
+测试附件下载
+
+需求: 本地存储的文件直接发送（FileResponse / nginx X-Accel-Redirect），MinIO 中的文件支持 Range 请求（206），
+ETag 由内容哈希的 HMAC 派生（不暴露 SHA-256），支持 If-None-Match / If-Modified-Since 条件请求（304）与 If-Range
+"""
+
+import hashlib
+import hmac
+from io import BytesIO
+
+import pytest
+
+from app.core.config import settings
+from app.models.attachment import Attachment
+from app.services import minio_service as minio_module
+from app.services.attachment_download import http_date, last_modified
+
+CONTENT = bytes(range(256)) * 40
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+ETAG = '"%s"' % hmac.new(settings.SECRET_KEY.encode(), DIGEST.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+@pytest.fixture
+def headers(teaching_office_token):
+    return {"Authorization": f"Bearer {teaching_office_token}"}
+
+
+@pytest.fixture
+def attachment(client, db, test_evaluation, headers, local_storage):
+    response = client.post(
+        "/api/teaching-office/attachments",
+        data={"evaluation_id": str(test_evaluation.id), "indicator": "teaching_honors"},
+        files=[("files", ("教学成果.pdf", BytesIO(CONTENT), "application/pdf"))],
+        headers=headers,
+    )
+    return db.get(Attachment, response.json()["attachment_ids"][0])
+
+
+def _download(client, headers, attachment, **extra):
+    return client.get(f"/api/teaching-office/attachments/{attachment.id}/download", headers={**headers, **extra})
+
+
+def test_full_download_carries_validators(client, headers, attachment):
+    response = _download(client, headers, attachment)
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["etag"] == ETAG
+    assert DIGEST not in response.headers["etag"]
+    assert response.headers["last-modified"] == http_date(last_modified(attachment))
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-type"] == "application/pdf"
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=100-199", (100, 199)),
+    ("bytes=10000-", (10000, len(CONTENT) - 1)),
+    ("bytes=-240", (len(CONTENT) - 240, len(CONTENT) - 1)),
+    ("bytes=10000-999999", (10000, len(CONTENT) - 1)),
+])
+def test_local_range_request(client, headers, attachment, header, expected, monkeypatch):
+    # 本地文件的区间直接从文件路径读取，不经过存储服务的文件流
+    monkeypatch.setattr(minio_module.minio_service, "get_file_stream", None)
+    monkeypatch.setattr(settings, "ATTACHMENT_DOWNLOAD_CHUNK_SIZE", 100)
+    response = _download(client, headers, attachment, Range=header)
+
+    start, end = expected
+    assert response.status_code == 206
+    assert response.content == CONTENT[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(CONTENT)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+
+def test_unsatisfiable_and_ignored_ranges(client, headers, attachment):
+    response = _download(client, headers, attachment, Range=f"bytes={len(CONTENT)}-")
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+    # 多区间与无法解析的区间按完整文件返回
+    for header in ("bytes=0-1,5-6", "bytes=abc", "items=0-1"):
+        response = _download(client, headers, attachment, Range=header)
+        assert (response.status_code, response.content) == (200, CONTENT)
+
+
+def test_conditional_requests(client, headers, attachment):
+    etag = ETAG
+    assert _download(client, headers, attachment, **{"If-None-Match": etag}).status_code == 304
+    assert _download(client, headers, attachment, **{"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert _download(client, headers, attachment, **{"If-None-Match": '"other"'}).status_code == 200
+    since = http_date(last_modified(attachment))
+    assert _download(client, headers, attachment, **{"If-Modified-Since": since}).status_code == 304
+
+    # If-Range 与当前内容一致时返回区间，否则返回完整文件
+    partial = _download(client, headers, attachment, Range="bytes=0-9", **{"If-Range": etag})
+    assert (partial.status_code, partial.content) == (206, CONTENT[:10])
+    stale = _download(client, headers, attachment, Range="bytes=0-9", **{"If-Range": '"stale"'})
+    assert (stale.status_code, stale.content) == (200, CONTENT)
+
+
+def test_local_file_is_handed_to_nginx(client, headers, attachment, monkeypatch):
+    monkeypatch.setattr(settings, "ATTACHMENT_ACCEL_REDIRECT_PREFIX", "/protected-uploads/")
+
+    response = _download(client, headers, attachment, Range="bytes=0-9")
+
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["x-accel-redirect"] == f"/protected-uploads/{attachment.storage_path}"
+    assert response.headers["etag"] == ETAG
+
+
+class FakeMinioObject(BytesIO):
+    released = False
+
+    def release_conn(self):
+        self.released = True
+
+
+class FakeMinio:
+    def __init__(self, objects):
+        self.objects = objects
+        self.requests = []
+        self.responses = []
+
+    def get_object(self, bucket, object_name, offset=0, length=0):
+        self.requests.append((object_name, offset, length))
+        data = self.objects[object_name]
+        response = FakeMinioObject(data[offset:offset + length] if length else data[offset:])
+        self.responses.append(response)
+        return response
+
+
+def test_minio_range_reads_only_requested_bytes(client, headers, attachment, monkeypatch):
+    fake = FakeMinio({attachment.storage_path: CONTENT})
+    monkeypatch.setattr(minio_module.minio_service, "client", fake)
+    monkeypatch.setattr(minio_module.minio_service, "_use_local_storage", False)
+
+    partial = _download(client, headers, attachment, Range="bytes=512-1023")
+    full = _download(client, headers, attachment)
+
+    assert (partial.status_code, partial.content) == (206, CONTENT[512:1024])
+    assert (full.status_code, full.content) == (200, CONTENT)
+    assert fake.requests == [(attachment.storage_path, 512, 512), (attachment.storage_path, 0, 0)]
+    # 发送完毕后关闭响应并归还连接
+    assert all(response.closed and response.released for response in fake.responses)
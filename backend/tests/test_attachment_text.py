@@ -0,0 +1,141 @@
+"""
+测试附件正文提取
+
+需求: 上传时提取PDF/DOCX/文本附件正文，按内容哈希缓存，评分时在token预算内附入提示词
+"""
+
+import io
+import zipfile
+from io import BytesIO
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from app.models.teaching_office import TeachingOffice
+from app.models.self_evaluation import SelfEvaluation
+from app.models.attachment import Attachment
+from app.models.attachment_text import AttachmentText
+from app.services.attachment_text_service import (
+    PYPDF_AVAILABLE,
+    AttachmentTextService,
+    content_hash,
+    extract_text,
+)
+from app.services.prompt_compiler import compile_scoring_prompt, estimate_tokens
+
+
+def _docx(*paragraphs):
+    body = "".join(f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>" for text in paragraphs)
+    xml = (
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{body}</w:body></w:document>"
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("word/document.xml", xml)
+    return buffer.getvalue()
+
+
+def test_extract_docx_and_plain_text():
+    result = extract_text(_docx("荣誉证书", "授予  张三   同志"), "证书.docx", None, 1000)
+    assert result.status == "succeeded"
+    assert result.extractor == "docx"
+    assert result.text == "荣誉证书\n授予 张三 同志"
+
+    result = extract_text("教学比赛一等奖".encode("gb18030"), "获奖.txt", "text/plain", 4)
+    assert result.text == "教学比赛"
+    assert result.char_count == 7
+
+
+def test_extract_unsupported_and_broken_files():
+    assert extract_text(b"\x89PNG", "photo.png", "image/png", 1000).status == "unsupported"
+    assert extract_text(b"not a zip", "broken.docx", None, 1000).status == "failed"
+    if not PYPDF_AVAILABLE:
+        assert extract_text(b"%PDF-1.4", "a.pdf", "application/pdf", 1000).status == "unsupported"
+
+
+async def test_extraction_cached_by_content_hash(db):
+    content = _docx("教改项目立项通知")
+    digest = content_hash(content)
+
+    service = AttachmentTextService(db)
+    statuses = await service.extract_and_store([
+        (digest, content, "a.docx", None),
+        (digest, content, "copy-of-a.docx", None),
+    ])
+    await service.extract_and_store([(digest, content, "again.docx", None)])
+
+    assert statuses == {digest: "succeeded"}
+    assert db.query(AttachmentText).count() == 1
+
+    attachments = [
+        SimpleNamespace(id=uuid4(), content_hash=digest),
+        SimpleNamespace(id=uuid4(), content_hash=digest),
+        SimpleNamespace(id=uuid4(), content_hash=None),
+    ]
+    texts = service.get_texts(attachments)
+    assert texts == {attachments[0].id: "教改项目立项通知", attachments[1].id: "教改项目立项通知"}
+
+
+def test_prompt_excerpts_within_budget():
+    attachments = [
+        SimpleNamespace(id=index, file_name=f"file{index}.docx", indicator="teaching_honors")
+        for index in range(3)
+    ]
+    texts = {0: "短正文", 1: "荣誉" * 3000}
+
+    plain = compile_scoring_prompt({}, attachments, 6000)
+    compiled = compile_scoring_prompt({}, attachments, 6000, attachment_texts=texts, excerpt_tokens=500)
+
+    assert "附件正文摘录" not in plain.text
+    assert compile_scoring_prompt({}, attachments, 6000, attachment_texts={}, excerpt_tokens=500).text == plain.text
+    assert "1. file0.docx：短正文" in compiled.text
+    assert "file2.docx：" not in compiled.text
+    assert "attachment_excerpts" in compiled.truncated_sections
+    assert compiled.section_tokens["attachment_excerpts"] <= 500 + estimate_tokens("2. file1.docx：") * 2
+
+
+@pytest.fixture
+def upload_headers(client, db):
+    from app.models.user import User
+    from app.core.security import get_password_hash
+
+    db.add(User(
+        username="uploader",
+        password_hash=get_password_hash("password123"),
+        role="teaching_office",
+        name="Uploader",
+        email="uploader@test.com",
+    ))
+    db.commit()
+    response = client.post(
+        "/api/auth/login",
+        json={"username": "uploader", "password": "password123", "role": "teaching_office"},
+    )
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+def test_upload_extracts_text_in_background(client, db, upload_headers, local_storage):
+    office = TeachingOffice(name="历史教研室", code="HIS01")
+    db.add(office)
+    db.commit()
+    evaluation = SelfEvaluation(teaching_office_id=office.id, evaluation_year=2024, content={}, status="draft")
+    db.add(evaluation)
+    db.commit()
+    content = _docx("省级教学成果奖")
+
+    response = client.post(
+        "/api/teaching-office/attachments",
+        files={"files": ("成果奖.docx", BytesIO(content), "application/octet-stream")},
+        data={"evaluation_id": str(evaluation.id), "indicator": "teaching_honors"},
+        headers=upload_headers,
+    )
+
+    assert response.status_code == 201
+    attachment = db.query(Attachment).filter(Attachment.evaluation_id == evaluation.id).one()
+    assert attachment.content_hash == content_hash(content)
+    db.expire_all()
+    stored = db.get(AttachmentText, attachment.content_hash)
+    assert stored.status == "succeeded"
+    assert stored.text == "省级教学成果奖"
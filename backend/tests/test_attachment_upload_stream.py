@@ -0,0 +1,158 @@
+"""
+测试附件流式上传
+
+需求: 上传文件按固定大小的分段写入存储（MinIO分段上传 length=-1 / 本地分段写入），
+边写边计算大小和SHA-256，内存占用不随文件大小增长；同一请求内的多个文件有上限地并发上传
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import pytest
+
+from app.core.config import settings
+from app.models.attachment import Attachment
+from app.models.content_object import ContentObject
+from app.services import minio_service as minio_module
+from app.services.content_store import ContentStore
+
+PART_SIZE = 256 * 1024
+FILE_SIZE = 16 * 1024 * 1024
+# 内存上限：与文件大小无关，只允许同时存在少量分段
+MEMORY_CEILING = 4 * PART_SIZE
+
+
+@pytest.fixture(autouse=True)
+def small_parts(monkeypatch):
+    monkeypatch.setattr(settings, "ATTACHMENT_UPLOAD_PART_SIZE", PART_SIZE)
+
+
+@pytest.fixture
+def large_file():
+    """16MB 的临时文件（分段写入，避免测试本身占用内存）及其SHA-256"""
+    digest = hashlib.sha256()
+    source = tempfile.TemporaryFile()
+    block = os.urandom(PART_SIZE)
+    for index in range(FILE_SIZE // PART_SIZE):
+        data = bytes([index % 256]) + block[1:]
+        source.write(data)
+        digest.update(data)
+    source.seek(0)
+    yield source, digest.hexdigest()
+    source.close()
+
+
+def _peak_memory(func, *args, **kwargs):
+    tracemalloc.start()
+    try:
+        result = func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+class FakeMinio:
+    """按 MinIO 客户端的方式分段读取数据流，只记录每个分段的大小"""
+
+    def __init__(self):
+        self.parts = []
+        self.length = None
+
+    def put_object(self, bucket, object_name, data, length, part_size=0, content_type=None, metadata=None):
+        self.length = length
+        while True:
+            chunk = data.read(part_size)
+            if not chunk:
+                break
+            self.parts.append(len(chunk))
+
+
+def test_local_stream_memory_ceiling(local_storage, large_file):
+    source, digest = large_file
+
+    stored, peak = _peak_memory(local_storage.upload_stream, "eval/indicator/big.bin", source)
+
+    assert (stored.size, stored.sha256) == (FILE_SIZE, digest)
+    assert peak < MEMORY_CEILING
+    path = local_storage.base_path / "eval" / "indicator" / "big.bin"
+    assert path.stat().st_size == FILE_SIZE
+    assert [p.name for p in path.parent.iterdir()] == ["big.bin"]
+
+
+def test_minio_multipart_stream_memory_ceiling(monkeypatch, large_file):
+    source, digest = large_file
+    fake = FakeMinio()
+    monkeypatch.setattr(minio_module.minio_service, "client", fake)
+    monkeypatch.setattr(minio_module.minio_service, "_initialized", True)
+    monkeypatch.setattr(minio_module.minio_service, "_use_local_storage", False)
+
+    stored, peak = _peak_memory(minio_module.minio_service.upload_stream, "eval/indicator/big.bin", source)
+
+    assert (stored.size, stored.sha256) == (FILE_SIZE, digest)
+    assert fake.length == -1
+    assert fake.parts == [PART_SIZE] * (FILE_SIZE // PART_SIZE)
+    assert peak < MEMORY_CEILING
+
+
+def test_upload_endpoint_streams_files_concurrently(client, db, test_evaluation, teaching_office_token, local_storage, monkeypatch):
+    monkeypatch.setattr(settings, "ATTACHMENT_UPLOAD_CONCURRENCY", 2)
+    upload_stream = local_storage.upload_stream
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def tracked_upload(object_name, source):
+        with lock:
+            active.append(object_name)
+            peak.append(len(active))
+        time.sleep(0.05)
+        try:
+            return upload_stream(object_name, source)
+        finally:
+            with lock:
+                active.remove(object_name)
+
+    monkeypatch.setattr(local_storage, "upload_stream", tracked_upload)
+    contents = [f"附件内容{index}".encode("utf-8") * (index + 1) for index in range(4)]
+
+    response = client.post(
+        "/api/teaching-office/attachments",
+        data={"evaluation_id": str(test_evaluation.id), "indicator": "teaching_honors"},
+        files=[("files", (f"file{index}.txt", BytesIO(content), "text/plain")) for index, content in enumerate(contents)],
+        headers={"Authorization": f"Bearer {teaching_office_token}"},
+    )
+
+    assert response.status_code == 201
+    assert max(peak) == 2
+    attachments = [db.get(Attachment, attachment_id) for attachment_id in response.json()["attachment_ids"]]
+    assert [attachment.file_name for attachment in attachments] == [f"file{index}.txt" for index in range(4)]
+    for attachment, content in zip(attachments, contents):
+        assert (attachment.file_size, attachment.content_hash) == (len(content), hashlib.sha256(content).hexdigest())
+        assert (local_storage.base_path / attachment.storage_path).read_bytes() == content
+
+
+def test_empty_file_rejects_whole_upload(client, db, test_evaluation, teaching_office_token, local_storage):
+    response = client.post(
+        "/api/teaching-office/attachments",
+        data={"evaluation_id": str(test_evaluation.id), "indicator": "teaching_honors"},
+        files=[
+            ("files", ("ok.txt", BytesIO(b"content"), "text/plain")),
+            ("files", ("empty.txt", BytesIO(b""), "text/plain")),
+        ],
+        headers={"Authorization": f"Bearer {teaching_office_token}"},
+    )
+
+    assert response.status_code == 400
+    assert "empty.txt" in response.json()["detail"]
+    assert db.query(Attachment).count() == 0
+    # 本次已写入存储的文件随请求失败撤销引用，由清理任务删除
+    assert db.query(ContentObject.ref_count).all() == [(0,)]
+    ContentStore(db).collect_garbage(now=datetime.utcnow() + timedelta(seconds=settings.CONTENT_STORE_GC_GRACE + 1))
+    assert [path for path in local_storage.base_path.rglob("*") if path.is_file()] == []
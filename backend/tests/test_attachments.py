@@ -10,6 +10,12 @@ from app.models.user import User
 from app.core.security import get_password_hash
 
 
+@pytest.fixture(autouse=True)
+def isolated_storage(local_storage):
+    """上传的附件写入临时目录，不写入仓库下的 uploads 目录"""
+    return local_storage
+
+
 @pytest.fixture
 def test_user(db):
     """Create a test user"""
@@ -691,7 +697,8 @@ def test_download_attachment_minio_failure(client, db, test_evaluation, auth_hea
         attachment_id = upload_response.json()["attachment_ids"][0]
         
         # Mock MinIO failure
-        with patch('app.services.minio_service.minio_service.get_file_stream') as mock_get_stream:
+        with patch('app.services.minio_service.minio_service.get_file_stream') as mock_get_stream, \
+                patch('app.services.minio_service.minio_service.get_local_file_path', return_value=None):
             mock_get_stream.return_value = None
             
             # Try to download
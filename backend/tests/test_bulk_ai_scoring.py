@@ -0,0 +1,143 @@
+"""
+测试管理端批量AI评分
+
+需求: 批量为已提交的自评表触发AI评分，有限并发执行，通过SSE推送进度与失败汇总
+"""
+
+import asyncio
+import json
+
+import pytest
+from datetime import datetime
+from decimal import Decimal
+
+from app.models.teaching_office import TeachingOffice
+from app.models.self_evaluation import SelfEvaluation
+from app.models.ai_score import AIScore
+from app.models.ai_scoring_job import AIScoringJob
+from app.services.ai_scoring_queue import ai_scoring_workers
+from app.services.ai_scoring_service import AIScoringService
+from tests.conftest import TestingSessionLocal
+
+
+def _parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def evaluations(db):
+    office = TeachingOffice(name="物理教研室", code="PHY01")
+    db.add(office)
+    db.commit()
+
+    created = []
+    for index in range(6):
+        evaluation = SelfEvaluation(
+            teaching_office_id=office.id,
+            evaluation_year=2024,
+            content={"regularTeaching": {}, "index": index},
+            status="locked",
+            submitted_at=datetime.utcnow(),
+        )
+        db.add(evaluation)
+        created.append(evaluation)
+    # 不应被选中：草稿、其他年度
+    db.add(SelfEvaluation(teaching_office_id=office.id, evaluation_year=2024, content={}, status="draft"))
+    db.add(SelfEvaluation(teaching_office_id=office.id, evaluation_year=2023, content={}, status="locked"))
+    db.commit()
+    return created
+
+
+@pytest.fixture
+def fake_scoring(monkeypatch):
+    state = {"running": 0, "max_running": 0, "fail": {}}
+
+    async def execute(self, evaluation_id):
+        state["running"] += 1
+        state["max_running"] = max(state["max_running"], state["running"])
+        try:
+            await asyncio.sleep(0.05)
+            error = state["fail"].get(evaluation_id)
+            if error:
+                raise error
+            ai_score = AIScore(
+                evaluation_id=evaluation_id,
+                total_score=Decimal("80"),
+                indicator_scores=[],
+                parsed_reform_projects=0,
+                parsed_honorary_awards=0,
+            )
+            self.db.add(ai_score)
+            self.db.query(SelfEvaluation).filter(
+                SelfEvaluation.id == evaluation_id
+            ).update({"status": "ai_scored"})
+            self.db.commit()
+            return ai_score
+        finally:
+            state["running"] -= 1
+
+    monkeypatch.setattr(AIScoringService, "execute_ai_scoring", execute)
+    monkeypatch.setattr(ai_scoring_workers, "_session_factory", TestingSessionLocal)
+    return state
+
+
+def test_bulk_scoring_streams_progress(client, db, evaluations, fake_scoring, evaluation_office_token):
+    fake_scoring["fail"][evaluations[0].id] = RuntimeError("DeepSeek timeout")
+    fake_scoring["fail"][evaluations[1].id] = ValueError("自评表没有附件")
+
+    response = client.post(
+        "/api/management/bulk-ai-scoring",
+        json={"year": 2024, "concurrency": 3},
+        headers={"Authorization": f"Bearer {evaluation_office_token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(response.text)
+
+    assert events[0] == ("start", {"total": 6, "concurrency": 3})
+    progress = [data for name, data in events if name == "progress"]
+    assert len(progress) == 6
+    assert [item["completed"] for item in progress] == [1, 2, 3, 4, 5, 6]
+
+    summary = events[-1][1]
+    assert events[-1][0] == "summary"
+    assert summary["succeeded"] == 4
+    assert summary["failed"] == 1
+    assert summary["retry_scheduled"] == 1
+    assert {item["status"] for item in summary["failures"]} == {"failed", "retry_scheduled"}
+
+    assert 1 < fake_scoring["max_running"] <= 3
+    db.expire_all()
+    assert db.query(SelfEvaluation).filter(SelfEvaluation.status == "ai_scored").count() == 4
+    assert db.query(AIScoringJob).filter(AIScoringJob.status == "queued").count() == 1
+
+
+def test_bulk_scoring_skips_already_scored(client, db, evaluations, fake_scoring, evaluation_office_token):
+    headers = {"Authorization": f"Bearer {evaluation_office_token}"}
+    target = [str(evaluations[2].id)]
+
+    first = _parse_sse(client.post(
+        "/api/management/bulk-ai-scoring", json={"evaluation_ids": target}, headers=headers
+    ).text)
+    second = _parse_sse(client.post(
+        "/api/management/bulk-ai-scoring", json={"evaluation_ids": target}, headers=headers
+    ).text)
+
+    assert first[-1][1]["succeeded"] == 1
+    assert second[0][1]["total"] == 0
+    assert second[-1][1]["total"] == 0
+
+
+def test_bulk_scoring_requires_management_role(client, teaching_office_token):
+    response = client.post(
+        "/api/management/bulk-ai-scoring",
+        json={"year": 2024},
+        headers={"Authorization": f"Bearer {teaching_office_token}"},
+    )
+
+    assert response.status_code == 403
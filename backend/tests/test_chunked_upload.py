@@ -0,0 +1,222 @@
+"""
+测试分块上传
+
+需求: 上传会话保存在数据库中，多个worker共享；分块可并行乱序上传，重复分块只保留一份；
+完成时在存储端合并（MinIO compose_object / 分段上传，本地 copy_file_range）；过期会话的分块被清理
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import pytest
+
+from app.models.attachment import Attachment
+from app.models.upload_session import UploadChunk, UploadSession
+from app.models.user import User
+from app.services import minio_service as minio_module
+from app.services.chunked_upload_service import ChunkedUploadService, chunk_prefix
+from tests.conftest import TestingSessionLocal
+
+CONTENT = b"0123456789abcdefghij-chunked"
+CHUNK_SIZE = 8
+
+
+def _chunks(content=CONTENT, size=CHUNK_SIZE):
+    return [content[offset:offset + size] for offset in range(0, len(content), size)]
+
+
+def _files(base):
+    return sorted(str(path.relative_to(base)) for path in base.rglob("*") if path.is_file())
+
+
+@pytest.fixture
+def headers(teaching_office_token):
+    return {"Authorization": f"Bearer {teaching_office_token}"}
+
+
+def _init(client, headers, evaluation, file_size=len(CONTENT)):
+    response = client.post(
+        "/api/chunked/upload/init",
+        data={
+            "file_name": "教学成果.pdf",
+            "file_size": file_size,
+            "evaluation_id": str(evaluation.id),
+            "indicator": "teaching_honors",
+            "chunk_size": CHUNK_SIZE,
+            "content_type": "application/pdf",
+        },
+        headers=headers,
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def _send(client, headers, upload_id, index, data):
+    return client.post(
+        "/api/chunked/upload/chunk",
+        data={"upload_id": upload_id, "chunk_index": index},
+        files={"chunk": ("blob", BytesIO(data), "application/octet-stream")},
+        headers=headers,
+    )
+
+
+def test_out_of_order_chunks_are_merged(client, db, test_evaluation, headers, local_storage):
+    session = _init(client, headers, test_evaluation)
+    upload_id = session["upload_id"]
+    chunks = _chunks()
+    assert session["total_chunks"] == len(chunks) == 4
+
+    for index in (3, 1, 0):
+        assert _send(client, headers, upload_id, index, chunks[index]).json()["status"] == "in_progress"
+    assert _send(client, headers, upload_id, 1, chunks[1]).json()["status"] == "already_uploaded"
+    assert _send(client, headers, upload_id, 2, b"short").status_code == 400
+    status = client.get(f"/api/chunked/upload/status/{upload_id}", headers=headers).json()
+    assert status["missing_chunks"] == [2]
+
+    incomplete = client.post("/api/chunked/upload/complete", data={"upload_id": upload_id}, headers=headers)
+    assert incomplete.status_code == 400
+
+    assert _send(client, headers, upload_id, 2, chunks[2]).json()["status"] == "completed"
+    response = client.post(
+        "/api/chunked/upload/complete",
+        data={"upload_id": upload_id, "evaluation_id": str(test_evaluation.id), "indicator": "teaching_honors"},
+        headers=headers,
+    )
+
+    assert response.status_code == 200
+    attachment = db.get(Attachment, response.json()["attachment_id"])
+    assert (attachment.file_size, attachment.content_hash) == (len(CONTENT), hashlib.sha256(CONTENT).hexdigest())
+    assert attachment.file_type == "application/pdf"
+    assert (local_storage.base_path / attachment.storage_path).read_bytes() == CONTENT
+    # 临时分块与分块记录已清理，只剩合并后的文件
+    assert _files(local_storage.base_path) == [attachment.storage_path]
+    assert db.query(UploadChunk).count() == 0
+
+    # 重复完成请求返回同一附件
+    again = client.post("/api/chunked/upload/complete", data={"upload_id": upload_id}, headers=headers)
+    assert again.json()["attachment_id"] == str(attachment.id)
+    status = client.get(f"/api/chunked/upload/status/{upload_id}", headers=headers).json()
+    assert (status["status"], status["progress"], status["attachment_id"]) == ("completed", 1, str(attachment.id))
+
+
+async def test_concurrent_chunks_from_separate_workers(db, test_evaluation, teaching_office_user, local_storage, monkeypatch):
+    session = ChunkedUploadService(db).create_session(
+        teaching_office_user, test_evaluation.id, "teaching_honors", "a.bin", len(CONTENT), chunk_size=CHUNK_SIZE
+    )
+    chunks = _chunks()
+    # 同一分块的两次上传都通过“尚未接收”检查后才写入存储
+    barrier = threading.Barrier(2, timeout=5)
+    upload_stream = local_storage.upload_stream
+
+    def racing_upload(object_name, source):
+        if "/00000-" in object_name:
+            barrier.wait()
+        return upload_stream(object_name, source)
+
+    monkeypatch.setattr(local_storage, "upload_stream", racing_upload)
+
+    async def worker(index):
+        # 每个请求使用独立的数据库会话，相当于落在不同的worker上
+        worker_db = TestingSessionLocal()
+        try:
+            service = ChunkedUploadService(worker_db)
+            user = worker_db.get(User, teaching_office_user.id)
+            return await service.accept_chunk(service.get_session(session.id, user), index, BytesIO(chunks[index]))
+        finally:
+            worker_db.close()
+
+    results = await asyncio.gather(*(worker(index) for index in [0, 0, 1, 2, 3]))
+
+    assert sorted(results[:2]) == ["already_uploaded", "uploaded"]
+    assert results[2:] == ["uploaded"] * 3
+    assert len(_files(local_storage.base_path / chunk_prefix(session.id))) == 4
+
+    db.expire_all()
+    attachment = await ChunkedUploadService(db).complete(db.get(UploadSession, session.id))
+    assert (local_storage.base_path / attachment.storage_path).read_bytes() == CONTENT
+
+
+def test_local_merge_falls_back_without_copy_file_range(local_storage, monkeypatch):
+    for index, data in enumerate(_chunks()):
+        local_storage.upload_bytes(f"chunks/x/{index}", data)
+
+    def unsupported(*args):
+        raise OSError(38, "Function not implemented")
+
+    monkeypatch.setattr(os, "copy_file_range", unsupported, raising=False)
+
+    assert local_storage.merge_files("merged.bin", [f"chunks/x/{index}" for index in range(4)])
+    assert (local_storage.base_path / "merged.bin").read_bytes() == CONTENT
+
+
+class FakeMinio:
+    def __init__(self, objects):
+        self.objects = dict(objects)
+        self.calls = []
+
+    def compose_object(self, bucket, object_name, sources, metadata=None):
+        self.calls.append("compose_object")
+        self.objects[object_name] = b"".join(self.objects[source.object_name] for source in sources)
+
+    def put_object(self, bucket, object_name, data, length, part_size=0, content_type=None, metadata=None):
+        self.calls.append("put_object")
+        parts = []
+        while True:
+            chunk = data.read(part_size)
+            if not chunk:
+                break
+            parts.append(chunk)
+        self.objects[object_name] = b"".join(parts)
+
+    def get_object(self, bucket, object_name):
+        return BytesIO(self.objects[object_name])
+
+
+@pytest.mark.parametrize("first_size, expected_call", [
+    (minio_module.MINIO_MIN_COMPOSE_PART_SIZE, "compose_object"),
+    (CHUNK_SIZE, "put_object"),
+])
+def test_minio_merge_composes_or_streams(monkeypatch, first_size, expected_call):
+    chunks = _chunks(CONTENT, 16)
+    fake = FakeMinio({"c0": chunks[0], "c1": chunks[1]})
+    monkeypatch.setattr(minio_module.minio_service, "client", fake)
+    monkeypatch.setattr(minio_module.minio_service, "_initialized", True)
+    monkeypatch.setattr(minio_module.minio_service, "_use_local_storage", False)
+
+    # compose_object 只在除最后一个外的分块都不小于5MiB时使用（这里以登记的分块大小判断）
+    stored = minio_module.minio_service.merge_objects("merged", [("c0", first_size), ("c1", len(chunks[1]))])
+
+    assert fake.calls == [expected_call]
+    assert fake.objects["merged"] == CONTENT
+    assert (stored.size, stored.sha256) == (len(CONTENT), hashlib.sha256(CONTENT).hexdigest())
+
+
+async def test_expired_sessions_are_garbage_collected(client, db, test_evaluation, teaching_office_user, headers, local_storage):
+    service = ChunkedUploadService(db)
+    abandoned = service.create_session(teaching_office_user, test_evaluation.id, "teaching_honors", "a.bin", len(CONTENT), chunk_size=CHUNK_SIZE)
+    active = service.create_session(teaching_office_user, test_evaluation.id, "teaching_honors", "b.bin", len(CONTENT), chunk_size=CHUNK_SIZE)
+    finished = service.create_session(teaching_office_user, test_evaluation.id, "teaching_honors", "c.bin", len(CONTENT), chunk_size=CHUNK_SIZE)
+    for session in (abandoned, active):
+        await service.accept_chunk(session, 0, BytesIO(_chunks()[0]))
+    long_ago = datetime.utcnow() - timedelta(days=3)
+    abandoned.expires_at = datetime.utcnow() - timedelta(minutes=1)
+    finished.status, finished.updated_at = "completed", long_ago
+    db.commit()
+    finished_id = finished.id
+
+    assert service.expire_sessions() == 1
+
+    db.expire_all()
+    assert db.get(UploadSession, abandoned.id).status == "expired"
+    assert db.get(UploadSession, active.id).status == "uploading"
+    assert db.get(UploadSession, finished_id) is None
+    assert db.query(UploadChunk).filter(UploadChunk.upload_id == abandoned.id).count() == 0
+    assert not (local_storage.base_path / chunk_prefix(abandoned.id)).exists()
+    assert len(_files(local_storage.base_path / chunk_prefix(active.id))) == 1
+
+    response = _send(client, headers, str(abandoned.id), 1, _chunks()[1])
+    assert response.status_code == 404
@@ -0,0 +1,251 @@
+"""
+测试外部调用熔断与自适应并发
+
+需求: DeepSeek与校长办公会端按目标共享熔断器（closed/open/half_open），
+并发上限按延迟与429/5xx自适应调整（AIMD），熔断状态与并发数可观测
+"""
+
+import asyncio
+import json
+from datetime import datetime
+
+import httpx
+import pytest
+from tenacity import RetryError, wait_none
+
+from app.core.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    AIMDConcurrencyLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    OutboundGuard,
+    outbound_guards,
+)
+from app.core.config import settings
+from app.core.http_clients import DEEPSEEK_CLIENT, HTTPClientConfig, http_clients, register_default_clients
+from app.models.teaching_office import TeachingOffice
+from app.models.self_evaluation import SelfEvaluation
+from app.models.attachment import Attachment
+from app.services.ai_scoring_queue import AIScoringJobService, AIScoringWorkerPool
+from app.services.ai_scoring_service import AIScoringService
+from tests.conftest import TestingSessionLocal
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_then_probes_half_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=3, recovery_timeout=30, clock=clock)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as exc_info:
+        breaker.before_call()
+    assert exc_info.value.retry_after == 30
+
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # 半开状态只放行一个探测请求
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["times_opened"] == 2
+    assert breaker.snapshot()["rejected_calls"] == 2
+
+
+def test_aimd_limiter_adjusts_concurrency():
+    clock = FakeClock()
+    limiter = AIMDConcurrencyLimiter("test", min_limit=1, max_limit=8, latency_target=5, clock=clock)
+    assert limiter.limit == 8
+
+    limiter.on_overload()
+    assert limiter.limit == 4
+    limiter.on_overload()  # 同一时刻的并发失败只减一次
+    assert limiter.limit == 4
+
+    clock.now += 2
+    limiter.on_success(latency=6)  # 耗时超标视为拥塞
+    assert limiter.limit == 2
+
+    for _ in range(3):
+        limiter.on_success(latency=1)
+    assert limiter.limit == 3
+
+    for _ in range(3):
+        clock.now += 2
+        limiter.on_overload()
+    assert limiter.limit == 1
+
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    limiter.release()
+    assert limiter.try_acquire()
+
+
+@pytest.fixture
+def deepseek_server(monkeypatch):
+    """DeepSeek 客户端替换为按预设状态码响应的 MockTransport"""
+    state = {"statuses": [], "requests": 0}
+
+    def handler(request):
+        state["requests"] += 1
+        status = state["statuses"].pop(0) if state["statuses"] else 200
+        if status != 200:
+            return httpx.Response(status, json={"error": "unavailable"})
+        content = AIScoringService.__new__(AIScoringService)._get_mock_response()
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}], "usage": {}})
+
+    monkeypatch.setattr(settings, "DEEPSEEK_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "DEEPSEEK_STREAMING", False)
+    monkeypatch.setattr(settings, "AI_RESPONSE_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(AIScoringService._call_deepseek_api.retry, "wait", wait_none())
+    outbound_guards.reset()
+    http_clients.register(DEEPSEEK_CLIENT, HTTPClientConfig(), transport=httpx.MockTransport(handler))
+    yield state
+    register_default_clients(http_clients)
+
+
+async def test_deepseek_outage_fails_fast_once_open(db, deepseek_server):
+    deepseek_server["statuses"] = [503, 503, 503, 503]
+    service = AIScoringService(db)
+
+    with pytest.raises(CircuitOpenError):
+        await service._call_deepseek_api("prompt")
+    # 两次失败后熔断，第三次重试不再发出请求
+    assert deepseek_server["requests"] == 2
+
+    with pytest.raises(CircuitOpenError):
+        await service._call_deepseek_api("prompt")
+    assert deepseek_server["requests"] == 2
+
+    metrics = outbound_guards.metrics()[DEEPSEEK_CLIENT]
+    assert metrics["state"] == OPEN
+    assert metrics["failures"] == 2
+    assert metrics["rejected_calls"] == 2
+    assert metrics["in_flight"] == 0
+    assert metrics["concurrency_limit"] == settings.DEEPSEEK_MAX_CONNECTIONS // 2
+
+
+async def test_client_errors_do_not_trip_breaker(db, deepseek_server):
+    deepseek_server["statuses"] = [400, 400, 400]
+    service = AIScoringService(db)
+
+    with pytest.raises(RetryError):
+        await service._call_deepseek_api("prompt")
+
+    assert deepseek_server["requests"] == 3
+    assert outbound_guards.metrics()[DEEPSEEK_CLIENT]["state"] == CLOSED
+    json.loads(await service._call_deepseek_api("prompt"))
+
+
+async def test_queue_defers_job_while_open_without_using_attempt(db, deepseek_server):
+    office = TeachingOffice(name="物理教研室", code="PHY01")
+    db.add(office)
+    db.commit()
+    evaluation = SelfEvaluation(
+        teaching_office_id=office.id,
+        evaluation_year=2024,
+        content={"regularTeaching": {}},
+        status="locked",
+        submitted_at=datetime.utcnow(),
+    )
+    db.add(evaluation)
+    db.commit()
+    db.add(Attachment(
+        evaluation_id=evaluation.id,
+        indicator="teaching_honors",
+        file_name="honor.pdf",
+        file_size=1,
+        file_type="application/pdf",
+        storage_path=f"{evaluation.id}/honor.pdf",
+        classified_by="user",
+    ))
+    db.commit()
+    guard = outbound_guards.get(DEEPSEEK_CLIENT)
+    guard.breaker.record_failure()
+    guard.breaker.record_failure()
+
+    job, _ = AIScoringJobService(db).enqueue(evaluation.id)
+    pool = AIScoringWorkerPool(session_factory=TestingSessionLocal, concurrency=0)
+    assert await pool.drain() == 1
+
+    db.expire_all()
+    assert job.status == "queued"
+    assert job.attempts == 0
+    assert "熔断" in job.last_error
+    assert (job.next_run_at - datetime.utcnow()).total_seconds() > settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT - 5
+    assert deepseek_server["requests"] == 0
+
+
+async def test_guard_limits_in_flight_calls():
+    guard = outbound_guards.get(DEEPSEEK_CLIENT)
+    guard.limiter._limit = 2.0
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with guard.call():
+            peak = max(peak, guard.limiter.in_flight)
+            await asyncio.sleep(0.05)
+
+    await asyncio.gather(*(call() for _ in range(5)))
+
+    assert peak == 2
+    assert guard.limiter.in_flight == 0
+    assert guard.snapshot()["successes"] == 5
+
+
+async def test_streaming_latency_measured_to_first_byte():
+    guard = OutboundGuard(
+        "stream",
+        CircuitBreaker("stream", failure_threshold=3, recovery_timeout=30),
+        AIMDConcurrencyLimiter("stream", min_limit=1, max_limit=8, latency_target=0.05),
+    )
+    guard.limiter._limit = 4.0
+
+    async with guard.call() as call:
+        call.record_first_byte()
+        await asyncio.sleep(0.1)  # 输出较长，但首个token及时到达
+    assert guard.limiter.limit == 4
+
+    async with guard.call():
+        await asyncio.sleep(0.1)
+    assert guard.limiter.limit == 2
+
+
+def test_outbound_health_endpoint(client, evaluation_office_token, teaching_office_token):
+    # 内部状态只对管理端开放
+    assert client.get("/api/health/outbound").status_code == 401
+    assert client.get(
+        "/api/health/outbound", headers={"Authorization": f"Bearer {teaching_office_token}"}
+    ).status_code == 403
+
+    response = client.get("/api/health/outbound", headers={"Authorization": f"Bearer {evaluation_office_token}"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data) >= {"deepseek", "president_office"}
+    assert data["deepseek"]["state"] == CLOSED
+    assert data["deepseek"]["in_flight"] == 0
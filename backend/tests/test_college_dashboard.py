@@ -0,0 +1,191 @@
+"""
+测试学院看板统计
+
+需求: 学院看板按教研室汇总真实得分、排名和指标失分率，并按学院/年度缓存
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from app.models.college import College
+from app.models.teaching_office import TeachingOffice
+from app.models.self_evaluation import SelfEvaluation
+from app.models.ai_score import AIScore
+from app.models.manual_score import ManualScore
+from app.models.final_score import FinalScore
+from app.models.user import User
+from app.core.security import get_password_hash, create_access_token
+from app.services import college_stats_service
+from app.services.college_stats_service import CollegeStatsService
+
+
+@pytest.fixture(autouse=True)
+def clear_stats_cache():
+    college_stats_service.invalidate_college_stats_cache()
+    yield
+    college_stats_service.invalidate_college_stats_cache()
+
+
+@pytest.fixture
+def college(db):
+    college = College(name="信息工程学院")
+    db.add(college)
+    db.commit()
+    db.refresh(college)
+    return college
+
+
+@pytest.fixture
+def dean(db, college):
+    user = User(
+        username="dean_user",
+        password_hash=get_password_hash("password123"),
+        role="evaluation_office",
+        college_id=college.id,
+        name="院长",
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+@pytest.fixture
+def dean_headers(dean):
+    token = create_access_token({
+        "sub": dean.username,
+        "user_id": str(dean.id),
+        "role": dean.role,
+    })
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _create_scored_office(db, college, code, name, final_score, manual_scores, reviewer, year=2024):
+    office = TeachingOffice(name=name, code=code, college_id=college.id)
+    db.add(office)
+    db.commit()
+
+    evaluation = SelfEvaluation(
+        teaching_office_id=office.id,
+        evaluation_year=year,
+        content={"regularTeaching": {}},
+        status="finalized",
+    )
+    db.add(evaluation)
+    db.commit()
+
+    db.add(ManualScore(
+        evaluation_id=evaluation.id,
+        reviewer_id=reviewer.id,
+        reviewer_name=reviewer.name,
+        reviewer_role=reviewer.role,
+        weight=Decimal("0.70"),
+        scores=[
+            {"indicator": key, "score": score, "comment": ""}
+            for key, score in manual_scores.items()
+        ],
+    ))
+    db.add(FinalScore(
+        evaluation_id=evaluation.id,
+        final_score=Decimal(str(final_score)),
+        determined_by=reviewer.id,
+    ))
+    db.commit()
+    return office, evaluation
+
+
+def test_dashboard_stats_aggregates_offices(client, db, college, dean, dean_headers):
+    _create_scored_office(
+        db, college, "SE001", "软件工程教研室", 90,
+        {"teachingProcessManagement": 9, "courseAssessment": 6}, dean,
+    )
+    _create_scored_office(
+        db, college, "NE001", "网络工程教研室", 80,
+        {"teachingProcessManagement": 7, "courseAssessment": 4}, dean,
+    )
+
+    response = client.get("/api/college/dashboard/stats", headers=dean_headers)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["avg_score"] == 85.0
+    assert data["year"] == 2024
+    assert [item["name"] for item in data["rank_list"]] == ["软件工程教研室", "网络工程教研室"]
+    assert data["rank_list"][0]["rank"] == 1
+
+    weakness = {item["indicator"]: item["avg_loss_rate"] for item in data["weakness_analysis"]}
+    assert weakness["课程考核"] == pytest.approx(0.5)
+    assert weakness["教学过程管理"] == pytest.approx(0.2)
+    assert data["weakness_analysis"][0]["indicator"] == "课程考核"
+
+
+def test_dashboard_stats_falls_back_to_ai_scores(db, college, dean):
+    office, evaluation = _create_scored_office(
+        db, college, "BD001", "大数据教研室", 75, {}, dean,
+    )
+    scored_at = datetime.utcnow()
+    # 重新评分前的旧记录先写入，失分率应取最新一次评分
+    db.add(AIScore(
+        evaluation_id=evaluation.id,
+        total_score=Decimal("70"),
+        indicator_scores=[{"indicator": "课程建设", "score": 2, "reasoning": ""}],
+        parsed_reform_projects=0,
+        parsed_honorary_awards=0,
+        scored_at=scored_at - timedelta(days=1),
+    ))
+    db.commit()
+    db.add(AIScore(
+        evaluation_id=evaluation.id,
+        total_score=Decimal("75"),
+        indicator_scores=[{"indicator": "课程建设", "score": 7, "reasoning": ""}],
+        parsed_reform_projects=0,
+        parsed_honorary_awards=0,
+        scored_at=scored_at,
+    ))
+    db.commit()
+
+    stats = CollegeStatsService(db).compute_dashboard_stats(college.id, 2024)
+
+    assert stats["weakness_analysis"] == [
+        {"indicator": "课程建设", "avg_loss_rate": 0.3, "sample_count": 1}
+    ]
+
+
+def test_dashboard_stats_cached_and_invalidated_on_score_insert(db, college, dean, monkeypatch):
+    _create_scored_office(
+        db, college, "SE001", "软件工程教研室", 90, {"courseAssessment": 8}, dean,
+    )
+    service = CollegeStatsService(db)
+    first = service.get_dashboard_stats(college.id, 2024)
+
+    calls = []
+    original = CollegeStatsService.compute_dashboard_stats
+
+    def counting(self, *args, **kwargs):
+        calls.append(args)
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(CollegeStatsService, "compute_dashboard_stats", counting)
+
+    assert service.get_dashboard_stats(college.id, 2024) is first
+    assert calls == []
+
+    _create_scored_office(
+        db, college, "NE001", "网络工程教研室", 70, {"courseAssessment": 6}, dean,
+    )
+    refreshed = service.get_dashboard_stats(college.id, 2024)
+
+    assert len(calls) == 1
+    assert refreshed["avg_score"] == 80.0
+    assert len(refreshed["rank_list"]) == 2
+
+
+def test_dashboard_stats_without_college_returns_empty(client, president_office_token):
+    response = client.get(
+        "/api/college/dashboard/stats",
+        headers={"Authorization": f"Bearer {president_office_token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["rank_list"] == []
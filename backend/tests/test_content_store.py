@@ -0,0 +1,198 @@
+"""
+测试内容寻址附件存储
+
+需求: 相同内容（SHA-256）的附件只存一份，数据库记录引用计数；客户端可先提交哈希秒传，
+服务端已有相同内容且客户端通过持有证明挑战时不再传输文件；引用计数归零的对象过宽限期后由清理任务删除
+"""
+
+import hashlib
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import pytest
+
+from app.core.config import settings
+from app.models.attachment import Attachment
+from app.models.content_object import ContentObject, StorageOrphan
+from app.services.content_store import ContentStore, content_path
+from app.services.storage_janitor import StorageJanitor
+from app.services.upload_challenge import issue_challenge, possession_proof
+from tests.conftest import TestingSessionLocal
+
+CONTENT = b"%PDF-1.4 teaching achievement certificate"
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+
+
+@pytest.fixture
+def headers(teaching_office_token):
+    return {"Authorization": f"Bearer {teaching_office_token}"}
+
+
+def _files(base):
+    return sorted(str(path.relative_to(base)) for path in base.rglob("*") if path.is_file())
+
+
+def _upload(client, headers, evaluation, name="证书.pdf", content=CONTENT):
+    response = client.post(
+        "/api/teaching-office/attachments",
+        data={"evaluation_id": str(evaluation.id), "indicator": "teaching_honors"},
+        files=[("files", (name, BytesIO(content), "application/pdf"))],
+        headers=headers,
+    )
+    assert response.status_code == 201
+    return response.json()["attachment_ids"][0]
+
+
+def _instant(client, headers, evaluation, digest=DIGEST, size=len(CONTENT), **extra):
+    return client.post(
+        "/api/teaching-office/attachments/instant-upload",
+        json={
+            "evaluation_id": str(evaluation.id),
+            "indicator": "teaching_honors",
+            "file_name": "证书-副本.pdf",
+            "file_size": size,
+            "sha256": digest,
+            "content_type": "application/pdf",
+            **extra,
+        },
+        headers=headers,
+    )
+
+
+def _prove(client, headers, evaluation, digest=DIGEST, size=len(CONTENT), content=CONTENT):
+    """完成秒传的两步：获取挑战，再按 content 计算持有证明提交"""
+    challenge = _instant(client, headers, evaluation, digest, size).json()["challenge"]
+    data = content[challenge["offset"]:challenge["offset"] + challenge["length"]]
+    return _instant(
+        client, headers, evaluation, digest, size,
+        challenge_token=challenge["token"],
+        proof=possession_proof(challenge["nonce"], data),
+    )
+
+
+def test_repeated_upload_stores_content_once(client, db, test_evaluation, headers, local_storage):
+    first = db.get(Attachment, _upload(client, headers, test_evaluation))
+    second = db.get(Attachment, _upload(client, headers, test_evaluation, name="证书(1).pdf"))
+
+    assert first.storage_path == second.storage_path == content_path(DIGEST)
+    assert db.get(ContentObject, DIGEST).ref_count == 2
+    # 临时路径已移动或删除，存储中只有一份内容
+    assert _files(local_storage.base_path) == [content_path(DIGEST)]
+    assert (local_storage.base_path / first.storage_path).read_bytes() == CONTENT
+
+
+def test_instant_upload_hit_skips_file_transfer(client, db, test_evaluation, headers, local_storage):
+    miss = _prove(client, headers, test_evaluation)
+    assert miss.status_code == 200
+    assert miss.json() == {"hit": False, "attachment_id": None, "challenge": None}
+    assert db.query(Attachment).count() == 0
+
+    _upload(client, headers, test_evaluation)
+    # 大小不一致视为不同内容
+    assert _prove(client, headers, test_evaluation, size=len(CONTENT) + 1).json()["hit"] is False
+
+    hit = _prove(client, headers, test_evaluation, digest=DIGEST.upper())
+    assert hit.json()["hit"] is True
+    attachment = db.get(Attachment, hit.json()["attachment_id"])
+    assert (attachment.file_name, attachment.storage_path, attachment.content_hash) == (
+        "证书-副本.pdf", content_path(DIGEST), DIGEST
+    )
+    db.expire_all()
+    assert db.get(ContentObject, DIGEST).ref_count == 2
+    assert _files(local_storage.base_path) == [content_path(DIGEST)]
+
+
+def test_instant_upload_rejects_locked_evaluation(client, db, test_evaluation, headers, local_storage):
+    _upload(client, headers, test_evaluation)
+    test_evaluation.status = "locked"
+    db.commit()
+
+    assert _instant(client, headers, test_evaluation).status_code == 403
+    db.expire_all()
+    assert db.get(ContentObject, DIGEST).ref_count == 1
+
+
+def test_instant_upload_requires_proof_of_possession(
+    client, db, test_evaluation, headers, local_storage, teaching_office_user
+):
+    _upload(client, headers, test_evaluation)
+
+    # 内容存在与否，第一步的响应相同：只下发挑战
+    for digest in (DIGEST, hashlib.sha256(b"other").hexdigest()):
+        first = _instant(client, headers, test_evaluation, digest=digest).json()
+        assert (first["hit"], first["attachment_id"]) == (False, None)
+        assert first["challenge"]["length"] == len(CONTENT)
+
+    # 只知道哈希、不持有内容时证明不通过
+    forged = _prove(client, headers, test_evaluation, content=b"x" * len(CONTENT))
+    assert forged.json() == {"hit": False, "attachment_id": None, "challenge": None}
+
+    # 挑战绑定内容哈希与用户
+    other_user = issue_challenge(DIGEST, len(CONTENT), "00000000-0000-0000-0000-000000000000")
+    other_digest = issue_challenge(hashlib.sha256(b"other").hexdigest(), len(CONTENT), teaching_office_user.id)
+    for challenge in (other_user, other_digest):
+        response = _instant(
+            client, headers, test_evaluation,
+            challenge_token=challenge["token"],
+            proof=possession_proof(challenge["nonce"], CONTENT),
+        )
+        assert response.status_code == 400
+
+    db.expire_all()
+    assert db.query(Attachment).count() == 1
+    assert db.get(ContentObject, DIGEST).ref_count == 1
+
+
+def test_unreferenced_content_is_collected_after_grace(client, db, test_evaluation, headers, local_storage):
+    first = _upload(client, headers, test_evaluation)
+    second = _upload(client, headers, test_evaluation)
+
+    assert client.delete(f"/api/teaching-office/attachments/{first}", headers=headers).status_code == 204
+    db.expire_all()
+    assert db.get(ContentObject, DIGEST).ref_count == 1
+    assert _files(local_storage.base_path) == [content_path(DIGEST)]
+
+    assert client.delete(f"/api/teaching-office/attachments/{second}", headers=headers).status_code == 204
+    db.expire_all()
+    assert db.get(ContentObject, DIGEST).ref_count == 0
+
+    # 宽限期内不删除：期间的秒传仍可引用该对象
+    StorageJanitor(session_factory=TestingSessionLocal, interval=0).run_once()
+    assert _files(local_storage.base_path) == [content_path(DIGEST)]
+
+    later = datetime.utcnow() + timedelta(seconds=settings.CONTENT_STORE_GC_GRACE + 1)
+    assert ContentStore(db).collect_garbage(now=later) == 1
+    db.expire_all()
+    assert db.get(ContentObject, DIGEST) is None
+    assert _files(local_storage.base_path) == []
+    assert _prove(client, headers, test_evaluation).json()["hit"] is False
+
+
+def test_private_file_is_deleted_with_last_reference(client, db, test_evaluation, headers, local_storage):
+    # 去重前的附件：没有登记为内容对象，两条记录共用同一文件（迁移合并后的情形）
+    local_storage.upload_bytes("legacy/report.pdf", CONTENT)
+    attachments = [
+        Attachment(
+            evaluation_id=test_evaluation.id,
+            indicator="teaching_honors",
+            file_name=f"report-{index}.pdf",
+            file_size=len(CONTENT),
+            file_type="application/pdf",
+            storage_path="legacy/report.pdf",
+            classified_by="user",
+            uploaded_at=datetime.utcnow(),
+            is_archived=True,
+            archived_at=datetime.utcnow(),
+        )
+        for index in range(2)
+    ]
+    db.add_all(attachments)
+    db.commit()
+    first_id, second_id = (attachment.id for attachment in attachments)
+
+    client.delete(f"/api/teaching-office/attachments/{first_id}", headers=headers)
+    assert _files(local_storage.base_path) == ["legacy/report.pdf"]
+
+    client.delete(f"/api/teaching-office/attachments/{second_id}", headers=headers)
+    assert _files(local_storage.base_path) == []
+    assert db.query(StorageOrphan).count() == 0
@@ -0,0 +1,139 @@
+"""
+测试校长办公会端考评数据副本
+
+需求: 接收的同步数据按 (同步任务, 自评表) 与数据哈希幂等地批量写入副本；
+数据看板与结果审定读取副本，不查询管理端的业务表
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.core.http_clients import PRESIDENT_OFFICE_CLIENT, HTTPClientConfig, http_clients, register_default_clients
+from app.core.security import sync_request_auth
+from app.models.anomaly import Anomaly
+from app.models.evaluation_replica import EvaluationReplica
+from app.models.self_evaluation import SelfEvaluation
+from app.services.evaluation_replica_service import EvaluationReplicaService, ReplicaRecord
+from app.services.sync_service import SyncService
+from tests.test_sync_collection import _seed
+from tests.test_sync_stream import BASE_URL, RecordingTransport
+
+
+@pytest.fixture
+def president_office(client, monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_STREAM_CHUNK_SIZE", 2)
+    transport = RecordingTransport()
+    http_clients.register(PRESIDENT_OFFICE_CLIENT, HTTPClientConfig(), transport=transport)
+    yield transport
+    register_default_clients(http_clients)
+
+
+def _records(db, ids, payload_hash="v1"):
+    collected = SyncService(BASE_URL).collect_evaluations_data(db, ids)
+    return [ReplicaRecord(evaluation_id, payload_hash, collected[evaluation_id]) for evaluation_id in ids]
+
+
+def test_apply_is_idempotent_and_ignores_stale_deliveries(db):
+    ids = _seed(db, 3)
+    service = EvaluationReplicaService(db)
+    task_id = uuid.uuid4()
+    synced_at = datetime.utcnow()
+
+    assert service.apply(task_id, synced_at, _records(db, ids))["inserted"] == 3
+    db.commit()
+    # 重复投递同一同步任务的数据
+    assert service.apply(task_id, synced_at, _records(db, ids))["unchanged"] == 3
+
+    newer = service.apply(uuid.uuid4(), synced_at + timedelta(minutes=1), [
+        *_records(db, ids[:1], "v2"),
+        ReplicaRecord(ids[1], None),
+    ])
+    assert (newer["updated"], newer["deleted"], newer["unchanged"]) == (1, 1, 0)
+    # 旧同步任务的重试晚到，不覆盖较新的数据
+    assert service.apply(task_id, synced_at, _records(db, ids[:1]))["stale"] == 1
+    db.commit()
+
+    rows = {row.evaluation_id: row for row in db.query(EvaluationReplica)}
+    assert rows[ids[0]].payload_hash == "v2"
+    assert rows[ids[1]].deleted and rows[ids[1]].payload_hash is None
+    assert rows[ids[2]].final_score == 85
+    assert rows[ids[2]].manual_scores[0]["reviewer_role"] == "evaluation_team"
+    assert set(service.active(ids)) == {ids[0], ids[2]}
+    assert {row.evaluation_id for row in service.dashboard_rows(2024)} == {ids[0], ids[2]}
+    assert service.dashboard_rows(2023) == []
+
+
+async def test_received_stream_populates_replica_in_chunk_transactions(db, president_office):
+    ids = _seed(db, 5)
+    service = SyncService(BASE_URL)
+    first_task = uuid.uuid4()
+
+    assert await service.sync_evaluations(db, ids, first_task) == (5, 0, None)
+    assert db.query(EvaluationReplica).count() == 5
+
+    db.execute(update(Anomaly).where(Anomaly.evaluation_id == ids[0]).values(status="corrected"))
+    db.commit()
+    delta = service.plan_changes(db)
+    assert await service.sync_evaluations(db, delta.changed + ids[1:2], uuid.uuid4(), [ids[4]]) == (3, 0, None)
+
+    rows = {row.evaluation_id: row for row in db.query(EvaluationReplica)}
+    assert rows[ids[0]].payload["anomalies"][0]["status"] == "corrected"
+    assert rows[ids[4]].deleted
+    # 数据未变化的记录再次发送时不重写
+    assert rows[ids[1]].sync_task_id == first_task
+    assert rows[ids[0]].sync_task_id != first_task
+
+
+def test_legacy_package_redelivery_and_dashboard(client, db):
+    ids = _seed(db, 2)
+    service = SyncService(BASE_URL)
+    collected = service.collect_evaluations_data(db, ids)
+    package = {
+        "sync_task_id": str(uuid.uuid4()),
+        "evaluations": [collected[evaluation_id].model_dump(mode="json") for evaluation_id in ids],
+        "total_count": 2,
+        "synced_at": datetime.utcnow().isoformat(),
+        "checksum": "",
+    }
+
+    first = client.post("/api/president-office/receive-sync-data", json=package, auth=sync_request_auth)
+    second = client.post("/api/president-office/receive-sync-data", json=package, auth=sync_request_auth)
+
+    assert first.json()["replica"]["inserted"] == 2
+    assert second.json()["replica"]["unchanged"] == 2
+
+    # 看板读取副本：管理端数据变化在下次同步之前不影响看板
+    db.execute(update(SelfEvaluation).where(SelfEvaluation.id == ids[0]).values(status="draft"))
+    db.commit()
+    scores = client.get("/api/president-office/dashboard", params={"year": 2024}).json()["teaching_office_scores"]
+    assert [score["status"] for score in scores] == ["finalized", "finalized"]
+    assert scores[0]["manual_scores"][0]["reviewer_name"] == "评审"
+
+
+def test_approval_reads_and_updates_replica(client, db, president_office_token):
+    ids = _seed(db, 2)
+    EvaluationReplicaService(db).apply(uuid.uuid4(), datetime.utcnow(), _records(db, ids[:1]))
+    db.commit()
+    headers = {"Authorization": f"Bearer {president_office_token}"}
+
+    response = client.post(
+        "/api/president-office/approve",
+        json={"evaluation_ids": [str(ids[1])], "decision": "approve"},
+        headers=headers,
+    )
+    assert response.status_code == 404
+
+    response = client.post(
+        "/api/president-office/approve",
+        json={"evaluation_ids": [str(ids[0])], "decision": "approve"},
+        headers=headers,
+    )
+
+    assert response.status_code == 200
+    assert db.get(EvaluationReplica, ids[0]).status == "approved"
+    db.expire_all()
+    assert db.get(SelfEvaluation, ids[0]).status == "approved"
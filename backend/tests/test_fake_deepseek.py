@@ -0,0 +1,94 @@
+"""
+测试 DeepSeek 替身服务与AI评分压测脚本
+
+需求: 提供可配置延迟分布、500/429注入、截断与非JSON正文、流式响应的本地替身服务，
+压测脚本以N个并发的 execute_ai_scoring 驱动，报告吞吐量与p95延迟
+"""
+
+import json
+import random
+
+import httpx
+import pytest
+
+from fake_deepseek_server import FakeDeepSeekConfig, FakeDeepSeekServer, create_app, sample_latency
+from load_test_ai_scoring import percentile, run_load_test
+from app.services.ai_response_schema import decode_ai_response
+
+URL = "http://fake-deepseek/v1/chat/completions"
+REQUEST = {"model": "deepseek-chat", "messages": [{"role": "user", "content": "请评分"}]}
+
+
+def _client(config):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(config)))
+
+
+async def test_returns_valid_scoring_response():
+    async with _client(FakeDeepSeekConfig(latency_ms=0, seed=1)) as client:
+        response = await client.post(URL, json=REQUEST)
+
+    assert response.status_code == 200
+    content = response.json()["choices"][0]["message"]["content"]
+    assert len(decode_ai_response(content)["indicator_scores"]) == 8
+
+
+async def test_fault_injection():
+    async with _client(FakeDeepSeekConfig(latency_ms=0, rate_limit_rate=1, retry_after=7)) as client:
+        response = await client.post(URL, json=REQUEST)
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "7"
+
+        await client.post("http://fake-deepseek/_control", json={"rate_limit_rate": 0, "error_rate": 1})
+        assert (await client.post(URL, json=REQUEST)).status_code == 500
+
+        await client.post("http://fake-deepseek/_control", json={"error_rate": 0, "truncate_rate": 1})
+        with pytest.raises(json.JSONDecodeError):
+            (await client.post(URL, json=REQUEST)).json()
+
+        await client.post("http://fake-deepseek/_control", json={"truncate_rate": 0, "non_json_rate": 1})
+        content = (await client.post(URL, json=REQUEST)).json()["choices"][0]["message"]["content"]
+        assert "{" not in content
+
+        stats = (await client.get("http://fake-deepseek/_stats")).json()
+        assert stats == {"requests": 1, "non_json": 1, "in_flight": 0, "max_in_flight": 1}
+
+        response = await client.post("http://fake-deepseek/_control", json={"distribution": "pareto"})
+        assert response.status_code == 400
+
+
+async def test_streaming_response():
+    async with _client(FakeDeepSeekConfig(latency_ms=0, stream_chunk_chars=16)) as client:
+        response = await client.post(URL, json={**REQUEST, "stream": True})
+
+    events = [line[5:].strip() for line in response.text.splitlines() if line.startswith("data:")]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    assert chunks[-1]["usage"]["completion_tokens"] > 0
+    content = "".join(chunk["choices"][0]["delta"]["content"] for chunk in chunks if chunk["choices"])
+    assert decode_ai_response(content)["total_score"] > 0
+
+
+def test_latency_distributions():
+    rng = random.Random(3)
+    for distribution in ("uniform", "exponential", "lognormal"):
+        config = FakeDeepSeekConfig(latency_ms=100, distribution=distribution)
+        samples = [sample_latency(config, rng) for _ in range(4000)]
+        assert min(samples) >= 0
+        assert sum(samples) / len(samples) == pytest.approx(0.1, rel=0.1)
+    assert sample_latency(FakeDeepSeekConfig(latency_ms=100), rng) == 0.1
+    assert percentile([5, 1, 4, 2, 3], 95) == 5
+    assert percentile([5, 1, 4, 2, 3], 50) == 3
+
+
+async def test_load_test_against_real_server():
+    with FakeDeepSeekServer(FakeDeepSeekConfig(latency_ms=20, distribution="uniform", seed=5)) as server:
+        report = await run_load_test(server.url, jobs=8, concurrency=4, streaming=True)
+        stats = server.stats
+
+    assert report["succeeded"] == 8
+    assert report["errors"] == {}
+    assert report["throughput_per_second"] > 0
+    assert report["latency_ms"]["p95"] >= report["latency_ms"]["p50"] >= 20
+    assert report["outbound"]["state"] == "closed"
+    assert stats["requests"] == 8
+    assert stats["max_in_flight"] <= 4
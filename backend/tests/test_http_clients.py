@@ -0,0 +1,96 @@
+"""
+测试出站HTTP客户端注册表
+
+需求: DeepSeek 与校长办公会端同步复用连接池，应用关闭时统一释放
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.http_clients import (
+    HTTPClientConfig,
+    HTTPClientRegistry,
+    PRESIDENT_OFFICE_CLIENT,
+    http_clients,
+)
+from app.services.sync_service import SyncService
+
+
+def _registry_with_mock(handler):
+    registry = HTTPClientRegistry()
+    registry.register("mock", HTTPClientConfig(max_connections=2), transport=httpx.MockTransport(handler))
+    return registry
+
+
+async def test_client_reused_across_calls():
+    registry = _registry_with_mock(lambda request: httpx.Response(200, json={"ok": True}))
+
+    first = registry.get("mock")
+    for _ in range(3):
+        response = await registry.get("mock").get("https://example.com/ping")
+        assert response.json() == {"ok": True}
+
+    assert registry.get("mock") is first
+    metrics = registry.metrics()["mock"]
+    assert metrics["requests"] == 3
+    assert metrics["in_flight"] == 0
+    assert metrics["errors"] == 0
+    assert metrics["clients_created"] == 1
+    assert metrics["max_connections"] == 2
+
+    await registry.aclose()
+    assert first.is_closed
+    assert registry.metrics()["mock"]["open"] is False
+
+
+async def test_errors_counted_and_closed_client_recreated():
+    def handler(request):
+        if request.url.path == "/fail":
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(503)
+
+    registry = _registry_with_mock(handler)
+    client = registry.get("mock")
+
+    with pytest.raises(httpx.ConnectError):
+        await client.get("https://example.com/fail")
+    await client.get("https://example.com/busy")
+
+    metrics = registry.metrics()["mock"]
+    assert metrics["requests"] == 2
+    assert metrics["errors"] == 2
+    assert metrics["in_flight"] == 0
+
+    await client.aclose()
+    assert registry.get("mock") is not client
+    await registry.aclose()
+
+
+def test_client_recreated_for_new_event_loop():
+    registry = _registry_with_mock(lambda request: httpx.Response(200))
+
+    async def fetch():
+        client = registry.get("mock")
+        await client.get("https://example.com/")
+        return client
+
+    first = asyncio.run(fetch())
+    second = asyncio.run(fetch())
+
+    assert first is not second
+    assert registry.metrics()["mock"]["clients_created"] == 2
+
+
+def test_unknown_client_rejected():
+    with pytest.raises(KeyError):
+        HTTPClientRegistry().get("missing")
+
+
+async def test_sync_service_uses_shared_client():
+    service = SyncService("https://president.example.com/api")
+
+    assert service.client is http_clients.get(PRESIDENT_OFFICE_CLIENT)
+    assert service.client is service.client
+    await http_clients.aclose()
@@ -0,0 +1,208 @@
+"""
+测试本地预评分与混合评分模式
+
+需求: 负面清单扣分、自评分合计、亮点数量核对与明确的附件分类由本地计算，
+DeepSeek只评8个常规教学指标；提供两种模式的耗时、token与一致性对比报告
+"""
+
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.core.indicators import REGULAR_TEACHING_INDICATORS
+from app.models.teaching_office import TeachingOffice
+from app.models.self_evaluation import SelfEvaluation
+from app.models.attachment import Attachment
+from app.models.ai_score import AIScore
+from app.models.ai_call_log import AICallLog
+from app.models.anomaly import Anomaly
+from app.services.ai_scoring_service import AIScoringService
+from app.services.local_prescorer import classify_filename, negative_list_deduction, prescore
+
+
+CONTENT = {
+    "regularTeaching": {key: {"selfScore": 9, "content": f"{label}工作扎实"} for key, label in REGULAR_TEACHING_INDICATORS.items()},
+    "highlights": {
+        "teachingReformProjects": {"items": [{"name": "课程思政改革", "level": "省级", "score": 3}]},
+        "teachingHonors": {"items": [{"name": "优秀教师", "level": "校级", "score": 1}, {"name": "先进集体", "level": "校级", "score": 1}]},
+    },
+    "negativeList": {"teachingAccidents": {"count": 1, "deduction": 5}, "workloadIncomplete": {"percentage": 15}},
+}
+
+SUBJECTIVE = {
+    "indicator_scores": [
+        {"indicator": label, "score": 8, "reasoning": "良好"} for label in REGULAR_TEACHING_INDICATORS.values()
+    ]
+}
+
+
+def test_negative_list_deduction_rules():
+    assert negative_list_deduction({}) == 0
+    assert negative_list_deduction({
+        "ethicsViolations": {"count": 1},
+        "teachingAccidents": {"count": 2},
+        "ideologyIssues": {"count": 1},
+        "workloadIncomplete": {"percentage": 35},
+    }) == 10 + 10 + 5 + 10
+    assert negative_list_deduction({"workloadIncomplete": {"percentage": 25}}) == 5
+    assert negative_list_deduction({"workloadIncomplete": {"percentage": 10}}) == 0
+
+
+@pytest.mark.parametrize("file_name, expected", [
+    ("2024教改项目立项通知.pdf", "teaching_reform_projects"),
+    ("优秀教师荣誉证书.jpg", "teaching_honors"),
+    ("青教赛一等奖.pdf", "teaching_competitions"),
+    ("互联网+创新创业大赛获奖.pdf", "innovation_competitions"),
+    ("scan_001.pdf", None),
+    ("教改项目获教学成果奖.pdf", None),
+])
+def test_classify_filename(file_name, expected):
+    assert classify_filename(file_name) == expected
+
+
+def test_prescore_and_merge():
+    attachments = [
+        SimpleNamespace(file_name="教改立项书.pdf", indicator="other"),
+        SimpleNamespace(file_name="scan.pdf", indicator="teachingHonors"),
+        SimpleNamespace(file_name="scan2.pdf", indicator="regularTeaching"),
+    ]
+
+    result = prescore(CONTENT, attachments)
+
+    assert result.regular_self_total == 72
+    assert result.highlights_total == 5
+    assert result.negative_deduction == 7
+    assert result.declared_counts["teaching_honors"] == 2
+    assert result.parsed_counts == {
+        "parsed_reform_projects": 1,
+        "parsed_honors": 1,
+        "parsed_competitions": 0,
+        "parsed_innovations": 0,
+    }
+    assert result.attachment_classifications == [
+        {"file_name": "教改立项书.pdf", "classified_indicator": "teaching_reform_projects"}
+    ]
+
+    merged = result.merge(SUBJECTIVE["indicator_scores"])
+    assert merged["total_score"] == 64 + 5 - 7
+    assert merged["parsed_honorary_awards"] == 1
+
+    # 截断响应的部分结果不参与总分，退回本地自评总分
+    partial = result.merge(SUBJECTIVE["indicator_scores"][:3], partial=True)
+    assert partial["total_score"] == result.local_total == 72 + 5 - 7
+    assert len(partial["indicator_scores"]) == 3
+
+
+@pytest.fixture
+def scored_evaluation(db):
+    office = TeachingOffice(name="音乐教研室", code="MUS01")
+    db.add(office)
+    db.commit()
+    evaluation = SelfEvaluation(
+        teaching_office_id=office.id,
+        evaluation_year=2024,
+        content=CONTENT,
+        status="locked",
+        submitted_at=datetime.utcnow(),
+    )
+    db.add(evaluation)
+    db.commit()
+    for name, indicator in [("教改立项书.pdf", "other"), ("优秀教师证书.pdf", "teachingHonors")]:
+        db.add(Attachment(
+            evaluation_id=evaluation.id,
+            indicator=indicator,
+            file_name=name,
+            file_size=1,
+            file_type="application/pdf",
+            storage_path=f"{evaluation.id}/{name}",
+            classified_by="user",
+        ))
+    db.commit()
+    return evaluation
+
+
+async def test_hybrid_mode_asks_only_for_regular_indicators(db, scored_evaluation, monkeypatch):
+    prompts = []
+
+    async def fake_call(self, prompt):
+        prompts.append(prompt)
+        return json.dumps(SUBJECTIVE, ensure_ascii=False)
+
+    monkeypatch.setattr(settings, "AI_RESPONSE_CACHE_ENABLED", False)
+    monkeypatch.setattr(AIScoringService, "_call_deepseek_api", fake_call)
+
+    ai_score = await AIScoringService(db, mode="hybrid").execute_ai_scoring(scored_evaluation.id)
+
+    assert "附件信息" not in prompts[0]
+    assert "负面清单" in prompts[0]  # 仅在说明中提及已由系统计算
+    assert float(ai_score.total_score) == 64 + 5 - 7
+    assert ai_score.parsed_reform_projects == 1
+    assert ai_score.parsed_honorary_awards == 1
+    anomalies = db.query(Anomaly).filter(Anomaly.evaluation_id == scored_evaluation.id).all()
+    assert {anomaly.indicator for anomaly in anomalies} == {"teaching_honors"}
+    reform = db.query(Attachment).filter(Attachment.file_name == "教改立项书.pdf").one()
+    assert reform.indicator == "teaching_reform_projects"
+    assert reform.classified_by == "ai"
+    assert db.query(AICallLog).one().mode == "hybrid"
+
+
+async def test_hybrid_partial_response_falls_back_to_local_total(db, scored_evaluation, monkeypatch):
+    async def fake_call(self, prompt):
+        self.last_partial_missing = ["total_score"]
+        return json.dumps(SUBJECTIVE, ensure_ascii=False)
+
+    monkeypatch.setattr(settings, "AI_RESPONSE_CACHE_ENABLED", False)
+    monkeypatch.setattr(AIScoringService, "_call_deepseek_api", fake_call)
+
+    score_data, _ = await AIScoringService(db, mode="hybrid").compute_score_data(
+        scored_evaluation, scored_evaluation.attachments
+    )
+
+    assert score_data["total_score"] == 72 + 5 - 7
+    assert len(score_data["indicator_scores"]) == len(REGULAR_TEACHING_INDICATORS)
+
+
+def test_mode_comparison_report(client, db, scored_evaluation, monkeypatch, evaluation_office_token):
+    full_response = {
+        "total_score": 63,
+        "indicator_scores": [
+            {"indicator": label, "score": 8.5 if index == 0 else 8, "reasoning": "良好"}
+            for index, label in enumerate(REGULAR_TEACHING_INDICATORS.values())
+        ],
+        "parsed_reform_projects": 1,
+        "parsed_honors": 2,
+        "parsed_competitions": 0,
+        "parsed_innovations": 0,
+        "attachment_classifications": [
+            {"file_name": "教改立项书.pdf", "classified_indicator": "teaching_reform_projects"},
+        ],
+    }
+
+    async def fake_call(self, prompt):
+        self.last_usage = {"prompt_tokens": len(prompt), "completion_tokens": 100 if self.mode == "hybrid" else 300}
+        return json.dumps(full_response if "附件信息" in prompt else SUBJECTIVE, ensure_ascii=False)
+
+    monkeypatch.setattr(AIScoringService, "_call_deepseek_api", fake_call)
+
+    response = client.post(
+        "/api/management/ai-scoring-mode-comparison",
+        json={"evaluation_ids": [str(scored_evaluation.id)]},
+        headers={"Authorization": f"Bearer {evaluation_office_token}"},
+    )
+
+    assert response.status_code == 200
+    report = response.json()
+    assert report["evaluations"] == 1
+    assert report["modes"]["hybrid"]["avg_prompt_tokens_estimated"] < report["modes"]["full"]["avg_prompt_tokens_estimated"]
+    assert report["reduction"]["completion_tokens"] == pytest.approx(2 / 3, abs=1e-3)
+    agreement = report["agreement"]
+    assert agreement["mean_total_score_diff"] == 1
+    assert agreement["indicators_within_1_point_rate"] == 1
+    assert agreement["parsed_counts_match_rate"] == 0.75
+    assert agreement["classification_agreement_rate"] == 1
+    # 对比为试运行，不写入评分与调用记录
+    assert db.query(AIScore).count() == 0
+    assert db.query(AICallLog).count() == 0
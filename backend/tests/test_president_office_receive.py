@@ -13,8 +13,12 @@ from uuid import uuid4
 from datetime import datetime
 import hashlib
 import json
+import time
 
 from app.main import app
+from app.core.config import settings
+from app.core.security import SyncRequestAuth, sync_request_auth, sync_stream_auth
+from app.models.sync_receipt import SyncReceipt
 from app.schemas.sync import SyncDataPackage, EvaluationSyncData
 
 
@@ -126,6 +130,7 @@ def test_receive_sync_data_success(
     """
     response = client.post(
         "/api/president-office/receive-sync-data",
+        auth=sync_request_auth,
         json=valid_sync_package.model_dump(mode='json'),
         headers={
             "X-Sync-Task-Id": str(valid_sync_package.sync_task_id),
@@ -156,6 +161,7 @@ def test_receive_sync_data_checksum_mismatch(
     """
     response = client.post(
         "/api/president-office/receive-sync-data",
+        auth=sync_request_auth,
         json=valid_sync_package.model_dump(mode='json'),
         headers={
             "X-Sync-Task-Id": str(valid_sync_package.sync_task_id),
@@ -179,6 +185,7 @@ def test_receive_sync_data_task_id_mismatch(
     """
     response = client.post(
         "/api/president-office/receive-sync-data",
+        auth=sync_request_auth,
         json=valid_sync_package.model_dump(mode='json'),
         headers={
             "X-Sync-Task-Id": str(uuid4()),  # Different task ID
@@ -227,6 +234,7 @@ def test_receive_sync_data_missing_evaluation_data(
     
     response = client.post(
         "/api/president-office/receive-sync-data",
+        auth=sync_request_auth,
         json=sync_package.model_dump(mode='json')
     )
     
@@ -272,6 +280,7 @@ def test_receive_sync_data_missing_scoring_records(
     
     response = client.post(
         "/api/president-office/receive-sync-data",
+        auth=sync_request_auth,
         json=sync_package.model_dump(mode='json')
     )
     
@@ -318,6 +327,7 @@ def test_receive_sync_data_missing_attachments_list(
     
     response = client.post(
         "/api/president-office/receive-sync-data",
+        auth=sync_request_auth,
         json=sync_package.model_dump(mode='json')
     )
     
@@ -363,6 +373,7 @@ def test_receive_sync_data_missing_anomalies_list(
     
     response = client.post(
         "/api/president-office/receive-sync-data",
+        auth=sync_request_auth,
         json=sync_package.model_dump(mode='json')
     )
     
@@ -391,6 +402,7 @@ def test_receive_sync_data_empty_evaluations(
     
     response = client.post(
         "/api/president-office/receive-sync-data",
+        auth=sync_request_auth,
         json=sync_package.model_dump(mode='json')
     )
     
@@ -413,6 +425,7 @@ def test_receive_sync_data_count_mismatch(
     
     response = client.post(
         "/api/president-office/receive-sync-data",
+        auth=sync_request_auth,
         json=valid_sync_package.model_dump(mode='json')
     )
     
@@ -467,6 +480,7 @@ def test_receive_sync_data_multiple_evaluations(
     
     response = client.post(
         "/api/president-office/receive-sync-data",
+        auth=sync_request_auth,
         json=sync_package.model_dump(mode='json'),
         headers={
             "X-Sync-Task-Id": str(sync_task_id),
@@ -477,3 +491,55 @@ def test_receive_sync_data_multiple_evaluations(
     assert response.status_code == 200
     data = response.json()
     assert data["evaluations_count"] == 3
+
+
+def test_sync_endpoints_require_service_credential(
+    client: TestClient,
+    db: Session,
+    valid_sync_package: SyncDataPackage,
+    monkeypatch
+):
+    """
+    测试同步端点只接受管理端签名的请求
+    
+    需求: 10.1（数据接收需校验来源）
+    """
+    payload = valid_sync_package.model_dump(mode='json')
+    url = "/api/president-office/receive-sync-data"
+    
+    assert client.post(url, json=payload).status_code == 401
+    assert client.get(f"/api/president-office/receive-sync-stream/{uuid4()}").status_code == 401
+    response = client.post("/api/president-office/receive-sync-stream", content=b'{"type":"header"}\n')
+    assert response.status_code == 401
+    assert db.query(SyncReceipt).count() == 0
+    
+    # 签名与请求体不符（请求体被篡改）
+    class TamperedAuth(SyncRequestAuth):
+        def auth_flow(self, request):
+            request = next(super().auth_flow(request))
+            request.headers["X-Sync-Signature"] = "0" * 64
+            yield request
+    assert client.post(url, json=payload, auth=TamperedAuth()).status_code == 401
+    
+    # 流式请求的签名不能用于普通请求
+    assert client.post(url, json=payload, auth=sync_stream_auth).status_code == 401
+    
+    # 时间戳超出允许范围
+    monkeypatch.setattr(settings, "SYNC_SIGNATURE_MAX_SKEW", -1)
+    assert client.post(url, json=payload, auth=sync_request_auth).status_code == 401
+    monkeypatch.setattr(settings, "SYNC_SIGNATURE_MAX_SKEW", 300)
+    
+    # 另一端使用不同的密钥
+    signed = client.build_request("POST", url, json=payload)
+    signed = next(sync_request_auth.auth_flow(signed))
+    monkeypatch.setattr(settings, "SYNC_SHARED_SECRET", "other-secret")
+    assert client.send(signed).status_code == 401
+    
+    # 未配置密钥时拒绝所有同步请求
+    monkeypatch.setattr(settings, "SYNC_SHARED_SECRET", "")
+    assert client.post(url, json=payload, headers={
+        "X-Sync-Timestamp": "0", "X-Sync-Signature": "0"
+    }).status_code == 401
+    assert client.post(url, json=payload, headers={
+        "X-Sync-Timestamp": str(int(time.time())), "X-Sync-Signature": "0"
+    }).status_code == 503
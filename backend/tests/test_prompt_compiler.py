@@ -0,0 +1,135 @@
+"""
+测试AI评分提示词编译
+
+需求: 提示词按token预算压缩超长内容，并记录每次调用的提示词token数
+"""
+
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.models.teaching_office import TeachingOffice
+from app.models.self_evaluation import SelfEvaluation
+from app.models.attachment import Attachment
+from app.models.ai_call_log import AICallLog
+from app.services.ai_scoring_service import AIScoringService
+from app.services.prompt_compiler import (
+    allocate_budget,
+    compile_scoring_prompt,
+    estimate_tokens,
+    truncate_to_tokens,
+)
+
+
+def _attachment(name, indicator="other"):
+    return SimpleNamespace(file_name=name, indicator=indicator)
+
+
+def test_estimate_tokens_weights_cjk_higher():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("教学" * 10) == 12
+    assert estimate_tokens("a" * 10) == 3
+
+
+def test_truncate_keeps_head_and_tail():
+    text = "开头" + "中" * 5000 + "结尾"
+
+    truncated = truncate_to_tokens(text, 200)
+
+    assert estimate_tokens(truncated) <= 200
+    assert truncated.startswith("开头")
+    assert truncated.endswith("结尾")
+    assert "省略" in truncated
+    assert truncate_to_tokens("短文本", 200) == "短文本"
+
+
+def test_allocate_budget_is_max_min_fair():
+    allocation = allocate_budget({"small": 10, "medium": 50, "large": 1000}, 150)
+
+    assert allocation == {"small": 10, "medium": 50, "large": 90}
+
+
+def test_short_submission_is_untouched():
+    content = {"regularTeaching": {"courseConstruction": {"selfScore": 9, "content": "课程建设完善"}}}
+
+    compiled = compile_scoring_prompt(content, [_attachment("a.pdf")], 6000)
+
+    assert compiled.truncated_sections == []
+    assert "课程建设完善" in compiled.text
+    assert "1. 文件名：a.pdf，考核指标：other" in compiled.text
+    assert compiled.estimated_tokens == estimate_tokens(compiled.text)
+
+
+def test_long_submission_fits_budget():
+    content = {
+        "regularTeaching": {
+            "teachingProcessManagement": {"selfScore": 9, "content": "过程管理" * 3000},
+            "courseAssessment": {"selfScore": 8, "content": "课程考核内容"},
+        },
+        "highlights": {
+            "teachingReformProjects": {
+                "items": [{"name": f"改革项目{i}", "level": "省级", "score": 1} for i in range(200)]
+            },
+        },
+    }
+    attachments = [_attachment(f"file{i}.pdf", "teaching_reform_projects") for i in range(500)]
+
+    compiled = compile_scoring_prompt(content, attachments, 3000)
+
+    assert compiled.estimated_tokens <= 3000
+    assert set(compiled.truncated_sections) == {"teachingProcessManagement", "highlights", "attachments"}
+    # 短内容不受影响，长列表保留摘要
+    assert "课程考核内容" in compiled.text
+    assert "未列出" in compiled.text
+    assert "附件信息（共500个）" in compiled.text
+    assert "评分任务" in compiled.text
+
+
+async def test_scoring_records_prompt_tokens(db, monkeypatch):
+    office = TeachingOffice(name="生物教研室", code="BIO01")
+    db.add(office)
+    db.commit()
+    evaluation = SelfEvaluation(
+        teaching_office_id=office.id,
+        evaluation_year=2024,
+        content={"regularTeaching": {"courseConstruction": {"selfScore": 9, "content": "课程建设"}}},
+        status="locked",
+        submitted_at=datetime.utcnow(),
+    )
+    db.add(evaluation)
+    db.commit()
+    db.add(Attachment(
+        evaluation_id=evaluation.id,
+        indicator="other",
+        file_name="a.pdf",
+        file_size=1,
+        file_type="application/pdf",
+        storage_path=f"{evaluation.id}/other/a.pdf",
+        classified_by="user",
+    ))
+    db.commit()
+
+    async def fake_call(self, prompt):
+        self.last_usage = {"prompt_tokens": 1500, "completion_tokens": 300}
+        return json.dumps({
+            "total_score": 70,
+            "indicator_scores": [],
+            "parsed_reform_projects": 0,
+            "parsed_honorary_awards": 0,
+            "parsed_honors": 0,
+            "parsed_competitions": 0,
+            "parsed_innovations": 0,
+        })
+
+    monkeypatch.setattr(settings, "AI_RESPONSE_CACHE_ENABLED", False)
+    monkeypatch.setattr(AIScoringService, "_call_deepseek_api", fake_call)
+    service = AIScoringService(db)
+
+    await service.execute_ai_scoring(evaluation.id)
+
+    log = db.query(AICallLog).filter(AICallLog.evaluation_id == evaluation.id).one()
+    assert log.prompt_tokens_estimated == service.last_prompt.estimated_tokens > 0
+    assert log.prompt_tokens == 1500
+    assert log.completion_tokens == 300
+    assert log.truncated_sections == []
@@ -0,0 +1,183 @@
+"""
+测试教研室端已公示结果列表
+
+需求: 批量加载评分数据，查询次数与历史年度数量无关，并按考评版本缓存
+"""
+
+import pytest
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from sqlalchemy import event
+
+from app.models.teaching_office import TeachingOffice
+from app.models.self_evaluation import SelfEvaluation
+from app.models.ai_score import AIScore
+from app.models.manual_score import ManualScore
+from app.models.final_score import FinalScore
+from app.models.user import User
+from app.core.security import get_password_hash, create_access_token
+from app.api.v1.endpoints import self_evaluation as self_evaluation_endpoints
+from tests.conftest import engine
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture(autouse=True)
+def clear_results_cache():
+    self_evaluation_endpoints._published_results_cache.clear()
+    yield
+    self_evaluation_endpoints._published_results_cache.clear()
+
+
+@pytest.fixture
+def office(db):
+    office = TeachingOffice(name="软件工程教研室", code="SE100")
+    db.add(office)
+    db.commit()
+    db.refresh(office)
+    return office
+
+
+@pytest.fixture
+def office_user(db, office):
+    user = User(
+        username="se_director",
+        password_hash=get_password_hash("password123"),
+        role="teaching_office",
+        teaching_office_id=office.id,
+        name="软件工程教研室主任",
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+@pytest.fixture
+def office_headers(office_user):
+    token = create_access_token({
+        "sub": office_user.username,
+        "user_id": str(office_user.id),
+        "role": office_user.role,
+    })
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _create_published_years(db, office, reviewer, years):
+    evaluations = []
+    for year in years:
+        evaluation = SelfEvaluation(
+            teaching_office_id=office.id,
+            evaluation_year=year,
+            content={"regularTeaching": {}},
+            status="published",
+        )
+        db.add(evaluation)
+        db.commit()
+        db.add(AIScore(
+            evaluation_id=evaluation.id,
+            total_score=Decimal("80"),
+            indicator_scores=[],
+            parsed_reform_projects=0,
+            parsed_honorary_awards=0,
+        ))
+        db.add(ManualScore(
+            evaluation_id=evaluation.id,
+            reviewer_id=reviewer.id,
+            reviewer_name=reviewer.name,
+            reviewer_role=reviewer.role,
+            weight=Decimal("0.70"),
+            scores=[{"indicator": "courseAssessment", "score": 8, "comment": ""},
+                    {"indicator": "courseConstruction", "score": 9, "comment": ""}],
+        ))
+        db.add(FinalScore(
+            evaluation_id=evaluation.id,
+            final_score=Decimal("85.5"),
+            summary="优秀",
+            determined_by=reviewer.id,
+        ))
+        db.commit()
+        evaluations.append(evaluation)
+    return evaluations
+
+
+def test_published_results_content(client, db, office, office_user, office_headers):
+    _create_published_years(db, office, office_user, [2023, 2024])
+
+    response = client.get("/api/teaching-office/published-results", headers=office_headers)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["evaluation_year"] for item in data] == [2024, 2023]
+    first = data[0]
+    assert first["teaching_office_name"] == "软件工程教研室"
+    assert first["ai_score"] == {"total_score": 80.0}
+    assert first["manual_scores"][0]["total"] == 17.0
+    assert first["final_score"]["final_score"] == 85.5
+    assert first["final_score"]["summary"] == "优秀"
+
+
+def test_published_results_use_latest_ai_score(client, db, office, office_user, office_headers):
+    evaluation = _create_published_years(db, office, office_user, [2024])[0]
+    first = db.query(AIScore).filter(AIScore.evaluation_id == evaluation.id).one()
+    # 重新评分新增一条更晚的记录
+    db.add(AIScore(
+        evaluation_id=evaluation.id,
+        total_score=Decimal("88"),
+        indicator_scores=[],
+        parsed_reform_projects=0,
+        parsed_honorary_awards=0,
+        scored_at=first.scored_at + timedelta(hours=1),
+    ))
+    db.commit()
+
+    data = client.get("/api/teaching-office/published-results", headers=office_headers).json()
+
+    assert data[0]["ai_score"] == {"total_score": 88.0}
+
+
+def test_published_results_query_count_independent_of_history(db, office, office_user):
+    _create_published_years(db, office, office_user, range(2015, 2025))
+    db.expire_all()
+    db.refresh(office_user)
+
+    with count_queries() as statements:
+        results = self_evaluation_endpoints.get_published_results(
+            teaching_office_id=None, year=None, db=db, current_user=office_user
+        )
+
+    assert len(results) == 10
+    # 指纹 + 考评联表 + AI评分 + 手动评分 + 最终得分
+    assert len(statements) <= 5
+
+    with count_queries() as statements:
+        cached = self_evaluation_endpoints.get_published_results(
+            teaching_office_id=None, year=None, db=db, current_user=office_user
+        )
+
+    assert cached == results
+    assert len(statements) == 1
+
+
+def test_published_results_cache_refreshes_on_new_publication(client, db, office, office_user, office_headers):
+    _create_published_years(db, office, office_user, [2023])
+    assert len(client.get("/api/teaching-office/published-results", headers=office_headers).json()) == 1
+
+    _create_published_years(db, office, office_user, [2024])
+
+    data = client.get("/api/teaching-office/published-results", headers=office_headers).json()
+    assert [item["evaluation_year"] for item in data] == [2024, 2023]
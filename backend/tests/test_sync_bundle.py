@@ -0,0 +1,117 @@
+"""
+测试离线同步包
+
+需求: 导出签名、压缩、内容寻址的同步包（清单 + NDJSON记录 + 校验和），
+校长办公会端边读取边校验导入，校验规则与在线接收相同
+"""
+
+import io
+import uuid
+
+import pytest
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.models.anomaly import Anomaly
+from app.models.evaluation_replica import EvaluationReplica
+from app.models.operation_log import OperationLog
+from app.models.sync_receipt import SyncReceipt
+from app.services.sync_bundle import SyncBundleConfigError, export_bundle, import_bundle
+from app.services.sync_stream import SyncStreamError
+from tests.test_sync_collection import _seed
+
+
+@pytest.fixture(autouse=True)
+def bundle_settings(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "SYNC_STREAM_CHUNK_SIZE", 2)
+    monkeypatch.setattr(settings, "SYNC_STREAM_COMPRESSION", "gzip")
+    monkeypatch.setattr(settings, "SYNC_BUNDLE_SIGNING_KEY", "shared-secret")
+    monkeypatch.setattr(settings, "SYNC_BUNDLE_DIR", str(tmp_path))
+
+
+async def test_export_and_import_round_trip(db):
+    ids = _seed(db, 3)
+    tombstone = uuid.uuid4()
+
+    bundle = await export_bundle(db, ids, [tombstone])
+
+    assert bundle.path.name == f"{bundle.manifest['payload_sha256']}.syncbundle"
+    assert (bundle.manifest["evaluation_count"], bundle.manifest["deleted_count"]) == (3, 1)
+    assert len(bundle.manifest["chunk_roots"]) == 2
+
+    with open(bundle.path, "rb") as source:
+        result = import_bundle(db, source)
+
+    assert (result["evaluations_count"], result["deleted_count"]) == (3, 1)
+    assert result["merkle_root"] == bundle.manifest["merkle_root"]
+    assert db.query(EvaluationReplica).filter(EvaluationReplica.deleted.is_(False)).count() == 3
+    log = db.query(OperationLog).filter(OperationLog.operation_type == "receive_sync_data").one()
+    assert log.details["transport"] == "bundle"
+
+    # 同一同步包重复导入
+    with open(bundle.path, "rb") as source:
+        assert import_bundle(db, source)["already_imported"] is True
+
+
+async def test_import_rejects_unsigned_changes_before_writing(db, monkeypatch):
+    ids = _seed(db, 3)
+    task_id = uuid.uuid4()
+    original = await export_bundle(db, ids, sync_task_id=task_id)
+    db.execute(update(Anomaly).where(Anomaly.evaluation_id == ids[0]).values(status="corrected"))
+    db.commit()
+    changed = await export_bundle(db, ids, sync_task_id=task_id)
+
+    # 原清单 + 不同的数据流：记录哈希自洽，但分块根与签名清单不符
+    manifest_line = original.path.read_bytes().split(b"\n", 1)[0]
+    spliced = manifest_line + b"\n" + changed.path.read_bytes().split(b"\n", 1)[1]
+    with pytest.raises(SyncStreamError, match="chunk 0 does not match signed manifest"):
+        import_bundle(db, io.BytesIO(spliced))
+    assert db.query(EvaluationReplica).count() == 0
+    assert db.query(SyncReceipt).count() == 0
+
+    monkeypatch.setattr(settings, "SYNC_BUNDLE_SIGNING_KEY", "other-secret")
+    with pytest.raises(SyncStreamError, match="signature") as excinfo:
+        import_bundle(db, io.BytesIO(original.path.read_bytes()))
+    assert excinfo.value.status_code == 403
+
+
+async def test_bundle_requires_signing_key(db, monkeypatch):
+    ids = _seed(db, 1)
+    bundle = await export_bundle(db, ids)
+    monkeypatch.setattr(settings, "SYNC_BUNDLE_SIGNING_KEY", "")
+
+    # 不再以 SECRET_KEY 代替签名密钥
+    with pytest.raises(SyncBundleConfigError):
+        await export_bundle(db, ids)
+    with pytest.raises(SyncBundleConfigError) as excinfo:
+        import_bundle(db, io.BytesIO(bundle.path.read_bytes()))
+    assert excinfo.value.status_code == 503
+    assert db.query(EvaluationReplica).count() == 0
+
+
+def test_bundle_api_export_and_import(client, db, evaluation_office_token, president_office_token):
+    ids = _seed(db, 2)
+
+    response = client.post(
+        "/api/review/sync-bundle",
+        json={"evaluation_ids": [str(eid) for eid in ids]},
+        headers={"Authorization": f"Bearer {evaluation_office_token}"},
+    )
+    assert response.status_code == 200
+    assert response.headers["x-bundle-sha256"] in response.headers["content-disposition"]
+
+    imported = client.post(
+        "/api/president-office/import-sync-bundle",
+        files={"file": ("bundle.syncbundle", response.content, "application/octet-stream")},
+        headers={"Authorization": f"Bearer {president_office_token}"},
+    )
+    assert imported.status_code == 200
+    assert imported.json()["evaluations_count"] == 2
+    assert db.query(EvaluationReplica).count() == 2
+
+    rejected = client.post(
+        "/api/president-office/import-sync-bundle",
+        files={"file": ("bundle.syncbundle", b"not a bundle\n", "application/octet-stream")},
+        headers={"Authorization": f"Bearer {president_office_token}"},
+    )
+    assert rejected.status_code == 400
@@ -0,0 +1,131 @@
+"""
+测试同步数据批量收集
+
+需求: 按自评表ID列表每张表一次 IN 查询收集同步数据，在内存中组装 EvaluationSyncData；
+500份自评表的查询次数与耗时基准
+"""
+
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert
+
+from app.models.ai_score import AIScore
+from app.models.anomaly import Anomaly
+from app.models.attachment import Attachment
+from app.models.final_score import FinalScore
+from app.models.manual_score import ManualScore
+from app.models.self_evaluation import SelfEvaluation
+from app.models.teaching_office import TeachingOffice
+from app.models.user import User
+from app.services.sync_service import SyncService
+
+
+@contextmanager
+def count_queries(db):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _seed(db, count):
+    """count 份完整的自评表（每份1条AI评分、2条人工评分、最终得分、2个附件、1条异常）"""
+    office = TeachingOffice(name="同步教研室", code=f"SYNC{count}")
+    reviewer = User(username=f"sync_reviewer_{count}", password_hash="x", role="evaluation_office", name="评审")
+    db.add_all([office, reviewer])
+    db.flush()
+    now = datetime.utcnow()
+    rows = {table: [] for table in (SelfEvaluation, AIScore, ManualScore, FinalScore, Attachment, Anomaly)}
+    ids = []
+    for index in range(count):
+        evaluation_id = uuid.uuid4()
+        ids.append(evaluation_id)
+        rows[SelfEvaluation].append({
+            "id": evaluation_id, "teaching_office_id": office.id, "evaluation_year": 2024,
+            "content": {"index": index}, "status": "finalized", "submitted_at": now,
+            "created_at": now, "updated_at": now,
+        })
+        rows[AIScore].append({
+            "id": uuid.uuid4(), "evaluation_id": evaluation_id, "total_score": 80, "indicator_scores": [],
+            "parsed_reform_projects": 1, "parsed_honorary_awards": 0, "scored_at": now,
+        })
+        for role in ("evaluation_team", "evaluation_office"):
+            rows[ManualScore].append({
+                "id": uuid.uuid4(), "evaluation_id": evaluation_id, "reviewer_id": reviewer.id,
+                "reviewer_name": "评审", "reviewer_role": role, "weight": 0.5, "scores": [], "submitted_at": now,
+            })
+        rows[FinalScore].append({
+            "id": uuid.uuid4(), "evaluation_id": evaluation_id, "final_score": 85, "summary": "良好",
+            "determined_by": reviewer.id, "determined_at": now, "version": 1,
+        })
+        for n in range(2):
+            rows[Attachment].append({
+                "id": uuid.uuid4(), "evaluation_id": evaluation_id, "indicator": "teaching_honors",
+                "file_name": f"{index}_{n}.pdf", "file_size": 10, "file_type": "application/pdf",
+                "storage_path": f"{evaluation_id}/{n}.pdf", "classified_by": "user", "uploaded_at": now,
+                "is_archived": True, "archived_at": now,
+            })
+        rows[Anomaly].append({
+            "id": uuid.uuid4(), "evaluation_id": evaluation_id, "type": "count_mismatch",
+            "indicator": "teaching_honors", "declared_count": 2, "parsed_count": 1,
+            "description": "旧说明", "status": "pending",
+        })
+    for table, values in rows.items():
+        db.execute(insert(table), values)
+    db.commit()
+    return ids
+
+
+def test_bulk_collection_matches_single_collection(db):
+    ids = _seed(db, 3)
+    # 重新评分后取最新一次AI评分
+    db.execute(insert(AIScore), [{
+        "id": uuid.uuid4(), "evaluation_id": ids[0], "total_score": 91, "indicator_scores": [],
+        "parsed_reform_projects": 1, "parsed_honorary_awards": 0,
+        "scored_at": datetime.utcnow() + timedelta(minutes=5),
+    }])
+    db.commit()
+    service = SyncService("https://president-office.test/api")
+    missing = uuid.uuid4()
+
+    collected = service.collect_evaluations_data(db, [ids[0], missing, ids[1], ids[0], ids[2]])
+
+    assert set(collected) == set(ids)
+    assert missing not in collected
+    assert collected[ids[0]].ai_score["total_score"] == 91
+    for evaluation_id in ids:
+        data = collected[evaluation_id]
+        assert data == service.collect_evaluation_data(db, evaluation_id)
+        assert data.teaching_office_name == "同步教研室"
+        assert len(data.manual_scores) == 2
+        assert len(data.attachments) == 2
+        assert len(data.anomalies) == 1
+        assert data.final_score["final_score"] == 85
+    assert service.collect_evaluation_data(db, missing) is None
+
+
+def test_bulk_collection_benchmark_500_evaluations(db):
+    ids = _seed(db, 500)
+    service = SyncService("https://president-office.test/api")
+    db.expire_all()
+
+    with count_queries(db) as statements:
+        started = time.perf_counter()
+        collected = service.collect_evaluations_data(db, ids)
+        elapsed = time.perf_counter() - started
+
+    assert len(collected) == 500
+    assert sum(len(data.attachments) for data in collected.values()) == 1000
+    # 自评表、教研室、AI评分、最终得分、人工评分、附件、异常各一次 IN 查询
+    assert len(statements) == 7
+    assert elapsed < 5.0
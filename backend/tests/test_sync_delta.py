@@ -0,0 +1,153 @@
+"""
+测试增量同步
+
+需求: 校长办公会端确认后记录每份自评表的同步数据哈希与版本；"上次成功同步以来的变化"模式
+只发送新增或变化的自评表及已删除自评表的墓碑
+"""
+
+import uuid
+from unittest.mock import AsyncMock
+from uuid import UUID
+
+import pytest
+from sqlalchemy import delete, update
+
+from app.core.config import settings
+from app.core.http_clients import PRESIDENT_OFFICE_CLIENT, HTTPClientConfig, http_clients, register_default_clients
+from app.models.ai_score import AIScore
+from app.models.anomaly import Anomaly
+from app.models.attachment import Attachment
+from app.models.final_score import FinalScore
+from app.models.manual_score import ManualScore
+from app.models.operation_log import OperationLog
+from app.models.self_evaluation import SelfEvaluation
+from app.models.sync_outbox import SyncOutboxEntry
+from app.models.sync_receipt import SyncReceipt
+from app.models.sync_watermark import SyncWatermark
+from app.services.sync_receiver_service import SyncReceiverService
+from app.services.sync_service import SyncAttempt, SyncService
+from app.services.sync_stream import SyncStreamDecoder, record_digest
+from tests.test_sync_collection import _seed
+from tests.test_sync_stream import BASE_URL, RecordingTransport
+
+
+@pytest.fixture
+def president_office(client, monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_STREAM_CHUNK_SIZE", 2)
+    transport = RecordingTransport()
+    http_clients.register(PRESIDENT_OFFICE_CLIENT, HTTPClientConfig(), transport=transport)
+    yield transport
+    register_default_clients(http_clients)
+
+
+def _delete_evaluation(db, evaluation_id):
+    for table in (AIScore, ManualScore, FinalScore, Attachment, Anomaly):
+        db.execute(delete(table).where(table.evaluation_id == evaluation_id))
+    db.execute(delete(SelfEvaluation).where(SelfEvaluation.id == evaluation_id))
+    db.commit()
+
+
+def _handle_anomaly(db, evaluation_id):
+    db.execute(update(Anomaly).where(Anomaly.evaluation_id == evaluation_id).values(status="corrected"))
+    db.commit()
+
+
+async def test_changes_since_last_sync_send_only_delta_and_tombstones(db, president_office):
+    ids = _seed(db, 5)
+    service = SyncService(BASE_URL)
+    assert await service.sync_evaluations(db, ids, uuid.uuid4()) == (5, 0, None)
+    full_body = president_office.bodies[-1][1]
+    assert {watermark.version for watermark in db.query(SyncWatermark)} == {1}
+    assert service.plan_changes(db).unchanged == 5
+
+    _handle_anomaly(db, ids[0])
+    _delete_evaluation(db, ids[1])
+    [added] = _seed(db, 1)
+
+    delta = service.plan_changes(db)
+    assert sorted(delta.changed) == sorted([ids[0], added])
+    assert (delta.deleted, delta.unchanged) == ([ids[1]], 3)
+
+    task_id = uuid.uuid4()
+    assert await service.sync_evaluations(db, delta.changed, task_id, delta.deleted) == (3, 0, None)
+
+    lines = president_office.record_lines()
+    assert sorted(message.type for message in lines) == ["record", "record", "tombstone"]
+    assert len(president_office.bodies[-1][1]) < len(full_body)
+    watermarks = {watermark.evaluation_id: watermark for watermark in db.query(SyncWatermark)}
+    assert (watermarks[ids[0]].version, watermarks[ids[0]].sync_task_id) == (2, task_id)
+    assert (watermarks[ids[1]].deleted, watermarks[ids[1]].payload_hash, watermarks[ids[1]].version) == (True, None, 2)
+    assert watermarks[added].version == 1
+    assert watermarks[ids[2]].version == 1
+    log = db.query(OperationLog).filter(OperationLog.target_id == task_id).one()
+    assert log.details["deleted_evaluation_ids"] == [str(ids[1])]
+
+    delta = service.plan_changes(db)
+    assert (delta.changed, delta.deleted, delta.unchanged) == ([], [], 5)
+
+
+async def test_failed_sync_keeps_previous_watermarks(db, client, monkeypatch):
+    ids = _seed(db, 2)
+    service = SyncService(BASE_URL)
+    monkeypatch.setattr(service, "send_sync_stream", AsyncMock(side_effect=RuntimeError("down")))
+
+    synced, failed, _ = await service.sync_evaluations(db, ids, uuid.uuid4())
+
+    assert (synced, failed) == (0, 2)
+    assert db.query(SyncWatermark).count() == 0
+    assert sorted(service.plan_changes(db).changed) == sorted(ids)
+
+
+async def test_resume_resends_acked_chunks_that_changed(db, president_office):
+    ids = _seed(db, 5)
+    task_id = uuid.uuid4()
+    service = SyncService(BASE_URL)
+
+    # 前两个分块已确认后中断
+    receiver = SyncReceiverService(db, task_id)
+    decoder = SyncStreamDecoder("identity")
+    async for data in service._stream_body(db, ids, task_id, "identity", [], SyncAttempt()):
+        for message in decoder.feed(data):
+            receiver.handle(message)
+        if receiver.next_chunk == 2:
+            break
+    # 中断期间第二个分块的数据发生变化
+    _handle_anomaly(db, ids[3])
+
+    assert await service.sync_evaluations(db, ids, task_id) == (5, 0, None)
+
+    assert {message.fields["chunk"] for message in president_office.record_lines()} == {1, 2}
+    receipts = db.query(SyncReceipt).filter(SyncReceipt.sync_task_id == task_id).all()
+    assert sorted(receipt.chunk_index for receipt in receipts) == [0, 1, 2]
+    assert db.query(SyncWatermark).count() == 5
+
+
+def test_changes_mode_endpoint(client, db, evaluation_office_token):
+    ids = _seed(db, 2)
+    headers = {"Authorization": f"Bearer {evaluation_office_token}"}
+
+    response = client.post("/api/review/sync-to-president-office", json={"mode": "full"}, headers=headers)
+    assert response.status_code == 422
+
+    response = client.post("/api/review/sync-to-president-office", json={"mode": "changes"}, headers=headers)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["status"], data["mode"], data["changed_count"], data["deleted_count"]) == ("syncing", "changes", 2, 0)
+    outbox = db.query(SyncOutboxEntry).filter(SyncOutboxEntry.sync_task_id == UUID(data["sync_task_id"])).all()
+    assert sorted(entry.evaluation_id for entry in outbox) == sorted(ids)
+
+    collected = SyncService(BASE_URL).collect_evaluations_data(db, ids)
+    SyncService(BASE_URL).record_watermarks(db, uuid.uuid4(), {
+        evaluation_id: record_digest(data.model_dump(mode="json")).hex()
+        for evaluation_id, data in collected.items()
+    })
+    response = client.post("/api/review/sync-to-president-office", json={"mode": "changes"}, headers=headers)
+
+    data = response.json()
+    assert (data["status"], data["changed_count"], data["unchanged_count"]) == ("completed", 0, 2)
+    assert data["message"] == "No changes since last successful sync."
+    assert db.query(SyncOutboxEntry).count() == 2
+    tasks = client.get("/api/review/sync-tasks", headers=headers).json()
+    assert [task["mode"] for task in tasks] == ["changes", "changes"]
+
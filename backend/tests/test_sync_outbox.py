@@ -0,0 +1,203 @@
+"""
+测试同步出站队列
+
+需求: 创建同步任务时在同一事务中写入每份自评表的投递记录；dispatcher按指数退避投递存储的快照，
+中断时按自评表粒度续投，达到最大次数后转入死信，死信可重新投递
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import delete, update
+from tenacity import stop_after_attempt, wait_none
+
+from app.core.config import settings
+from app.core.http_clients import PRESIDENT_OFFICE_CLIENT, HTTPClientConfig, http_clients, register_default_clients
+from app.models.evaluation_replica import EvaluationReplica
+from app.models.manual_score import ManualScore
+from app.models.sync_outbox import SyncOutboxEntry
+from app.models.sync_task import SyncTask
+from app.models.sync_watermark import SyncWatermark
+from app.services.sync_outbox import SyncOutboxDispatcher, SyncOutboxService
+from app.services import sync_service as sync_service_module
+from app.services.sync_service import SyncService
+from tests.conftest import TestingSessionLocal
+from tests.test_sync_collection import _seed
+from tests.test_sync_stream import BASE_URL, RecordingTransport
+
+
+class FlakyTransport(RecordingTransport):
+    """mode 为 down 时同步数据流发送失败；为 cut 时只送达第一个分块后断开连接"""
+
+    def __init__(self):
+        super().__init__()
+        self.mode = None
+
+    async def handle_async_request(self, request):
+        if request.method != "POST" or self.mode is None:
+            return await super().handle_async_request(request)
+        if self.mode == "cut":
+            body = await request.aread()
+            end = body.index(b"\n", body.index(b'"type":"chunk"')) + 1
+            forwarded = httpx.Request(request.method, request.url, headers=request.headers, content=body[:end])
+            await self.inner.handle_async_request(forwarded)
+        raise httpx.ReadError("connection reset", request=request)
+
+
+@pytest.fixture
+def president_office(client, monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_STREAM_CHUNK_SIZE", 2)
+    monkeypatch.setattr(settings, "SYNC_STREAM_COMPRESSION", "identity")
+    monkeypatch.setattr(settings, "SYNC_OUTBOX_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(sync_service_module, "_sync_service", SyncService(BASE_URL))
+    # 重试策略由出站队列负责：每次投递只发送一次
+    monkeypatch.setattr(SyncService.send_sync_stream.retry, "stop", stop_after_attempt(1))
+    monkeypatch.setattr(SyncService.send_sync_stream.retry, "wait", wait_none())
+    transport = FlakyTransport()
+    http_clients.register(PRESIDENT_OFFICE_CLIENT, HTTPClientConfig(), transport=transport)
+    yield transport
+    register_default_clients(http_clients)
+
+
+@pytest.fixture
+def dispatcher():
+    return SyncOutboxDispatcher(session_factory=TestingSessionLocal, concurrency=0)
+
+
+def _create_task(db, ids):
+    task = SyncTask(evaluation_ids=[str(eid) for eid in ids], status="syncing", total_count=len(ids))
+    SyncOutboxService(db).enqueue(task, ids)
+    db.commit()
+    return task
+
+
+def _make_due(db):
+    db.execute(update(SyncOutboxEntry).values(next_run_at=datetime.utcnow()))
+    db.commit()
+
+
+async def test_sync_request_writes_outbox_and_dispatcher_delivers(client, db, evaluation_office_token, president_office, dispatcher):
+    ids = _seed(db, 4)
+    # 数据不完整的自评表在入队时即记为失败
+    db.execute(delete(ManualScore).where(ManualScore.evaluation_id == ids[3]))
+    db.commit()
+    headers = {"Authorization": f"Bearer {evaluation_office_token}"}
+
+    response = client.post(
+        "/api/review/sync-to-president-office",
+        json={"evaluation_ids": [str(eid) for eid in ids]},
+        headers=headers,
+    )
+
+    data = response.json()
+    assert (data["status"], data["failed_count"]) == ("syncing", 1)
+    entries = db.query(SyncOutboxEntry).order_by(SyncOutboxEntry.seq).all()
+    assert [entry.status for entry in entries] == ["pending", "pending", "pending", "dead"]
+    assert entries[0].payload["evaluation_id"] == str(ids[0])
+    assert president_office.bodies == []
+
+    assert await dispatcher.drain() == 1
+
+    db.expire_all()
+    task = db.get(SyncTask, entries[0].sync_task_id)
+    assert (task.status, task.synced_count, task.failed_count) == ("failed", 3, 1)
+    assert "missing manual_scores" in task.error_message
+    assert db.query(EvaluationReplica).count() == 3
+    assert db.query(SyncWatermark).count() == 3
+
+
+async def test_interrupted_delivery_resumes_per_evaluation(db, president_office, dispatcher):
+    ids = _seed(db, 3)
+    task = _create_task(db, ids)
+    president_office.mode = "cut"
+
+    assert await dispatcher.drain() == 1
+
+    db.expire_all()
+    statuses = {entry.evaluation_id: entry.status for entry in db.query(SyncOutboxEntry)}
+    # 第一个分块（2份自评表）已确认，其余安排退避重试
+    assert [statuses[eid] for eid in ids] == ["delivered", "delivered", "pending"]
+    assert (task.status, task.synced_count, task.retry_count) == ("syncing", 2, 0)
+    assert task.error_message == "connection reset"
+    assert await dispatcher.drain() == 0
+
+    president_office.mode = None
+    _make_due(db)
+    assert await dispatcher.drain() == 1
+
+    assert [json.loads(message.raw_data)["evaluation_id"] for message in president_office.record_lines()] == [str(ids[2])]
+    db.expire_all()
+    assert (task.status, task.synced_count, task.retry_count, task.error_message) == ("completed", 3, 1, None)
+    assert db.query(EvaluationReplica).count() == 3
+
+
+async def test_dead_letter_after_max_attempts_and_requeue(client, db, evaluation_office_token, president_office, dispatcher):
+    ids = _seed(db, 2)
+    task = _create_task(db, ids)
+    president_office.mode = "down"
+
+    await dispatcher.drain()
+    _make_due(db)
+    await dispatcher.drain()
+
+    db.expire_all()
+    assert {entry.status for entry in db.query(SyncOutboxEntry)} == {"dead"}
+    assert (task.status, task.failed_count, task.retry_count) == ("failed", 2, 1)
+    assert task.completed_at is not None
+
+    president_office.mode = None
+    headers = {"Authorization": f"Bearer {evaluation_office_token}"}
+    response = client.post(f"/api/review/sync-tasks/{task.id}/retry", headers=headers)
+    assert (response.json()["status"], response.json()["failed_count"]) == ("syncing", 0)
+
+    assert await dispatcher.drain() == 1
+    db.expire_all()
+    assert (task.status, task.synced_count) == ("completed", 2)
+    status = client.get(f"/api/review/sync-status/{task.id}", headers=headers).json()
+    assert status["status"] == "completed"
+
+
+async def test_stale_receipts_do_not_ack_shorter_retry(db, president_office, dispatcher, monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_OUTBOX_MAX_ATTEMPTS", 3)
+    ids = _seed(db, 5)
+    task = _create_task(db, ids)
+    president_office.mode = "cut"
+    assert await dispatcher.drain() == 1
+
+    # 重试只投递剩余的3份，接收端仍保留第一次投递第0块（前2份）的回执
+    president_office.mode = "down"
+    _make_due(db)
+    assert await dispatcher.drain() == 1
+
+    db.expire_all()
+    statuses = {entry.evaluation_id: entry.status for entry in db.query(SyncOutboxEntry)}
+    assert [statuses[eid] for eid in ids] == ["delivered", "delivered", "pending", "pending", "pending"]
+    assert task.synced_count == 2
+
+    president_office.mode = None
+    _make_due(db)
+    assert await dispatcher.drain() == 1
+    db.expire_all()
+    assert (task.status, task.synced_count) == ("completed", 5)
+    assert db.query(EvaluationReplica).count() == 5
+
+
+def test_stale_entries_dead_letter_after_max_attempts(db, dispatcher):
+    ids = _seed(db, 2)
+    task = _create_task(db, ids)
+    lease_expired = datetime.utcnow() - timedelta(seconds=settings.SYNC_OUTBOX_LEASE_SECONDS + 60)
+    first, second = db.query(SyncOutboxEntry).order_by(SyncOutboxEntry.seq).all()
+    db.execute(update(SyncOutboxEntry).values(status="sending", locked_by="crashed", locked_at=lease_expired))
+    db.execute(update(SyncOutboxEntry).where(SyncOutboxEntry.id == first.id).values(attempts=first.max_attempts))
+    db.execute(update(SyncOutboxEntry).where(SyncOutboxEntry.id == second.id).values(attempts=1))
+    db.commit()
+
+    assert dispatcher.requeue_stale_entries() == 1
+
+    db.expire_all()
+    assert (first.status, first.locked_by) == ("dead", None)
+    assert "最大尝试次数" in first.last_error
+    assert (second.status, second.attempts) == ("pending", 1)
+    assert (task.status, task.failed_count) == ("syncing", 1)
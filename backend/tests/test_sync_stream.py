@@ -0,0 +1,267 @@
+"""
+测试流式分块同步传输
+
+需求: NDJSON流（可选压缩）传输同步数据，记录级哈希与Merkle根校验，
+按分块确认、中断后续传，两端内存只与分块大小有关
+"""
+
+import hashlib
+import json
+import uuid
+import zlib
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.core.http_clients import PRESIDENT_OFFICE_CLIENT, HTTPClientConfig, http_clients, register_default_clients
+from app.core.security import SYNC_SIGNATURE_HEADER, SYNC_TIMESTAMP_HEADER, sync_request_auth, sync_stream_auth
+from app.main import app
+from app.models.evaluation_replica import EvaluationReplica
+from app.models.operation_log import OperationLog
+from app.models.sync_receipt import SyncReceipt
+from app.services.sync_receiver_service import SyncReceiverService
+from app.services.sync_service import SyncAttempt, SyncService
+from app.services.sync_stream import (
+    RECORD_TYPES,
+    MerkleBuilder,
+    SyncStreamDecoder,
+    SyncStreamError,
+    ZSTD_AVAILABLE,
+    compressor,
+    encode_message,
+    encode_record,
+    leaf_hash,
+)
+from tests.test_sync_collection import _seed
+
+BASE_URL = "http://president.test/api/president-office"
+
+
+def _reference_root(leaves):
+    """RFC 6962 Merkle Tree Hash 的递归定义"""
+    if not leaves:
+        return hashlib.sha256(b"").digest()
+    if len(leaves) == 1:
+        return leaves[0]
+    split = 1
+    while split * 2 < len(leaves):
+        split *= 2
+    return hashlib.sha256(b"\x01" + _reference_root(leaves[:split]) + _reference_root(leaves[split:])).digest()
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """转发到应用本身，并记录发送的同步数据流"""
+
+    def __init__(self):
+        self.inner = httpx.ASGITransport(app=app)
+        self.bodies = []
+
+    async def handle_async_request(self, request):
+        body = await request.aread()
+        if request.method == "POST":
+            self.bodies.append((request.headers.get("content-encoding"), body))
+        forwarded = httpx.Request(request.method, request.url, headers=request.headers, content=body)
+        return await self.inner.handle_async_request(forwarded)
+
+    def record_lines(self, index=-1):
+        codec, body = self.bodies[index]
+        decoder = SyncStreamDecoder(codec)
+        return [message for message in [*decoder.feed(body), *decoder.close()] if message.type in RECORD_TYPES]
+
+
+@pytest.fixture
+def president_office(client, monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_STREAM_CHUNK_SIZE", 2)
+    transport = RecordingTransport()
+    http_clients.register(PRESIDENT_OFFICE_CLIENT, HTTPClientConfig(), transport=transport)
+    yield transport
+    register_default_clients(http_clients)
+
+
+def test_merkle_builder_matches_rfc6962():
+    leaves = [leaf_hash(str(i).encode()) for i in range(20)]
+    for n in range(len(leaves) + 1):
+        builder = MerkleBuilder()
+        for leaf in leaves[:n]:
+            builder.add(leaf)
+        assert builder.root() == _reference_root(leaves[:n]).hex()
+
+
+@pytest.mark.parametrize("codec", ["identity", "gzip", pytest.param("zstd", marks=pytest.mark.skipif(
+    not ZSTD_AVAILABLE, reason="zstandard not installed"))])
+def test_decoder_handles_arbitrary_splits(codec):
+    lines = [encode_record(0, {"name": f"教研室{i}", "value": i, "nested": {"b": 1, "a": [i]}})[0] for i in range(50)]
+    packer = compressor(codec)
+    body = b"".join(lines)
+    if packer:
+        body = packer.compress(body) + packer.flush()
+
+    decoder = SyncStreamDecoder(codec)
+    messages = []
+    for start in range(0, len(body), 7):
+        messages.extend(decoder.feed(body[start:start + 7]))
+    messages.extend(decoder.close())
+
+    assert len(messages) == 50
+    for message in messages:
+        # 原始字节即规范化JSON，哈希可直接校验
+        assert leaf_hash(message.raw_data).hex() == message.fields["hash"]
+    assert b'"nested":{"a":[3],"b":1}' in messages[3].raw_data
+
+    with pytest.raises(SyncStreamError):
+        list(SyncStreamDecoder("identity", max_line_bytes=10).feed(b"x" * 20))
+
+
+def test_decoder_bounds_decompressed_output():
+    # 约50KB的gzip数据解压后为64MB，且没有换行
+    packer = compressor("gzip")
+    bomb = packer.compress(b"x" * (64 * 1024 * 1024)) + packer.flush()
+    decoder = SyncStreamDecoder("gzip", max_line_bytes=1024 * 1024)
+
+    with pytest.raises(SyncStreamError) as exc_info:
+        list(decoder.feed(bomb))
+
+    assert exc_info.value.status_code == 413
+    # 超过上限时立即中止，只展开了上限附近的数据
+    assert len(decoder._buffer) <= 1024 * 1024 + 64 * 1024
+
+    # 正常数据即使压缩比很高也能逐行解出
+    line = encode_record(0, {"text": "a" * 1000})[0]
+    packer = compressor("gzip")
+    body = packer.compress(line * 5000) + packer.flush()
+    decoder = SyncStreamDecoder("gzip", max_line_bytes=4096)
+    assert sum(1 for _ in decoder.feed(body)) + sum(1 for _ in decoder.close()) == 5000
+
+
+async def test_streamed_sync_end_to_end(db, president_office):
+    ids = _seed(db, 5)
+    missing = uuid.uuid4()
+    task_id = uuid.uuid4()
+
+    synced, failed, error = await SyncService(BASE_URL).sync_evaluations(db, ids + [missing, ids[0]], task_id)
+
+    assert (synced, failed) == (5, 1)
+    assert error == f"Evaluation {missing} not found"
+    codec, _ = president_office.bodies[-1]
+    assert codec in ("zstd", "gzip")
+    receipts = db.query(SyncReceipt).filter(SyncReceipt.sync_task_id == task_id).order_by(SyncReceipt.chunk_index).all()
+    assert [receipt.record_count for receipt in receipts] == [2, 2, 1]
+    log = db.query(OperationLog).filter(OperationLog.target_id == task_id).one()
+    assert log.details["transport"] == "stream"
+    assert sorted(log.details["evaluation_ids"]) == sorted(str(i) for i in ids)
+
+
+async def test_resumes_after_last_acknowledged_chunk(db, president_office):
+    ids = _seed(db, 5)
+    task_id = uuid.uuid4()
+    service = SyncService(BASE_URL)
+
+    # 第一次发送在第一个分块确认后中断
+    receiver = SyncReceiverService(db, task_id)
+    decoder = SyncStreamDecoder("identity")
+    async for data in service._stream_body(db, ids, task_id, "identity", [], SyncAttempt()):
+        for message in decoder.feed(data):
+            receiver.handle(message)
+        if receiver.next_chunk == 1:
+            break
+    with pytest.raises(SyncStreamError, match="不完整"):
+        receiver.finish()
+
+    synced, failed, error = await service.sync_evaluations(db, ids, task_id)
+
+    assert (synced, failed, error) == (5, 0, None)
+    # 续传只发送了后两个分块的记录
+    assert len(president_office.record_lines()) == 3
+    assert {message.fields["chunk"] for message in president_office.record_lines()} == {1, 2}
+    assert db.query(SyncReceipt).filter(SyncReceipt.sync_task_id == task_id).count() == 3
+
+
+async def test_tampered_record_is_rejected_before_ack(db, client):
+    ids = _seed(db, 3)
+    task_id = uuid.uuid4()
+    body = b"".join([data async for data in SyncService(BASE_URL)._stream_body(db, ids, task_id, "identity", [], SyncAttempt())])
+    tampered = body.replace(b'"final_score":85.0', b'"final_score":95.0', 1)
+    assert tampered != body
+
+    response = client.post(
+        "/api/president-office/receive-sync-stream",
+        auth=sync_stream_auth,
+        content=tampered,
+        headers={"X-Sync-Task-Id": str(task_id), "Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 400
+    assert "record hash mismatch" in response.json()["detail"]["message"]
+    assert db.query(SyncReceipt).count() == 0
+
+    response = client.post(
+        "/api/president-office/receive-sync-stream",
+        auth=sync_stream_auth,
+        content=zlib.compress(body),
+        headers={"X-Sync-Task-Id": str(task_id), "Content-Encoding": "br"},
+    )
+    assert response.status_code == 415
+
+    response = client.post(
+        "/api/president-office/receive-sync-stream",
+        auth=sync_stream_auth,
+        content=body,
+        headers={"X-Sync-Task-Id": str(task_id)},
+    )
+    assert response.status_code == 200
+    assert response.json()["evaluations_count"] == 3
+    status = client.get(f"/api/president-office/receive-sync-stream/{task_id}", auth=sync_request_auth).json()
+    assert [chunk["index"] for chunk in status["acked_chunks"]] == [0]
+
+
+async def test_replayed_signature_with_forged_body_is_rejected(db, client):
+    ids = _seed(db, 3)
+    task_id = uuid.uuid4()
+    body = b"".join([data async for data in SyncService(BASE_URL)._stream_body(db, ids, task_id, "identity", [], SyncAttempt())])
+    # 截获的合法请求签名头：流式请求体不在请求签名范围内
+    signed = next(sync_stream_auth.auth_flow(
+        httpx.Request("POST", "http://testserver/api/president-office/receive-sync-stream")
+    )).headers
+    headers = {
+        SYNC_TIMESTAMP_HEADER: signed[SYNC_TIMESTAMP_HEADER],
+        SYNC_SIGNATURE_HEADER: signed[SYNC_SIGNATURE_HEADER],
+        "X-Sync-Task-Id": str(task_id),
+    }
+
+    # 篡改记录后重新计算记录哈希与分块根，但无法重新计算分块结束标记的HMAC
+    lines, chunk_hashes = [], MerkleBuilder()
+    decoder = SyncStreamDecoder("identity")
+    for message in [*decoder.feed(body), *decoder.close()]:
+        if message.type in RECORD_TYPES:
+            data = json.loads(message.raw_data.replace(b'"final_score":85.0', b'"final_score":95.0'))
+            line, digest = encode_record(message.fields["chunk"], data, message.type)
+            chunk_hashes.add(digest)
+            lines.append(line)
+        elif message.type == "chunk":
+            lines.append(encode_message({**message.fields, "root": chunk_hashes.root()}))
+            chunk_hashes = MerkleBuilder()
+        else:
+            lines.append(encode_message(message.fields))
+    forged = b"".join(lines)
+    assert forged != body
+
+    response = client.post("/api/president-office/receive-sync-stream", content=forged, headers=headers)
+
+    assert response.status_code == 401
+    assert "invalid chunk signature" in response.json()["detail"]["message"]
+    assert db.query(SyncReceipt).count() == 0
+    assert db.query(EvaluationReplica).count() == 0
+
+    # 去掉HMAC的数据流在头部即被拒绝
+    unsigned = b"".join(
+        encode_message({key: value for key, value in message.fields.items() if key != "mac"})
+        for message in SyncStreamDecoder("identity").feed(body.split(b"\n", 1)[0] + b"\n")
+    )
+    response = client.post("/api/president-office/receive-sync-stream", content=unsigned, headers=headers)
+    assert response.status_code == 401
+    assert "invalid header signature" in response.json()["detail"]["message"]
+
+    # 原样重放只会重复写入同样的数据
+    response = client.post("/api/president-office/receive-sync-stream", content=body, headers=headers)
+    assert response.status_code == 200
@@ -64,6 +64,11 @@ export const selfEvaluationApi = {
     })
   },
   
+  // Get AI scoring job status (latest job of the evaluation)
+  getAIScoringJob: (evaluationId: string) => {
+    return apiClient.get(`/teaching-office/self-evaluation/${evaluationId}/ai-scoring-job`)
+  },
+  
   // Get self-evaluation status
   getStatus: (evaluationId: string) => {
     return apiClient.get(`/teaching-office/self-evaluation/${evaluationId}`)
@@ -228,6 +233,72 @@ export const managementResultApi = {
   // Get detailed result for a specific teaching office
   getResultDetail: (evaluationId: string) => {
     return apiClient.get(`/management/results/${evaluationId}`)
+  },
+  
+  // Bulk AI scoring; progress is streamed as Server-Sent Events (start / progress / summary)
+  bulkAIScoring: async (
+    data: { year?: number; evaluation_ids?: string[]; concurrency?: number },
+    onEvent: (event: string, payload: any) => void
+  ) => {
+    const token = localStorage.getItem('token')
+    const response = await fetch(`${baseURL}/management/bulk-ai-scoring`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token ? { Authorization: `Bearer ${token}` } : {})
+      },
+      body: JSON.stringify(data)
+    })
+    if (!response.ok || !response.body) {
+      throw new Error(`批量AI评分请求失败: ${response.status}`)
+    }
+    await readSSE(response.body, onEvent)
+  },
+
+  // Subscribe to AI scoring job progress (SSE); abort via signal to unsubscribe
+  streamAIScoringProgress: async (
+    params: { year?: number },
+    onEvent: (event: string, payload: any) => void,
+    signal?: AbortSignal
+  ) => {
+    const token = localStorage.getItem('token')
+    const query = params.year ? `?year=${params.year}` : ''
+    const response = await fetch(`${baseURL}/management/ai-scoring-progress/stream${query}`, {
+      headers: token ? { Authorization: `Bearer ${token}` } : {},
+      signal
+    })
+    if (!response.ok || !response.body) {
+      throw new Error(`订阅AI评分进度失败: ${response.status}`)
+    }
+    await readSSE(response.body, onEvent)
+  }
+}
+
+// Parse a Server-Sent Events response body incrementally
+async function readSSE (
+  body: ReadableStream<Uint8Array>,
+  onEvent: (event: string, payload: any) => void
+) {
+  const reader = body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    let boundary = buffer.indexOf('\n\n')
+    while (boundary !== -1) {
+      const block = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      let event = 'message'
+      let payload = ''
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7)
+        else if (line.startsWith('data: ')) payload += line.slice(6)
+      }
+      if (payload) onEvent(event, JSON.parse(payload))
+      boundary = buffer.indexOf('\n\n')
+    }
   }
 }
 
@@ -3,11 +3,12 @@ import apiClient from './client'
 export interface CollegeStats {
     avg_score: number
     rank_list: Array<{ name: string; score: number }>
-    weakness_analysis: Array<{ indicator: string; avg_loss_rate: number }>
+    weakness_analysis: Array<{ indicator: string; avg_loss_rate: number; sample_count?: number }>
+    year?: number | null
 }
 
 export const collegeApi = {
-    getDashboardStats: () => {
-        return apiClient.get<CollegeStats>('/college/dashboard/stats')
+    getDashboardStats: (year?: number) => {
+        return apiClient.get<CollegeStats>('/college/dashboard/stats', { params: year ? { year } : undefined })
     }
 }